@@ -0,0 +1,83 @@
+# scripts/analytics_report.py
+"""
+Stage, task and token analytics over the task log history.
+
+Task logs and usage records of the database in DATABASE_URL / MYSQL_* are streamed in
+chunks into column arrays and aggregated with NumPy; see src/analytics/reports.py.
+
+    python scripts/analytics_report.py
+    python scripts/analytics_report.py --since 2025-01-01 --until 2025-02-01 --json
+    python scripts/analytics_report.py --parquet ./analytics   # needs pyarrow
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Keep stdout for the report (--json output is meant to be piped)
+os.environ.setdefault("SQL_ECHO", "false")
+
+from src.analytics.columnar import ANALYTICS_CHUNK_ROWS  # noqa: E402
+from src.analytics.reports import build_report, export_parquet  # noqa: E402
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value:g}" if isinstance(value, (int, float)) else str(value)
+
+
+def print_report(report: dict):
+    rows = report["rows"]
+    print(f"{rows['task_logs']} log entries, {rows['usage_records']} usage records, {rows['tasks']} tasks "
+          f"({rows['chunks']} chunks): loaded in {report['timings']['load_seconds']}s, "
+          f"aggregated in {report['timings']['aggregate_seconds']}s\n")
+
+    print(f"{'stage':<16} {'runs':>8} {'success':>8} {'tasks':>7} {'retries':>8} {'retried':>8} "
+          f"{'task ok':>8} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8}")
+    for row in report["stages"]:
+        print(f"{row['stage']:<16} {row['runs']:>8} {fmt(row['success_rate']):>8} {row['tasks']:>7} "
+              f"{fmt(row['retries_per_task']):>8} {fmt(row['tasks_retried_rate']):>8} {fmt(row['task_success_rate']):>8} "
+              f"{fmt(row['seconds_p50']):>8} {fmt(row['seconds_p90']):>8} {fmt(row['seconds_p99']):>8}")
+
+    tasks = report["tasks"]
+    print(f"\ntasks: {tasks['tasks']} ({tasks['with_outcome']} finished), completion rate {fmt(tasks['completion_rate'])}")
+    print("outcomes: " + ", ".join(f"{k} {v}" for k, v in tasks["outcomes"].items()))
+    print(f"seconds p50/p90/p99: {fmt(tasks['seconds_p50'])} / {fmt(tasks['seconds_p90'])} / {fmt(tasks['seconds_p99'])}")
+
+    tokens = report["tokens"]
+    print(f"\ntokens: {tokens['prompt_tokens']} prompt + {tokens['completion_tokens']} completion in {tokens['calls']} calls, "
+          f"${tokens['cost_usd']}")
+    print(f"tokens per task p50/p90/p99: {fmt(tokens['tokens_per_task_p50'])} / {fmt(tokens['tokens_per_task_p90'])} / "
+          f"{fmt(tokens['tokens_per_task_p99'])}")
+    for key in ("stage", "model"):
+        print(f"\n{key:<24} {'calls':>8} {'prompt':>12} {'completion':>12} {'cost $':>10} {'p50/call':>9}")
+        for row in tokens[f"by_{key}"]:
+            print(f"{row[key]:<24} {row['calls']:>8} {row['prompt_tokens']:>12} {row['completion_tokens']:>12} "
+                  f"{row['cost_usd']:>10} {fmt(row['tokens_per_call_p50']):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--since", help="first day/time included, e.g. 2025-01-01")
+    parser.add_argument("--until", help="first day/time excluded")
+    parser.add_argument("--chunk-rows", type=int, default=ANALYTICS_CHUNK_ROWS, help="rows fetched per round trip")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--parquet", metavar="DIR", help="also write the raw columns as Parquet files to DIR")
+    args = parser.parse_args()
+
+    if args.parquet:
+        try:
+            paths = export_parquet(args.parquet, since=args.since, until=args.until, chunk_rows=args.chunk_rows)
+        except ImportError:
+            sys.exit("--parquet needs pyarrow (pip install pyarrow)")
+        print("wrote " + ", ".join(paths), file=sys.stderr)
+
+    report = build_report(since=args.since, until=args.until, chunk_rows=args.chunk_rows)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
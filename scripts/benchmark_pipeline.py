@@ -0,0 +1,101 @@
+# scripts/benchmark_pipeline.py
+"""
+Offline end-to-end benchmark of the agent pipeline with a deterministic fake LLM.
+
+Tasks go through run_core_agent_task on an in-memory Celery broker into the CoreAgent,
+its tools and the database (SQLite in a scratch directory). Model calls are answered
+by a script (or a recorded cassette) after a sampled latency. Reports tasks/sec,
+per-stage p50/p99, DB round trips and tokens per task, and writes them to JSON;
+--compare fails (exit 1) on regressions against an earlier results file.
+
+    python scripts/benchmark_pipeline.py --tasks 20 --concurrency 4 --latency lognormal:0.8,0.5 --latency-scale 0.1
+    python scripts/benchmark_pipeline.py --output new.json --compare baseline.json
+    python scripts/benchmark_pipeline.py --mode record --cassette cassettes/pipeline.json   # needs OPENAI_API_KEY
+    python scripts/benchmark_pipeline.py --mode replay --cassette cassettes/pipeline.json
+    python scripts/benchmark_pipeline.py --scheduler on --exploration 0.3 --workdir bench-rl --tasks 40
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", default="none", help="default LLM latency, e.g. none, fixed:0.5, lognormal:0.8,0.5")
+    parser.add_argument("--role-latency", action="append", default=[], metavar="ROLE=SPEC",
+                        help="latency for one role (core_agent, analyze, plan, codegen, deploy, validate); repeatable")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=["script", "replay", "record"], default="script")
+    parser.add_argument("--cassette", help="recorded responses for --mode replay/record")
+    parser.add_argument("--output", help="results JSON (default: benchmark-results/pipeline-<timestamp>.json)")
+    parser.add_argument("--compare", help="baseline results JSON; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=None, help="relative change counted as a regression (default 0.2)")
+    parser.add_argument("--workdir", help="scratch directory (default: a temporary one, removed afterwards)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for each task")
+    parser.add_argument("--scheduler", choices=["off", "shadow", "on"], default="off",
+                        help="learned stage/model scheduler (its history lives in the --workdir database)")
+    parser.add_argument("--exploration", type=float, default=None, help="scheduler exploration rate (default RL_EXPLORATION)")
+    args = parser.parse_args()
+
+    if args.mode != "script" and not args.cassette:
+        parser.error("--mode replay/record needs --cassette")
+    latency = {"default": args.latency}
+    for item in args.role_latency:
+        role, _, spec = item.partition("=")
+        latency[role] = spec
+    cassette = os.path.abspath(args.cassette) if args.cassette else None
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="pipeline-bench-")
+    from src.benchmark import harness
+    harness.configure_environment(workdir, scheduler=args.scheduler, exploration=args.exploration)
+    try:
+        results = harness.run_benchmark(
+            tasks=args.tasks,
+            concurrency=args.concurrency,
+            latency=latency,
+            latency_scale=args.latency_scale,
+            seed=args.seed,
+            mode=args.mode,
+            cassette_path=cassette,
+            timeout=args.timeout,
+        )
+    finally:
+        os.chdir(ROOT)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if output is None:
+        stamp = results["meta"]["timestamp"].replace(":", "").replace("-", "")
+        output = os.path.join(ROOT, "benchmark-results", f"pipeline-{stamp}.json")
+    harness.write_results(results, output)
+    print(harness.format_results(results))
+    print(f"\nResults written to {output}")
+
+    if baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        tolerance = args.tolerance if args.tolerance is not None else harness.DEFAULT_TOLERANCE
+        regressions = harness.compare(baseline, results, tolerance)
+        if regressions:
+            print(f"\nRegressions against {baseline_path} (tolerance {tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {baseline_path} (tolerance {tolerance:.0%}).")
+    if results["tasks"]["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# scripts/benchmark_vector_search.py
+"""
+Recall and latency of the persistent vector store on synthetic clustered data.
+
+For each corpus size a fresh index is built through VectorDBClient (so the flat/IVF
+choice, mmap reads and compaction are the production ones), then queried with
+held-out points. Recall@k is measured against exact brute-force search.
+
+    python scripts/benchmark_vector_search.py --sizes 10000 50000 200000 --dim 256
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.memory import vector_db_client  # noqa: E402
+from src.memory.vector_db_client import VectorDBClient, _normalize  # noqa: E402
+
+
+def synthetic_vectors(rows: int, dim: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    points = centers[labels] + 0.35 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return _normalize(points)
+
+
+def run(size: int, dim: int, queries: int, k: int, root: str, rng) -> dict:
+    data = synthetic_vectors(size + queries, dim, clusters=max(16, size // 500), rng=rng)
+    corpus, held_out = data[:size], data[size:]
+
+    client = VectorDBClient(f"bench-{size}", root=root, compact_rows=size + 1)
+    started = time.perf_counter()
+    for start in range(0, size, 10000):
+        chunk = corpus[start:start + 10000]
+        client.add(chunk, [""] * len(chunk))
+    client.compact()
+    build_seconds = time.perf_counter() - started
+    index_type = client._open().index_meta["type"]
+
+    exact = np.argsort(-(held_out @ corpus.T), axis=1)[:, :k]
+    latencies, hits = [], 0
+    for i, query in enumerate(held_out):
+        started = time.perf_counter()
+        found = client.search(query, k=k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(exact[i]) & {r["id"] for r in found})
+    client.close()
+
+    latencies = np.asarray(latencies)
+    return {
+        "size": size,
+        "index": index_type,
+        "build_s": build_seconds,
+        "recall": hits / (queries * k),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=vector_db_client.NPROBE)
+    parser.add_argument("--ann-min-rows", type=int, default=vector_db_client.ANN_MIN_ROWS)
+    args = parser.parse_args()
+
+    vector_db_client.NPROBE = args.nprobe
+    vector_db_client.ANN_MIN_ROWS = args.ann_min_rows
+    rng = np.random.default_rng(0)
+    root = tempfile.mkdtemp(prefix="vector-bench-")
+    try:
+        print(f"{'size':>10} {'index':>6} {'build s':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for size in args.sizes:
+            r = run(size, args.dim, args.queries, args.k, root, rng)
+            print(f"{r['size']:>10} {r['index']:>6} {r['build_s']:>8.2f} {r['recall']:>10.3f} {r['p50_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
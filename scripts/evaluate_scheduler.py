@@ -0,0 +1,58 @@
+# scripts/evaluate_scheduler.py
+"""
+Offline evaluation of the learned stage/model scheduler against logged task history.
+
+Episodes come from the task logs (scheduler entries, or older CoreAgent runs rebuilt
+from the usage ledger) of the database in DATABASE_URL / MYSQL_*. The policy is fitted
+on the oldest part and its decisions are scored on the rest; see rl_strategies.evaluate().
+
+    python scripts/evaluate_scheduler.py
+    python scripts/evaluate_scheduler.py --train-fraction 0.5 --json
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.db.models import SessionLocal  # noqa: E402
+from src.orchestrator.rl_engine.rl_strategies import RL_HISTORY_LIMIT, evaluate, load_episodes  # noqa: E402
+
+
+def fmt(value) -> str:
+    return "-" if value is None else f"{value:g}" if isinstance(value, (int, float)) else str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--train-fraction", type=float, default=0.7)
+    parser.add_argument("--limit", type=int, default=RL_HISTORY_LIMIT, help="most recent episodes to use")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        episodes = load_episodes(db, args.limit)
+    finally:
+        db.close()
+    if len(episodes) < 2:
+        sys.exit(f"Not enough episodes to evaluate ({len(episodes)})")
+    report = evaluate(episodes, args.train_fraction)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"episodes: {report['train_episodes']} train, {report['test_episodes']} held out")
+    print(f"policy order: {' -> '.join(report['policy']['order'])}\n")
+    print(f"{'decision':<20} {'policy arm':<11} {'matched':>7} {'estimator':>9} {'policy':>8} {'logged':>8}")
+    for point, row in report["decision_points"].items():
+        print(f"{point:<20} {row['policy_arm']:<11} {row['matched']:>7} {row['estimator']:>9} "
+              f"{fmt(row['policy_value']):>8} {fmt(row['logged_value']):>8}")
+    print(f"\n{'held-out episodes':<28} {'all logged':>12} {'policy-consistent':>18}")
+    for key in ("episodes", "completion_rate", "mean_reward", "llm_calls_per_completed", "tokens_per_completed", "seconds_per_completed"):
+        print(f"{key:<28} {fmt(report['logged'][key]):>12} {fmt(report['policy_consistent'][key]):>18}")
+
+
+if __name__ == "__main__":
+    main()
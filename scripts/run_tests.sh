@@ -0,0 +1,24 @@
+#!/usr/bin/env bash
+# scripts/run_tests.sh
+# Byte-compiles the sources, runs the unit tests under tests/, then runs the offline
+# pipeline benchmark (fake LLM, SQLite, in-memory Celery broker) as an end-to-end smoke test. With BASELINE set, the run also
+# fails on performance regressions against that results file.
+#
+#   scripts/run_tests.sh
+#   BASELINE=benchmark-results/baseline.json scripts/run_tests.sh
+set -euo pipefail
+cd "$(dirname "$0")/.."
+
+python -m compileall -q src scripts tests
+python -m pytest -q tests
+
+args=(
+  --tasks "${BENCH_TASKS:-4}"
+  --concurrency "${BENCH_CONCURRENCY:-2}"
+  --latency "${BENCH_LATENCY:-none}"
+  --output "${BENCH_OUTPUT:-benchmark-results/latest.json}"
+)
+if [ -n "${BASELINE:-}" ]; then
+  args+=(--compare "$BASELINE")
+fi
+python scripts/benchmark_pipeline.py "${args[@]}"
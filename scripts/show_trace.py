@@ -0,0 +1,99 @@
+# scripts/show_trace.py
+"""
+Prints a trace from the span export file as an indented tree with durations.
+
+Without a trace id the slowest recent traces are listed; with one, its spans are
+shown in start order with each span's share of the whole trace, so the stage a slow
+task spent its time in stands out.
+
+    python scripts/show_trace.py                 # slowest traces
+    python scripts/show_trace.py <trace_id>      # one trace as a tree
+"""
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.utils.tracing import TRACE_EXPORT_PATH  # noqa: E402
+
+
+def load_spans(path: str):
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                continue
+            for resource in request.get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    spans.extend(scope.get("spans", []))
+    return spans
+
+
+def duration_ms(span) -> float:
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def attributes(span) -> dict:
+    return {a["key"]: next(iter(a["value"].values())) for a in span.get("attributes", [])}
+
+
+def print_tree(spans):
+    by_id = {s["spanId"]: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        if span.get("parentSpanId") in by_id:
+            children[span["parentSpanId"]].append(span)
+        else:
+            roots.append(span)
+    # Tasks outlive the request that enqueued them, so shares are of the whole trace
+    total = (max(int(s["endTimeUnixNano"]) for s in spans) - min(int(s["startTimeUnixNano"]) for s in spans)) / 1e6 or 1
+
+    def show(span, depth):
+        status = " ERROR" if span.get("status", {}).get("code") == 2 else ""
+        attrs = {k: v for k, v in attributes(span).items() if k.startswith(("llm.", "db.", "celery.state", "http.status"))}
+        extra = " " + " ".join(f"{k}={v}" for k, v in attrs.items()) if attrs else ""
+        print(f"{duration_ms(span):>10.1f} ms {100 * duration_ms(span) / total:>5.1f}%  {'  ' * depth}{span['name']}{status}{extra}")
+        for child in sorted(children[span["spanId"]], key=lambda s: int(s["startTimeUnixNano"])):
+            show(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: int(s["startTimeUnixNano"])):
+        show(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("trace_id", nargs="?")
+    parser.add_argument("--file", default=TRACE_EXPORT_PATH)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    spans = load_spans(args.file)
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["traceId"]].append(span)
+
+    if args.trace_id:
+        if args.trace_id not in traces:
+            sys.exit(f"Trace {args.trace_id} not found in {args.file}")
+        print_tree(traces[args.trace_id])
+        return
+
+    rows = []
+    for trace_id, members in traces.items():
+        start = min(int(s["startTimeUnixNano"]) for s in members)
+        end = max(int(s["endTimeUnixNano"]) for s in members)
+        first = min(members, key=lambda s: int(s["startTimeUnixNano"]))
+        rows.append(((end - start) / 1e6, trace_id, first["name"], len(members)))
+    print(f"{'duration ms':>12}  {'trace id':<32}  {'spans':>5}  first span")
+    for ms, trace_id, name, count in sorted(rows, reverse=True)[:args.limit]:
+        print(f"{ms:>12.1f}  {trace_id:<32}  {count:>5}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# src/agent_factory/agent_continuation.py
+import os
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+import langchain
+from langchain.agents import AgentExecutor
+from langchain.agents.mrkl.output_parser import FINAL_ANSWER_ACTION
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import CallbackManager
+from langchain_core.utils.input import get_color_mapping
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Steps a task may take in total, across pauses and resumes, before it is stopped
+CORE_AGENT_MAX_STEPS = int(os.getenv("CORE_AGENT_MAX_STEPS", "45"))
+
+STATUS_RUNNING = "running"
+STATUS_PAUSED = "paused"
+STATUS_FINISHED = "finished"
+
+# A task paused on a question keeps it as a step of this tool; the user's answers become its observation
+ASK_USER_TOOL = "user_interaction"
+
+# langchain releases (major, minor) whose private AgentExecutor API take_step is written
+# against; requirements.txt pins one of them
+SUPPORTED_LANGCHAIN = ((0, 3),)
+
+Step = Tuple[AgentAction, str]
+
+logger = logging.getLogger(__name__)
+
+
+def _plain(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def dump_steps(steps: List[Step]) -> List[dict]:
+    return [
+        {"tool": action.tool, "tool_input": _plain(action.tool_input), "log": action.log, "observation": _plain(observation)}
+        for action, observation in steps
+    ]
+
+
+def load_steps(data: List[dict]) -> List[Step]:
+    return [
+        (AgentAction(tool=step["tool"], tool_input=step["tool_input"], log=step["log"]), step["observation"])
+        for step in data or []
+    ]
+
+
+class ExecutorCheckpoint:
+    """
+    The intermediate steps of a task's agent executor and the inputs they were taken
+    for, kept in the agent_checkpoints table. save() runs after every step, so a task
+    paused for the user, retried by Celery or picked up by another worker continues from
+    its last step instead of repeating the tool and LLM calls before it.
+    """
+
+    def __init__(self, db, task_id: int, user_id: int, project_id: int):
+        self.db = db
+        self.task_id = task_id
+        self.user_id = user_id
+        self.project_id = project_id
+        self.inputs: Optional[dict] = None
+        self.steps: List[Step] = []
+        self.status = STATUS_RUNNING
+        self.resumed = False
+        self._stored = False
+
+    def load(self) -> "ExecutorCheckpoint":
+        """
+        Picks up the saved state of an unfinished run; a finished one starts over.
+        """
+        from src.db.models import AgentCheckpoint
+
+        row = self.db.query(AgentCheckpoint).filter(AgentCheckpoint.task_id == self.task_id).first()
+        self._stored = row is not None
+        if row is not None and row.status != STATUS_FINISHED and row.steps:
+            self.inputs = dict(row.inputs)
+            self.steps = load_steps(row.steps)
+            self.status = row.status
+            self.resumed = True
+            logger.info("Resuming core agent after %d saved steps", len(self.steps), extra={"task_id": self.task_id})
+        return self
+
+    def start(self, inputs: dict) -> dict:
+        """
+        The inputs to run with: the saved ones when resuming (the scratchpad was built
+        for them), otherwise inputs. What a resumed run brings new reaches the agent
+        through answer().
+        """
+        if self.inputs is None:
+            self.inputs = inputs
+        return self.inputs
+
+    def pause_for_user(self, finish: AgentFinish, questions: str):
+        """
+        Keeps the agent's questions as a step still waiting for its observation and pauses.
+        The step's log reads as a call of the user_interaction tool: kept as the finish's
+        "Final Answer: ..." it would show the resumed agent a final answer already given.
+        """
+        thought = finish.log.split(FINAL_ANSWER_ACTION, 1)[0].rstrip()
+        log = f"{thought}\nAction: {ASK_USER_TOOL}\nAction Input: {questions}".lstrip()
+        self.steps.append((AgentAction(tool=ASK_USER_TOOL, tool_input=questions, log=log), None))
+        self.save(STATUS_PAUSED)
+
+    @property
+    def awaiting_answers(self) -> bool:
+        return self.status == STATUS_PAUSED and bool(self.steps) and self.steps[-1][0].tool == ASK_USER_TOOL and self.steps[-1][1] is None
+
+    def answer(self, answers: str):
+        """
+        The user's answers as the observation of the question step, so the next step sees them.
+        """
+        action, _ = self.steps[-1]
+        self.steps[-1] = (action, answers)
+        self.save(STATUS_RUNNING)
+
+    def save(self, status: str = STATUS_RUNNING):
+        from src.db.models import AgentCheckpoint
+
+        self.status = status
+        values = {"status": status, "inputs": self.inputs or {}, "steps": dump_steps(self.steps), "step_count": len(self.steps)}
+        if self._stored:
+            # One UPDATE per step, without reading the row back
+            self.db.query(AgentCheckpoint).filter(AgentCheckpoint.task_id == self.task_id).update(values, synchronize_session=False)
+        else:
+            self.db.add(AgentCheckpoint(task_id=self.task_id, user_id=self.user_id, project_id=self.project_id, **values))
+            self._stored = True
+        self.db.commit()
+
+
+class _ExecutorInternals:
+    """
+    The private AgentExecutor API take_step drives, in one place. It is checked against
+    the installed langchain before each step, so an upgrade that moves it fails with a
+    clear error instead of an AttributeError in the middle of a tool call.
+    """
+
+    def __init__(self, executor: AgentExecutor):
+        version = tuple(int(part) for part in langchain.__version__.split(".")[:2])
+        missing = [name for name in ("_take_next_step", "_action_agent", "_get_tool_return") if not hasattr(executor, name)]
+        if version not in SUPPORTED_LANGCHAIN or missing:
+            raise RuntimeError(
+                f"Step-wise agent continuation supports langchain {', '.join('%d.%d' % v for v in SUPPORTED_LANGCHAIN)}; "
+                f"installed {langchain.__version__}" + (f" lacks AgentExecutor.{', '.join(missing)}" if missing else "")
+            )
+        self.executor = executor
+
+    def next_step(self, name_to_tool_map, color_mapping, inputs: dict, steps: List[Step], run_manager):
+        return self.executor._take_next_step(name_to_tool_map, color_mapping, inputs, steps, run_manager=run_manager)
+
+    def stopped_response(self, steps: List[Step], inputs: dict) -> AgentFinish:
+        return self.executor._action_agent.return_stopped_response(self.executor.early_stopping_method, steps, **inputs)
+
+    def tool_return(self, step: Step) -> Optional[AgentFinish]:
+        return self.executor._get_tool_return(step)
+
+
+def take_step(executor: AgentExecutor, inputs: dict, steps: List[Step], callbacks=None) -> Tuple[List[Step], Optional[AgentFinish]]:
+    """
+    One thought-action-observation iteration of executor on top of steps (not modified):
+    returns the new steps and, once the agent is done, its AgentFinish. AgentExecutor only
+    exposes whole runs, so this drives the same _take_next_step its loop calls (through
+    _ExecutorInternals), inside a chain run so the callbacks see the LLM and tool calls as
+    they would in executor.run().
+    """
+    internals = _ExecutorInternals(executor)
+    name_to_tool_map = {tool.name: tool for tool in executor.tools}
+    color_mapping = get_color_mapping([tool.name for tool in executor.tools], excluded_colors=["green", "red"])
+    callback_manager = CallbackManager.configure(callbacks, executor.callbacks, executor.verbose, None, executor.tags, None, executor.metadata)
+    run_manager = callback_manager.on_chain_start(None, inputs, name="AgentExecutor")
+    new_steps, finish = [], None
+    try:
+        if len(steps) >= CORE_AGENT_MAX_STEPS:
+            finish = internals.stopped_response(steps, inputs)
+        else:
+            output = internals.next_step(name_to_tool_map, color_mapping, inputs, list(steps), run_manager)
+            if isinstance(output, AgentFinish):
+                finish = output
+            else:
+                new_steps = list(output)
+                if len(new_steps) == 1:
+                    # A return_direct tool's observation is the final answer
+                    finish = internals.tool_return(new_steps[0])
+    except BaseException as e:
+        run_manager.on_chain_error(e)
+        raise
+    run_manager.on_chain_end(finish.return_values if finish is not None else {})
+    return new_steps, finish
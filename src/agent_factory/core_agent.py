@@ -1,9 +1,11 @@
 # src/agent_factory/core_agent.py
 import os
+import json
 import time
+import logging
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory
 from langchain.agents import initialize_agent, Tool
@@ -11,17 +13,26 @@ from langchain.schema.runnable import RunnableMap
 from tenacity import retry, stop_after_attempt, wait_fixed
 
 from .custom_parser import CustomOutputParser
+from src.agent_factory.langchain_integration import get_llm
+from src.agent_factory import agent_continuation
+from src.agent_factory.agent_continuation import ExecutorCheckpoint, take_step
 from src.agent_factory.tools.analyze_tool import make_analyze_tool
-from src.agent_factory.tools.plan_tool import PlanTool
-from src.agent_factory.tools.codegen_tool import CodeGenTool
+from src.agent_factory.tools.plan_tool import make_plan_tool
+from src.agent_factory.tools.codegen_tool import make_codegen_tool
 from src.agent_factory.tools.validate_tool import ValidateTool
 from src.agent_factory.tools.test_tool import TestTool
 from src.agent_factory.tools.deploy_tool import DeployTool
 from src.agent_factory.tools.user_interaction_tool import UserInteractionTool
 from src.utils.log_agent_execution import log_agent_execution
 from src.utils.agent_tools import ToolExecutionTracker
+from src.utils import tracing
+from src.utils import usage_ledger
+from src.utils.usage_ledger import BudgetExceeded, UsageLedger
+from src.orchestrator.rl_engine import rl_strategies
+from src.memory.short_term_memory import ShortTermMemory
 from src.utils.log_user_interaction import (
     get_unanswered_questions,
+    get_latest_answers,
     store_ai_questions,
     store_user_answers,
     store_agent_confirmation,
@@ -33,6 +44,30 @@ from .multi_agent_prompt_generator import MultiAgentPromptGenerator, SWEPromptCo
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+# How often a finished run polls for the user's confirmation
+CONFIRMATION_POLL_SECONDS = float(os.getenv("CONFIRMATION_POLL_SECONDS", "30"))
+# The marker a ReAct agent writes before the answer that completes its task
+FINAL_ANSWER = "Final Answer:"
+# How run() reports a task paused on questions, stopped by a budget or stopped by an error
+AWAITING_ANSWERS = "Awaiting user answers to clarifying questions."
+BUDGET_STOPPED = " Execution stopped:"
+ERROR_STOPPED = " Execution stopped due to error:"
+
+logger = logging.getLogger(__name__)
+
+def result_status(result: Optional[str]) -> str:
+    """
+    TaskLog status of what CoreAgent.run() returned: "completed", "waiting_user_input",
+    "budget_exceeded" or "failed".
+    """
+    if not result or result.startswith(ERROR_STOPPED):
+        return "failed"
+    if result.startswith(BUDGET_STOPPED):
+        return "budget_exceeded"
+    if result == AWAITING_ANSWERS:
+        return "waiting_user_input"
+    return "completed" if FINAL_ANSWER in result else "failed"
+
 class CoreAgent:
     def __init__(
         self,
@@ -51,10 +86,19 @@ class CoreAgent:
         self.task_id = task_id
         self.project_id = project_id
         self.project_name = project_name
-        openai_api_key = os.getenv("OPENAI_API_KEY", "")
-        self.llm = ChatOpenAI(model_name='gpt-4o', temperature=0, api_key=openai_api_key)
+        # Every LLM call of the task is recorded in the usage ledger and checked against its budgets
+        self.ledger = UsageLedger(user_id, project_id, task_id).start()
+        # Model tiers, skipped stages and a suggested order learned from earlier tasks (None when off)
+        self.schedule = rl_strategies.choose_schedule()
+        core_model = self.schedule.model_for("core_agent", "gpt-4o") if self.schedule else "gpt-4o"
+        # The tracker is attached to the agent executor, so no forwarding callback here
+        self.llm = get_llm(core_model, temperature=0, callbacks=[])
         self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-        self.tool_tracker = ToolExecutionTracker()
+        # Tool I/O of this task is shared through Redis, so a retry on another worker resumes warm
+        self.short_term_memory = ShortTermMemory(task_id)
+        self.tool_tracker = ToolExecutionTracker(short_term_memory=self.short_term_memory, task_id=task_id, ledger=self.ledger)
+        # Intermediate steps saved after every step: a paused, retried or moved task continues from its last one
+        self.checkpoint = ExecutorCheckpoint(db, task_id, user_id, project_id).load()
         self.state = AgentState(
             current_task="initializing",
             dependencies=[],
@@ -65,14 +109,16 @@ class CoreAgent:
        #  self.mapg = MultiAgentPromptGenerator(config_path=mapg_config_path)
 
         self.tools = [
-            make_analyze_tool(db, user_id, task_id, project_id),
-            PlanTool,
-            CodeGenTool,
+            make_analyze_tool(db, user_id, task_id, project_id, project_name),
+            make_plan_tool(db, user_id, task_id, project_id, project_name),
+            make_codegen_tool(db, user_id, task_id, project_id, project_name),
             ValidateTool,
             TestTool,
             DeployTool,
             UserInteractionTool
         ]
+        if self.schedule and self.schedule.skip:
+            self.tools = [t for t in self.tools if t.name not in self.schedule.skip]
         # A default prompt that helps the agent decide which tool to call:
         self.prompt = PromptTemplate.from_template("""
         You are AI Core Agent, an advanced, self-evolving software AGI with reinforcement-learning capabilities. 
@@ -148,9 +194,7 @@ class CoreAgent:
             Action:
             """)
 
-        print(f"""    CORE AGENT prompt
-            {self.prompt}
-        """)
+        logger.debug("Core agent prompt template", extra={"task_id": task_id, "prompt": self.prompt.template})
     
         self.agent_chain = self._build_agent_chain()
         
@@ -160,59 +204,144 @@ class CoreAgent:
             tools=self.tools,
             llm=self.llm,
             agent="zero-shot-react-description",  # Use the standard zero-shot agent
-            verbose=True,  # or False in production
+            # LangChain's verbose output prints every step and tool result to stdout
+            verbose=logger.isEnabledFor(logging.DEBUG),
             handle_parsing_errors=True,
-            callback_manager=[self.tool_tracker]  # Attach callback tracker
         )
         return agent_executor
     
-    def _safe_run(self, requirement: str, max_retries=3) -> str:
+    def _safe_step(self, inputs: dict, max_retries=3):
         """
-        Safely invoke the agent chain with basic retry logic.
+        Advance the agent by one step from its checkpoint, retrying only that step.
+        Returns the AgentFinish once the agent is done, else None.
         """
+        step = len(self.checkpoint.steps) + 1
         for attempt in range(max_retries):
             try:
-                print(f"\n[CoreAgent] Attempt {attempt+1}/{max_retries}")
-                return self.agent_chain.run(input=requirement, prompt=self.prompt.format(
-                    requirement=requirement,
-                    tools="\n".join([t.name for t in self.tools])
-                ))
+                logger.info("Core agent step %d, attempt %d/%d", step, attempt + 1, max_retries, extra={"task_id": self.task_id})
+                with tracing.start_span("core_agent.step", **{"task.id": self.task_id, "agent.step": step, "agent.attempt": attempt + 1}):
+                    # Run-time callbacks are inherited by the tool and LLM runs (constructor ones are not)
+                    new_steps, finish = take_step(self.agent_chain, inputs, self.checkpoint.steps, callbacks=[self.tool_tracker])
+                break
+            except BudgetExceeded:
+                raise
             except Exception as e:
-                print(f"Attempt {attempt+1} failed with error: {e}")
+                logger.warning("Core agent step %d attempt %d failed: %s", step, attempt + 1, e, extra={"task_id": self.task_id})
                 if attempt == max_retries - 1:
                     raise e
                 time.sleep(2)
+        if new_steps:
+            self.checkpoint.steps.extend(new_steps)
+            self.checkpoint.save()
+        return finish
+
+    def _apply_budget(self):
+        """
+        Swaps the agent's model for its cheaper counterpart once a budget is nearly used up.
+        """
+        state, reason = self.ledger.status()
+        current = getattr(self.llm, "model_name", None)
+        if state == usage_ledger.STATUS_DOWNGRADE and current and usage_ledger.effective_model(current) != current:
+            self.llm = get_llm(current, temperature=0, callbacks=[])
+            self.agent_chain = self._build_agent_chain()
+            logger.warning("Downgraded core agent model %s -> %s: %s", current, self.llm.model_name, reason, extra={"task_id": self.task_id})
 
     def run(self, requirement: str) -> str:
         """
         Orchestrate the conversation with the user requirement, calling sub-agents as needed.
         """
-        print(f"\nRunning Core Agent for Project {self.project_name}")
-        print(f" User's requirement:\n{requirement}\n")
-        executed_agents = set()  # Track which agents have already run
+        token = usage_ledger.activate(self.ledger)
+        schedule_token = rl_strategies.activate(self.schedule)
+        started = time.perf_counter()
+        result = None
+        try:
+            if self.checkpoint.awaiting_answers:
+                self._answer_questions(requirement)
+            if self.schedule and self.schedule.hint():
+                requirement = f"{requirement}\n\n{self.schedule.hint()}"
+            result = self._run(requirement)
+            return result
+        finally:
+            rl_strategies.deactivate(schedule_token)
+            usage_ledger.deactivate(token)
+            self.ledger.flush()
+            logger.info("Task usage", extra={"task_id": self.task_id, "usage": self.ledger.summary()})
+            if self.schedule is not None:
+                self._record_episode(result, time.perf_counter() - started)
+
+    def _answer_questions(self, requirement: str):
+        """
+        Gives the agent the user's answers to the questions the task paused on: those stored
+        for its latest questions, else the requirement it was run again with, when that is new.
+        """
+        answers = get_latest_answers(self.db, self.task_id)
+        if answers is None and requirement.strip() not in self.checkpoint.inputs.get("input", ""):
+            answers = requirement
+        if not answers:
+            return
+        self.checkpoint.answer(answers if isinstance(answers, str) else json.dumps(answers))
+        logger.info("Resuming with the user's answers", extra={"task_id": self.task_id, "steps": len(self.checkpoint.steps)})
+
+    def _record_episode(self, result, seconds: float):
+        outcome = result_status(result)
+        try:
+            rl_strategies.record_episode(self.db, self.user_id, self.project_id, self.project_name, self.task_id,
+                                         self.schedule, self.tool_tracker, self.ledger, outcome, seconds)
+        except Exception as e:
+            logger.warning("Could not record scheduler episode: %s", e, extra={"task_id": self.task_id})
+
+    def _run(self, requirement: str) -> str:
+        logger.info("Running core agent for project %s", self.project_name, extra={"task_id": self.task_id})
+        logger.debug("User requirement", extra={"task_id": self.task_id, "requirement": requirement})
+        working_context = ""
+        if not self.checkpoint.resumed:
+            # Without saved steps, tool I/O buffered by an earlier attempt is the best context there is
+            try:
+                working_context = self.short_term_memory.format_context()
+            except Exception as e:
+                logger.warning("Short-term memory unavailable: %s", e, extra={"task_id": self.task_id})
+        if working_context:
+            logger.info("Resuming task %s with earlier working context", self.task_id, extra={"task_id": self.task_id})
+            requirement = f"{requirement}\n\nWork already done on this task (most recent last):\n{working_context}"
         db = self.db
         user_id = self.user_id
         task_id = self.task_id
         project_id = self.project_id
         project_name = self.project_name
+        inputs = self.checkpoint.start({"input": requirement, "prompt": self.prompt.format(
+            requirement=requirement,
+            tools="\n".join([t.name for t in self.tools])
+        )})
+        if self.checkpoint.awaiting_answers:
+            # Run again before the user answered: nothing to continue with yet
+            return AWAITING_ANSWERS
+        # Each iteration advances the agent by one step; a finished agent leaves the loop
         while True:
             try:
-                ai_response = self._safe_run(requirement)
-                print(f"Agent Output:\n{ai_response}\n")
-
+                self._apply_budget()
+                finish = self._safe_step(inputs)
+                if finish is None:
+                    continue
+                ai_response = str(finish.return_values.get("output", ""))
                 agent_name = self.tool_tracker.get_last_tool_name()
-                print(f"Last tool invoked: {agent_name}")
+                logger.info("Agent run finished after tool %s", agent_name, extra={"task_id": task_id, "output_chars": len(ai_response), "steps": len(self.checkpoint.steps)})
+                logger.debug("Agent output", extra={"task_id": task_id, "output": ai_response})
 
                 store_agent_confirmation(db, user_id, task_id, project_id, agent_name, ai_response)
 
                 pending_confirmations = get_pending_user_confirmation(db, user_id, task_id, project_id, agent_name)
                 while pending_confirmations:
-                    print("\n Waiting for user confirmation...\n")
-                    time.sleep(30)
+                    logger.info("Waiting for user confirmation", extra={"task_id": task_id, "agent_name": agent_name})
+                    time.sleep(CONFIRMATION_POLL_SECONDS)
                     pending_confirmations = get_pending_user_confirmation(db, user_id, task_id, project_id, agent_name)
 
-                if "Final Answer:" in ai_response:
-                    print(" Final answer received. Task completed.")
+                # The output is only the text after "Final Answer:", so completion is read from the
+                # finish log: a stopped run, or a reply without the marker, did not complete the task
+                asks_user = "Ask the user:" in ai_response
+                if not asks_user and FINAL_ANSWER in finish.log:
+                    if FINAL_ANSWER not in ai_response:
+                        ai_response = f"{FINAL_ANSWER} {ai_response}"
+                    logger.info("Final answer received, task completed", extra={"task_id": task_id, "usage": self.tool_tracker.summary()})
                     log_agent_execution(
                         db=db,
                         user_id=user_id,
@@ -224,17 +353,41 @@ class CoreAgent:
                         output=ai_response
                     )
                     db.commit()
+                    self.checkpoint.save(agent_continuation.STATUS_FINISHED)
+                    try:
+                        self.short_term_memory.complete()
+                    except Exception as e:
+                        logger.warning("Could not expire short-term memory: %s", e, extra={"task_id": task_id})
                     return ai_response
 
                 # Handle "Ask the user" scenario
                 # If the sub-agent's ai_response instructs to ask the user questions:
-                if "Ask the user:" in ai_response:
-                    questions = self._extract_clarifying_questions(ai_response)
-                    if questions:
-                        store_ai_questions(db, task_id, user_id, project_id, agent_name, questions)
-                        # Return or break to wait for user input, depending on your flow
-                        return "Awaiting user answers to clarifying questions."
+                if asks_user:
+                    questions = self.extract_clarifying_questions(ai_response) or ai_response
+                    store_ai_questions(db, task_id, user_id, project_id, agent_name, questions)
+                    # Paused on the question: the next run continues with the answers as its observation
+                    self.checkpoint.pause_for_user(finish, questions)
+                    return AWAITING_ANSWERS
+
+                # Out of steps (CORE_AGENT_MAX_STEPS) without a final answer: stepping on would only repeat the stopped response
+                self.checkpoint.save(agent_continuation.STATUS_FINISHED)
+                raise RuntimeError(f"{ai_response} ({len(self.checkpoint.steps)} steps)")
 
+            except BudgetExceeded as e:
+                log_agent_execution(
+                    db=db,
+                    user_id=user_id,
+                    project_id=project_id,
+                    project_name=project_name,
+                    task_id=task_id,
+                    agent_name="CoreAgent",
+                    status="budget_exceeded",
+                    output=str(e)
+                )
+                # Kept resumable: with a raised budget the task continues from its last step
+                self.checkpoint.save(agent_continuation.STATUS_PAUSED)
+                logger.warning("Task stopped: %s", e, extra={"task_id": task_id})
+                return f"{BUDGET_STOPPED} {e}"
             except Exception as e:
                 log_agent_execution(
                     db=db,
@@ -246,8 +399,8 @@ class CoreAgent:
                     status="failed",
                     output=str(e)
                 )
-                print(f" Error during execution: {e}")
-                return f" Execution stopped due to error: {e}"
+                logger.error("Error during execution: %s", e, extra={"task_id": task_id})
+                return f"{ERROR_STOPPED} {e}"
 
     def extract_clarifying_questions(self, result: str) -> str:
         """
@@ -260,5 +413,5 @@ class CoreAgent:
             clarifying_questions = result[questions_start:].strip()
             return clarifying_questions
         except Exception as e:
-            print(f" Error extracting clarifying questions: {e}")
+            logger.warning("Error extracting clarifying questions: %s", e, extra={"task_id": self.task_id})
             return None
@@ -1,13 +1,16 @@
 import os
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+logger = logging.getLogger(__name__)
+
 class CodeGeneratorAgent:
     def __init__(self):
-        print(f"CodeGeneratorAgent initialized")
+        logger.debug("CodeGeneratorAgent initialized")
 
     def run(self, task_data):
         prompt = f"Task: {task_data['description']}\n..."
@@ -29,8 +32,6 @@ class CodeGeneratorAgent:
             ],
             max_tokens=10000
         )
-        print(response.choices[0].message.content)
-
         code_snippet = response.choices[0].message.content
-        print(f"code_snippet result {code_snippet}")
+        logger.debug("code_snippet result %s", code_snippet)
         return code_snippet
@@ -0,0 +1,44 @@
+# src/agent_factory/langchain_integration.py
+import os
+from pathlib import Path
+from typing import Callable, Optional
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from src.utils.agent_tools import LLMCallbackForwarder, current_stage
+from src.utils.usage_ledger import effective_model
+from src.orchestrator.rl_engine.rl_strategies import model_override
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Replaces ChatOpenAI when set, see set_llm_factory()
+_llm_factory: Optional[Callable] = None
+
+def set_llm_factory(factory: Optional[Callable]):
+    """
+    Routes every get_llm() call to factory(model_name=..., temperature=..., callbacks=..., **kwargs),
+    e.g. the offline benchmark's fake chat model. None restores ChatOpenAI.
+    """
+    global _llm_factory
+    _llm_factory = factory
+
+def get_llm(model_name: str = None, temperature: float = 0, callbacks: list = None, **kwargs) -> ChatOpenAI:
+    """
+    Chat model for the agents. Its calls are timed and their token usage and cost
+    recorded against the agent stage that made them; callers that attach their own
+    tracker (the CoreAgent) pass callbacks=[] instead. Inside a tool, the task's schedule
+    may pick another model tier for the stage; a task close to its usage budget gets the
+    cheaper model configured in USAGE_DOWNGRADE_MODELS.
+    """
+    model_name = model_override(current_stage(), model_name or os.getenv("OPENAI_DEFAULT_MODEL", "o1-preview"))
+    model_name = effective_model(model_name)
+    callbacks = [LLMCallbackForwarder()] if callbacks is None else callbacks
+    if _llm_factory is not None:
+        return _llm_factory(model_name=model_name, temperature=temperature, callbacks=callbacks, **kwargs)
+    return ChatOpenAI(
+        temperature=temperature,
+        openai_api_key=os.getenv("OPENAI_API_KEY", ""),
+        model_name=model_name,
+        callbacks=callbacks,
+        **kwargs
+    )
@@ -5,6 +5,7 @@ import json
 import yaml
 import hashlib
 import inspect
+from src.agent_factory.static_validator import check_source
 
 class AgentRole(str, Enum):
     ANALYZE = "requirements_analysis"
@@ -87,6 +88,17 @@ class MultiAgentPromptGenerator:
             # ... templates for other agents
         }
 
+    def _validate_code_syntax(self, code: str) -> bool:
+        result = check_source(code)
+        return not any(i["rule"] in ("syntax-error", "undefined-name") for i in result["issues"])
+
+    def _check_security_patterns(self, code: str) -> bool:
+        result = check_source(code)
+        return not any(
+            i["severity"] == "error" and i["rule"] not in ("syntax-error", "undefined-name")
+            for i in result["issues"]
+        )
+
     def generate_agent_prompt(
         self,
         role: AgentRole,
@@ -0,0 +1,302 @@
+# src/agent_factory/static_validator.py
+import os
+import ast
+import builtins
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from src.utils.workspace_manifest import WorkspaceManifest, SKIP_DIRS
+from src.utils import metrics
+
+# Below this many files a process pool costs more than it saves
+PARALLEL_THRESHOLD = int(os.getenv("STATIC_VALIDATOR_PARALLEL_THRESHOLD", "16"))
+MAX_WORKERS = int(os.getenv("STATIC_VALIDATOR_MAX_WORKERS", "0")) or None
+
+KNOWN_NAMES = set(dir(builtins)) | {
+    "__file__", "__name__", "__doc__", "__package__", "__spec__",
+    "__loader__", "__builtins__", "__path__", "__annotations__", "__class__",
+}
+
+# Calls that are rejected outright in generated code
+DANGEROUS_CALLS = {
+    "eval": "eval() executes arbitrary code",
+    "exec": "exec() executes arbitrary code",
+    "os.system": "os.system() runs a shell command",
+    "os.popen": "os.popen() runs a shell command",
+    "pickle.loads": "pickle.loads() can execute arbitrary code on untrusted data",
+    "pickle.load": "pickle.load() can execute arbitrary code on untrusted data",
+    "marshal.loads": "marshal.loads() is unsafe on untrusted data",
+    "tempfile.mktemp": "tempfile.mktemp() is race-prone, use mkstemp()",
+}
+
+# Calls that are reported but do not fail validation
+WEAK_CALLS = {
+    "hashlib.md5": "md5 is not collision resistant",
+    "hashlib.sha1": "sha1 is not collision resistant",
+    "__import__": "dynamic import",
+}
+
+SECRET_MARKERS = ("password", "passwd", "secret", "token", "api_key", "apikey", "private_key")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _dotted_name(node: ast.AST) -> str:
+    """
+    Returns 'os.system' for an ast.Attribute chain, '' when the call target is dynamic.
+    """
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return ".".join(reversed(parts))
+    return ""
+
+
+def _issue(rule: str, severity: str, line: int, message: str) -> Dict:
+    return {"rule": rule, "severity": severity, "line": line, "message": message}
+
+
+def _bound_names(tree: ast.AST) -> set:
+    """
+    Collects every name bound anywhere in the module. Scoping is deliberately
+    ignored, so the undefined-name check only reports names that are never bound at all.
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                names.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            names.add(node.rest)
+    return names
+
+
+def _check_undefined_names(tree: ast.AST) -> List[Dict]:
+    # A star import makes the set of bound names unknowable
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names):
+            return []
+
+    defined = _bound_names(tree) | KNOWN_NAMES
+    issues, reported = [], set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            if node.id not in defined and node.id not in reported:
+                reported.add(node.id)
+                issues.append(_issue("undefined-name", "error", node.lineno, f"undefined name '{node.id}'"))
+    return issues
+
+
+def _check_calls(tree: ast.AST) -> List[Dict]:
+    issues = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        name = _dotted_name(node.func)
+        keywords = {kw.arg: kw.value for kw in node.keywords if kw.arg}
+
+        if name in DANGEROUS_CALLS:
+            issues.append(_issue("dangerous-call", "error", node.lineno, DANGEROUS_CALLS[name]))
+        elif name in WEAK_CALLS:
+            issues.append(_issue("weak-call", "warning", node.lineno, WEAK_CALLS[name]))
+
+        shell = keywords.get("shell")
+        if name.startswith("subprocess.") and isinstance(shell, ast.Constant) and shell.value is True:
+            issues.append(_issue("shell-injection", "error", node.lineno, f"{name}(shell=True) is injectable"))
+
+        if name in ("yaml.load", "yaml.load_all") and "Loader" not in keywords and len(node.args) < 2:
+            issues.append(_issue("unsafe-yaml", "error", node.lineno, f"{name}() without a Loader, use yaml.safe_load()"))
+
+        verify = keywords.get("verify")
+        if isinstance(verify, ast.Constant) and verify.value is False:
+            issues.append(_issue("tls-verify-disabled", "error", node.lineno, f"{name or 'call'}(verify=False) disables TLS verification"))
+
+        debug = keywords.get("debug")
+        if name.endswith(".run") and isinstance(debug, ast.Constant) and debug.value is True:
+            issues.append(_issue("debug-enabled", "warning", node.lineno, f"{name}(debug=True) in generated code"))
+
+        # cursor.execute(f"... {x}") / execute("..." % x) / execute("...".format(x))
+        if name.endswith(".execute") and node.args:
+            query = node.args[0]
+            formatted = isinstance(query, ast.JoinedStr) or (
+                isinstance(query, ast.BinOp) and isinstance(query.op, (ast.Mod, ast.Add))
+            ) or (
+                isinstance(query, ast.Call) and isinstance(query.func, ast.Attribute) and query.func.attr == "format"
+            )
+            if formatted:
+                issues.append(_issue("sql-injection", "error", node.lineno, "SQL built by string formatting, use query parameters"))
+    return issues
+
+
+def _check_hardcoded_secrets(tree: ast.AST) -> List[Dict]:
+    issues = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            targets, value = node.targets, node.value
+        elif isinstance(node, ast.AnnAssign) and node.value is not None:
+            targets, value = [node.target], node.value
+        else:
+            continue
+        if not (isinstance(value, ast.Constant) and isinstance(value.value, str) and value.value):
+            continue
+        for target in targets:
+            name = target.id if isinstance(target, ast.Name) else getattr(target, "attr", "")
+            if any(marker in name.lower() for marker in SECRET_MARKERS):
+                issues.append(_issue("hardcoded-secret", "error", node.lineno, f"hardcoded credential in '{name}'"))
+    return issues
+
+
+def check_source(source: str, filename: str = "<snippet>") -> Dict:
+    """
+    Runs all local checks on one piece of Python source.
+    Returns {"filename", "ok", "issues"}; ok is False when any issue has severity 'error'.
+    """
+    try:
+        tree = ast.parse(source, filename=filename)
+    except SyntaxError as e:
+        issue = _issue("syntax-error", "error", e.lineno or 0, e.msg)
+        return {"filename": filename, "ok": False, "issues": [issue]}
+
+    issues = _check_undefined_names(tree) + _check_calls(tree) + _check_hardcoded_secrets(tree)
+    issues.sort(key=lambda i: i["line"])
+    ok = not any(i["severity"] == "error" for i in issues)
+    return {"filename": filename, "ok": ok, "issues": issues}
+
+
+def check_file(path: str, root: Optional[str] = None) -> Dict:
+    """
+    Reads and checks a single file. The reported filename is relative to root when given.
+    """
+    filename = os.path.relpath(path, root) if root else path
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return {"filename": filename, "ok": False, "issues": [_issue("unreadable", "error", 0, str(e))]}
+    return check_source(source, filename)
+
+
+def iter_python_files(root: str):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for name in filenames:
+            if name.endswith(".py"):
+                yield os.path.join(dirpath, name)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    The pool is created once per process and reused, so repeated validation rounds
+    don't pay the worker start-up cost again.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    return _pool
+
+
+def check_files(paths: List[str], root: Optional[str] = None) -> List[Dict]:
+    """
+    Checks a list of files, fanning out to the process pool when there are enough of them.
+    """
+    if len(paths) < PARALLEL_THRESHOLD:
+        return [check_file(p, root) for p in paths]
+
+    roots = [root] * len(paths)
+    chunksize = max(1, len(paths) // (4 * (os.cpu_count() or 1)))
+    return list(_get_pool().map(check_file, paths, roots, chunksize=chunksize))
+
+
+def validate_directory(root: str, incremental: bool = True, changed_paths: Optional[List[str]] = None) -> Dict:
+    """
+    Statically validates every Python file under root.
+
+    With incremental=True the project's workspace manifest is used: only files whose
+    content changed since the last round, and the files importing them, are re-checked.
+    Everything else reuses the cached result stored against its content hash.
+    When the caller already knows which paths changed (changed_paths) the directory
+    is not walked at all.
+    """
+    if not os.path.isdir(root):
+        return {"ok": False, "files_checked": 0, "results": [], "error": f"Directory not found: {root}"}
+
+    if not incremental:
+        results = check_files(sorted(iter_python_files(root)), root)
+        return {
+            "ok": all(r["ok"] for r in results),
+            "files_checked": len(results),
+            "results": results,
+        }
+
+    manifest = WorkspaceManifest.load(root)
+    changes = manifest.refresh(changed_paths)
+    python_files = manifest.python_files()
+    stale = manifest.affected(changes) & python_files
+    stale |= {rel for rel in python_files if manifest.get_result(rel, "validate") is None}
+
+    for result in check_files([os.path.join(root, rel) for rel in sorted(stale)], root):
+        rel = result["filename"].replace(os.sep, "/")
+        result["filename"] = rel
+        _add_import_issues(result, manifest)
+        manifest.set_result(rel, "validate", result)
+    if stale or changes["removed"]:
+        manifest.save()
+
+    results = [manifest.get_result(rel, "validate") for rel in sorted(python_files)]
+    metrics.record_cache("validate", len(python_files) - len(stale), len(stale))
+    return {
+        "ok": all(r["ok"] for r in results),
+        "files_checked": len(stale),
+        "files_cached": len(python_files) - len(stale),
+        "results": results,
+    }
+
+
+def _add_import_issues(result: Dict, manifest: WorkspaceManifest):
+    """
+    Cross-file check: names imported from project modules must exist there.
+    This is why dependents of a changed file are re-checked.
+    """
+    for module, name, lineno in manifest.graph.missing_names(result["filename"]):
+        result["issues"].append(_issue("import-error", "error", lineno, f"cannot import '{name}' from '{module}'"))
+    if manifest.removed_modules:
+        for module, lineno in manifest.graph.imported_modules(result["filename"]):
+            if module in manifest.removed_modules:
+                result["issues"].append(_issue("import-error", "error", lineno, f"module '{module}' was deleted"))
+    if result["issues"]:
+        result["issues"].sort(key=lambda i: i["line"])
+        result["ok"] = not any(i["severity"] == "error" for i in result["issues"])
+
+
+def format_report(results: List[Dict], max_issues: int = 20) -> str:
+    """
+    Renders results as 'Validation passed' or 'Validation failed: <reasons>',
+    the format the CoreAgent already expects from the validate tool.
+    """
+    lines = []
+    for result in results:
+        for issue in result["issues"]:
+            lines.append(f"{result['filename']}:{issue['line']} [{issue['severity']}] {issue['rule']}: {issue['message']}")
+
+    failed = any(not r["ok"] for r in results)
+    header = "Validation failed" if failed else "Validation passed"
+    if not lines:
+        return header
+    if len(lines) > max_issues:
+        lines = lines[:max_issues] + [f"... {len(lines) - max_issues} more"]
+    return f"{header}:\n" + "\n".join(lines)
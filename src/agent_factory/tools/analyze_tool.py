@@ -1,11 +1,12 @@
 import os
 import re
 import json
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Optional
 from langchain.agents import Tool
-from langchain.chat_models import ChatOpenAI
+from src.agent_factory.langchain_integration import get_llm
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from sqlalchemy.orm import Session
 from functools import partial
@@ -15,7 +16,9 @@ from src.utils.log_user_interaction import store_ai_questions
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: int, db: Session) -> str:
+logger = logging.getLogger(__name__)
+
+def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: int, db: Session, project_name: str = None) -> str:
     """
     AnalyzeAgent:
     - Summarizes the user requirement
@@ -32,12 +35,7 @@ def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: i
 
     analysis_result = f"Analysis for requirement: {requirement}"
 
-    openai_api_key = os.getenv("OPENAI_API_KEY", "")
-    llm = ChatOpenAI(
-        temperature=0,
-        openai_api_key=openai_api_key,
-        model_name=os.getenv("OPENAI_DEFAULT_MODEL", "o1-preview")
-    )
+    llm = get_llm()
 
     system_prompt = SystemMessagePromptTemplate.from_template(
         """
@@ -49,12 +47,12 @@ def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: i
         4. Do not include chain-of-thought or internal reasoning. Provide only the final summarized insights.
     
         OUTPUT FORMAT (in valid JSON and dont include comments inside the json code block)
-        {
+        {{
         "summary": "...",
         "ambiguities": ["..."],
         "questions": ["..."],
         "refined_requirement": "..."
-        }
+        }}
 
         - "summary": A short, 1-2 sentence summary.
         - "ambiguities": A list of unclear or missing details. If none, use an empty list [].
@@ -77,12 +75,11 @@ def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: i
     try:
         response = llm(messages)
         refined_analysis = response.content.strip()
-        print(f"Analyze agent response : {refined_analysis}")
+        logger.debug("Analyze agent response", extra={"task_id": task_id, "output": refined_analysis})
         # Attempt to parse JSON
         # If the LLM returned something else, fallback or raise an error.
         try:
             data = json.loads(refined_analysis)
-            print(f"Analyze agent response data : {data}")
         except json.JSONDecodeError as e:
             # If the AI didn't comply with JSON, treat entire refined_analysis as fallback
             data = {
@@ -103,6 +100,7 @@ def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: i
             task_id=task_id,
             user_id=user_id,
             project_id=project_id,
+            project_name=project_name,
             agent_name="AnalyzeAgent",
             status="success",
             output=final_output
@@ -127,6 +125,7 @@ def analyze_agent_func(input_str: str, user_id: int, task_id: int, project_id: i
             task_id=task_id,
             user_id=user_id,
             project_id=project_id,
+            project_name=project_name,
             agent_name="AnalyzeAgent",
             status="failed",
             output=str(e)
@@ -137,7 +136,8 @@ def make_analyze_tool(
     db: Session,
     user_id: int,
     task_id: int,
-    project_id: int
+    project_id: int,
+    project_name: str = None
 ) -> Tool:
     """
     Factory function that returns a LangChain Tool for 'analyze'.
@@ -150,6 +150,7 @@ def make_analyze_tool(
         user_id=user_id,
         task_id=task_id,
         project_id=project_id,
+        project_name=project_name,
         db=db
     )
     
@@ -1,15 +1,19 @@
 # src/agent_factory/tools/codegen_tool.py
 
 import os
+import json
+from functools import partial
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain.agents import Tool
-from langchain.chat_models import ChatOpenAI
+from src.agent_factory.langchain_integration import get_llm
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from sqlalchemy.orm import Session
 from src.utils.log_agent_execution import log_agent_execution
 from src.utils.log_user_interaction import store_ai_questions
-from src.utils.file_operations import ensure_project_directory, create_or_update_file
+from src.utils.file_operations import write_files, PROJECTS_ROOT
+from src.utils.snapshot_store import SnapshotStore
+from src.utils.symbol_index import get_symbol_index
 
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -21,12 +25,7 @@ def codegen_agent_func(plan_step: str, task_id: int, user_id: int, project_id: i
     - Stores AI-generated clarification questions if needed.
     """
     try:
-        openai_api_key = os.getenv("OPENAI_API_KEY", "")
-        llm = ChatOpenAI(
-            temperature=0,
-            openai_api_key=openai_api_key,
-            model_name=os.getenv("OPENAI_DEFAULT_MODEL", "o1-preview")
-        )
+        llm = get_llm()
 
         system_prompt = SystemMessagePromptTemplate.from_template("""
         You are a Code Generation Agent. You generate, modify or delete code to accomplish the user's plan step. 
@@ -37,12 +36,19 @@ def codegen_agent_func(plan_step: str, task_id: int, user_id: int, project_id: i
         Plan step to code:
         "{plan_step}"
 
+        Target file: {filename}
+        Relevant existing code in the project (outline of the target file, signatures and
+        snippets of the symbols involved; everything else is omitted):
+        {context}
+
         Generate the code that solves or implements this step. 
         If needed, include minimal comments or docstrings.
         """)
 
         chat_prompt = ChatPromptTemplate.from_messages([system_prompt, human_prompt])
-        messages = chat_prompt.format_messages(plan_step=plan_step)
+        # Only the symbols this step touches, instead of whole files
+        context = get_symbol_index(project_name).context_for(plan_step, filename=filename) or "(none yet)"
+        messages = chat_prompt.format_messages(plan_step=plan_step, filename=filename, context=context)
 
         response = llm(messages)
         generated_code = response.content.strip()
@@ -53,11 +59,13 @@ def codegen_agent_func(plan_step: str, task_id: int, user_id: int, project_id: i
             questions_part = generated_code.split("**Clarifying Questions**:")[1].split("\n")
             clarification_questions = [q.strip("- ") for q in questions_part if q.strip()]
 
-        # Ensure project directory exists
-        project_path = ensure_project_directory(project_name)
-
-        # Create or update file
-        file_path = create_or_update_file(project_name, filename, generated_code)
+        # Write the file (skipped when the content is unchanged)
+        change_set = write_files(project_name, {filename: generated_code})
+        file_path = os.path.join(PROJECTS_ROOT, project_name, filename)
+        status = "unchanged" if change_set.is_empty() else "saved"
+        if not change_set.is_empty():
+            # Keep this iteration so a failed validation can roll back instead of regenerating
+            SnapshotStore().snapshot(project_name, change_set, label=f"codegen: {filename}")
 
         # Log execution details
         log_agent_execution(
@@ -68,7 +76,7 @@ def codegen_agent_func(plan_step: str, task_id: int, user_id: int, project_id: i
             project_name=project_name,
             agent_name="CodeGenAgent",
             status="completed",
-            output=f"Generated code saved to {file_path}."
+            output=f"Generated code {status}: {file_path}."
         )
 
         # Store clarification questions if any
@@ -82,7 +90,7 @@ def codegen_agent_func(plan_step: str, task_id: int, user_id: int, project_id: i
                 questions=clarification_questions
             )
 
-        return f"Code generation completed. File saved at: {file_path}"
+        return f"Code generation completed. File {status} at: {file_path}"
 
     except Exception as e:
         log_agent_execution(
@@ -97,10 +105,27 @@ def codegen_agent_func(plan_step: str, task_id: int, user_id: int, project_id: i
         )
         return f"Error: {str(e)}"
 
-CodeGenTool = Tool(
-    name="codegen",
-    func=codegen_agent_func,
-    description=(
-        "Generates or modifies code for a given plan step and stores it in the project directory."
+def codegen_tool_func(input_str: str, task_id: int, user_id: int, project_id: int, project_name: str, db: Session) -> str:
+    """
+    Tool entry point. Input is JSON: {"plan_step": "...", "filename": "path/in/project.py"}.
+    """
+    try:
+        data = json.loads(input_str)
+    except json.JSONDecodeError:
+        data = {}
+    if not isinstance(data, dict) or not data.get("plan_step") or not data.get("filename"):
+        return "Error: expected JSON {\"plan_step\": \"...\", \"filename\": \"path/in/project.py\"}"
+    return codegen_agent_func(data["plan_step"], task_id, user_id, project_id, project_name, data["filename"], db)
+
+def make_codegen_tool(db: Session, user_id: int, task_id: int, project_id: int, project_name: str) -> Tool:
+    """
+    Factory returning the 'codegen' Tool for one task: generated files go to its project.
+    """
+    return Tool(
+        name="codegen",
+        func=partial(codegen_tool_func, task_id=task_id, user_id=user_id, project_id=project_id, project_name=project_name, db=db),
+        description=(
+            "Generates or modifies code for a given plan step and stores it in the project directory. "
+            "Input: a JSON object with \"plan_step\" and \"filename\" (path in the project) keys."
+        )
     )
-)
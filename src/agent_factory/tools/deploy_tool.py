@@ -4,7 +4,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain.agents import Tool
-from langchain.chat_models import ChatOpenAI
+from src.agent_factory.langchain_integration import get_llm
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 
 env_path = Path(__file__).parent.parent / ".env"
@@ -16,12 +16,7 @@ def deploy_agent_func(code_snippet: str) -> str:
     Real usage might push to GitHub or a server.
     """
 
-    openai_api_key = os.getenv("OPENAI_API_KEY", "")
-    llm = ChatOpenAI(
-        temperature=0,
-        openai_api_key=openai_api_key,
-        model_name=os.getenv("OPENAI_DEFAULT_MODEL","o1-preview")
-    )
+    llm = get_llm()
 
     system_prompt = SystemMessagePromptTemplate.from_template("""
 You are DeployAgent. 
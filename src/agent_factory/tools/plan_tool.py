@@ -4,7 +4,7 @@ import json
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain.agents import Tool
-from langchain.chat_models import ChatOpenAI
+from src.agent_factory.langchain_integration import get_llm
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
 from sqlalchemy.orm import Session
 from functools import partial
@@ -15,7 +15,7 @@ from src.utils.log_user_interaction import store_ai_questions
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-def plan_agent_func(analyzed_requirement: str, task_id: int, user_id: int, project_id: int, db: Session) -> str:
+def plan_agent_func(analyzed_requirement: str, task_id: int, user_id: int, project_id: int, db: Session, project_name: str = None) -> str:
     """
     PlanAgent:
     - Takes the user's analyzed requirement (in JSON) from the AnalyzeAgent
@@ -24,12 +24,7 @@ def plan_agent_func(analyzed_requirement: str, task_id: int, user_id: int, proje
     """
 
     try:
-        openai_api_key = os.getenv("OPENAI_API_KEY", "")
-        llm = ChatOpenAI(
-            temperature=0,
-            openai_api_key=openai_api_key,
-            model_name=os.getenv("OPENAI_DEFAULT_MODEL", "gpt-4")
-        )
+        llm = get_llm(os.getenv("OPENAI_DEFAULT_MODEL", "gpt-4"))
 
         system_prompt = SystemMessagePromptTemplate.from_template("""
         You are an AI-powered specialized Plan Agent.
@@ -40,14 +35,14 @@ def plan_agent_func(analyzed_requirement: str, task_id: int, user_id: int, proje
         4. Keep your reasoning private.
 
         OUTPUT FORMAT (valid JSON):
-        {
+        {{
           "goal": "...",
           "tasks": [
             "task 1",
             "task 2"
           ],
           "questions": []
-        }
+        }}
         - "goal": short summary of what we're trying to achieve overall
         - "tasks": bullet list of tasks in logical order
         - "questions": any clarifications needed. if none, use an empty list []
@@ -83,6 +78,7 @@ def plan_agent_func(analyzed_requirement: str, task_id: int, user_id: int, proje
             task_id=task_id,
             user_id=user_id,
             project_id=project_id,
+            project_name=project_name,
             agent_name="PlanAgent",
             status="completed",
             output=content
@@ -108,14 +104,20 @@ def plan_agent_func(analyzed_requirement: str, task_id: int, user_id: int, proje
             task_id=task_id,
             user_id=user_id,
             project_id=project_id,
+            project_name=project_name,
             agent_name="PlanAgent",
             status="failed",
             output=str(e)
         )
         return f"Error: {str(e)}"
 
-PlanTool = Tool(
-    name="plan",
-    func=partial(plan_agent_func, task_id=None, user_id=None, project_id=None, db=None),
-    description="Takes the 'analyzed requirement' (JSON) and returns a JSON plan with a goal, tasks, and clarifying questions if needed."
-)
+def make_plan_tool(db: Session, user_id: int, task_id: int, project_id: int, project_name: str = None) -> Tool:
+    """
+    Factory returning the 'plan' Tool with the task's db session and ids baked in,
+    so its executions are logged against the task.
+    """
+    return Tool(
+        name="plan",
+        func=partial(plan_agent_func, task_id=task_id, user_id=user_id, project_id=project_id, project_name=project_name, db=db),
+        description="Takes the 'analyzed requirement' (JSON) and returns a JSON plan with a goal, tasks, and clarifying questions if needed."
+    )
@@ -1,51 +1,45 @@
 # src/agent_factory/tools/test_tool.py
 
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain.agents import Tool
-from langchain.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+from src.sandbox_manager.test_runner import run_tests, format_test_summary
+from src.utils import file_operations
 
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-def test_agent_func(code_snippet: str) -> str:
+def test_agent_func(input_str: str) -> str:
     """
-    Stub that calls the LLM to 'simulate' testing. 
-    In real usage, you'd run actual tests in Docker or local environment.
+    Runs the generated project's tests in sharded pytest workers (see TEST_RUNNER_PYTHON).
+    Input is a project name or JSON: {"project_name": "...", "workers": 4, "coverage": true}.
+    Returns a compact summary: a 'Tests passed'/'Tests failed' line plus failing tests.
     """
-
-    openai_api_key = os.getenv("OPENAI_API_KEY", "")
-    llm = ChatOpenAI(
-        temperature=0,
-        openai_api_key=openai_api_key,
-        model_name=os.getenv("OPENAI_DEFAULT_MODEL","o1-preview")
+    try:
+        data = json.loads(input_str)
+        if not isinstance(data, dict):
+            data = {"project_name": str(data)}
+    except json.JSONDecodeError:
+        data = {"project_name": input_str.strip().strip('"')}
+
+    project_name = data.get("project_name")
+    if not project_name:
+        return "Tests failed: expected a project name, e.g. {\"project_name\": \"my_project\"}"
+
+    result = run_tests(
+        os.path.join(file_operations.PROJECTS_ROOT, project_name),
+        workers=data.get("workers"),
+        with_coverage=data.get("coverage", True),
     )
-
-    system_prompt = SystemMessagePromptTemplate.from_template("""
-You are TestAgent. 
-Simulate running tests on the given code. 
-Output either 'Tests passed' or 'Tests failed: <reason>'. 
-This is only a placeholder for real test logic.
-""")
-
-    human_prompt = HumanMessagePromptTemplate.from_template("""
-{code_snippet}
-Give pass/fail result.
-""")
-
-    chat_prompt = ChatPromptTemplate.from_messages([system_prompt, human_prompt])
-    messages = chat_prompt.format_messages(code_snippet=code_snippet)
-
-    response = llm(messages)
-    test_result = response.content.strip()
-    return test_result
+    return format_test_summary(result)
 
 TestTool = Tool(
     name="test",
     func=test_agent_func,
     description=(
-        "Runs a simulated test on code snippet. Returns 'Tests passed' or 'Tests failed: <reason>'."
+        "Runs the tests of a generated project (input: project name or a JSON object with a \"project_name\" key). "
+        "Returns 'Tests passed: ...' or 'Tests failed: ...' with failing tests and coverage."
     )
 )
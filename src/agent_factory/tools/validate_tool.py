@@ -1,48 +1,146 @@
 # src/agent_factory/tools/validate_tool.py
 
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 from langchain.agents import Tool
-from langchain.chat_models import ChatOpenAI
+from src.agent_factory.langchain_integration import get_llm
 from langchain.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate
+from src.agent_factory.static_validator import check_source, validate_directory, format_report
+from src.utils import file_operations
+from src.utils.snapshot_store import SnapshotStore
+from src.utils.symbol_index import get_symbol_index
 
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
-def validate_agent_func(code_snippet: str) -> str:
+
+# Ask the LLM for a semantic review after the static checks pass (off by default)
+SEMANTIC_REVIEW_DEFAULT = os.getenv("VALIDATE_SEMANTIC_REVIEW", "false").lower() == "true"
+# Symbol context sent per reviewed file
+SYMBOL_CONTEXT_PER_FILE = int(os.getenv("VALIDATE_SYMBOL_CONTEXT_PER_FILE", "1500"))
+
+def semantic_review(code_snippet: str, context: str = "") -> str:
     """
-    A stub that calls an LLM to do a 'theoretical validation'.
-    In Phase 2, you might run a real sandbox or lint check.
+    Calls an LLM for a semantic review of code that already passed the static checks.
+    context holds signatures of project symbols the code uses.
     """
 
-    openai_api_key = os.getenv("OPENAI_API_KEY", "")
-    llm = ChatOpenAI(
-        temperature=0,
-        openai_api_key=openai_api_key,
-        model_name=os.getenv("OPENAI_DEFAULT_MODEL","o1-preview")
-    )
+    llm = get_llm()
 
     system_prompt = SystemMessagePromptTemplate.from_template("""
 You are ValidateAgent. 
-You check code for errors or basic issues.
+The code already passed syntax and security checks.
+Review it for logic errors or mismatches with its apparent intent.
 Output either 'Validation passed' or 'Validation failed: <reason>'.
-This is a theoretical check for now.
 """)
 
-    human_prompt = HumanMessagePromptTemplate.from_template("""{code_snippet}""")
+    human_prompt = HumanMessagePromptTemplate.from_template("""{code_snippet}
+
+Signatures of project code it relies on:
+{context}""")
 
     chat_prompt = ChatPromptTemplate.from_messages([system_prompt, human_prompt])
-    messages = chat_prompt.format_messages(code_snippet=code_snippet)
+    messages = chat_prompt.format_messages(code_snippet=code_snippet, context=context or "(none)")
 
     response = llm(messages)
-    validation_result = response.content.strip()
-    return validation_result
+    return response.content.strip()
+
+def validate_agent_func(input_str: str) -> str:
+    """
+    Validates a code snippet or a whole project directory with local static checks
+    (syntax, undefined names, dangerous calls, security rules).
+    Input is either raw code or JSON:
+    {"code": "...", "project_name": "...", "semantic_review": false, "rollback_on_failure": false,
+     "context_project": "..."}.
+    The LLM is only consulted when the static checks pass and a semantic review is requested.
+    It sees only the files changed since the last validated snapshot, plus signatures of the
+    project symbols they use (context_project supplies those for a bare snippet).
+    A project that passes is tagged 'validated' in the snapshot store; with rollback_on_failure
+    a failing project is restored to its last validated snapshot.
+    """
+    try:
+        data = json.loads(input_str)
+        if not isinstance(data, dict):
+            data = {"code": input_str}
+    except json.JSONDecodeError:
+        data = {"code": input_str}
+
+    wants_review = bool(data.get("semantic_review", SEMANTIC_REVIEW_DEFAULT))
+
+    if data.get("project_name"):
+        project_name = data["project_name"]
+        result = validate_directory(os.path.join(file_operations.PROJECTS_ROOT, project_name))
+        if result.get("error"):
+            return f"Validation failed: {result['error']}"
+        report = format_report(result["results"])
+        if not result["ok"]:
+            if data.get("rollback_on_failure"):
+                report += _rollback_to_validated(project_name)
+            return report
+        if not wants_review:
+            _tag_validated(project_name)
+            return report
+        filenames = _changed_since_validated(project_name, [r["filename"] for r in result["results"]])
+        if not filenames:
+            return "Validation passed (nothing changed since the last validated snapshot)"
+        code = "\n\n".join(_read_sources(filenames, project_name))
+        index = get_symbol_index(project_name)
+        context = "\n\n".join(
+            index.context_for("", filename=f.replace(os.sep, "/"), max_chars=SYMBOL_CONTEXT_PER_FILE) for f in filenames
+        )
+    else:
+        code = data.get("code", "")
+        result = check_source(code)
+        report = format_report([result])
+        if not result["ok"] or not wants_review:
+            return report
+        context = get_symbol_index(data["context_project"]).context_for(code) if data.get("context_project") else ""
+
+    review = semantic_review(code, context)
+    if data.get("project_name") and review.startswith("Validation passed"):
+        _tag_validated(data["project_name"])
+    return review
+
+def _tag_validated(project_name: str):
+    store = SnapshotStore()
+    snapshot_id = store.latest(project_name)
+    if snapshot_id is not None:
+        store.tag(project_name, snapshot_id, "validated")
+
+def _rollback_to_validated(project_name: str) -> str:
+    store = SnapshotStore()
+    snapshot_id = store.latest_tagged(project_name, "validated")
+    if snapshot_id is None:
+        return "\nNo validated snapshot to roll back to."
+    change_set = store.rollback(project_name, snapshot_id)
+    return f"\nRolled back to validated snapshot {snapshot_id} ({len(change_set.changed)} files restored)."
+
+def _changed_since_validated(project_name: str, filenames: list) -> list:
+    """
+    The files changed since the last validated snapshot; all of them if there is none.
+    """
+    store = SnapshotStore()
+    validated, latest = store.latest_tagged(project_name, "validated"), store.latest(project_name)
+    if validated is None or latest is None:
+        return filenames
+    diff = store.diff(project_name, validated, latest)
+    changed = set(diff.get("added", [])) | set(diff.get("modified", []))
+    return [f for f in filenames if f.replace(os.sep, "/") in changed]
+
+def _read_sources(filenames: list, project_name: str) -> list:
+    sources = []
+    for filename in filenames:
+        with open(os.path.join(file_operations.PROJECTS_ROOT, project_name, filename), "r", encoding="utf-8") as f:
+            sources.append(f"# {filename}\n{f.read()}")
+    return sources
 
 ValidateTool = Tool(
     name="validate",
     func=validate_agent_func,
     description=(
-        "Checks code snippet for errors or issues. Returns a string like "
+        "Checks a code snippet, or a whole project when given a JSON object with a \"project_name\" key, "
+        "for syntax errors, undefined names and insecure calls. Returns a string like "
         "'Validation passed' or 'Validation failed: <reason>'."
     )
 )
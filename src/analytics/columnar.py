@@ -0,0 +1,189 @@
+# src/analytics/columnar.py
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+import numpy as np
+from sqlalchemy import Float, cast, func, select
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Rows fetched per round trip from the server-side cursor
+ANALYTICS_CHUNK_ROWS = int(os.getenv("ANALYTICS_CHUNK_ROWS", "100000"))
+
+
+class Dictionary:
+    """
+    Dictionary encoding of a string column: values become int32 codes into self.values,
+    so grouping works on integers (np.bincount) instead of Python strings.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def encode(self, chunk: Iterable) -> np.ndarray:
+        uniques, inverse = np.unique(np.asarray(chunk, dtype=object).astype(str), return_inverse=True)
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.values)
+                self.values.append(value)
+            mapping[i] = code
+        return mapping[inverse]
+
+    def code(self, value: str) -> int:
+        return self._codes.get(value, -1)
+
+    def codes(self, values: Iterable[str]) -> np.ndarray:
+        return np.array([self.code(v) for v in values], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ColumnTable:
+    """
+    Columns of one query as NumPy arrays: numeric columns as int64/float64, string
+    columns as int32 codes with their Dictionary in self.dictionaries.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], dictionaries: Dict[str, Dictionary]):
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def labels(self, name: str) -> List[str]:
+        return self.dictionaries[name].values
+
+    def take(self, mask_or_index) -> "ColumnTable":
+        return ColumnTable({k: v[mask_or_index] for k, v in self.columns.items()}, self.dictionaries)
+
+    def to_arrow(self):
+        """
+        The table as a pyarrow.Table with dictionary-encoded string columns (needs pyarrow).
+        """
+        import pyarrow as pa
+
+        arrays = {}
+        for name, values in self.columns.items():
+            if name in self.dictionaries:
+                arrays[name] = pa.DictionaryArray.from_arrays(pa.array(values), pa.array(self.dictionaries[name].values))
+            else:
+                arrays[name] = pa.array(values)
+        return pa.table(arrays)
+
+
+def epoch_seconds(column, dialect: str):
+    """
+    SQL expression for a DATETIME column as Unix seconds, so timestamps arrive as
+    numbers instead of one Python datetime per row.
+    """
+    if dialect == "mysql":
+        return cast(func.unix_timestamp(column), Float)
+    if dialect == "sqlite":
+        return cast(func.strftime("%s", column), Float)
+    return func.extract("epoch", column)
+
+
+def _to_array(values: tuple, kind: str, dictionary: Optional[Dictionary]) -> np.ndarray:
+    """
+    One chunk of a column as an array: NULL becomes "" for strings, -1 for ints, NaN for floats.
+    """
+    if kind == "str":
+        return dictionary.encode([v if v is not None else "" for v in values])
+    if kind == "float":
+        return np.array(values, dtype=np.float64)
+    try:
+        return np.array(values, dtype=np.int64)
+    except TypeError:
+        return np.array([v if v is not None else -1 for v in values], dtype=np.int64)
+
+
+def stream_columns(engine, statement, kinds: Dict[str, str], chunk_rows: int = ANALYTICS_CHUNK_ROWS) -> Tuple[ColumnTable, int]:
+    """
+    Runs statement on a server-side cursor and converts each chunk of rows to arrays.
+    kinds maps every selected label to "int", "float" or "str". Returns the table and
+    the number of chunks fetched.
+    """
+    names = list(kinds)
+    dictionaries = {name: Dictionary() for name, kind in kinds.items() if kind == "str"}
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+    chunks = 0
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(statement)
+        for rows in result.partitions(chunk_rows):
+            if not rows:
+                continue
+            chunks += 1
+            for name, values in zip(names, zip(*rows)):
+                parts[name].append(_to_array(values, kinds[name], dictionaries.get(name)))
+    empty = {"int": np.int64, "float": np.float64, "str": np.int32}
+    columns = {
+        name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=empty[kinds[name]])
+        for name in names
+    }
+    return ColumnTable(columns, dictionaries), chunks
+
+
+def _time_filters(column, since: Optional[str], until: Optional[str]) -> list:
+    filters = []
+    if since:
+        filters.append(column >= since)
+    if until:
+        filters.append(column < until)
+    return filters
+
+
+def load_task_logs(engine, since: Optional[str] = None, until: Optional[str] = None, chunk_rows: int = ANALYTICS_CHUNK_ROWS) -> Tuple[ColumnTable, int]:
+    """
+    task_logs without its output text (only its length): id, task, user, project,
+    agent, status, created_at as Unix seconds.
+    """
+    from src.db.models import TaskLog
+
+    statement = (
+        select(
+            TaskLog.id.label("id"),
+            TaskLog.task_id.label("task_id"),
+            TaskLog.user_id.label("user_id"),
+            TaskLog.project_id.label("project_id"),
+            TaskLog.agent_name.label("agent_name"),
+            TaskLog.status.label("status"),
+            epoch_seconds(TaskLog.created_at, engine.dialect.name).label("created_at"),
+            func.length(TaskLog.output).label("output_chars"),
+        )
+        .where(*_time_filters(TaskLog.created_at, since, until))
+    )
+    kinds = {"id": "int", "task_id": "int", "user_id": "int", "project_id": "int", "agent_name": "str",
+             "status": "str", "created_at": "float", "output_chars": "int"}
+    return stream_columns(engine, statement, kinds, chunk_rows)
+
+
+def load_usage_records(engine, since: Optional[str] = None, until: Optional[str] = None, chunk_rows: int = ANALYTICS_CHUNK_ROWS) -> Tuple[ColumnTable, int]:
+    from src.db.models import UsageRecord
+
+    statement = (
+        select(
+            UsageRecord.task_id.label("task_id"),
+            UsageRecord.user_id.label("user_id"),
+            UsageRecord.project_id.label("project_id"),
+            UsageRecord.stage.label("stage"),
+            UsageRecord.model.label("model"),
+            UsageRecord.prompt_tokens.label("prompt_tokens"),
+            UsageRecord.completion_tokens.label("completion_tokens"),
+            UsageRecord.cost_usd.label("cost_usd"),
+            epoch_seconds(UsageRecord.created_at, engine.dialect.name).label("created_at"),
+        )
+        .where(*_time_filters(UsageRecord.created_at, since, until))
+    )
+    kinds = {"task_id": "int", "user_id": "int", "project_id": "int", "stage": "str", "model": "str",
+             "prompt_tokens": "int", "completion_tokens": "int", "cost_usd": "float", "created_at": "float"}
+    return stream_columns(engine, statement, kinds, chunk_rows)
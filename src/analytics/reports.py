@@ -0,0 +1,349 @@
+# src/analytics/reports.py
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+import numpy as np
+from sqlalchemy import select
+from src.analytics.columnar import ANALYTICS_CHUNK_ROWS, ColumnTable, epoch_seconds, load_task_logs, load_usage_records, stream_columns
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Seconds an API report is reused for the same time range
+ANALYTICS_CACHE_SECONDS = float(os.getenv("ANALYTICS_CACHE_SECONDS", "300"))
+
+SUCCESS_STATUSES = ("completed", "success")
+FAILURE_STATUSES = ("failed", "error", "budget_exceeded")
+# Task-level outcome entries and bookkeeping entries; every other agent name is a stage
+TASK_AGENT = "CoreAgent"
+NON_STAGE_AGENTS = (TASK_AGENT, "Profiler", "Scheduler")
+QUANTILES = (0.5, 0.9, 0.99)
+
+logger = logging.getLogger(__name__)
+
+
+# Vectorized grouping: groups are dense int codes (0..n-1), one value per row
+
+def group_counts(groups: np.ndarray, n: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    return np.bincount(groups if mask is None else groups[mask], minlength=n)[:n]
+
+
+def group_sums(groups: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    return np.bincount(groups, weights=values, minlength=n)[:n]
+
+
+def group_quantiles(groups: np.ndarray, values: np.ndarray, n: int, quantiles: Sequence[float] = QUANTILES) -> np.ndarray:
+    """
+    Per-group quantiles (linear interpolation, NaN values ignored) with one sort of all
+    rows: shape (n, len(quantiles)), NaN for empty groups.
+    """
+    keep = ~np.isnan(values)
+    groups, values = groups[keep], values[keep]
+    order = np.lexsort((values, groups))
+    values = values[order]
+    counts = np.bincount(groups, minlength=n)[:n]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    result = np.full((n, len(quantiles)), np.nan)
+    filled = counts > 0
+    for column, q in enumerate(quantiles):
+        position = starts[filled] + q * (counts[filled] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        result[filled, column] = values[low] + (values[high] - values[low]) * (position - low)
+    return result
+
+
+def dense_pairs(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Groups rows by the pair (a, b) of non-negative ints: returns the first and second
+    key of every pair and each row's pair index.
+    """
+    width = int(b.max()) + 1 if len(b) else 1
+    pairs, inverse = np.unique(a.astype(np.int64) * width + b, return_inverse=True)
+    return pairs // width, pairs % width, inverse
+
+
+def _round(value, digits: int = 3):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
+
+
+def _quantile_fields(prefix: str, row: np.ndarray, quantiles: Sequence[float] = QUANTILES) -> dict:
+    return {f"{prefix}_p{int(round(q * 100))}": _round(v) for q, v in zip(quantiles, row)}
+
+
+def _rate(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+def stage_report(logs: ColumnTable) -> List[dict]:
+    """
+    Per stage: runs, success rate of its outcomes, retries per task (outcome entries of
+    the same stage in a task beyond the first) and the gap since the task's previous log
+    entry, which for stages logging at the end of their run is their latency. The first
+    entry of a task has no gap.
+    """
+    labels = logs.labels("agent_name")
+    status = logs["status"]
+    statuses = logs.dictionaries["status"]
+    success = np.isin(status, statuses.codes(SUCCESS_STATUSES))
+    failure = np.isin(status, statuses.codes(FAILURE_STATUSES))
+
+    # Gaps between consecutive entries of a task, in (task, time, id) order
+    order = np.lexsort((logs["id"], logs["created_at"], logs["task_id"]))
+    task_sorted = logs["task_id"][order]
+    gap_sorted = np.full(len(order), np.nan)
+    if len(order) > 1:
+        same_task = task_sorted[1:] == task_sorted[:-1]
+        deltas = np.diff(logs["created_at"][order])
+        gap_sorted[1:] = np.where(same_task, deltas, np.nan)
+    gap = np.empty_like(gap_sorted)
+    gap[order] = gap_sorted
+
+    stage_mask = ~np.isin(logs["agent_name"], logs.dictionaries["agent_name"].codes(NON_STAGE_AGENTS))
+    stage = logs["agent_name"][stage_mask].astype(np.int64)
+    n = len(labels)
+    runs = group_counts(stage, n)
+    successes = group_counts(stage, n, success[stage_mask])
+    failures = group_counts(stage, n, failure[stage_mask])
+    gaps = group_quantiles(stage, gap[stage_mask], n)
+
+    # Outcome entries per (task, stage): retries and whether the stage ended up succeeding
+    outcome = (success | failure)[stage_mask]
+    tasks, attempts, retried, succeeded, max_attempts = (np.zeros(n) for _ in range(5))
+    if outcome.any():
+        _, pair_stage, pair = dense_pairs(logs["task_id"][stage_mask][outcome], stage[outcome])
+        pair_attempts = np.bincount(pair)
+        pair_success = np.bincount(pair, weights=success[stage_mask][outcome]) > 0
+        tasks = group_counts(pair_stage, n)
+        attempts = group_sums(pair_stage, pair_attempts, n)
+        retried = group_counts(pair_stage, n, pair_attempts > 1)
+        succeeded = group_counts(pair_stage, n, pair_success)
+        np.maximum.at(max_attempts, pair_stage, pair_attempts)
+
+    success_rate = _rate(successes, successes + failures)
+    retries_per_task = _rate(attempts - tasks, tasks)
+    retried_rate = _rate(retried, tasks)
+    eventual_rate = _rate(succeeded, tasks)
+    rows = []
+    for code in np.flatnonzero(runs):
+        rows.append({
+            "stage": labels[code],
+            "runs": int(runs[code]),
+            "successes": int(successes[code]),
+            "failures": int(failures[code]),
+            "success_rate": _round(success_rate[code], 4),
+            "tasks": int(tasks[code]),
+            "retries_per_task": _round(retries_per_task[code], 4),
+            "tasks_retried_rate": _round(retried_rate[code], 4),
+            "max_retries": max(int(max_attempts[code]) - 1, 0),
+            "task_success_rate": _round(eventual_rate[code], 4),
+            **_quantile_fields("seconds", gaps[code]),
+        })
+    return sorted(rows, key=lambda r: -r["runs"])
+
+
+def load_tasks(engine, task_ids: np.ndarray, chunk_rows: int = ANALYTICS_CHUNK_ROWS) -> ColumnTable:
+    from src.db.models import TaskModel
+
+    statement = select(
+        TaskModel.id.label("id"),
+        epoch_seconds(TaskModel.created_at, engine.dialect.name).label("created_at"),
+    )
+    if len(task_ids):
+        statement = statement.where(TaskModel.id >= int(task_ids.min()), TaskModel.id <= int(task_ids.max()))
+    table, _ = stream_columns(engine, statement, {"id": "int", "created_at": "float"}, chunk_rows)
+    return table
+
+
+def task_report(logs: ColumnTable, tasks: ColumnTable) -> dict:
+    """
+    Per task: the last CoreAgent outcome, entries logged, and the time from the task's
+    creation to its last log entry.
+    """
+    task_ids, inverse = np.unique(logs["task_id"], return_inverse=True)
+    n = len(task_ids)
+    entries = np.bincount(inverse, minlength=n)
+    last_log = np.full(n, -np.inf)
+    np.maximum.at(last_log, inverse, logs["created_at"])
+
+    # Final outcome: the status of each task's latest CoreAgent entry
+    outcome = np.full(n, -1, dtype=np.int64)
+    core = logs["agent_name"] == logs.dictionaries["agent_name"].code(TASK_AGENT)
+    if core.any():
+        order = np.lexsort((logs["id"][core], logs["created_at"][core], inverse[core]))
+        task_sorted = inverse[core][order]
+        last = np.append(task_sorted[1:] != task_sorted[:-1], True)
+        outcome[task_sorted[last]] = logs["status"][core][order][last]
+
+    created = np.full(n, np.nan)
+    if len(tasks):
+        by_id = np.argsort(tasks["id"])
+        position = np.clip(np.searchsorted(tasks["id"], task_ids, sorter=by_id), 0, len(by_id) - 1)
+        found = tasks["id"][by_id[position]] == task_ids
+        created[found] = tasks["created_at"][by_id[position[found]]]
+    duration = last_log - created
+
+    status_labels = logs.labels("status")
+    outcome_counts = np.bincount(outcome[outcome >= 0], minlength=len(status_labels))
+    finished = outcome >= 0
+    completed = np.isin(outcome, logs.dictionaries["status"].codes(SUCCESS_STATUSES))
+    zeros = np.zeros(n, dtype=np.int64)
+    return {
+        "tasks": n,
+        "with_outcome": int(finished.sum()),
+        "completion_rate": _round(completed.sum() / finished.sum(), 4) if finished.any() else None,
+        "outcomes": {status_labels[code]: int(count) for code, count in enumerate(outcome_counts) if count},
+        **_quantile_fields("entries", group_quantiles(zeros, entries.astype(np.float64), 1)[0]),
+        **_quantile_fields("seconds", group_quantiles(zeros, duration, 1)[0]),
+        **_quantile_fields("completed_seconds", group_quantiles(zeros[completed], duration[completed], 1)[0]),
+    }
+
+
+def token_report(usage: ColumnTable) -> dict:
+    """
+    Calls, tokens and cost by stage and by model, and the distribution of tokens per task.
+    """
+    prompt = usage["prompt_tokens"].astype(np.float64)
+    completion = usage["completion_tokens"].astype(np.float64)
+    cost = usage["cost_usd"]
+
+    def grouped(column: str) -> List[dict]:
+        codes, labels = usage[column].astype(np.int64), usage.labels(column)
+        n = len(labels)
+        calls = group_counts(codes, n)
+        prompt_sum, completion_sum, cost_sum = (group_sums(codes, v, n) for v in (prompt, completion, cost))
+        total = prompt + completion
+        per_call = group_quantiles(codes, total, n)
+        rows = [{
+            column: labels[code],
+            "calls": int(calls[code]),
+            "prompt_tokens": int(prompt_sum[code]),
+            "completion_tokens": int(completion_sum[code]),
+            "cost_usd": round(float(cost_sum[code]), 4),
+            **_quantile_fields("tokens_per_call", per_call[code]),
+        } for code in np.flatnonzero(calls)]
+        return sorted(rows, key=lambda r: -(r["prompt_tokens"] + r["completion_tokens"]))
+
+    task_ids, inverse = np.unique(usage["task_id"], return_inverse=True)
+    per_task_tokens = group_sums(inverse, prompt + completion, len(task_ids))
+    per_task_cost = group_sums(inverse, cost, len(task_ids))
+    zeros = np.zeros(len(task_ids), dtype=np.int64)
+    return {
+        "calls": len(usage),
+        "tasks": len(task_ids),
+        "prompt_tokens": int(prompt.sum()),
+        "completion_tokens": int(completion.sum()),
+        "cost_usd": round(float(cost.sum()), 4),
+        **_quantile_fields("tokens_per_task", group_quantiles(zeros, per_task_tokens, 1)[0]),
+        **_quantile_fields("cost_per_task", group_quantiles(zeros, per_task_cost, 1)[0]),
+        "by_stage": grouped("stage"),
+        "by_model": grouped("model"),
+    }
+
+
+def daily_report(logs: ColumnTable, usage: ColumnTable) -> List[dict]:
+    """
+    Per UTC day: tasks with log entries, stage failures, tokens and cost.
+    """
+    log_day = np.floor(logs["created_at"] / 86400).astype(np.int64)
+    usage_day = np.floor(usage["created_at"] / 86400).astype(np.int64)
+    days = np.union1d(log_day, usage_day)
+    if not len(days):
+        return []
+    first, n = days[0], int(days[-1] - days[0]) + 1
+    failure = np.isin(logs["status"], logs.dictionaries["status"].codes(FAILURE_STATUSES))
+    task_days, _, _ = dense_pairs(log_day - first, logs["task_id"])
+    tasks = group_counts(task_days, n)
+    failures = group_counts(log_day - first, n, failure)
+    tokens = group_sums(usage_day - first, (usage["prompt_tokens"] + usage["completion_tokens"]).astype(np.float64), n)
+    cost = group_sums(usage_day - first, usage["cost_usd"], n)
+    active = np.flatnonzero(tasks + tokens)
+    return [{
+        "day": time.strftime("%Y-%m-%d", time.gmtime(int(first + i) * 86400)),
+        "tasks": int(tasks[i]),
+        "failures": int(failures[i]),
+        "tokens": int(tokens[i]),
+        "cost_usd": round(float(cost[i]), 4),
+    } for i in active]
+
+
+def build_report(engine=None, since: Optional[str] = None, until: Optional[str] = None,
+                 chunk_rows: int = ANALYTICS_CHUNK_ROWS) -> dict:
+    """
+    Streams task logs, usage records and tasks of [since, until) into column arrays and
+    aggregates them. since/until are "YYYY-MM-DD[ HH:MM:SS]" in the database's time.
+    """
+    if engine is None:
+        from src.db.models import engine
+    timings = {}
+    started = time.perf_counter()
+    logs, log_chunks = load_task_logs(engine, since, until, chunk_rows)
+    usage, usage_chunks = load_usage_records(engine, since, until, chunk_rows)
+    tasks = load_tasks(engine, np.unique(logs["task_id"]), chunk_rows)
+    timings["load_seconds"] = round(time.perf_counter() - started, 3)
+
+    started = time.perf_counter()
+    report = {
+        "since": since,
+        "until": until,
+        "rows": {"task_logs": len(logs), "usage_records": len(usage), "tasks": len(tasks),
+                 "chunks": log_chunks + usage_chunks},
+        "stages": stage_report(logs),
+        "tasks": task_report(logs, tasks),
+        "tokens": token_report(usage),
+        "daily": daily_report(logs, usage),
+    }
+    timings["aggregate_seconds"] = round(time.perf_counter() - started, 3)
+    report["timings"] = timings
+    report["generated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    logger.info("Analytics report over %d log entries and %d usage records", len(logs), len(usage), extra=timings)
+    return report
+
+
+_cache: Dict[tuple, Tuple[float, dict]] = {}
+_cache_lock = threading.Lock()
+
+
+def cached_report(since: Optional[str] = None, until: Optional[str] = None) -> dict:
+    """
+    build_report() reused for ANALYTICS_CACHE_SECONDS per time range, so dashboards
+    polling the API do not rescan the history on every request.
+    """
+    key = (since, until)
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+    report = build_report(since=since, until=until)
+    with _cache_lock:
+        for stale in [k for k, (expires, _) in _cache.items() if expires <= now]:
+            del _cache[stale]
+        _cache[key] = (now + ANALYTICS_CACHE_SECONDS, report)
+    return report
+
+
+def export_parquet(directory: str, engine=None, since: Optional[str] = None, until: Optional[str] = None,
+                   chunk_rows: int = ANALYTICS_CHUNK_ROWS) -> List[str]:
+    """
+    Writes the task log and usage columns as task_logs.parquet and usage_records.parquet
+    (needs pyarrow), for notebooks or other tools.
+    """
+    import pyarrow.parquet as pq
+
+    if engine is None:
+        from src.db.models import engine
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, loader in (("task_logs", load_task_logs), ("usage_records", load_usage_records)):
+        table, _ = loader(engine, since, until, chunk_rows)
+        path = os.path.join(directory, f"{name}.parquet")
+        pq.write_table(table.to_arrow(), path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,177 @@
+# src/benchmark/fake_llm.py
+import os
+import json
+import math
+import time
+import random
+import hashlib
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def prompt_key(messages: List[BaseMessage]) -> str:
+    data = json.dumps([[m.type, m.content] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """
+    Seeded latency distributions, per role with a default:
+
+        LatencyModel({"default": "lognormal:0.8,0.5", "core_agent": "fixed:1.2"}, scale=0.1)
+
+    Specs: "none", "fixed:<s>", "uniform:<low>,<high>", "lognormal:<median>,<sigma>",
+    "normal:<mean>,<stddev>" (clipped at 0). scale multiplies every sample.
+    A sample depends only on the seed and the prompt, not on the order calls arrive in,
+    so runs with concurrent tasks stay comparable.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, str]] = None, scale: float = 1.0, seed: int = 0):
+        self.specs = {role: self.parse(spec) for role, spec in (specs or {"default": "none"}).items()}
+        self.scale = scale
+        self.seed = seed
+
+    @staticmethod
+    def parse(spec: str) -> Tuple[str, List[float]]:
+        kind, _, args = spec.partition(":")
+        values = [float(v) for v in args.split(",") if v.strip()]
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "lognormal": 2, "normal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Bad latency spec '{spec}', expected e.g. none, fixed:0.5, uniform:0.2,1, lognormal:0.8,0.5, normal:1,0.2")
+        return kind, values
+
+    def sample(self, role: str, key: str = "") -> float:
+        kind, values = self.specs.get(role) or self.specs.get("default") or ("none", [])
+        rng = random.Random(f"{self.seed}:{role}:{key}")
+        if kind == "fixed":
+            seconds = values[0]
+        elif kind == "uniform":
+            seconds = rng.uniform(values[0], values[1])
+        elif kind == "lognormal":
+            seconds = rng.lognormvariate(math.log(values[0]), values[1])
+        elif kind == "normal":
+            seconds = max(0.0, rng.gauss(values[0], values[1]))
+        else:
+            seconds = 0.0
+        return seconds * self.scale
+
+
+class Cassette:
+    """
+    Recorded responses keyed by a hash of the prompt messages, stored as one JSON file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, key: str, role: str, text: str):
+        with self._lock:
+            self.entries[key] = {"role": role, "text": text}
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".cassette-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for ChatOpenAI.
+
+    mode "script": responder(messages) -> (role, text) answers every call.
+    mode "replay": answers from the cassette, falling back to the responder on a miss.
+    mode "record": calls record_model (a real chat model) and stores its answers in the cassette.
+
+    Each call sleeps for a latency sampled for its role and reports token usage the way
+    ChatOpenAI does (llm_output["token_usage"]), so the metrics and traces see it as a real call.
+    """
+
+    model_name: str = "fake"
+    mode: str = "script"
+    responder: Optional[Callable] = None
+    latency: Optional[Any] = None
+    cassette: Optional[Any] = None
+    record_model: Optional[Any] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name, "mode": self.mode}
+
+    def _respond(self, messages: List[BaseMessage], key: str) -> Tuple[str, str]:
+        if self.mode == "record":
+            text = self.record_model.invoke(messages).content
+            role = self.responder(messages)[0] if self.responder else "default"
+            self.cassette.put(key, role, text)
+            return role, text
+        if self.mode == "replay" and self.cassette is not None:
+            entry = self.cassette.get(key)
+            if entry is not None:
+                return entry["role"], entry["text"]
+        if self.responder is None:
+            raise KeyError(f"No recorded response for prompt {key[:12]} and no responder")
+        return self.responder(messages)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        key = prompt_key(messages)
+        role, text = self._respond(messages, key)
+        for token in stop or []:
+            if token in text:
+                text = text[:text.index(token)]
+        if self.mode != "record" and self.latency is not None:
+            seconds = self.latency.sample(role, key)
+            if seconds > 0:
+                time.sleep(seconds)
+        prompt_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        completion_tokens = count_tokens(text)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=text))],
+            llm_output={
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+                "model_name": self.model_name,
+            },
+        )
@@ -0,0 +1,463 @@
+# src/benchmark/harness.py
+"""
+Offline end-to-end benchmark of the agent pipeline:
+run_core_agent_task -> CoreAgent -> tools -> log_agent_execution, with the chat model
+replaced by FakeChatModel, Celery on an in-memory broker and the database on SQLite.
+
+configure_environment() must run before anything under src.db / src.orchestrator is
+imported, since those read their settings at import time; scripts/benchmark_pipeline.py
+does that and is the intended entry point.
+"""
+import os
+import re
+import json
+import time
+import logging
+import socket
+import platform
+import sys
+import threading
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.benchmark.fake_llm import Cassette, FakeChatModel, LatencyModel
+from src.utils.logging_config import logging_stats
+
+RESULTS_VERSION = 1
+# Relative slowdown (or growth in DB round trips / tokens) reported as a regression
+DEFAULT_TOLERANCE = 0.2
+# Stage timings must also move by this many seconds, so millisecond jitter isn't flagged
+MIN_STAGE_DELTA_S = 0.01
+
+logger = logging.getLogger(__name__)
+
+
+def configure_environment(workdir: str, scheduler: str = "off", exploration: Optional[float] = None):
+    """
+    Points every setting with side effects outside the process at workdir, and makes
+    the process' working directory a subdirectory of it: the "./../projects" style
+    defaults (projects, snapshots, vector store) then land in workdir as well.
+    """
+    run_dir = os.path.join(workdir, "run")
+    os.makedirs(run_dir, exist_ok=True)
+    defaults = {
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'benchmark.sqlite')}",
+        "SQL_ECHO": "false",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "TRACE_EXPORT_PATH": os.path.join(workdir, "spans.jsonl"),
+        "TRACE_OTLP_ENDPOINT": "",
+        "CONFIRMATION_POLL_SECONDS": "0.05",
+        "METRICS_PUSH_INTERVAL": "3600",
+        "WORKSPACE_FSYNC": "false",
+        # The generated calculator tests run under the benchmark's own interpreter
+        "TEST_RUNNER_PYTHON": os.environ.get("TEST_RUNNER_PYTHON") or sys.executable,
+        # Off by default so runs stay comparable; "on" with a reused workdir learns across runs
+        "RL_SCHEDULER": scheduler,
+    }
+    if exploration is not None:
+        defaults["RL_EXPLORATION"] = str(exploration)
+    for key, value in defaults.items():
+        os.environ[key] = value
+    os.chdir(run_dir)
+
+
+# Scripted answers for the pipeline's prompts
+
+MODULE_SOURCE = '''"""Arithmetic helpers generated by the benchmark."""
+
+
+def add(a, b):
+    return a + b
+
+
+def subtract(a, b):
+    return a - b
+
+
+def mean(values):
+    if not values:
+        raise ValueError("mean of an empty sequence")
+    return sum(values) / len(values)
+'''
+
+TEST_SOURCE = '''import pytest
+from calculator import add, subtract, mean
+
+
+def test_add():
+    assert add(2, 3) == 5
+
+
+def test_subtract():
+    assert subtract(5, 3) == 2
+
+
+def test_mean():
+    assert mean([1, 2, 3]) == 2
+
+
+def test_mean_empty():
+    with pytest.raises(ValueError):
+        mean([])
+'''
+
+
+def core_agent_steps(project: str, index: int) -> List[str]:
+    """
+    The ReAct turns of one task: analyze, plan, two codegen steps, validate, test, deploy.
+    """
+    def action(thought: str, tool: str, tool_input) -> str:
+        if not isinstance(tool_input, str):
+            tool_input = json.dumps(tool_input)
+        return f"Thought: {thought}\nAction: {tool}\nAction Input: {tool_input}"
+
+    return [
+        action("I should analyze the requirement first.", "analyze", f"Calculator helpers for {project}"),
+        action("Now I need a plan.", "plan", json.dumps({"refined_requirement": "add, subtract and mean helpers with tests"})),
+        action("Write the module.", "codegen", {"plan_step": "Create calculator.py with add, subtract and mean", "filename": "calculator.py"}),
+        action("Write its tests.", "codegen", {"plan_step": "Create tests for calculator.py", "filename": "test_calculator.py"}),
+        action("Validate the project.", "validate", {"project_name": project}),
+        action("Run the tests.", "test", {"project_name": project}),
+        action("Deploy it.", "deploy", "calculator.py"),
+        f"Thought: I now know the final answer\nFinal Answer: Task {index}: calculator.py and its tests were generated, validated, tested and deployed.",
+    ]
+
+
+def scripted_response(messages) -> Tuple[str, str]:
+    """
+    (role, text) for a prompt of the pipeline, recognized by the agent's system prompt.
+    """
+    text = "\n".join(str(m.content) for m in messages)
+    if "Begin!" in text:
+        # Zero-shot ReAct prompt: the number of observations so far is the turn number
+        scratchpad = text.rsplit("Begin!", 1)[1]
+        match = re.search(r"\[project: ([\w.-]+)\]", scratchpad)
+        project = match.group(1) if match else "benchmark"
+        index = int(project.rsplit("-", 1)[-1]) if project.rsplit("-", 1)[-1].isdigit() else 0
+        steps = core_agent_steps(project, index)
+        # Like a real model, use only the tools the prompt offers (the scheduler may skip stages)
+        offered = re.search(r"should be one of \[([^\]]*)\]", text)
+        if offered:
+            tools = {name.strip() for name in offered.group(1).split(",")}
+            steps = [step for step in steps if "\nAction: " not in step or step.split("\nAction: ", 1)[1].split("\n", 1)[0] in tools]
+        turn = scratchpad.count("Observation:")
+        return "core_agent", steps[min(turn, len(steps) - 1)]
+    if "Analysis Agent" in text:
+        return "analyze", json.dumps({
+            "summary": "Arithmetic helpers with unit tests.",
+            "ambiguities": [],
+            "questions": [],
+            "refined_requirement": "Provide add, subtract and mean functions with pytest tests.",
+        })
+    if "Plan Agent" in text:
+        return "plan", json.dumps({
+            "goal": "Arithmetic helpers with tests",
+            "tasks": ["Create calculator.py", "Create test_calculator.py", "Validate", "Test", "Deploy"],
+            "questions": [],
+        })
+    if "Code Generation Agent" in text:
+        match = re.search(r"Target file: (\S+)", text)
+        target = match.group(1) if match else ""
+        return "codegen", TEST_SOURCE if os.path.basename(target).startswith("test_") else MODULE_SOURCE
+    if "DeployAgent" in text:
+        return "deploy", "Deployment successful: calculator.py deployed to the benchmark environment."
+    if "ValidateAgent" in text:
+        return "validate", "Validation passed"
+    return "default", "OK"
+
+
+# Measurements
+
+class DBRoundTrips:
+    """
+    Counts statements sent to the database (one round trip each), except those of
+    threads in ignored_threads (the harness' own).
+    """
+
+    def __init__(self, engine, ignored_threads=("benchmark-confirm",)):
+        from sqlalchemy import event
+
+        self.count = 0
+        self.ignored_threads = set(ignored_threads)
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs):
+        if threading.current_thread().name in self.ignored_threads:
+            return
+        with self._lock:
+            self.count += 1
+
+
+def _auto_confirm(stop: threading.Event, interval: float):
+    """
+    Plays the user: approves every pending confirmation the CoreAgent waits for.
+    """
+    from src.db.models import SessionLocal, UserConfirmation
+
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            pending = db.query(UserConfirmation).filter(UserConfirmation.status == "pending").all()
+            for confirmation in pending:
+                confirmation.status = "approved"
+            if pending:
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Auto-confirm failed: %s", e)
+        finally:
+            db.close()
+        stop.wait(interval)
+
+
+def load_spans(path: str) -> List[dict]:
+    spans = []
+    if not os.path.exists(path):
+        return spans
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    spans.extend(scope.get("spans", []))
+    return spans
+
+
+def _attributes(span: dict) -> dict:
+    return {a["key"]: next(iter(a["value"].values())) for a in span.get("attributes", [])}
+
+
+def stage_of(span: dict) -> Optional[str]:
+    """
+    Stage a span is reported under: the tool name, "llm:<stage>", "db.flush", "core_agent.run" or "task".
+    """
+    name = span["name"]
+    if name.startswith("tool "):
+        return name[len("tool "):]
+    if name.startswith("llm "):
+        return f"llm:{_attributes(span).get('agent.stage', 'unknown')}"
+    if name.startswith("celery ") and name.endswith("run_core_agent_task"):
+        return "task"
+    if name in ("db.flush", "core_agent.run"):
+        return name
+    return None
+
+
+def summarize_spans(spans: List[dict]) -> Tuple[Dict[str, dict], Dict[str, int]]:
+    durations: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    tokens = {"prompt": 0, "completion": 0, "llm_calls": 0}
+    for span in spans:
+        stage = stage_of(span)
+        if stage is None:
+            continue
+        durations[stage].append((int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e9)
+        if span.get("status", {}).get("code") == 2:
+            errors[stage] += 1
+        if span["name"].startswith("llm "):
+            attributes = _attributes(span)
+            tokens["prompt"] += int(attributes.get("llm.prompt_tokens", 0))
+            tokens["completion"] += int(attributes.get("llm.completion_tokens", 0))
+            tokens["llm_calls"] += 1
+
+    stages = {}
+    for stage, values in sorted(durations.items()):
+        array = np.asarray(values)
+        stages[stage] = {
+            "count": len(values),
+            "errors": errors[stage],
+            "mean_s": float(array.mean()),
+            "p50_s": float(np.percentile(array, 50)),
+            "p99_s": float(np.percentile(array, 99)),
+            "total_s": float(array.sum()),
+        }
+    return stages, tokens
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# The run
+
+def run_benchmark(
+    tasks: int = 10,
+    concurrency: int = 1,
+    latency: Optional[Dict[str, str]] = None,
+    latency_scale: float = 1.0,
+    seed: int = 0,
+    mode: str = "script",
+    cassette_path: Optional[str] = None,
+    timeout: float = 600,
+) -> dict:
+    """
+    Runs tasks pipeline executions through a Celery worker with concurrency threads
+    and returns the results document (see write_results()).
+    """
+    from src.agent_factory import langchain_integration
+    from src.db.models import Base, SessionLocal, engine, User, Project
+    from src.orchestrator.orchestrator_service import celery_app, run_core_agent_task
+    from src.utils import tracing
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    if db.get(User, 1) is None:
+        db.add(User(id=1, username="benchmark", password="-", status="active"))
+    project_names = [f"bench-{i}" for i in range(tasks)]
+    for i, name in enumerate(project_names, start=1):
+        if db.get(Project, i) is None:
+            db.add(Project(id=i, user_id=1, project_name=name, description="benchmark project"))
+    db.commit()
+    db.close()
+
+    latency_model = LatencyModel(latency or {"default": "none"}, scale=latency_scale, seed=seed)
+    cassette = Cassette(cassette_path) if cassette_path else None
+
+    def factory(model_name: str, temperature: float = 0, callbacks=None, **kwargs):
+        recorder = None
+        if mode == "record":
+            from langchain_openai import ChatOpenAI
+            recorder = ChatOpenAI(model_name=model_name, temperature=temperature, openai_api_key=os.getenv("OPENAI_API_KEY", ""))
+        return FakeChatModel(model_name=model_name, mode=mode, responder=scripted_response, latency=latency_model,
+                             cassette=cassette, record_model=recorder, callbacks=callbacks)
+
+    langchain_integration.set_llm_factory(factory)
+    round_trips = DBRoundTrips(engine)
+
+    worker = celery_app.Worker(
+        pool="threads" if concurrency > 1 else "solo",
+        concurrency=concurrency,
+        loglevel="WARNING",
+        without_heartbeat=True,
+        without_mingle=True,
+        without_gossip=True,
+    )
+    threading.Thread(target=worker.start, name="benchmark-worker", daemon=True).start()
+    stop = threading.Event()
+    confirmer = threading.Thread(target=_auto_confirm, args=(stop, 0.02), name="benchmark-confirm", daemon=True)
+    confirmer.start()
+
+    trace_path = os.environ.get("TRACE_EXPORT_PATH", tracing.TRACE_EXPORT_PATH)
+    if os.path.exists(trace_path):
+        os.remove(trace_path)
+    round_trips.count = 0
+
+    started = time.perf_counter()
+    pending = []
+    for i, name in enumerate(project_names, start=1):
+        requirement = f"[project: {name}] Create calculator helpers (add, subtract, mean) with pytest tests."
+        with tracing.start_span("benchmark.enqueue", **{"project.name": name}):
+            pending.append(run_core_agent_task.delay(user_id=1, task_id=i, project_id=i, project_name=name, requirement=requirement))
+
+    outputs = []
+    for result in pending:
+        try:
+            outputs.append(result.get(timeout=timeout, disable_sync_subtasks=False))
+        except Exception as e:
+            outputs.append(f"[benchmark] task failed: {e}")
+    wall = time.perf_counter() - started
+
+    stop.set()
+    confirmer.join(timeout=5)
+    worker.stop()
+    langchain_integration.set_llm_factory(None)
+    tracing.flush()
+    if cassette is not None and mode == "record":
+        cassette.save()
+
+    stages, tokens = summarize_spans(load_spans(trace_path))
+    completed = sum(1 for output in outputs if output and "Final Answer:" in output)
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "commit": _git_commit(),
+            "host": socket.gethostname(),
+            "python": platform.python_version(),
+            "tasks": tasks,
+            "concurrency": concurrency,
+            "latency": latency or {"default": "none"},
+            "latency_scale": latency_scale,
+            "seed": seed,
+            "mode": mode,
+            "scheduler": os.environ.get("RL_SCHEDULER", "off"),
+            "cassette": {"path": cassette_path, "hits": cassette.hits, "misses": cassette.misses} if cassette else None,
+        },
+        "tasks": {"total": tasks, "completed": completed, "failed": tasks - completed},
+        "wall_s": wall,
+        "tasks_per_sec": tasks / wall if wall else 0.0,
+        "db": {"round_trips": round_trips.count, "round_trips_per_task": round_trips.count / tasks},
+        "llm": {
+            "calls_per_task": tokens["llm_calls"] / tasks,
+            "prompt_tokens_per_task": tokens["prompt"] / tasks,
+            "completion_tokens_per_task": tokens["completion"] / tasks,
+            "tokens_per_task": (tokens["prompt"] + tokens["completion"]) / tasks,
+        },
+        "stages": stages,
+        "logging": logging_stats(),
+        "failures": [output for output in outputs if not output or "Final Answer:" not in output][:5],
+    }
+
+
+def write_results(results: dict, path: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def compare(baseline: dict, current: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """
+    Regressions of current against baseline beyond tolerance: throughput, per-stage
+    p50/p99, DB round trips and tokens per task. Empty when there are none.
+    """
+    regressions = []
+
+    def worse(label: str, before: float, after: float, higher_is_better: bool = False, min_delta: float = 0.0):
+        if not before:
+            return
+        change = (after - before) / before
+        if (-change if higher_is_better else change) > tolerance and abs(after - before) >= min_delta:
+            regressions.append(f"{label}: {before:.4g} -> {after:.4g} ({change:+.0%})")
+
+    worse("tasks_per_sec", baseline["tasks_per_sec"], current["tasks_per_sec"], higher_is_better=True)
+    worse("db.round_trips_per_task", baseline["db"]["round_trips_per_task"], current["db"]["round_trips_per_task"])
+    worse("llm.tokens_per_task", baseline["llm"]["tokens_per_task"], current["llm"]["tokens_per_task"])
+    if current["tasks"]["failed"] > baseline["tasks"]["failed"]:
+        regressions.append(f"failed tasks: {baseline['tasks']['failed']} -> {current['tasks']['failed']}")
+    for stage, before in baseline["stages"].items():
+        after = current["stages"].get(stage)
+        if after is None:
+            continue
+        worse(f"{stage} p50", before["p50_s"], after["p50_s"], min_delta=MIN_STAGE_DELTA_S)
+        worse(f"{stage} p99", before["p99_s"], after["p99_s"], min_delta=MIN_STAGE_DELTA_S)
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    lines = [
+        f"tasks: {results['tasks']['completed']}/{results['tasks']['total']} completed in {results['wall_s']:.2f}s "
+        f"({results['tasks_per_sec']:.3f} tasks/s, concurrency {results['meta']['concurrency']})",
+        f"db round trips/task: {results['db']['round_trips_per_task']:.1f}   "
+        f"llm calls/task: {results['llm']['calls_per_task']:.1f}   tokens/task: {results['llm']['tokens_per_task']:.0f}",
+        "",
+        f"{'stage':<24} {'count':>6} {'errors':>6} {'p50 ms':>10} {'p99 ms':>10} {'total s':>9}",
+    ]
+    for stage, s in results["stages"].items():
+        lines.append(f"{stage:<24} {s['count']:>6} {s['errors']:>6} {s['p50_s'] * 1000:>10.1f} {s['p99_s'] * 1000:>10.1f} {s['total_s']:>9.2f}")
+    log = results.get("logging")
+    if log:
+        lines.append(f"\nlog records: {log['queued']} queued, {log['dropped']} dropped, {log['sampled_out']} sampled out, "
+                     f"{log['truncated']} truncated; {log['caller_us_per_record']:.1f} us per record in calling threads")
+    for failure in results["failures"]:
+        lines.append(f"failed: {str(failure)[:200]}")
+    return "\n".join(lines)
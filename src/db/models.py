@@ -1,11 +1,13 @@
 # v4coppercoreagent/src/db/models.py
 import os
+import logging
 from sqlalchemy import (
-    create_engine, Column, Integer, String, URL, DateTime, JSON, ForeignKey, Text
+    create_engine, Column, Integer, String, URL, DateTime, JSON, ForeignKey, Text, Float, Index
 )
 from sqlalchemy.sql import func
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 from dotenv import load_dotenv
+from src.utils.tracing import instrument_sqlalchemy
 
 load_dotenv()
 
@@ -18,7 +20,8 @@ MYSQL_HOST = os.getenv("MYSQL_HOST", "127.0.0.1")
 MYSQL_PORT = os.getenv("MYSQL_PORT", "3306")
 MYSQL_DB = os.getenv("MYSQL_DB", "coppercoreagent")
 
-DATABASE_URL = URL.create(
+# A full URL (e.g. sqlite:///./bench.db for offline benchmarks) replaces the MySQL settings
+DATABASE_URL = os.getenv("DATABASE_URL") or URL.create(
     "mysql+pymysql",
     username=MYSQL_USER,
     password=MYSQL_PASSWORD,
@@ -26,10 +29,17 @@ DATABASE_URL = URL.create(
     port=MYSQL_PORT,
     database=MYSQL_DB
 )
-
-print(f"DATABASE_URL {DATABASE_URL}")
-engine = create_engine(DATABASE_URL, echo=True)
+# Log every SQL statement
+SQL_ECHO = os.getenv("SQL_ECHO", "true").lower() == "true"
+
+logger = logging.getLogger(__name__)
+logger.info("DATABASE_URL %s", DATABASE_URL)
+# SQLite connections are shared between Celery's worker threads
+connect_args = {"check_same_thread": False} if str(DATABASE_URL).startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO, connect_args=connect_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Flushes inside a traced request or task are recorded as db.flush spans
+instrument_sqlalchemy(SessionLocal)
 
 # Function to get DB session
 def get_db():
@@ -118,6 +128,64 @@ class UserConfirmation(Base):
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+class UsageRecord(Base):
+    """
+    One LLM call's token usage and estimated cost (the usage ledger, see src/utils/usage_ledger.py).
+    """
+    __tablename__ = "usage_records"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    model = Column(String(100), nullable=False)
+    stage = Column(String(100), nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0.0)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_usage_records_user_created", "user_id", "created_at"),
+        Index("ix_usage_records_project_created", "project_id", "created_at"),
+        Index("ix_usage_records_task", "task_id"),
+    )
+
+class UsageBudget(Base):
+    """
+    Token/cost limit of a user (project_id empty) or a project, per "task", "day" or "month".
+    Overrides the USAGE_* defaults for that scope.
+    """
+    __tablename__ = "usage_budgets"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=True)
+    period = Column(String(10), nullable=False, default="day")
+    max_tokens = Column(Integer, nullable=True)
+    max_cost_usd = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class AgentCheckpoint(Base):
+    """
+    Executor state of a task's core agent: its inputs and the intermediate steps taken so
+    far, saved after every step so the task continues where it stopped (see
+    src/agent_factory/agent_continuation.py).
+    """
+    __tablename__ = "agent_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False, unique=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String(25), nullable=False, default="running")
+    inputs = Column(JSON, nullable=False)
+    steps = Column(JSON, nullable=False)
+    step_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
 # Now Define Relationships After All Tables Have Been Declared
 User.projects = relationship("Project", back_populates="user", cascade="all, delete-orphan")
 User.tasks = relationship("TaskModel", back_populates="user", cascade="all, delete-orphan")
@@ -1,31 +1,129 @@
 import os
+import stat
+import hashlib
+import logging
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Optional
 from dotenv import load_dotenv
-from github import Github
-import base64
+from github import Auth, Github, GithubException, InputGitTreeElement
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
-def push_to_github(project_repo, file_path, code_snippet):
+# Point at a GitHub Enterprise or a local fake server for tests
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+
+MODE_FILE = "100644"
+MODE_EXECUTABLE = "100755"
+MODE_SYMLINK = "120000"
+
+logger = logging.getLogger(__name__)
+
+_repos = {}
+
+@lru_cache(maxsize=1)
+def get_github_client() -> Github:
+    """
+    One authenticated client per process; PyGithub keeps its HTTP session alive across calls.
+    """
     token = os.getenv("GITHUB_TOKEN", "")
-    g = Github(token)
-    repo = g.get_repo(f"{os.getenv("GITHUB_ACCOUNT_USERNAME", "")}/{project_repo}")
-    path = file_path
+    return Github(auth=Auth.Token(token) if token else None, base_url=GITHUB_API_URL)
+
+def get_repo(project_repo: str):
+    account = os.getenv("GITHUB_ACCOUNT_USERNAME", "")
+    full_name = project_repo if "/" in project_repo else f"{account}/{project_repo}"
+    if full_name not in _repos:
+        _repos[full_name] = get_github_client().get_repo(full_name)
+    return _repos[full_name]
+
+def git_blob_sha(data: bytes) -> str:
+    """
+    The SHA git assigns to a blob with this content, computed locally.
+    """
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def git_file_mode(path: str) -> str:
+    """
+    The git tree mode of a working-tree file: symlink, executable or regular file.
+    """
+    st = os.lstat(path)
+    if stat.S_ISLNK(st.st_mode):
+        return MODE_SYMLINK
+    return MODE_EXECUTABLE if st.st_mode & stat.S_IXUSR else MODE_FILE
+
+def push_files(project_repo: str, files: Dict[str, Optional[str]], message: str = "Update generated code",
+               branch: str = "main", modes: Optional[Dict[str, str]] = None) -> dict:
+    """
+    Pushes a whole change set as a single commit using the Git Data API.
+    files maps repository paths to new content, or to None to delete the path.
+    modes gives the git mode of paths that are not regular files (MODE_EXECUTABLE,
+    or MODE_SYMLINK with the link target as content). A path without one keeps the
+    mode it has on the branch; only new paths default to MODE_FILE.
+
+    Paths whose blob SHA and mode already match the branch head are left out, and no commit
+    is made when nothing differs. Independent of the number of files this costs about
+    six API calls: ref, commit, tree, new tree, new commit, ref update.
+    """
+    repo = get_repo(project_repo)
     try:
-        contents = repo.get_contents(path, ref="main")
-        # update existing
-        repo.update_file(
-            path=path,
-            message="Update generated code",
-            content=code_snippet,
-            sha=contents.sha,
-            branch="main"
-        )
-    except:
-        # create new
-        repo.create_file(
-            path=path,
-            message="Add generated code",
-            content=code_snippet,
-            branch="main"
-        )
+        ref = repo.get_git_ref(f"heads/{branch}")
+        base_commit = repo.get_git_commit(ref.object.sha)
+        existing = {e.path: (e.sha, e.mode) for e in repo.get_git_tree(base_commit.tree.sha, recursive=True).tree if e.type == "blob"}
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        ref, base_commit, existing = None, None, {}
+
+    modes = {k.replace("\\", "/").lstrip("/"): v for k, v in (modes or {}).items()}
+    elements, changed = [], []
+    for path, content in files.items():
+        path = path.replace("\\", "/").lstrip("/")
+        if content is None:
+            if path in existing:
+                elements.append(InputGitTreeElement(path=path, mode=existing[path][1], type="blob", sha=None))
+                changed.append(path)
+            continue
+        mode = modes.get(path) or (existing[path][1] if path in existing else MODE_FILE)
+        if existing.get(path) == (git_blob_sha(content.encode("utf-8")), mode):
+            continue
+        elements.append(InputGitTreeElement(path=path, mode=mode, type="blob", content=content))
+        changed.append(path)
+
+    if not elements:
+        logger.info("Nothing to push to %s@%s: %d files already up to date", repo.full_name, branch, len(files))
+        return {"commit": base_commit.sha if base_commit else None, "changed": [], "skipped": len(files)}
+
+    if base_commit:
+        tree = repo.create_git_tree(elements, base_commit.tree)
+        commit = repo.create_git_commit(message, tree, [base_commit])
+        ref.edit(commit.sha)
+    else:
+        tree = repo.create_git_tree(elements)
+        commit = repo.create_git_commit(message, tree, [])
+        repo.create_git_ref(f"refs/heads/{branch}", commit.sha)
+
+    logger.info("Pushed %d files to %s@%s in commit %s", len(changed), repo.full_name, branch, commit.sha)
+    return {"commit": commit.sha, "changed": changed, "skipped": len(files) - len(changed)}
+
+def push_change_set(project_repo: str, change_set, message: str = "Update generated code", branch: str = "main") -> dict:
+    """
+    Pushes the files a workspace write changed (a file_operations.ChangeSet), with
+    the mode each has in the working tree.
+    """
+    from src.utils.file_operations import PROJECTS_ROOT
+
+    project_path = os.path.join(PROJECTS_ROOT, change_set.project_name)
+    files, modes = {}, {}
+    for rel in change_set.added + change_set.modified:
+        full = os.path.join(project_path, rel)
+        modes[rel] = git_file_mode(full)
+        if modes[rel] == MODE_SYMLINK:
+            files[rel] = os.readlink(full)
+        else:
+            with open(full, "r", encoding="utf-8") as f:
+                files[rel] = f.read()
+    files.update({rel: None for rel in change_set.deleted})
+    return push_files(project_repo, files, message=message, branch=branch, modes=modes)
+
+def push_to_github(project_repo, file_path, code_snippet):
+    return push_files(project_repo, {file_path: code_snippet}, message="Update generated code", branch="main")
@@ -0,0 +1,119 @@
+# src/github_integration/push_coalescer.py
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+import redis
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Pushes to the same branch within this window collapse into one validation
+PUSH_DEBOUNCE_SECONDS = float(os.getenv("PUSH_DEBOUNCE_SECONDS", "10"))
+# State of idle branches expires on its own
+PUSH_STATE_TTL = int(os.getenv("PUSH_STATE_TTL", "86400"))
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+def _key(repo: str, branch: str) -> str:
+    return f"webhook:push:{repo}:{branch}"
+
+
+def record_push(repo: str, branch: str, commit_id: str, changed_paths: Optional[Iterable[str]] = None, base_commit: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """
+    Registers a push as the newest for (repo, branch).
+    Returns its generation number and the id of the validation task it supersedes.
+
+    The files changed by every push since the last completed validation are collected,
+    together with the commit the first of those pushes started from. changed_paths None
+    means the push can't be scoped (force push, new branch, too many commits).
+    """
+    key = _key(repo, branch)
+    pipe = get_redis().pipeline()
+    pipe.hincrby(key, "generation", 1)
+    pipe.hget(key, "task_id")
+    pipe.hset(key, "commit", commit_id)
+    if base_commit:
+        pipe.hsetnx(key, "base", base_commit)
+    if changed_paths is None:
+        pipe.hset(key, "full", 1)
+    elif changed_paths:
+        pipe.sadd(f"{key}:paths", *changed_paths)
+    pipe.expire(key, PUSH_STATE_TTL)
+    pipe.expire(f"{key}:paths", PUSH_STATE_TTL)
+    generation, previous_task = pipe.execute()[:2]
+    return int(generation), previous_task.decode() if previous_task else None
+
+
+def pending_changes(repo: str, branch: str) -> Tuple[Optional[str], Optional[List[str]]]:
+    """
+    The base commit and the union of paths changed by the pushes not yet validated.
+    Paths are None when a full run is needed.
+    """
+    key = _key(repo, branch)
+    pipe = get_redis().pipeline()
+    pipe.hmget(key, "base", "full")
+    pipe.smembers(f"{key}:paths")
+    (base, full), paths = pipe.execute()
+    base = base.decode() if base else None
+    if full or base is None:
+        return base, None
+    return base, sorted(p.decode() for p in paths)
+
+
+def clear_pending(repo: str, branch: str, generation: Optional[int]):
+    """
+    Forgets the collected changes once the validation of generation finished,
+    unless a newer push already added to them.
+    """
+    key = _key(repo, branch)
+    client = get_redis()
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(key, f"{key}:paths")
+            if generation is not None and int(pipe.hget(key, "generation") or 0) != generation:
+                return
+            pipe.multi()
+            pipe.hdel(key, "base", "full")
+            pipe.delete(f"{key}:paths")
+            pipe.execute()
+        except redis.WatchError:
+            pass
+
+
+def set_task(repo: str, branch: str, generation: int, task_id: str):
+    """
+    Remembers which task validates a generation, unless a newer push already arrived.
+    """
+    key = _key(repo, branch)
+    client = get_redis()
+    with client.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            if int(pipe.hget(key, "generation") or 0) != generation:
+                return
+            pipe.multi()
+            pipe.hset(key, "task_id", task_id)
+            pipe.execute()
+        except redis.WatchError:
+            pass
+
+
+def is_current(repo: str, branch: str, generation: Optional[int]) -> bool:
+    """
+    False once a newer push to the same branch has been recorded.
+    Tasks not started by the webhook (generation None) are always current.
+    """
+    if generation is None:
+        return True
+    latest = get_redis().hget(_key(repo, branch), "generation")
+    return latest is None or int(latest) == generation
@@ -0,0 +1,259 @@
+# src/github_integration/repo_sync.py
+import os
+import time
+import uuid
+import base64
+import logging
+import shutil
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from filelock import FileLock, Timeout
+from src.utils.workspace_manifest import MANIFEST_DIR
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+MIRRORS_ROOT = os.getenv("REPO_MIRRORS_ROOT", "./../mirrors")
+MIRROR_DISK_BUDGET = int(os.getenv("REPO_MIRROR_DISK_BUDGET_MB", "10240")) * 1024 * 1024
+# "{repo}" is replaced by "owner/name"; use file:///path/{repo}.git for local bare repos
+REPO_URL_TEMPLATE = os.getenv("REPO_URL_TEMPLATE", "https://github.com/{repo}.git")
+GIT_TIMEOUT = int(os.getenv("REPO_SYNC_GIT_TIMEOUT", "600"))
+
+logger = logging.getLogger(__name__)
+
+
+class RepoSyncError(Exception):
+    pass
+
+
+class RepoMirrorManager:
+    """
+    Keeps one bare mirror per repository on local disk.
+
+    - The first sync of a repository clones it; later syncs only fetch the delta, and
+      nothing at all if the requested commit is already present.
+    - Jobs get a throwaway worktree of the mirror at the requested commit, which
+      shares the mirror's object store instead of copying it.
+    - When the mirrors exceed the disk budget, the least recently used mirrors that
+      have no active worktree are deleted. Each mirror's size is measured after a
+      clone or fetch and kept next to it, so eviction does not walk every mirror.
+    """
+
+    def __init__(self, root: str = MIRRORS_ROOT, disk_budget: int = MIRROR_DISK_BUDGET, url_template: str = REPO_URL_TEMPLATE):
+        self.root = os.path.abspath(root)
+        self.mirrors_dir = os.path.join(self.root, "mirrors")
+        self.worktrees_dir = os.path.join(self.root, "worktrees")
+        self.disk_budget = disk_budget
+        self.url_template = url_template
+        os.makedirs(self.mirrors_dir, exist_ok=True)
+        os.makedirs(self.worktrees_dir, exist_ok=True)
+
+    def mirror_path(self, repo: str) -> str:
+        return os.path.join(self.mirrors_dir, repo.replace("/", "__") + ".git")
+
+    def _lock(self, repo: str) -> FileLock:
+        return FileLock(self.mirror_path(repo) + ".lock", timeout=GIT_TIMEOUT)
+
+    def _git_env(self) -> Dict[str, str]:
+        """
+        Passes the GitHub token as an HTTP header through GIT_CONFIG_* variables,
+        so it never lands in the mirror's config or on a command line.
+        """
+        env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+        token = os.getenv("GITHUB_TOKEN", "")
+        if token and self.url_template.startswith("https://"):
+            basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+            env.update({
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "http.extraHeader",
+                "GIT_CONFIG_VALUE_0": f"Authorization: Basic {basic}",
+            })
+        return env
+
+    def _git(self, *args: str, cwd: Optional[str] = None) -> str:
+        result = subprocess.run(
+            ["git", *args], cwd=cwd, env=self._git_env(),
+            capture_output=True, text=True, timeout=GIT_TIMEOUT,
+        )
+        if result.returncode != 0:
+            raise RepoSyncError(f"git {' '.join(args[:2])} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def _has_commit(self, mirror: str, commit: str) -> bool:
+        result = subprocess.run(
+            ["git", "--git-dir", mirror, "cat-file", "-e", f"{commit}^{{commit}}"],
+            capture_output=True,
+        )
+        return result.returncode == 0
+
+    def _touch(self, repo: str):
+        stamp = self.mirror_path(repo) + ".used"
+        with open(stamp, "a"):
+            pass
+        os.utime(stamp, None)
+
+    def _size_path(self, repo: str) -> str:
+        return self.mirror_path(repo) + ".size"
+
+    def _record_size(self, repo: str):
+        """
+        Stores the mirror's size on disk; called under the mirror lock after it changed.
+        """
+        size_path = self._size_path(repo)
+        tmp = f"{size_path}.tmp-{uuid.uuid4().hex[:8]}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(self._disk_usage(self.mirror_path(repo))))
+        os.replace(tmp, size_path)
+
+    def _recorded_size(self, repo: str) -> Optional[int]:
+        try:
+            with open(self._size_path(repo), "r", encoding="utf-8") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def sync(self, repo: str, commit: Optional[str] = None, url: Optional[str] = None) -> str:
+        """
+        Makes sure the mirror of repo exists and contains commit (or the latest
+        branch heads when commit is None). Returns the mirror path.
+        """
+        mirror = self.mirror_path(repo)
+        started = time.time()
+        with self._lock(repo):
+            if not os.path.isdir(mirror):
+                self._git("clone", "--bare", url or self.url_template.format(repo=repo), mirror)
+                self._git("--git-dir", mirror, "config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*")
+                action = "cloned"
+            elif commit and self._has_commit(mirror, commit):
+                action = "up to date"
+            else:
+                self._git("--git-dir", mirror, "fetch", "--prune", "--tags", "origin")
+                action = "fetched"
+            if commit and not self._has_commit(mirror, commit):
+                raise RepoSyncError(f"Commit {commit} not found in {repo}")
+            if action != "up to date" or self._recorded_size(repo) is None:
+                self._record_size(repo)
+            self._touch(repo)
+        logger.info("%s %s in %.2fs", repo, action, time.time() - started)
+        self.evict(keep=repo)
+        return mirror
+
+    def create_worktree(self, repo: str, commit: str) -> str:
+        mirror = self.mirror_path(repo)
+        path = os.path.join(self.worktrees_dir, f"{repo.replace('/', '__')}-{commit[:12]}-{uuid.uuid4().hex[:8]}")
+        with self._lock(repo):
+            self._git("--git-dir", mirror, "worktree", "add", "--detach", path, commit)
+        return path
+
+    def remove_worktree(self, repo: str, path: str):
+        mirror = self.mirror_path(repo)
+        with self._lock(repo):
+            try:
+                self._git("--git-dir", mirror, "worktree", "remove", "--force", path)
+            except RepoSyncError:
+                shutil.rmtree(path, ignore_errors=True)
+                self._git("--git-dir", mirror, "worktree", "prune")
+
+    @contextmanager
+    def checkout(self, repo: str, commit: str, url: Optional[str] = None):
+        """
+        Syncs the mirror and yields a temporary worktree at commit.
+        """
+        self.sync(repo, commit, url=url)
+        path = self.create_worktree(repo, commit)
+        try:
+            yield path
+        finally:
+            self.remove_worktree(repo, path)
+
+    def _state_dir(self, repo: str, branch: str) -> str:
+        name = f"{repo}@{branch}".replace("/", "__")
+        return os.path.join(self.root, "state", name)
+
+    def restore_state(self, repo: str, branch: str, worktree: str) -> Optional[str]:
+        """
+        Copies the workspace state (.coppercore: manifest with import graph, cached
+        validation/test results, coverage) saved by the last validation of this branch
+        into worktree. Returns the commit that state belongs to, or None.
+        """
+        state = self._state_dir(repo, branch)
+        marker = os.path.join(state, "COMMIT")
+        if not os.path.exists(marker):
+            return None
+        shutil.copytree(os.path.join(state, MANIFEST_DIR), os.path.join(worktree, MANIFEST_DIR), dirs_exist_ok=True)
+        with open(marker, "r", encoding="utf-8") as f:
+            return f.read().strip()
+
+    def save_state(self, repo: str, branch: str, worktree: str, commit: str):
+        source = os.path.join(worktree, MANIFEST_DIR)
+        if not os.path.isdir(source):
+            return
+        state = self._state_dir(repo, branch)
+        tmp = state + f".tmp-{uuid.uuid4().hex[:8]}"
+        shutil.copytree(source, os.path.join(tmp, MANIFEST_DIR))
+        with open(os.path.join(tmp, "COMMIT"), "w", encoding="utf-8") as f:
+            f.write(commit)
+        with FileLock(state + ".lock", timeout=GIT_TIMEOUT):
+            shutil.rmtree(state, ignore_errors=True)
+            os.replace(tmp, state)
+
+    def _disk_usage(self, path: str) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Deletes least recently used mirrors until the total size fits the disk budget.
+        Mirrors with active worktrees, locked mirrors and `keep` are never evicted.
+        Sizes come from the size recorded at the last clone or fetch; a mirror without
+        one is measured only if its lock is free (a locked one is being cloned, and its
+        sync records the size).
+        """
+        mirrors = []
+        for name in os.listdir(self.mirrors_dir):
+            if not name.endswith(".git"):
+                continue
+            path = os.path.join(self.mirrors_dir, name)
+            repo = name[:-4].replace("__", "/")
+            size = self._recorded_size(repo)
+            if size is None:
+                try:
+                    with FileLock(path + ".lock", timeout=0):
+                        if os.path.isdir(path):
+                            self._record_size(repo)
+                except Timeout:
+                    continue
+                size = self._recorded_size(repo)
+                if size is None:
+                    continue
+            stamp = path + ".used"
+            last_used = os.path.getmtime(stamp) if os.path.exists(stamp) else 0.0
+            mirrors.append((last_used, repo, path, size))
+
+        total = sum(m[3] for m in mirrors)
+        for last_used, repo, path, size in sorted(mirrors):
+            if total <= self.disk_budget:
+                break
+            worktrees = os.path.join(path, "worktrees")
+            if repo == keep or (os.path.isdir(worktrees) and os.listdir(worktrees)):
+                continue
+            lock = FileLock(path + ".lock", timeout=0)
+            try:
+                with lock:
+                    shutil.rmtree(path, ignore_errors=True)
+                    for sidecar in (path + ".used", path + ".size"):
+                        if os.path.exists(sidecar):
+                            os.remove(sidecar)
+            except Timeout:
+                continue
+            total -= size
+            logger.info("Evicted mirror %s (%d MB)", repo, size // (1024 * 1024))
@@ -1,8 +1,9 @@
 # v4coppercoreagent/src/github_integration/webhook_handler.py
 import os
 import hmac
+import json
 import hashlib
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Request, HTTPException
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -11,11 +12,48 @@ env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 # Optional: read a secret from .env for verifying GitHub signatures
 GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+NULL_COMMIT = "0" * 40
+# GitHub lists at most 20 commits per push payload; beyond that the file lists are incomplete
+MAX_PAYLOAD_COMMITS = 20
+
+def changed_paths_from_payload(payload: dict):
+    """
+    Union of the files added, modified or removed by the commits of a push.
+    None when the payload can't tell (force push, new branch, truncated commit list).
+    """
+    commits = payload.get("commits") or []
+    if payload.get("forced") or payload.get("created") or not commits or len(commits) >= MAX_PAYLOAD_COMMITS:
+        return None
+    paths = set()
+    for commit in commits:
+        for field in ("added", "modified", "removed"):
+            paths.update(commit.get(field) or [])
+    return sorted(paths)
+
+def enqueue_push_validation(repo: str, branch: str, commit_id: str, changed_paths=None, base_commit=None):
+    """
+    Coalesces pushes per (repo, branch): the validation is scheduled after the debounce
+    window and the one queued for an earlier push is revoked. Validations that already
+    started notice they are superseded and stop at their next checkpoint.
+    """
+    from src.orchestrator.orchestrator_service import celery_app, sync_code_and_validate
+    from src.github_integration.push_coalescer import PUSH_DEBOUNCE_SECONDS, record_push, set_task
+
+    generation, previous_task = record_push(repo, branch, commit_id, changed_paths, base_commit)
+    if previous_task:
+        celery_app.control.revoke(previous_task)
+
+    result = sync_code_and_validate.apply_async(
+        kwargs={"repo": repo, "commit_id": commit_id, "branch": branch, "generation": generation},
+        countdown=PUSH_DEBOUNCE_SECONDS,
+    )
+    set_task(repo, branch, generation, result.id)
 
 @router.post("/github-webhook")
-async def github_webhook(request: Request):
+async def github_webhook(request: Request, background_tasks: BackgroundTasks):
     """
     Handle POST requests from GitHub. Typically invoked when a push occurs.
+    The response is sent before anything is queued.
     """
     # 1. Read raw body (for signature checking, if needed)
     body = await request.body()
@@ -26,7 +64,7 @@ async def github_webhook(request: Request):
         if not signature:
             raise HTTPException(status_code=400, detail="Missing X-Hub-Signature-256 header")
 
-        sha_name, received_sig = signature.split("=")
+        sha_name, _, received_sig = signature.partition("=")
         if sha_name != "sha256":
             raise HTTPException(status_code=400, detail="Only sha256 is supported")
 
@@ -37,19 +75,22 @@ async def github_webhook(request: Request):
         if not hmac.compare_digest(received_sig, expected_sig):
             raise HTTPException(status_code=400, detail="Invalid webhook signature")
 
-    # 3. Parse JSON payload
-    payload = await request.json()
+    # 3. Parse the body we already have instead of reading it again
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
     # You can check the event type:
     event_type = request.headers.get("X-GitHub-Event")  # "push", "pull_request", etc.
-    if event_type == "push":
+    if event_type == "push" and not payload.get("deleted") and payload.get("after") != NULL_COMMIT:
         # Extract relevant info from the payload
         repo = payload["repository"]["full_name"]
         commit_id = payload["after"]  # Last commit hash
         branch_ref = payload["ref"]   # e.g. "refs/heads/main"
-
-        # Queue a Celery task for code sync/validation, passing these details
-        from orchestrator.orchestrator_service import sync_code_and_validate
-        sync_code_and_validate.delay(repo=repo, commit_id=commit_id, branch=branch_ref)
+        background_tasks.add_task(
+            enqueue_push_validation, repo, branch_ref, commit_id,
+            changed_paths_from_payload(payload), payload.get("before"),
+        )
 
     return {"status": "Webhook received", "event": event_type}
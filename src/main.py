@@ -1,13 +1,22 @@
 import os
+import logging
 from pathlib import Path
 from dotenv import load_dotenv
 import time
+from typing import Optional
 from sqlalchemy.orm import Session
-from fastapi import FastAPI, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from src.github_integration.webhook_handler import router as github_webhook_router
+from src.routes.profiles import router as profiles_router
+from src.routes.usage import router as usage_router
+from src.routes.analytics import router as analytics_router
 from sqlalchemy.exc import OperationalError
 from src.orchestrator.orchestrator_service import run_core_agent_task
+from src.utils.metrics import render_metrics, collect_all, summarize
+from src.utils import tracing
+from src.utils.profiling import PROFILE_HEADER, requested_mode
+from src.utils.logging_config import configure_logging
 
 from src.db.models import SessionLocal, engine, Base, get_db, TaskModel
 from src.db.tasks import TaskCreate, TaskRead
@@ -16,6 +25,9 @@ from src.db.tasks import TaskCreate, TaskRead
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 MAX_TRIES = 10
 WAIT_SECONDS = 2
 
@@ -25,11 +37,11 @@ def try_connect(engine):
         try:
             connection = engine.connect()
             connection.close()
-            print("Connected to MySQL!")
+            logger.info("Connected to MySQL")
             return
         except OperationalError:
             attempts += 1
-            print(f"Cannot connect, retrying in {WAIT_SECONDS}s... (attempt {attempts}/{MAX_TRIES})")
+            logger.warning("Cannot connect, retrying in %ss (attempt %d/%d)", WAIT_SECONDS, attempts, MAX_TRIES)
             time.sleep(WAIT_SECONDS)
     raise Exception("Could not connect to MySQL after several attempts.")
 
@@ -40,6 +52,26 @@ app = FastAPI(
     version="0.1.0"
 )
 app.include_router(github_webhook_router, prefix="/webhook", tags=["GitHub Webhook"])
+app.include_router(profiles_router, tags=["Profiling"])
+app.include_router(usage_router, tags=["Usage"])
+app.include_router(analytics_router, tags=["Analytics"])
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """
+    Every request runs in a server span (continuing the caller's traceparent, if any);
+    Celery tasks enqueued while handling it join the same trace. The trace id is
+    returned in the X-Trace-Id header.
+    """
+    with tracing.start_span(f"{request.method} {request.url.path}", kind=tracing.KIND_SERVER,
+                            traceparent=request.headers.get(tracing.TRACEPARENT_HEADER),
+                            **{"http.method": request.method, "http.route": request.url.path}) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            span.set_error(f"HTTP {response.status_code}")
+        response.headers["X-Trace-Id"] = span.trace_id
+        return response
 
 try_connect(engine)  # Retries up to 10 times
 # 3) (Optional) Create the database tables if they don't exist
@@ -53,10 +85,25 @@ Base.metadata.create_all(bind=engine)
 def read_root():
     return {"msg": "Hello from v4coppercoreagent!"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus scrape endpoint: stage latencies, LLM calls/tokens/cost and cache
+    hit rates of this process and every live Celery worker.
+    """
+    return render_metrics()
+
+@app.get("/metrics/summary", response_class=JSONResponse)
+def metrics_summary():
+    """
+    The same metrics with p50/p99 per series, for a quick look without Prometheus.
+    """
+    return summarize(collect_all())
+
 @app.post("/tasks", response_model=TaskRead)
 def create_task(task_in: TaskCreate, db: Session = Depends(get_db)):
     # 1) Create the task in DB
-    print("new task process starting..... ")
+    logger.info("Creating task")
     db_task = TaskModel(
         description=task_in.description,
         payload=task_in.payload,
@@ -72,11 +119,16 @@ def create_task(task_in: TaskCreate, db: Session = Depends(get_db)):
     return db_task
 
 @app.post("/new-core-agent-task", response_model=TaskRead)
-async def start_agent(user_id: int, task_id: int, project_id: int, project_name: str, requirement: str, db: Session = Depends(get_db)):
+async def start_agent(user_id: int, task_id: int, project_id: int, project_name: str, requirement: str, profile: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Kick off the entire multi-agent pipeline with a user requirement.
+    profile=cprofile|sample runs the task under that profiler; see /tasks/{task_id}/profiles.
     """
-    print("new core task process starting..... ")
+    logger.info("Starting core agent task", extra={"task_id": task_id, "project_name": project_name})
+    span = tracing.current_span()
+    if span is not None:
+        span.set_attribute("task.id", task_id)
+        span.set_attribute("project.name", project_name)
     db_task = TaskModel(
             user_id=user_id,
             task_id=task_id,
@@ -89,7 +141,10 @@ async def start_agent(user_id: int, task_id: int, project_id: int, project_name:
         db.commit()
         db.refresh(db_task)
 
-        result = run_core_agent_task.delay(user_id=user_id, task_id=task_id, project_id=project_id, project_name=project_name, requirement=requirement)
+        task_kwargs = dict(user_id=user_id, task_id=task_id, project_id=project_id, project_name=project_name, requirement=requirement)
+        profile_mode = requested_mode(profile)
+        headers = {PROFILE_HEADER: profile_mode} if profile_mode else None
+        result = run_core_agent_task.apply_async(kwargs=task_kwargs, headers=headers)
         
         db_task.status = "completed"
         db.commit()
@@ -0,0 +1,222 @@
+# src/memory/embedding_pipeline.py
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+from filelock import FileLock
+import numpy as np
+
+from src.memory.vector_db_client import VECTOR_DB_ROOT
+from src.utils import metrics
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# OpenAI accepts up to 2048 inputs per embeddings request
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "2048"))
+# ... and a bounded number of tokens; roughly 4 characters per token
+EMBEDDING_BATCH_MAX_CHARS = int(os.getenv("EMBEDDING_BATCH_MAX_CHARS", "1000000"))
+EMBEDDING_CACHE_ROOT = os.getenv("EMBEDDING_CACHE_ROOT", os.path.join(VECTOR_DB_ROOT, "embedding_cache"))
+# Query embeddings are kept in memory only, for this many recent queries per pipeline
+QUERY_CACHE_SIZE = int(os.getenv("EMBEDDING_QUERY_CACHE_SIZE", "256"))
+
+HASH_BYTES = 32
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for one model, keyed by the sha256 of the text.
+
+    Vectors are stored as float16 rows in an append-only file (half the size of
+    float32; the rounding is far below what changes a nearest-neighbour ranking), with
+    the matching digests in a parallel file. Appends take a file lock, and rows
+    appended by other processes are picked up on the next lookup. Only rows present in
+    both files count; a writer that died between the two appends leaves extra rows in
+    one of them, which the next writer cuts off before it appends.
+    """
+
+    def __init__(self, model: str, root: str = EMBEDDING_CACHE_ROOT):
+        self.path = os.path.join(os.path.abspath(root), model.replace("/", "__"))
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors_path = os.path.join(self.path, "vectors.f16")
+        self._hashes_path = os.path.join(self.path, "hashes.bin")
+        self._dim_path = os.path.join(self.path, "dim")
+        self._rows: Dict[bytes, int] = {}
+        self._hashes_read = 0
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+    @property
+    def dim(self) -> Optional[int]:
+        try:
+            with open(self._dim_path, "r", encoding="utf-8") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _complete_rows(self) -> int:
+        try:
+            hashes = os.path.getsize(self._hashes_path) // HASH_BYTES
+            vectors = os.path.getsize(self._vectors_path) // (self.dim * 2)
+        except (OSError, TypeError):
+            return 0
+        return min(hashes, vectors)
+
+    def _truncate_partial_rows(self):
+        """
+        Cuts both files back to their complete rows; called under the writer lock.
+        """
+        rows = self._complete_rows()
+        for path, row_bytes in ((self._vectors_path, self.dim * 2), (self._hashes_path, HASH_BYTES)):
+            if os.path.exists(path) and os.path.getsize(path) > rows * row_bytes:
+                os.truncate(path, rows * row_bytes)
+
+    def _refresh(self):
+        size = self._complete_rows() * HASH_BYTES
+        if size <= self._hashes_read:
+            return
+        with open(self._hashes_path, "rb") as f:
+            f.seek(self._hashes_read)
+            data = f.read(size - self._hashes_read)
+        start = self._hashes_read // HASH_BYTES
+        for i in range(len(data) // HASH_BYTES):
+            self._rows.setdefault(data[i * HASH_BYTES:(i + 1) * HASH_BYTES], start + i)
+        self._hashes_read = size
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(size // HASH_BYTES, self.dim))
+
+    def get_many(self, digests: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        with self._lock:
+            self._refresh()
+            found = {d: self._rows[d] for d in digests if d in self._rows}
+            return {d: np.asarray(self._vectors[row], dtype=np.float32) for d, row in found.items()}
+
+    def put_many(self, items: Dict[bytes, np.ndarray]):
+        if not items:
+            return
+        digests = list(items)
+        vectors = np.asarray([items[d] for d in digests], dtype=np.float16)
+        with self._lock, FileLock(os.path.join(self.path, "writer.lock")):
+            if self.dim is None:
+                with open(self._dim_path, "w", encoding="utf-8") as f:
+                    f.write(str(vectors.shape[1]))
+            self._truncate_partial_rows()
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._hashes_path, "ab") as f:
+                f.write(b"".join(digests))
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def make_batches(texts: Sequence[str], batch_size: int = EMBEDDING_BATCH_SIZE, max_chars: int = EMBEDDING_BATCH_MAX_CHARS) -> List[List[str]]:
+    """
+    Splits texts into request-sized batches bounded by count and by total length.
+    """
+    batches, current, chars = [], [], 0
+    for text in texts:
+        if current and (len(current) >= batch_size or chars + len(text) > max_chars):
+            batches.append(current)
+            current, chars = [], 0
+        current.append(text)
+        chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingPipeline:
+    """
+    Embeds texts through a LangChain embeddings object with as few provider calls as
+    possible: identical texts are embedded once, cached texts not at all, and the rest
+    go out in batches of up to EMBEDDING_BATCH_SIZE. Queries are not written to the
+    persistent cache; the last QUERY_CACHE_SIZE of them are kept in memory.
+    """
+
+    def __init__(self, embeddings, model: Optional[str] = None, cache: Optional[EmbeddingCache] = None, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.embeddings = embeddings
+        self.model = model or getattr(embeddings, "model", None) or type(embeddings).__name__
+        self.cache = cache or EmbeddingCache(self.model)
+        self.batch_size = batch_size
+        self.stats = {"texts": 0, "cached": 0, "embedded": 0, "calls": 0}
+        self._queries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        One float32 row per input text, in input order.
+        """
+        digests = [text_hash(t) for t in texts]
+        unique: Dict[bytes, str] = {}
+        for digest, text in zip(digests, texts):
+            unique.setdefault(digest, text)
+
+        vectors = self.cache.get_many(list(unique))
+        missing = [d for d in unique if d not in vectors]
+        computed = {}
+        for batch in make_batches([unique[d] for d in missing], self.batch_size):
+            rows = self.embeddings.embed_documents(batch)
+            self.stats["calls"] += 1
+            for text, row in zip(batch, rows):
+                computed[text_hash(text)] = np.asarray(row, dtype=np.float32)
+        self.cache.put_many(computed)
+        vectors.update(computed)
+
+        self.stats["texts"] += len(texts)
+        self.stats["cached"] += len(unique) - len(missing)
+        self.stats["embedded"] += len(missing)
+        metrics.record_cache("embedding", len(unique) - len(missing), len(missing))
+        if not texts:
+            return np.empty((0, self.cache.dim or 0), dtype=np.float32)
+        return np.stack([vectors[d] for d in digests])
+
+    def embed_query(self, text: str) -> np.ndarray:
+        digest = text_hash(text)
+        with self._queries_lock:
+            if digest in self._queries:
+                self._queries.move_to_end(digest)
+                metrics.record_cache("embedding_query", 1, 0)
+                return self._queries[digest]
+        # A query identical to an indexed text can reuse its stored vector
+        vector = self.cache.get_many([digest]).get(digest)
+        if vector is None:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self.stats["calls"] += 1
+        metrics.record_cache("embedding_query", 0, 1)
+        with self._queries_lock:
+            self._queries[digest] = vector
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+
+# Background indexing runs on one thread per process, so writes stay ordered
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def submit_background(fn, *args, **kwargs) -> Future:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+    future = _executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(_report_failure)
+    return future
+
+
+def _report_failure(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Background indexing failed", exc_info=future.exception())
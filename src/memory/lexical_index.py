@@ -0,0 +1,142 @@
+# src/memory/lexical_index.py
+import re
+import sqlite3
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Set, Tuple
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+# Words too common in code and prose to say anything about a match
+STOPWORDS = {"the", "a", "an", "and", "or", "of", "to", "in", "is", "for", "on", "with", "self", "def", "return", "import", "from"}
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased terms for code and prose. An identifier yields itself and its parts:
+    parseJsonResponse -> parsejsonresponse, parse, json, response;
+    load_user_config -> load_user_config, load, user, config.
+    """
+    terms = []
+    for word in _WORD.findall(text):
+        lowered = word.lower()
+        parts = [p.lower() for chunk in word.split("_") for p in _CAMEL.findall(chunk)]
+        if lowered not in STOPWORDS:
+            terms.append(lowered)
+        if len(parts) > 1:
+            terms.extend(p for p in parts if p not in STOPWORDS and len(p) > 1)
+    return terms
+
+
+def is_lexical_query(query: str) -> bool:
+    """
+    True for queries that name code rather than describe it: identifiers, dotted
+    paths, file names or call expressions with at most three words.
+    """
+    words = query.split()
+    if not words or len(words) > 3:
+        return False
+    return all(re.search(r"[_.()/]|[a-z][A-Z]", w) or len(words) == 1 for w in words)
+
+
+def _fts_term(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over pre-tokenized documents, stored in SQLite FTS5.
+    Document ids are those of the vector store, so results from both sides can be fused.
+
+    It also keeps the (path, content hash) key of every document, so re-indexing a file
+    can be skipped when it is unchanged. A new version of a path retires the old one:
+    its terms are dropped here and its id is listed for the vector side to filter out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as db:
+            db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(terms, project UNINDEXED, tokenize='unicode61 remove_diacritics 0 tokenchars ''_''')"
+            )
+            db.execute("CREATE TABLE IF NOT EXISTS doc_keys(path TEXT NOT NULL, hash TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (path, hash))")
+            db.execute("CREATE TABLE IF NOT EXISTS retired(id INTEGER PRIMARY KEY)")
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def add(self, ids: Sequence[int], texts: Sequence[str], projects: Optional[Sequence[Optional[str]]] = None,
+            keys: Optional[Sequence[Tuple[str, str]]] = None):
+        """
+        Indexes documents; keys gives their (path, hash), path "" for documents without one.
+        """
+        projects = projects or [None] * len(ids)
+        with self._connection() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO docs(rowid, terms, project) VALUES (?, ?, ?)",
+                [(int(i), " ".join(tokenize(text)), project or "") for i, text, project in zip(ids, texts, projects)],
+            )
+            for doc_id, (path, digest) in zip(ids, keys or []):
+                if path:
+                    old = [(row[0],) for row in db.execute("SELECT id FROM doc_keys WHERE path = ? AND hash != ?", (path, digest))]
+                    db.executemany("DELETE FROM docs WHERE rowid = ?", old)
+                    db.executemany("INSERT OR IGNORE INTO retired(id) VALUES (?)", old)
+                    db.execute("DELETE FROM doc_keys WHERE path = ? AND hash != ?", (path, digest))
+                db.execute("INSERT OR REPLACE INTO doc_keys(path, hash, id) VALUES (?, ?, ?)", (path, digest, int(doc_id)))
+
+    def find(self, keys: Sequence[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+        """
+        Ids of the documents already stored under the given (path, hash) keys.
+        """
+        db = self._connection()
+        found = {}
+        for key in dict.fromkeys(keys):
+            row = db.execute("SELECT id FROM doc_keys WHERE path = ? AND hash = ?", key).fetchone()
+            if row is not None:
+                found[key] = row[0]
+        return found
+
+    def retired(self, ids: Sequence[int]) -> Set[int]:
+        """
+        The ids among ids that a newer version of their path has replaced.
+        """
+        ids = [int(i) for i in ids]
+        if not ids:
+            return set()
+        marks = ",".join("?" * len(ids))
+        return {row[0] for row in self._connection().execute(f"SELECT id FROM retired WHERE id IN ({marks})", ids)}
+
+    def search(self, query: str, k: int = 10, project: Optional[str] = None) -> List[Dict]:
+        """
+        Up to k {"id", "score"} best first; any query term may match (OR semantics),
+        documents matching more and rarer terms rank higher.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        sql = "SELECT rowid, -bm25(docs) FROM docs WHERE docs MATCH ?"
+        params: list = [" OR ".join(_fts_term(t) for t in terms)]
+        if project is not None:
+            sql += " AND project = ?"
+            params.append(project)
+        sql += " ORDER BY bm25(docs) LIMIT ?"
+        params.append(k)
+        rows = self._connection().execute(sql, params).fetchall()
+        return [{"id": row_id, "score": score} for row_id, score in rows]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60) -> List[tuple]:
+    """
+    Fuses ranked id lists: each list contributes 1 / (k + rank) per id.
+    Returns [(id, score)] best first.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
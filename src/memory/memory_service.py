@@ -1,14 +1,162 @@
 # memory_service.py
-from langchain.vectorstores import FAISS
-from langchain.embeddings.openai import OpenAIEmbeddings
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence
+from langchain_openai import OpenAIEmbeddings
+from src.memory.vector_db_client import get_sharded_vector_db
+from src.memory.embedding_pipeline import EmbeddingPipeline, submit_background, text_hash
+from src.memory.lexical_index import LexicalIndex, is_lexical_query, reciprocal_rank_fusion
+
+# Source files worth remembering when a whole project is indexed
+INDEXED_EXTENSIONS = {".py", ".md", ".txt", ".toml", ".cfg", ".yaml", ".yml", ".json", ".js", ".ts", ".html", ".css"}
 
 class MemoryService:
-    def __init__(self, api_key):
-        self.embeddings = OpenAIEmbeddings(api_key=api_key)
-        self.store = FAISS(...) # init with blank or some data
+    """
+    Long-term snippet memory backed by the persistent vector store: constructing it
+    opens the existing index instead of rebuilding one. Embeddings go through the
+    batched, cached pipeline; indexing can run in the background.
+
+    Snippets are sharded by their "project" metadata; each shard has its own ANN index
+    and, next to it, a BM25 index. search() fuses both rankings and answers
+    identifier-style queries from the BM25 index alone.
+
+    Snippets are keyed by (project, path, content hash): adding one that is already
+    stored is a no-op, and a new version of a path replaces the previous one in search.
+    """
+    def __init__(self, api_key, index_name: str = "snippets", embeddings=None):
+        self.embeddings = embeddings or OpenAIEmbeddings(api_key=api_key)
+        self.pipeline = EmbeddingPipeline(self.embeddings)
+        self.store = get_sharded_vector_db(index_name)
+        self._lexical: Dict[str, LexicalIndex] = {}
+        self._lexical_lock = threading.Lock()
+
+    def lexical(self, shard_name: str) -> LexicalIndex:
+        with self._lexical_lock:
+            if shard_name not in self._lexical:
+                path = os.path.join(self.store.path, shard_name)
+                os.makedirs(path, exist_ok=True)
+                self._lexical[shard_name] = LexicalIndex(os.path.join(path, "lexical.sqlite"))
+            return self._lexical[shard_name]
+
+    def add_snippets(self, snippets: Sequence[str], metadatas: Optional[Sequence[dict]] = None) -> List[tuple]:
+        """
+        Stores snippets in their project's shard; returns (shard, id) per snippet.
+        Snippets already stored under the same path and content keep their id and are
+        not embedded again.
+        """
+        if not snippets:
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in snippets]
+        keys = [(metadata.get("path") or "", text_hash(text).hex()) for text, metadata in zip(snippets, metadatas)]
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(self.store.shard_name(metadata.get("project")), []).append(i)
+
+        ids: List[tuple] = [None] * len(snippets)
+        new: Dict[str, List[int]] = {}
+        for shard_name, positions in groups.items():
+            stored = self.lexical(shard_name).find([keys[i] for i in positions])
+            first: Dict[tuple, int] = {}
+            for i in positions:
+                if keys[i] in stored:
+                    ids[i] = (shard_name, stored[keys[i]])
+                elif first.setdefault(keys[i], i) == i:
+                    new.setdefault(shard_name, []).append(i)
+
+        added = [i for positions in new.values() for i in positions]
+        vectors = dict(zip(added, self.pipeline.embed([snippets[i] for i in added]))) if added else {}
+        for shard_name, positions in new.items():
+            texts = [snippets[i] for i in positions]
+            stored_metadatas = [{**metadatas[i], "hash": keys[i][1]} for i in positions]
+            shard_ids = self.store.open_shard(shard_name).add([vectors[i] for i in positions], texts, stored_metadatas)
+            self.lexical(shard_name).add(shard_ids, texts, [metadatas[i].get("project") for i in positions], [keys[i] for i in positions])
+            for i, shard_id in zip(positions, shard_ids):
+                ids[i] = (shard_name, shard_id)
+        # Repeats of a snippet within this call share the id of its first occurrence
+        first_ids = {(ids[i][0], keys[i]): ids[i] for i in added}
+        for i, metadata in enumerate(metadatas):
+            if ids[i] is None:
+                ids[i] = first_ids[(self.store.shard_name(metadata.get("project")), keys[i])]
+        return ids
+
+    def add_snippets_async(self, snippets: Sequence[str], metadatas: Optional[Sequence[dict]] = None) -> Future:
+        """
+        Same as add_snippets, off the caller's thread; the returned future holds the ids.
+        """
+        return submit_background(self.add_snippets, list(snippets), list(metadatas) if metadatas else None)
+
+    def add_snippet(self, snippet: str, metadata: Optional[dict] = None) -> tuple:
+        return self.add_snippets([snippet], [metadata or {}])[0]
+
+    def index_project(self, project_path: str, background: bool = True):
+        """
+        Adds every source file of a project, one snippet per file, in batched calls.
+        Snippets are tagged with the project (the directory name) for filtered search.
+        Re-indexing only embeds and stores the files whose content changed.
+        """
+        from src.utils.workspace_manifest import SKIP_DIRS
+
+        snippets, metadatas = [], []
+        for dirpath, dirnames, filenames in os.walk(project_path):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                if os.path.splitext(name)[1] not in INDEXED_EXTENSIONS:
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    with open(full, "r", encoding="utf-8") as f:
+                        content = f.read()
+                except (OSError, UnicodeDecodeError):
+                    continue
+                if content.strip():
+                    snippets.append(content)
+                    metadatas.append({
+                        "project": os.path.basename(os.path.normpath(project_path)),
+                        "path": os.path.relpath(full, project_path).replace(os.sep, "/"),
+                    })
+        if background:
+            return self.add_snippets_async(snippets, metadatas)
+        return self.add_snippets(snippets, metadatas)
+
+    def search(self, query: str, k: int = 4, project: Optional[str] = None, mode: str = "auto") -> List[Dict]:
+        """
+        mode "lexical" uses BM25 only, "vector" embeddings only, "hybrid" fuses both with
+        reciprocal rank fusion. "auto" answers identifier-style queries lexically when
+        there are enough hits, and fuses otherwise. project restricts the search to that
+        project's shard; without it all shards are searched and merged, lexical hits by
+        rank (BM25 scores of different shards are not comparable), fused or vector hits
+        by score.
+        """
+        candidates = max(k * 4, 20)
+        shards = [self.store.shard_name(project)] if project is not None else self.store.shard_names()
+        lexical = {}
+        if mode != "vector":
+            lexical = {name: self.lexical(name).search(query, candidates, project=project) for name in shards}
+        lexical_hits = sum(len(hits) for hits in lexical.values())
 
-    def add_snippet(self, snippet: str):
-        self.store.add_texts([snippet], [some_id])
+        results = []
+        if mode == "lexical" or (mode == "auto" and lexical_hits >= k and is_lexical_query(query)):
+            # BM25 scores depend on each shard's own term statistics, so shards are merged by rank
+            fused = reciprocal_rank_fusion([[(name, hit["id"]) for hit in hits[:k]] for name, hits in lexical.items()])[:k]
+            by_shard: Dict[str, Dict[int, float]] = {}
+            for (name, doc_id), score in fused:
+                by_shard.setdefault(name, {})[doc_id] = score
+            for name, scores in by_shard.items():
+                docs = self.store.open_shard(name).get(list(scores))
+                results.extend({**doc, "score": scores[doc["id"]], "shard": name} for doc in docs)
+            return sorted(results, key=lambda r: -r["score"])[:k]
 
-    def search(self, query: str):
-        return self.store.similarity_search(query)
+        query_vector = self.pipeline.embed_query(query)
+        for name in shards:
+            shard = self.store.open_shard(name)
+            vector = shard.search(query_vector, k=candidates)
+            retired = self.lexical(name).retired([hit["id"] for hit in vector])
+            vector = [hit for hit in vector if hit["id"] not in retired]
+            if mode == "vector":
+                results.extend({**hit, "shard": name} for hit in vector[:k])
+                continue
+            fused = reciprocal_rank_fusion([[hit["id"] for hit in lexical.get(name, [])], [hit["id"] for hit in vector]])[:k]
+            scores = dict(fused)
+            results.extend({**doc, "score": scores[doc["id"]], "shard": name} for doc in shard.get([doc_id for doc_id, _ in fused]))
+        return sorted(results, key=lambda r: -r["score"])[:k]
@@ -0,0 +1,165 @@
+# src/memory/short_term_memory.py
+import os
+import json
+import time
+import logging
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+import redis
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SHORT_TERM_MAX_ENTRIES = int(os.getenv("SHORT_TERM_MAX_ENTRIES", "64"))
+SHORT_TERM_MAX_TOKENS = int(os.getenv("SHORT_TERM_MAX_TOKENS", "8000"))
+# Working context of a running task survives this long without writes ...
+SHORT_TERM_ACTIVE_TTL = int(os.getenv("SHORT_TERM_ACTIVE_TTL", "604800"))
+# ... and this long once the task has completed
+SHORT_TERM_COMPLETED_TTL = int(os.getenv("SHORT_TERM_COMPLETED_TTL", "3600"))
+# Payloads above this size are zlib-compressed
+COMPRESS_THRESHOLD = 512
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def _pack(value) -> bytes:
+    data = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+    if len(data) > COMPRESS_THRESHOLD:
+        return b"z" + zlib.compress(data)
+    return b"j" + data
+
+
+def _unpack(data: bytes):
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]))
+    return json.loads(data[1:])
+
+
+# Appends an entry ("<tokens>:<payload>") and drops the oldest ones until the buffer
+# fits both the entry and the token budget. The newest entry is always kept.
+_APPEND_SCRIPT = """
+local entries, totals = KEYS[1], KEYS[2]
+local tokens = tonumber(ARGV[2])
+redis.call('RPUSH', entries, ARGV[1])
+local total = redis.call('HINCRBY', totals, 'tokens', tokens)
+local evicted = 0
+while redis.call('LLEN', entries) > 1 and
+      (redis.call('LLEN', entries) > tonumber(ARGV[3]) or total > tonumber(ARGV[4])) do
+    local oldest = redis.call('LPOP', entries)
+    local size = tonumber(string.match(oldest, '^(%d+):'))
+    total = redis.call('HINCRBY', totals, 'tokens', -size)
+    evicted = evicted + 1
+end
+redis.call('EXPIRE', entries, ARGV[5])
+redis.call('EXPIRE', totals, ARGV[5])
+return {total, evicted}
+"""
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
+
+
+class ShortTermMemory:
+    """
+    Working context of one in-flight task, shared by every worker through Redis.
+
+    - entries: a ring buffer of recent tool inputs/outputs, bounded by entry count and by
+      tokens; the oldest entries are evicted first.
+    - artifacts: named values (plan, file list, last validation report, ...), latest wins.
+
+    Values are stored as compact JSON, zlib-compressed above COMPRESS_THRESHOLD bytes.
+    A worker resuming the task reads both with load() in a single round trip.
+    """
+
+    def __init__(self, task_id, client: Optional[redis.Redis] = None,
+                 max_entries: int = SHORT_TERM_MAX_ENTRIES, max_tokens: int = SHORT_TERM_MAX_TOKENS):
+        self.task_id = task_id
+        self.client = client or get_redis()
+        self.max_entries = max_entries
+        self.max_tokens = max_tokens
+        prefix = f"stm:task:{task_id}"
+        self.entries_key = f"{prefix}:entries"
+        self.meta_key = f"{prefix}:meta"
+        self.artifacts_key = f"{prefix}:artifacts"
+        self._append = self.client.register_script(_APPEND_SCRIPT)
+
+    def append(self, kind: str, content: str, **fields) -> Dict:
+        """
+        Records one step (kind: "tool_input", "tool_output", "note", ...).
+        Returns {"tokens": buffer total, "evicted": entries dropped}.
+        """
+        tokens = count_tokens(content)
+        entry = {"kind": kind, "content": content, "tokens": tokens, "ts": round(time.time(), 3), **fields}
+        total, evicted = self._append(
+            keys=[self.entries_key, self.meta_key],
+            args=[str(tokens).encode() + b":" + _pack(entry), tokens, self.max_entries, self.max_tokens, SHORT_TERM_ACTIVE_TTL],
+        )
+        if evicted:
+            logger.debug("Evicted %s entries (%s tokens kept)", evicted, total, extra={"task_id": self.task_id})
+        return {"tokens": int(total), "evicted": int(evicted)}
+
+    def set_artifact(self, name: str, value):
+        pipe = self.client.pipeline()
+        pipe.hset(self.artifacts_key, name, _pack(value))
+        pipe.expire(self.artifacts_key, SHORT_TERM_ACTIVE_TTL)
+        pipe.execute()
+
+    def load(self) -> Dict:
+        """
+        {"entries": [...oldest first], "artifacts": {...}, "tokens": int} in one round trip.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lrange(self.entries_key, 0, -1)
+        pipe.hgetall(self.artifacts_key)
+        pipe.hget(self.meta_key, "tokens")
+        raw_entries, raw_artifacts, tokens = pipe.execute()
+        return {
+            "entries": [_unpack(raw.split(b":", 1)[1]) for raw in raw_entries],
+            "artifacts": {name.decode(): _unpack(value) for name, value in raw_artifacts.items()},
+            "tokens": int(tokens or 0),
+        }
+
+    def format_context(self, max_chars: int = 4000) -> str:
+        """
+        The buffered steps as plain text for a prompt, newest kept when it's too long.
+        """
+        context = self.load()
+        lines: List[str] = []
+        for entry in context["entries"]:
+            label = entry["kind"] if not entry.get("tool") else f"{entry['kind']} ({entry['tool']})"
+            lines.append(f"- {label}: {entry['content']}")
+        text = "\n".join(lines)
+        return text[-max_chars:] if len(text) > max_chars else text
+
+    def complete(self, ttl: int = SHORT_TERM_COMPLETED_TTL):
+        """
+        Marks the task finished: its context expires after ttl seconds.
+        """
+        pipe = self.client.pipeline()
+        for key in (self.entries_key, self.meta_key, self.artifacts_key):
+            pipe.expire(key, ttl)
+        pipe.execute()
+
+    def clear(self):
+        self.client.delete(self.entries_key, self.meta_key, self.artifacts_key)
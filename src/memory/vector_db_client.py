@@ -0,0 +1,550 @@
+# src/memory/vector_db_client.py
+import os
+import json
+import mmap
+import logging
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import quote
+from dotenv import load_dotenv
+from filelock import FileLock, Timeout
+import numpy as np
+import faiss
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+VECTOR_DB_ROOT = os.getenv("VECTOR_DB_ROOT", "./../vector_db")
+# Appended rows are kept in a small delta segment until there are this many of them
+COMPACT_ROWS = int(os.getenv("VECTOR_DB_COMPACT_ROWS", "2048"))
+WRITER_LOCK_TIMEOUT = int(os.getenv("VECTOR_DB_WRITER_LOCK_TIMEOUT", "60"))
+# Shards below this many rows use an exact flat index, larger ones an IVF index
+ANN_MIN_ROWS = int(os.getenv("VECTOR_DB_ANN_MIN_ROWS", "20000"))
+# Inverted lists probed per IVF search: the recall/latency trade-off
+NPROBE = int(os.getenv("VECTOR_DB_NPROBE", "16"))
+# IVF centroids are re-trained once a shard has grown this much since the last training
+RETRAIN_GROWTH = float(os.getenv("VECTOR_DB_RETRAIN_GROWTH", "2.0"))
+TRAIN_POINTS_PER_LIST = 64
+
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.jsonl"
+OFFSETS_FILE = "offsets.npy"
+DELTA_VECTORS = "delta.f32"
+DELTA_DOCS = "delta.jsonl"
+VECTORS_FILE = "vectors.f32"
+INDEX_META_FILE = "index.json"
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def ivf_list_count(rows: int) -> int:
+    # About 4*sqrt(n) lists, with enough points per list for k-means to be meaningful
+    return int(max(16, min(65536, 4 * np.sqrt(rows), rows // 39)))
+
+
+def build_index(vectors: np.ndarray, dim: int) -> tuple:
+    """
+    A fresh index over vectors: exact (flat) below ANN_MIN_ROWS rows, IVF with
+    about 4*sqrt(n) lists above, trained on a sample. Returns (index, index meta).
+    """
+    rows = len(vectors)
+    if rows < ANN_MIN_ROWS:
+        index = faiss.IndexFlatIP(dim)
+        meta = {"type": "flat"}
+    else:
+        nlist = ivf_list_count(rows)
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        sample = np.random.default_rng(0).choice(rows, size=min(rows, nlist * TRAIN_POINTS_PER_LIST), replace=False)
+        index.train(np.ascontiguousarray(vectors[np.sort(sample)]))
+        meta = {"type": "ivf", "nlist": nlist, "trained_rows": rows}
+    for start in range(0, rows, 65536):
+        index.add(np.ascontiguousarray(vectors[start:start + 65536]))
+    return index, meta
+
+
+class _Generation:
+    """
+    Read-only view of one on-disk generation: a FAISS index and its documents,
+    both memory-mapped, plus the delta rows appended since the generation was built.
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.index = None
+        self.base_rows = 0
+        self._docs = None
+        self._offsets = None
+        if os.path.exists(os.path.join(path, INDEX_FILE)):
+            # MMAP_IFC also maps the vectors of flat indexes (plain MMAP only maps IVF lists),
+            # so the codes are file-backed pages shared by every process, not a heap copy
+            self.index = faiss.read_index(os.path.join(path, INDEX_FILE), faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+            self.base_rows = self.index.ntotal
+            if isinstance(self.index, faiss.IndexIVF):
+                self.index.nprobe = NPROBE
+            self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+            if self.base_rows:
+                with open(os.path.join(path, DOCS_FILE), "rb") as f:
+                    self._docs = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # The delta files are only ever appended to, so rows already read stay valid
+        self._delta_vectors = open(os.path.join(path, DELTA_VECTORS), "a+b")
+        self._delta_docs = open(os.path.join(path, DELTA_DOCS), "a+b")
+        self._delta_rows = np.empty((0, dim), dtype=np.float32)
+        self._delta_doc_list: List[dict] = []
+        self._delta_doc_pos = 0
+
+    def refresh_delta(self):
+        row_bytes = self.dim * 4
+        rows = os.fstat(self._delta_vectors.fileno()).st_size // row_bytes
+        if rows <= len(self._delta_rows):
+            return
+        self._delta_vectors.seek(len(self._delta_rows) * row_bytes)
+        added = np.frombuffer(self._delta_vectors.read((rows - len(self._delta_rows)) * row_bytes), dtype=np.float32)
+        self._delta_rows = np.vstack([self._delta_rows, added.reshape(-1, self.dim)])
+
+        # Documents are written before their vectors, so the first `rows` lines are complete
+        self._delta_docs.seek(self._delta_doc_pos)
+        while len(self._delta_doc_list) < rows:
+            line = self._delta_docs.readline()
+            if not line.endswith(b"\n"):
+                break
+            self._delta_doc_pos += len(line)
+            self._delta_doc_list.append(json.loads(line))
+
+    @property
+    def delta_count(self) -> int:
+        return min(len(self._delta_rows), len(self._delta_doc_list))
+
+    @property
+    def count(self) -> int:
+        return self.base_rows + self.delta_count
+
+    def document(self, row: int) -> dict:
+        if row >= self.base_rows:
+            return self._delta_doc_list[row - self.base_rows]
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._docs[start:end])
+
+    def search(self, query: np.ndarray, k: int) -> List[tuple]:
+        hits = []
+        if self.index is not None and self.base_rows:
+            scores, rows = self.index.search(query, min(k, self.base_rows))
+            hits.extend((float(s), int(r)) for s, r in zip(scores[0], rows[0]) if r >= 0)
+        delta = self._delta_rows[:self.delta_count]
+        if len(delta):
+            scores = delta @ query[0]
+            top = np.argsort(-scores)[:k]
+            hits.extend((float(scores[i]), self.base_rows + int(i)) for i in top)
+        hits.sort(key=lambda h: -h[0])
+        return hits[:k]
+
+    @property
+    def index_meta(self) -> dict:
+        try:
+            with open(os.path.join(self.path, INDEX_META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"type": "flat"}
+
+    def base_vectors(self) -> np.ndarray:
+        if not self.base_rows:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=np.float32, mode="r").reshape(-1, self.dim)
+
+    def close(self):
+        self._delta_vectors.close()
+        self._delta_docs.close()
+        if self._docs is not None:
+            self._docs.close()
+
+
+class VectorDBClient:
+    """
+    Persistent vector store with one directory per named index under VECTOR_DB_ROOT.
+
+    - Searches open the current generation memory-mapped and read-only, so every worker
+      process shares the same page cache instead of holding its own copy, and opening
+      an index never re-embeds anything.
+    - Appends are serialized through a file lock (one writer at a time across processes)
+      and go to an append-only delta segment that readers pick up without reopening.
+    - Once the delta reaches COMPACT_ROWS rows it is folded into a new generation on a
+      background thread, while appends and searches continue; CURRENT is then switched
+      atomically and readers move over on their next search.
+    - Small indexes are exact (flat); from ANN_MIN_ROWS rows on they are IVF indexes,
+      extended in place on compaction and re-trained from the raw vectors once they
+      have grown by RETRAIN_GROWTH.
+
+    Vectors are L2-normalized, so scores are cosine similarities.
+    """
+
+    def __init__(self, name: str, root: str = VECTOR_DB_ROOT, compact_rows: int = COMPACT_ROWS):
+        self.name = name
+        self.path = os.path.join(os.path.abspath(root), name)
+        self.compact_rows = compact_rows
+        self._generation: Optional[_Generation] = None
+        self._current_stat = None
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    # On-disk state
+
+    def _writer_lock(self) -> FileLock:
+        return FileLock(os.path.join(self.path, "writer.lock"), timeout=WRITER_LOCK_TIMEOUT)
+
+    def _read_meta(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.path, META_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _current_name(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _switch_current(self, generation_name: str):
+        tmp = os.path.join(self.path, CURRENT_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(generation_name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, CURRENT_FILE))
+        _fsync_dir(self.path)
+
+    def _create(self, dim: int):
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "metric": "cosine"}, f)
+        os.makedirs(os.path.join(self.path, "gen-00000000"), exist_ok=True)
+        self._switch_current("gen-00000000")
+
+    def _open(self) -> Optional[_Generation]:
+        """
+        The current generation, reopened only when CURRENT was switched.
+        """
+        try:
+            st = os.stat(os.path.join(self.path, CURRENT_FILE))
+        except OSError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            if self._generation is None or stamp != self._current_stat:
+                meta = self._read_meta()
+                name = self._current_name()
+                if not meta or not name:
+                    return None
+                if self._generation is not None:
+                    self._generation.close()
+                self._generation = _Generation(os.path.join(self.path, name), meta["dim"])
+                self._current_stat = stamp
+            self._generation.refresh_delta()
+            return self._generation
+
+    # Reads
+
+    @property
+    def dim(self) -> Optional[int]:
+        meta = self._read_meta()
+        return meta["dim"] if meta else None
+
+    def count(self) -> int:
+        generation = self._open()
+        return generation.count if generation else 0
+
+    def search(self, vector: Sequence[float], k: int = 4) -> List[Dict]:
+        """
+        The k stored documents most similar to vector, best first, as
+        {"id", "score", "text", "metadata"}.
+        """
+        generation = self._open()
+        if generation is None or not generation.count:
+            return []
+        query = _normalize(vector)
+        if query.shape[1] != generation.dim:
+            raise ValueError(f"Index {self.name} has dimension {generation.dim}, got {query.shape[1]}")
+        return [
+            {"id": row, "score": score, **generation.document(row)}
+            for score, row in generation.search(query, k)
+        ]
+
+    def get(self, ids: Sequence[int]) -> List[Dict]:
+        """
+        Stored documents by id as {"id", "text", "metadata"}; unknown ids are skipped.
+        """
+        generation = self._open()
+        if generation is None:
+            return []
+        return [{"id": int(i), **generation.document(int(i))} for i in ids if 0 <= int(i) < generation.count]
+
+    # Writes
+
+    def add(self, vectors: Sequence[Sequence[float]], texts: Sequence[str], metadatas: Optional[Sequence[dict]] = None) -> List[int]:
+        """
+        Appends vectors with their texts; returns the ids assigned to them.
+        """
+        vectors = _normalize(vectors)
+        if len(vectors) != len(texts):
+            raise ValueError("vectors and texts must have the same length")
+        metadatas = metadatas or [{} for _ in texts]
+
+        with self._writer_lock():
+            meta = self._read_meta()
+            if meta is None:
+                self._create(vectors.shape[1])
+                meta = self._read_meta()
+            if vectors.shape[1] != meta["dim"]:
+                raise ValueError(f"Index {self.name} has dimension {meta['dim']}, got {vectors.shape[1]}")
+
+            generation_path = os.path.join(self.path, self._current_name())
+            start = self._row_count(generation_path, meta["dim"])
+            with open(os.path.join(generation_path, DELTA_DOCS), "ab") as f:
+                for text, metadata in zip(texts, metadatas):
+                    f.write(json.dumps({"text": text, "metadata": metadata}).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            with open(os.path.join(generation_path, DELTA_VECTORS), "ab") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            pending = os.path.getsize(os.path.join(generation_path, DELTA_VECTORS)) // (meta["dim"] * 4)
+        if pending >= self.compact_rows:
+            self.compact(background=True)
+        return list(range(start, start + len(vectors)))
+
+    def _row_count(self, generation_path: str, dim: int) -> int:
+        base = 0
+        offsets = os.path.join(generation_path, OFFSETS_FILE)
+        if os.path.exists(offsets):
+            base = len(np.load(offsets, mmap_mode="r")) - 1
+        delta = os.path.join(generation_path, DELTA_VECTORS)
+        return base + (os.path.getsize(delta) // (dim * 4) if os.path.exists(delta) else 0)
+
+    def compact(self, background: bool = False, rebuild: bool = False):
+        """
+        Folds the delta segment into a new generation; rebuild=True also re-trains the
+        index from all raw vectors. With background=True this runs on the compaction
+        thread and a Future is returned. At most one compaction per index runs at a time
+        across processes; a request arriving during one is dropped.
+        """
+        if background:
+            return _submit_compaction(self._compact, rebuild)
+        return self._compact(rebuild)
+
+    def _compact(self, rebuild: bool = False) -> Optional[str]:
+        lock = FileLock(os.path.join(self.path, "compact.lock"), timeout=0)
+        try:
+            lock.acquire()
+        except Timeout:
+            return None
+        try:
+            meta = self._read_meta()
+            if not meta:
+                return None
+            dim = meta["dim"]
+            current = self._current_name()
+            old = _Generation(os.path.join(self.path, current), dim)
+            try:
+                old.refresh_delta()
+                folded = old.delta_count
+                if not folded and not rebuild:
+                    return None
+                new_name = f"gen-{int(current.split('-')[1]) + 1:08d}"
+                tmp_path = os.path.join(self.path, f".{new_name}.tmp")
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                os.makedirs(tmp_path)
+                index_meta = self._build_generation(old, folded, tmp_path, rebuild)
+
+                # Rows appended while the index was built move to the new generation's delta
+                with self._writer_lock():
+                    old.refresh_delta()
+                    with open(os.path.join(tmp_path, DELTA_DOCS), "wb") as f:
+                        for doc in old._delta_doc_list[folded:old.delta_count]:
+                            f.write(json.dumps(doc).encode("utf-8") + b"\n")
+                    with open(os.path.join(tmp_path, DELTA_VECTORS), "wb") as f:
+                        f.write(old._delta_rows[folded:old.delta_count].tobytes())
+                    os.rename(tmp_path, os.path.join(self.path, new_name))
+                    self._switch_current(new_name)
+            finally:
+                old.close()
+            logger.info("Compacted %s into %s (%d rows, %s)", self.name, new_name, index_meta["rows"], index_meta["type"])
+
+            # Readers still mapping older generations keep their pages after the unlink
+            for entry in os.listdir(self.path):
+                if entry.startswith("gen-") and entry not in (current, new_name):
+                    shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+            return new_name
+        finally:
+            lock.release()
+
+    def _build_generation(self, old: _Generation, folded: int, path: str, rebuild: bool) -> dict:
+        dim = old.dim
+        delta = old._delta_rows[:folded]
+        rows = old.base_rows + folded
+
+        with open(os.path.join(path, VECTORS_FILE), "wb") as f:
+            if old.base_rows:
+                base = old.base_vectors()
+                for start in range(0, old.base_rows, 65536):
+                    f.write(np.ascontiguousarray(base[start:start + 65536]).tobytes())
+            f.write(delta.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        vectors = np.memmap(os.path.join(path, VECTORS_FILE), dtype=np.float32, mode="r").reshape(-1, dim) if rows else delta
+
+        index_meta = old.index_meta
+        growing_ivf = index_meta["type"] == "ivf" and rows <= index_meta.get("trained_rows", 0) * RETRAIN_GROWTH
+        growing_flat = index_meta["type"] == "flat" and rows < ANN_MIN_ROWS
+        if old.index is not None and not rebuild and (growing_ivf or growing_flat):
+            index = faiss.read_index(os.path.join(old.path, INDEX_FILE))
+            index.add(delta)
+        else:
+            index, index_meta = build_index(vectors, dim)
+        faiss.write_index(index, os.path.join(path, INDEX_FILE))
+        index_meta = {**index_meta, "rows": rows}
+        with open(os.path.join(path, INDEX_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(index_meta, f)
+
+        offsets = [0] if old._offsets is None else [int(o) for o in old._offsets]
+        with open(os.path.join(path, DOCS_FILE), "wb") as out:
+            if old._docs is not None:
+                out.write(old._docs[:offsets[-1]])
+            for doc in old._delta_doc_list[:folded]:
+                line = json.dumps(doc).encode("utf-8") + b"\n"
+                out.write(line)
+                offsets.append(offsets[-1] + len(line))
+            out.flush()
+            os.fsync(out.fileno())
+        np.save(os.path.join(path, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+        return index_meta
+
+    def close(self):
+        with self._lock:
+            if self._generation is not None:
+                self._generation.close()
+                self._generation = None
+
+
+class ShardedVectorDB:
+    """
+    A named collection of VectorDBClient shards, one per project (tenant), under
+    VECTOR_DB_ROOT/<name>/<shard>. Searches scoped to a project touch only its shard;
+    unscoped searches fan out over all shards and merge by score.
+    """
+
+    DEFAULT_SHARD = "_shared"
+
+    def __init__(self, name: str, root: str = VECTOR_DB_ROOT):
+        self.name = name
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, name)
+        self._shards: Dict[str, VectorDBClient] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def shard_name(project: Optional[str]) -> str:
+        """
+        Directory name of a project's shard: the project name percent-encoded, so distinct
+        projects never share a shard and no name reaches outside the collection. A leading
+        "_" is encoded as well, which keeps DEFAULT_SHARD out of reach of project names.
+        """
+        if not project:
+            return ShardedVectorDB.DEFAULT_SHARD
+        if project in (".", ".."):
+            raise ValueError(f"Invalid project name for a vector shard: {project!r}")
+        name = quote(project, safe="-_.")
+        return "%5F" + name[1:] if name.startswith("_") else name
+
+    def shard(self, project: Optional[str]) -> VectorDBClient:
+        return self.open_shard(self.shard_name(project))
+
+    def open_shard(self, name: str) -> VectorDBClient:
+        """
+        The shard stored under name, as returned by shard_name() or shard_names().
+        """
+        if name in (".", "..") or "/" in name or os.sep in name:
+            raise ValueError(f"Invalid vector shard name: {name!r}")
+        with self._lock:
+            if name not in self._shards:
+                self._shards[name] = VectorDBClient(f"{self.name}/{name}", root=self.root)
+            return self._shards[name]
+
+    def shard_names(self) -> List[str]:
+        return sorted(d for d in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, d)))
+
+    def search(self, vector: Sequence[float], k: int = 4, project: Optional[str] = None) -> List[Dict]:
+        if project is not None:
+            return [{**hit, "shard": self.shard_name(project)} for hit in self.shard(project).search(vector, k)]
+        hits = []
+        for name in self.shard_names():
+            hits.extend({**hit, "shard": name} for hit in self.open_shard(name).search(vector, k))
+        return sorted(hits, key=lambda h: -h["score"])[:k]
+
+
+# Compactions run on one background thread per process
+_compaction_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _submit_compaction(fn, *args) -> Future:
+    global _compaction_executor
+    with _executor_lock:
+        if _compaction_executor is None:
+            _compaction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-compaction")
+    future = _compaction_executor.submit(fn, *args)
+    future.add_done_callback(_report_compaction_failure)
+    return future
+
+
+def _report_compaction_failure(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Background compaction failed", exc_info=future.exception())
+
+
+_clients: Dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_vector_db(name: str, root: str = VECTOR_DB_ROOT) -> VectorDBClient:
+    """
+    One client per index and process, so all users in a worker share its mappings.
+    """
+    key = (os.path.abspath(root), name)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = VectorDBClient(name, root=root)
+        return _clients[key]
+
+
+def get_sharded_vector_db(name: str, root: str = VECTOR_DB_ROOT) -> ShardedVectorDB:
+    key = (os.path.abspath(root), name, "sharded")
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = ShardedVectorDB(name, root=root)
+        return _clients[key]
@@ -1,12 +1,16 @@
 # v4coppercoreagent/src/orchestrator/orchestrator_service.py
 
 import os
+import logging
 from celery import Celery
+from celery.signals import setup_logging, task_postrun, worker_process_init, worker_process_shutdown, worker_shutdown
 from pathlib import Path
 from src.db.models import SessionLocal, TaskModel
 from src.agent_factory.generator import CodeGeneratorAgent
-from src.agent_factory.core_agent import CoreAgent
+from src.agent_factory.core_agent import CoreAgent, result_status
 from src.utils.log_agent_execution import log_agent_execution
+from src.utils import metrics, profiling, tracing
+from src.utils.logging_config import configure_logging
 from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(dotenv_path=env_path)
@@ -14,11 +18,15 @@ load_dotenv(dotenv_path=env_path)
 # REDIS_URL might come from your .env or fallback to localhost:
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+# Broker and result backend default to Redis; the offline benchmark uses memory://
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+
 # Create the Celery app
 celery_app = Celery(
     "core_agent_orchestrator",
-    broker=REDIS_URL,
-    backend=REDIS_URL,
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND,
     broker_connection_retry_on_startup=True,
 )
 
@@ -32,34 +40,81 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
+logger = logging.getLogger(__name__)
+
+# Workers log through the queue-based pipeline instead of Celery's own handlers
+@setup_logging.connect
+def setup_worker_logging(**kwargs):
+    configure_logging()
+
+# Tasks continue the trace of whoever enqueued them (traceparent message header)
+tracing.instrument_celery()
+# Opt-in profiling: the "profile" message header or PROFILE_SAMPLE_RATE
+profiling.instrument_celery()
+
+# Workers publish their metrics for the API's /metrics endpoint: after tasks (throttled)
+# and from a timer thread, so idle workers stay visible; once more when they stop
+@task_postrun.connect
+def push_metrics_after_task(**kwargs):
+    metrics.push_worker_metrics()
+    metrics.start_metrics_pusher()  # no-op once running; covers pools without worker_process_init
+
+@worker_process_init.connect
+def start_metrics_pusher(**kwargs):
+    metrics.start_metrics_pusher()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def push_metrics_on_shutdown(**kwargs):
+    metrics.stop_metrics_pusher()
+
 # Example: a simple test task
 @celery_app.task
 def add_numbers(x, y):
     return x + y
 
 @celery_app.task
-def sync_code_and_validate(repo: str, commit_id: str, branch: str):
+def sync_code_and_validate(repo: str, commit_id: str, branch: str, generation: int = None):
     """
-    Pull the latest code from GitHub and run validation.
-    For example, run a Docker sandbox or local command to verify tests.
+    Bring the local mirror of the repository up to date with an incremental fetch,
+    check the pushed commit out into a temporary worktree and validate it there.
+    generation comes from the webhook's push coalescer: once a newer push to the same
+    branch is recorded this run stops at its next checkpoint.
+
+    The state of the branch's last validation is restored into the worktree. If it
+    belongs to the commit the pending pushes started from, only the files those pushes
+    changed (and what depends on them) are validated and tested again.
     """
-    # 1. Clone or pull the code locally (for demonstration):
-    #    In real usage, you might do a "git pull" or clone to a temp directory
-    repo_url = f"https://github.com/{repo}.git"
-    print(f"[Celery Task] Syncing {repo_url} at commit {commit_id} (branch {branch})")
-
-    # 2. Pull/Checkout code (pseudo example):
-    #    - Use subprocess or GitPython library
-    #    - Then call the sandbox manager
-    # E.g. subprocess.run(["git", "clone", "--single-branch", "--branch", branch, repo_url, "/tmp/mycode"], check=True)
-
-    # 3. Run sandbox validation
-    # from sandbox_manager.manager import run_sandbox_validation
-    # run_sandbox_validation("/tmp/mycode")
-
-    # 4. Log or return results
-    print(f"[Celery Task] Validation complete for {repo} commit {commit_id}.")
-    return {"repo": repo, "commit": commit_id, "branch": branch, "status": "validated"}
+    from src.github_integration.repo_sync import RepoMirrorManager
+    from src.github_integration.push_coalescer import clear_pending, is_current, pending_changes
+    from src.sandbox_manager.manager import run_sandbox_validation
+
+    superseded = {"repo": repo, "commit": commit_id, "branch": branch, "status": "superseded"}
+    cancelled = lambda: not is_current(repo, branch, generation)
+    if cancelled():
+        logger.info("Skipping %s commit %s: superseded by a newer push", repo, commit_id)
+        return superseded
+
+    base_commit, changed_files = pending_changes(repo, branch) if generation is not None else (None, None)
+    mirrors = RepoMirrorManager()
+    logger.info("Syncing %s at commit %s (branch %s)", repo, commit_id, branch)
+    with mirrors.checkout(repo, commit_id) as worktree:
+        if cancelled():
+            return superseded
+        state_commit = mirrors.restore_state(repo, branch, worktree)
+        if state_commit is None or state_commit != base_commit:
+            changed_files = None
+        result = run_sandbox_validation(worktree, cancelled=cancelled, changed_files=changed_files)
+        if not result.get("cancelled"):
+            mirrors.save_state(repo, branch, worktree, commit_id)
+    if result.get("cancelled"):
+        logger.info("Stopped validating %s commit %s: superseded by a newer push", repo, commit_id)
+        return superseded
+
+    clear_pending(repo, branch, generation)
+    logger.info("Validation complete for %s commit %s (%s scope)", repo, commit_id, result["scope"])
+    status = "validated" if result["validation_passed"] and result.get("tests_status") in ("passed", "no_tests", None) else "failed"
+    return {"repo": repo, "commit": commit_id, "branch": branch, "status": status, **result}
 
 @celery_app.task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 1})
 def run_core_agent_task(self, user_id:int, task_id:int, project_id:int, project_name:str,  requirement: str):
@@ -69,7 +124,7 @@ def run_core_agent_task(self, user_id:int, task_id:int, project_id:int, project_
     task_output = ""
 
     try:
-        print(f"Starting CoreAgent task for User: {user_id}, Project: {project_id} - {project_name}")
+        logger.info("Starting CoreAgent task for user %s, project %s - %s", user_id, project_id, project_name, extra={"task_id": task_id})
 
         existing_task = (
             db.query(TaskModel)
@@ -78,10 +133,9 @@ def run_core_agent_task(self, user_id:int, task_id:int, project_id:int, project_
         )
 
         if existing_task:
-            print(f" Existing Pending Task Found: Task {existing_task.id}, skipping new task creation.")
+            logger.info("Existing pending task %s found, skipping new task creation", existing_task.id, extra={"task_id": existing_task.id})
             task_id = existing_task.id
         else:
-            print(f" No existing task found. Creating new task.")
             new_task = TaskModel(
                 user_id=user_id,
                 project_id=project_id,
@@ -92,19 +146,16 @@ def run_core_agent_task(self, user_id:int, task_id:int, project_id:int, project_
             db.commit()
             db.refresh(new_task)
             task_id = new_task.id
-            print(f" Task Created: {task_id}")
+            logger.info("Task %s created", task_id, extra={"task_id": task_id})
 
         agent = CoreAgent(db=db, user_id=user_id, task_id=task_id, project_id=project_id, project_name=project_name, requirement=requirement)
 
         # Run the Core Agent
         result = agent.run(requirement)
-        print(f"agent result:\n{result}\n")
+        logger.debug("Agent result", extra={"task_id": task_id, "output": result})
 
-        # Determine task status
-        if "Final Answer:" in result:
-            task_status = "completed"
-        elif "Waiting for user input" in result:
-            task_status = "waiting_user_input"
+        # Determine task status: a pause or a budget stop is not a failure
+        task_status = result_status(result)
 
         task_output = result
 
@@ -120,7 +171,7 @@ def run_core_agent_task(self, user_id:int, task_id:int, project_id:int, project_
         )
         db.commit()
     except Exception as e:
-        print(f"\n[ERROR] Core Agent Execution Failed for {project_name}: {e}\n")
+        logger.exception("Core agent execution failed for %s: %s", project_name, e, extra={"task_id": task_id})
         task_status = "failed"
         task_output = str(e)
     finally:
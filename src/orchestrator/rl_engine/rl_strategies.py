@@ -0,0 +1,428 @@
+# src/orchestrator/rl_engine/rl_strategies.py
+import os
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# "on" applies the learned schedule, "shadow" only logs it, "off" disables the scheduler.
+# Shadow by default: the reward only sees completion and cost, so a schedule is not applied unasked
+RL_SCHEDULER = os.getenv("RL_SCHEDULER", "shadow").lower()
+# Probability of a random arm at each decision, so every alternative keeps being tried
+RL_EXPLORATION = float(os.getenv("RL_EXPLORATION", "0.05"))
+# An arm is only exploited once it has been observed this many times
+RL_MIN_PULLS = int(os.getenv("RL_MIN_PULLS", "10"))
+# Episodes (most recent first) the policy is fitted on, and how often it is refitted
+RL_HISTORY_LIMIT = int(os.getenv("RL_HISTORY_LIMIT", "2000"))
+RL_REFRESH_SECONDS = float(os.getenv("RL_REFRESH_SECONDS", "600"))
+# Reward of a completed task: 1 minus these weights times its tokens/seconds relative to the references
+RL_TOKEN_WEIGHT = float(os.getenv("RL_TOKEN_WEIGHT", "0.5"))
+RL_TIME_WEIGHT = float(os.getenv("RL_TIME_WEIGHT", "0.25"))
+RL_REFERENCE_TOKENS = float(os.getenv("RL_REFERENCE_TOKENS", "50000"))
+RL_REFERENCE_SECONDS = float(os.getenv("RL_REFERENCE_SECONDS", "600"))
+
+# Model tiers a stage can be given; "default" keeps the model the tool asks for
+MODEL_TIERS = {"small": "gpt-4o-mini", "large": "gpt-4o"}
+MODEL_TIERS.update(json.loads(os.getenv("RL_MODEL_TIERS_JSON", "{}")))
+DEFAULT_ARM = "default"
+
+# Stages in their canonical order (the core agent prompt's analyze -> plan -> codegen -> ...)
+STAGES = ("analyze", "plan", "codegen", "validate", "test", "deploy")
+MODEL_STAGES = ("core_agent", "analyze", "plan", "codegen", "validate", "deploy")
+# Stages that always run: the reward has no quality signal, so skipping the ones that check
+# the generated code would only ever look cheaper
+REQUIRED_STAGES = ("codegen", "validate", "test")
+# Stages the scheduler may drop
+SKIPPABLE_STAGES = tuple(
+    s.strip() for s in os.getenv("RL_SKIPPABLE_STAGES", "analyze,plan").split(",")
+    if s.strip() and s.strip() not in REQUIRED_STAGES
+)
+START, FINISH = "start", "finish"
+
+# TaskLog entries written by the scheduler (one per CoreAgent run)
+SCHEDULER_AGENT_NAME = "Scheduler"
+
+logger = logging.getLogger(__name__)
+
+_active_schedule = contextvars.ContextVar("active_schedule", default=None)
+
+
+def reward(completed: bool, tokens: int, seconds: float) -> float:
+    """
+    Completion per token and per second, in [0, 1]: 0 for an unfinished task, else 1 minus
+    the weighted share of the reference tokens and seconds it used.
+    """
+    if not completed:
+        return 0.0
+    penalty = RL_TOKEN_WEIGHT * min(1.0, tokens / RL_REFERENCE_TOKENS) + RL_TIME_WEIGHT * min(1.0, seconds / RL_REFERENCE_SECONDS)
+    return max(0.0, 1.0 - penalty)
+
+
+def model_arm(model: Optional[str]) -> str:
+    for arm, name in MODEL_TIERS.items():
+        if model == name:
+            return arm
+    return DEFAULT_ARM
+
+
+def decision_points() -> Dict[str, List[str]]:
+    """
+    Every decision the scheduler makes, with its arms: the model tier of each stage
+    that calls an LLM and whether to run each skippable stage. (Stage order is a
+    separate, observational estimate, see SchedulerPolicy.order().)
+    """
+    points = {f"model:{stage}": [DEFAULT_ARM] + list(MODEL_TIERS) for stage in MODEL_STAGES}
+    points.update({f"skip:{stage}": ["run", "skip"] for stage in SKIPPABLE_STAGES})
+    return points
+
+
+def episode_decisions(episode: dict) -> Dict[str, str]:
+    """
+    The arm an episode took at each decision point: the scheduler's own decisions when it
+    applied them, else inferred from what ran (model points only for stages that ran).
+    """
+    if episode.get("mode") == "on" and episode.get("arms"):
+        return dict(episode["arms"])
+    models = episode.get("models") or {}
+    decisions = {f"model:{stage}": model_arm(models[stage]) for stage in MODEL_STAGES if stage in models}
+    sequence = episode.get("sequence") or []
+    decisions.update({f"skip:{stage}": "run" if stage in sequence else "skip" for stage in SKIPPABLE_STAGES})
+    return decisions
+
+
+class Schedule:
+    """
+    The scheduler's decision for one task: model per stage, skipped stages and a
+    suggested stage order, with the probability each decision had (for offline evaluation).
+    """
+
+    def __init__(self, arms: Dict[str, str], propensities: Dict[str, float], order: List[str], mode: str = RL_SCHEDULER):
+        self.arms = arms
+        self.propensities = propensities
+        self.order = order
+        self.mode = mode
+
+    @property
+    def applied(self) -> bool:
+        return self.mode == "on"
+
+    @property
+    def skip(self) -> List[str]:
+        return [stage for stage in SKIPPABLE_STAGES if self.arms.get(f"skip:{stage}") == "skip"] if self.applied else []
+
+    def model_for(self, stage: str, requested: str) -> str:
+        arm = self.arms.get(f"model:{stage}", DEFAULT_ARM)
+        if not self.applied or arm == DEFAULT_ARM:
+            return requested
+        return MODEL_TIERS.get(arm, requested)
+
+    def hint(self) -> str:
+        """
+        Guidance appended to the requirement; empty unless the schedule is applied.
+        """
+        if not self.applied:
+            return ""
+        order = [stage for stage in self.order if stage not in self.skip]
+        lines = [f"Suggested stage order (from earlier tasks): {' -> '.join(order)}."]
+        if self.skip:
+            lines.append(f"Skip these stages, their tools are not available: {', '.join(self.skip)}.")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        return {"mode": self.mode, "arms": self.arms, "propensities": self.propensities, "order": self.order}
+
+
+class SchedulerPolicy:
+    """
+    Epsilon-greedy bandit over the decision points, fitted on logged episodes.
+    The value of an arm is the posterior mean of its reward (Beta(1, 1) prior);
+    arms seen fewer than RL_MIN_PULLS times are never exploited, so with little
+    history the policy keeps the defaults and only explores.
+    """
+
+    def __init__(self):
+        # point -> arm -> [pulls, reward sum]
+        self.stats: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        # previous stage -> next stage -> [transitions, reward sum]
+        self.transitions: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+        self.episodes = 0
+
+    @classmethod
+    def fit(cls, episodes: List[dict]) -> "SchedulerPolicy":
+        policy = cls()
+        for episode in episodes:
+            r = episode["reward"]
+            for point, arm in episode_decisions(episode).items():
+                entry = policy.stats[point][arm]
+                entry[0] += 1
+                entry[1] += r
+            path = [START] + [s for s in episode.get("sequence") or [] if s in STAGES] + [FINISH]
+            for previous, following in zip(path, path[1:]):
+                if previous != following:
+                    entry = policy.transitions[previous][following]
+                    entry[0] += 1
+                    entry[1] += r
+            policy.episodes += 1
+        return policy
+
+    @staticmethod
+    def _value(entry) -> Optional[float]:
+        pulls, total = entry
+        return (1 + total) / (2 + pulls) if pulls >= RL_MIN_PULLS else None
+
+    def value(self, point: str, arm: str) -> Optional[float]:
+        return self._value(self.stats[point][arm]) if point in self.stats and arm in self.stats[point] else None
+
+    def greedy(self, point: str, arms: List[str]) -> str:
+        default = arms[0]
+        default_value = self.value(point, default)
+        if default_value is None:
+            return default
+        best, best_value = default, default_value
+        for arm in arms[1:]:
+            value = self.value(point, arm)
+            if value is not None and value > best_value:
+                best, best_value = arm, value
+        return best
+
+    def order(self, skip: List[str] = ()) -> List[str]:
+        """
+        Stage order by the best-rewarded observed transition from each stage, falling
+        back to the canonical order where transitions are too rare to judge.
+        """
+        remaining = [stage for stage in STAGES if stage not in skip]
+        order, current = [], START
+        while remaining:
+            candidates = self.transitions.get(current, {})
+            scored = [(self._value(candidates[s]), s) for s in remaining if s in candidates]
+            scored = [(v, s) for v, s in scored if v is not None]
+            following = max(scored)[1] if scored else remaining[0]
+            order.append(following)
+            remaining.remove(following)
+            current = following
+        return order
+
+    def decide(self, rng: Optional[random.Random] = None, exploration: float = RL_EXPLORATION, mode: str = RL_SCHEDULER) -> Schedule:
+        rng = rng or random
+        arms, propensities = {}, {}
+        for point, options in decision_points().items():
+            greedy = self.greedy(point, options)
+            chosen = rng.choice(options) if rng.random() < exploration else greedy
+            arms[point] = chosen
+            propensities[point] = round((1 - exploration) * (chosen == greedy) + exploration / len(options), 6)
+        skip = [stage for stage in SKIPPABLE_STAGES if arms[f"skip:{stage}"] == "skip"]
+        return Schedule(arms, propensities, self.order(skip), mode)
+
+
+# Episodes from the task logs
+
+def load_episodes(db, limit: int = RL_HISTORY_LIMIT) -> List[dict]:
+    """
+    Finished CoreAgent runs, oldest first. Runs recorded by the scheduler carry their
+    decisions; older tasks are rebuilt from their final CoreAgent log and usage ledger
+    rows (stages in the order of their first LLM call, no propensities).
+    """
+    from src.db.models import TaskLog, UsageRecord
+
+    episodes, seen = [], set()
+    rows = (
+        db.query(TaskLog)
+        .filter(TaskLog.agent_name == SCHEDULER_AGENT_NAME)
+        .order_by(TaskLog.id.desc())
+        .limit(limit)
+        .all()
+    )
+    for row in rows:
+        try:
+            episode = json.loads(row.output or "{}")
+        except ValueError:
+            continue
+        episode.update(task_id=row.task_id, logged_at=str(row.created_at))
+        episode["reward"] = reward(episode.get("outcome") == "completed", episode.get("tokens", 0), episode.get("seconds", 0.0))
+        episodes.append(episode)
+        seen.add(row.task_id)
+
+    finals = (
+        db.query(TaskLog)
+        .filter(TaskLog.agent_name == "CoreAgent", TaskLog.status.in_(("completed", "failed", "budget_exceeded")))
+        .order_by(TaskLog.id.desc())
+        .limit(limit)
+        .all()
+    )
+    legacy = {}
+    for row in finals:
+        if row.task_id not in seen and row.task_id not in legacy:
+            legacy[row.task_id] = row
+    if legacy:
+        usage = defaultdict(list)
+        for record in db.query(UsageRecord).filter(UsageRecord.task_id.in_(list(legacy))).order_by(UsageRecord.id):
+            usage[record.task_id].append(record)
+        for task_id, row in legacy.items():
+            records = usage.get(task_id)
+            if not records:
+                continue
+            sequence, models = [], {}
+            for record in records:
+                models.setdefault(record.stage, record.model)
+                if record.stage in STAGES and record.stage not in sequence:
+                    sequence.append(record.stage)
+            tokens = sum(r.prompt_tokens + r.completion_tokens for r in records)
+            seconds = (row.created_at - records[0].created_at).total_seconds() if row.created_at and records[0].created_at else 0.0
+            outcome = "completed" if row.status == "completed" else row.status
+            episodes.append({
+                "task_id": task_id, "logged_at": str(row.created_at), "outcome": outcome, "models": models,
+                "sequence": sequence, "tokens": tokens, "seconds": max(0.0, seconds), "llm_calls": len(records),
+                "reward": reward(outcome == "completed", tokens, max(0.0, seconds)),
+            })
+    episodes.sort(key=lambda e: e["logged_at"])
+    return episodes[-limit:]
+
+
+_policy: Optional[SchedulerPolicy] = None
+_fitted_at = 0.0
+_policy_lock = threading.Lock()
+
+
+def get_policy() -> SchedulerPolicy:
+    """
+    The policy fitted on recent episodes, refitted every RL_REFRESH_SECONDS.
+    """
+    global _policy, _fitted_at
+    with _policy_lock:
+        if _policy is not None and time.monotonic() - _fitted_at < RL_REFRESH_SECONDS:
+            return _policy
+        from src.db.models import SessionLocal
+
+        db = SessionLocal()
+        try:
+            _policy = SchedulerPolicy.fit(load_episodes(db))
+        except Exception as e:
+            logger.warning("Could not fit the scheduler policy, using defaults: %s", e)
+            _policy = _policy or SchedulerPolicy()
+        finally:
+            db.close()
+        _fitted_at = time.monotonic()
+        return _policy
+
+
+def choose_schedule() -> Optional[Schedule]:
+    if RL_SCHEDULER not in ("on", "shadow"):
+        return None
+    return get_policy().decide()
+
+
+def activate(schedule: Optional[Schedule]):
+    return _active_schedule.set(schedule)
+
+
+def deactivate(token):
+    _active_schedule.reset(token)
+
+
+def model_override(stage: Optional[str], requested: str) -> str:
+    """
+    The model the running task's schedule gives the stage, or requested.
+    """
+    schedule = _active_schedule.get()
+    if schedule is None or stage is None:
+        return requested
+    return schedule.model_for(stage, requested)
+
+
+def record_episode(db, user_id: int, project_id: int, project_name: str, task_id: int, schedule: Schedule,
+                   tracker, ledger, outcome: str, seconds: float):
+    """
+    Logs a finished run (decisions, stages called, cost, outcome) as a "Scheduler" task log entry.
+    """
+    from src.utils.log_agent_execution import log_agent_execution
+
+    episode = {
+        **schedule.to_dict(),
+        "outcome": outcome,
+        "sequence": list(tracker.sequence),
+        "models": dict(tracker.models),
+        "llm_calls": tracker.llm["calls"],
+        "tokens": ledger.tokens if ledger is not None else tracker.llm["prompt_tokens"] + tracker.llm["completion_tokens"],
+        "seconds": round(seconds, 3),
+    }
+    log_agent_execution(
+        db=db,
+        user_id=user_id,
+        project_id=project_id,
+        project_name=project_name,
+        task_id=task_id,
+        agent_name=SCHEDULER_AGENT_NAME,
+        status=outcome,
+        output=json.dumps(episode),
+    )
+
+
+# Offline evaluation
+
+def _summary(episodes: List[dict]) -> dict:
+    completed = [e for e in episodes if e.get("outcome") == "completed"]
+    return {
+        "episodes": len(episodes),
+        "completion_rate": round(len(completed) / len(episodes), 4) if episodes else None,
+        "mean_reward": round(sum(e["reward"] for e in episodes) / len(episodes), 4) if episodes else None,
+        "llm_calls_per_completed": round(sum(e.get("llm_calls", 0) for e in episodes) / len(completed), 2) if completed else None,
+        "tokens_per_completed": round(sum(e.get("tokens", 0) for e in episodes) / len(completed), 1) if completed else None,
+        "seconds_per_completed": round(sum(e.get("seconds", 0.0) for e in episodes) / len(completed), 2) if completed else None,
+    }
+
+
+def evaluate(episodes: List[dict], train_fraction: float = 0.7) -> dict:
+    """
+    Fits the policy on the oldest train_fraction of the episodes and estimates its value
+    on the rest. Per decision point: inverse propensity scoring where the logged decision
+    has a propensity, otherwise replay (the mean reward of the episodes whose logged
+    decision matches the policy's). Overall: the logged metrics of all held-out episodes
+    against those whose every decision matches the greedy policy.
+    """
+    split = int(len(episodes) * train_fraction)
+    train, test = episodes[:split], episodes[split:]
+    policy = SchedulerPolicy.fit(train)
+    greedy = {point: policy.greedy(point, arms) for point, arms in decision_points().items()}
+
+    points = {}
+    for point, arms in decision_points().items():
+        ips, matched = [], []
+        for episode in test:
+            logged = episode_decisions(episode).get(point)
+            if logged is None:
+                continue
+            propensity = (episode.get("propensities") or {}).get(point)
+            if logged == greedy[point]:
+                matched.append(episode["reward"])
+                if propensity:
+                    ips.append(episode["reward"] / propensity)
+            elif propensity:
+                ips.append(0.0)
+        logged_mean = sum(e["reward"] for e in test) / len(test) if test else None
+        estimate = sum(ips) / len(ips) if ips else (sum(matched) / len(matched) if matched else None)
+        points[point] = {
+            "policy_arm": greedy[point],
+            "matched": len(matched),
+            "estimator": "ips" if ips else "replay",
+            "policy_value": round(estimate, 4) if estimate is not None else None,
+            "logged_value": round(logged_mean, 4) if logged_mean is not None else None,
+        }
+
+    consistent = [e for e in test if all(greedy[p] == a for p, a in episode_decisions(e).items())]
+    return {
+        "train_episodes": len(train),
+        "test_episodes": len(test),
+        "policy": {"arms": greedy, "order": policy.order([s for s in SKIPPABLE_STAGES if greedy[f"skip:{s}"] == "skip"])},
+        "decision_points": points,
+        "logged": _summary(test),
+        "policy_consistent": _summary(consistent),
+    }
@@ -0,0 +1,23 @@
+# src/routes/analytics.py
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from src.analytics.reports import cached_report
+
+router = APIRouter()
+
+def _parse_time(name: str, value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date or datetime")
+
+@router.get("/analytics/report")
+def get_analytics_report(since: Optional[str] = None, until: Optional[str] = None):
+    """
+    Stage success rates, retries, latency percentiles, task outcomes and token usage over
+    the task logs of [since, until) (all history when omitted). Cached for ANALYTICS_CACHE_SECONDS.
+    """
+    return cached_report(since=_parse_time("since", since), until=_parse_time("until", until))
@@ -0,0 +1,51 @@
+# src/routes/profiles.py
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from src.db.models import get_db, TaskLog
+from src.utils.profiling import artifact_path, load_summary
+
+router = APIRouter()
+
+@router.get("/tasks/{task_id}/profiles")
+def list_task_profiles(task_id: int, db: Session = Depends(get_db)):
+    """
+    Profiles recorded for a task (newest first), as linked from its task logs.
+    """
+    logs = (
+        db.query(TaskLog)
+        .filter(TaskLog.task_id == task_id, TaskLog.agent_name == "Profiler")
+        .order_by(TaskLog.id.desc())
+        .all()
+    )
+    profiles = []
+    for log in logs:
+        try:
+            entry = json.loads(log.output or "{}")
+        except ValueError:
+            continue
+        entry["download_url"] = f"/profiles/{entry.get('profile_id')}/download"
+        profiles.append(entry)
+    return {"task_id": task_id, "profiles": profiles}
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """
+    Metadata and top functions of a profile.
+    """
+    summary = load_summary(profile_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return summary
+
+@router.get("/profiles/{profile_id}/download")
+def download_profile(profile_id: str):
+    """
+    The raw artifact: a pstats .prof file (cProfile) or collapsed stacks (sampler).
+    """
+    summary = load_summary(profile_id)
+    path = artifact_path(profile_id, summary["artifact"]) if summary else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=summary["artifact"], media_type="application/octet-stream")
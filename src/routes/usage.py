@@ -0,0 +1,74 @@
+# src/routes/usage.py
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from src.db.models import get_db, UsageBudget
+from src.utils.usage_ledger import PERIODS, budget_status, load_budgets, period_start, spend, usage_report
+
+router = APIRouter()
+
+@router.get("/usage")
+def get_usage(user_id: Optional[int] = None, project_id: Optional[int] = None, task_id: Optional[int] = None,
+              period: str = "day", db: Session = Depends(get_db)):
+    """
+    Tokens and estimated cost from the usage ledger, by model and stage.
+    period: "day" or "month" (since its start, UTC) or "all".
+    """
+    if period not in ("day", "month", "all"):
+        raise HTTPException(status_code=400, detail="period must be day, month or all")
+    since = period_start(period)
+    report = usage_report(db, user_id=user_id, project_id=project_id, task_id=task_id, since=since)
+    return {"user_id": user_id, "project_id": project_id, "task_id": task_id, "period": period,
+            "since": since.isoformat() if since else None, **report}
+
+@router.get("/usage/budgets")
+def get_budgets(user_id: int, project_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    The budgets a new task of this user (and project) runs under, with what is used of them.
+    Task budgets report the limit only; their spend starts with each task.
+    """
+    budgets = []
+    for budget in load_budgets(db, user_id, project_id):
+        entry = dict(budget)
+        if budget["scope"] == "user":
+            entry["used_tokens"], entry["used_cost_usd"] = spend(db, user_id=user_id, since=period_start(budget["period"]))
+        elif budget["scope"] == "project" and project_id is not None and budget["period"] != "task":
+            entry["used_tokens"], entry["used_cost_usd"] = spend(db, project_id=project_id, since=period_start(budget["period"]))
+        if "used_tokens" in entry:
+            entry["status"], fraction = budget_status(entry["used_tokens"], entry["used_cost_usd"], budget)
+            entry["used_fraction"] = round(fraction, 4)
+        budgets.append(entry)
+    return {"user_id": user_id, "project_id": project_id, "budgets": budgets}
+
+@router.put("/usage/budgets")
+def set_budget(user_id: int, period: str = "day", project_id: Optional[int] = None, max_tokens: Optional[int] = None,
+               max_cost_usd: Optional[float] = None, db: Session = Depends(get_db)):
+    """
+    Sets the budget of a user (without project_id) or a project for a period ("task", "day", "month").
+    Limits left empty are unlimited; a budget overrides the USAGE_* default of its scope and period.
+    """
+    if period not in PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(PERIODS)}")
+    budget = (
+        db.query(UsageBudget)
+        .filter(UsageBudget.user_id == user_id, UsageBudget.project_id == project_id, UsageBudget.period == period)
+        .first()
+    )
+    if budget is None:
+        budget = UsageBudget(user_id=user_id, project_id=project_id, period=period)
+        db.add(budget)
+    budget.max_tokens = max_tokens
+    budget.max_cost_usd = max_cost_usd
+    db.commit()
+    db.refresh(budget)
+    return {"id": budget.id, "user_id": user_id, "project_id": project_id, "period": period,
+            "max_tokens": max_tokens, "max_cost_usd": max_cost_usd}
+
+@router.delete("/usage/budgets/{budget_id}")
+def delete_budget(budget_id: int, db: Session = Depends(get_db)):
+    budget = db.get(UsageBudget, budget_id)
+    if budget is None:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    db.delete(budget)
+    db.commit()
+    return {"deleted": budget_id}
@@ -0,0 +1,352 @@
+# src/sandbox_manager/coverage_report.py
+import os
+import re
+import logging
+import sqlite3
+import difflib
+from typing import Collection, Dict, Iterable, List, Optional
+
+from src.utils.workspace_manifest import MANIFEST_DIR
+
+STATE_FILE = "coverage.sqlite"
+# coverage.py settings of the shards: each test's lines are recorded under its own context,
+# so they can be attributed to the test file that ran it
+SHARD_RCFILE = "[run]\ndynamic_context = test_function\n"
+
+logger = logging.getLogger(__name__)
+
+# Line sets are Python ints used as bitmaps: bit n set <=> line n.
+# coverage.py stores executed lines in the same layout ("numbits": little-endian bytes),
+# so shard data can be OR-ed in without ever expanding it into lists.
+
+
+def lines_to_bitmap(lines: Iterable[int]) -> int:
+    bitmap = 0
+    for line in lines:
+        bitmap |= 1 << line
+    return bitmap
+
+
+def bitmap_to_lines(bitmap: int) -> List[int]:
+    lines, line = [], 0
+    while bitmap:
+        if bitmap & 1:
+            lines.append(line)
+        bitmap >>= 1
+        line += 1
+    return lines
+
+
+def _to_blob(bitmap: int) -> bytes:
+    return bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+
+
+def _from_blob(blob: Optional[bytes]) -> int:
+    return int.from_bytes(blob, "little") if blob else 0
+
+
+def statement_lines(source: str, filename: str = "<file>") -> int:
+    """
+    Bitmap of executable lines, taken from the compiled bytecode line tables.
+    """
+    try:
+        code = compile(source, filename, "exec", dont_inherit=True)
+    except (SyntaxError, ValueError):
+        return 0
+    bitmap, stack = 0, [code]
+    while stack:
+        co = stack.pop()
+        for _, _, line in co.co_lines():
+            if line:
+                bitmap |= 1 << line
+        stack.extend(c for c in co.co_consts if hasattr(c, "co_lines"))
+    return bitmap
+
+
+def _test_modules(test_files: Iterable[str]) -> Dict[str, str]:
+    """
+    The module names a test file can be imported as (pytest's rootdir or package
+    based names, e.g. "tests.test_a" and "test_a"), mapped to the file.
+    """
+    modules = {}
+    for rel in test_files:
+        parts = rel[:-3].split("/")
+        for i in range(len(parts)):
+            modules.setdefault(".".join(parts[i:]), rel)
+    return modules
+
+
+def _context_test(context: str, modules: Dict[str, str]) -> Optional[str]:
+    """
+    The test file of a test_function context ("module.Class.test_name").
+    """
+    parts = context.split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        rel = modules.get(".".join(parts[:i]))
+        if rel:
+            return rel
+    return None
+
+
+class CoverageAggregator:
+    """
+    Per-project coverage state, kept in .coppercore/coverage.sqlite:
+    - files: one (path, content hash, executed bitmap, statements bitmap) row per source
+      file, executed being the union over the tests;
+    - hits: the lines each test file executed in each source file;
+    - tests: the key (see test_runner._code_key) each test file's hits were recorded with.
+
+    Shard data is merged row by row, so the cost of a round is linear in the
+    coverage data it produced, not in the size of the project.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, MANIFEST_DIR), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, MANIFEST_DIR, STATE_FILE))
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, hash TEXT, executed BLOB, statements BLOB)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hits (path TEXT, test TEXT, executed BLOB, PRIMARY KEY (path, test))"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tests (test TEXT PRIMARY KEY, key TEXT)")
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def _relpath(self, path: str) -> Optional[str]:
+        rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+        return None if rel.startswith("../") else rel
+
+    def reset_changed(self, file_hashes: Dict[str, str], test_keys: Optional[Dict[str, str]] = None):
+        """
+        Drops executed lines recorded against older content of a file: line numbers
+        from a previous version are meaningless. Files removed from the project are dropped.
+
+        With test_keys ({test file: key} of the current test set), the lines of test files
+        that were removed or whose key changed are dropped too: what they executed before
+        no longer says what the tests execute now.
+        """
+        rows = self.conn.execute("SELECT path, hash FROM files").fetchall()
+        for path, stored_hash in rows:
+            if file_hashes.get(path) != stored_hash:
+                self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                self.conn.execute("DELETE FROM hits WHERE path = ?", (path,))
+        if test_keys is None:
+            return
+        stale = [test for test, key in self.conn.execute("SELECT test, key FROM tests") if test_keys.get(test) != key]
+        if not stale:
+            return
+        affected = set()
+        for test in stale:
+            affected.update(path for (path,) in self.conn.execute("SELECT path FROM hits WHERE test = ?", (test,)))
+            self.conn.execute("DELETE FROM hits WHERE test = ?", (test,))
+            self.conn.execute("DELETE FROM tests WHERE test = ?", (test,))
+        for path in affected:
+            executed = 0
+            for (bits,) in self.conn.execute("SELECT executed FROM hits WHERE path = ?", (path,)):
+                executed |= _from_blob(bits)
+            self.conn.execute("UPDATE files SET executed = ? WHERE path = ?", (_to_blob(executed), path))
+        logger.debug("Dropped the coverage of %d changed or removed test files", len(stale))
+
+    def test_keys(self) -> Dict[str, str]:
+        """
+        {test file: key} of the test files whose executed lines the state holds.
+        """
+        return dict(self.conn.execute("SELECT test, key FROM tests"))
+
+    def _statements(self, rel: str) -> int:
+        try:
+            with open(os.path.join(self.root, rel), "r", encoding="utf-8") as f:
+                return statement_lines(f.read(), rel)
+        except (OSError, UnicodeDecodeError):
+            return 0
+
+    def _owners(self, rel: str, context: str, tests: Dict[str, str], modules: Dict[str, str],
+                imports: Dict[str, Collection[str]]) -> List[str]:
+        """
+        The test files lines executed under context are attributed to. Lines run outside
+        a test (imports at collection time) belong to the shard's tests that import rel.
+        """
+        if not tests:
+            return [""]
+        test = _context_test(context, modules) if context else None
+        if test:
+            return [test]
+        return [t for t in tests if rel in imports.get(t, ())] or list(tests)
+
+    def merge_data_file(self, data_file: str, file_hashes: Dict[str, str], tests: Optional[Dict[str, str]] = None,
+                        imports: Optional[Dict[str, Collection[str]]] = None):
+        """
+        ORs one shard's .coverage database (coverage.py's SQLite format) into the state.
+        Rows are streamed from a cursor; nothing is materialised per report.
+
+        tests ({test file: key}) are the test files the shard ran, imports their import
+        closures: lines are recorded per test file, so reset_changed() can drop them.
+        """
+        if not os.path.exists(data_file):
+            return
+        tests = tests or {}
+        imports = imports or {}
+        modules = _test_modules(tests)
+        shard = sqlite3.connect(data_file)
+        try:
+            cursor = shard.execute(
+                "SELECT file.path, context.context, line_bits.numbits FROM line_bits "
+                "JOIN file ON file.id = line_bits.file_id JOIN context ON context.id = line_bits.context_id"
+            )
+            for path, context, numbits in cursor:
+                rel = self._relpath(path)
+                if rel is None or rel not in file_hashes:
+                    continue
+                bits = _from_blob(numbits)
+                for test in self._owners(rel, context, tests, modules, imports):
+                    row = self.conn.execute("SELECT executed FROM hits WHERE path = ? AND test = ?", (rel, test)).fetchone()
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO hits (path, test, executed) VALUES (?, ?, ?)",
+                        (rel, test, _to_blob(bits | (_from_blob(row[0]) if row else 0))),
+                    )
+                row = self.conn.execute("SELECT executed, statements FROM files WHERE path = ?", (rel,)).fetchone()
+                executed = bits
+                if row:
+                    executed |= _from_blob(row[0])
+                    statements = _from_blob(row[1])
+                else:
+                    statements = self._statements(rel)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files (path, hash, executed, statements) VALUES (?, ?, ?, ?)",
+                    (rel, file_hashes[rel], _to_blob(executed), _to_blob(statements | executed)),
+                )
+            self.conn.executemany("INSERT OR REPLACE INTO tests (test, key) VALUES (?, ?)", tests.items())
+        except sqlite3.DatabaseError as e:
+            logger.warning("Skipping unreadable coverage data %s: %s", data_file, e)
+        finally:
+            shard.close()
+        self.conn.commit()
+
+    def add_unexecuted(self, file_hashes: Dict[str, str]):
+        """
+        Records files no test has executed yet, so they count against the total.
+        Only files missing from the state (new or changed since last round) are compiled.
+        """
+        known = {path for (path,) in self.conn.execute("SELECT path FROM files")}
+        for rel, file_hash in file_hashes.items():
+            if rel not in known:
+                self.conn.execute(
+                    "INSERT INTO files (path, hash, executed, statements) VALUES (?, ?, ?, ?)",
+                    (rel, file_hash, b"", _to_blob(self._statements(rel))),
+                )
+        self.conn.commit()
+
+    def file_coverage(self) -> Dict[str, Dict[str, int]]:
+        coverage = {}
+        for path, executed, statements in self.conn.execute("SELECT path, executed, statements FROM files"):
+            executed, statements = _from_blob(executed), _from_blob(statements)
+            coverage[path] = {"covered": (executed & statements).bit_count(), "statements": statements.bit_count()}
+        return coverage
+
+    def diff_coverage(self, changed_lines: Dict[str, Iterable[int]]) -> Dict:
+        """
+        Coverage of changed executable lines only. changed_lines maps project-relative
+        paths to line numbers in the new version of each file.
+        """
+        covered = total = 0
+        files, uncovered = {}, {}
+        for rel, lines in changed_lines.items():
+            row = self.conn.execute("SELECT executed, statements FROM files WHERE path = ?", (rel,)).fetchone()
+            changed = lines_to_bitmap(lines)
+            if row:
+                executed, statements = _from_blob(row[0]), _from_blob(row[1])
+            else:
+                executed, statements = 0, self._statements(rel) if rel.endswith(".py") else 0
+            relevant = changed & statements
+            if not relevant:
+                continue
+            hit = relevant & executed
+            covered += hit.bit_count()
+            total += relevant.bit_count()
+            files[rel] = round(100.0 * hit.bit_count() / relevant.bit_count(), 1)
+            missed = bitmap_to_lines(relevant & ~hit)
+            if missed:
+                uncovered[rel] = missed
+        return {
+            "percent": round(100.0 * covered / total, 1) if total else 100.0,
+            "covered": covered,
+            "lines": total,
+            "files": files,
+            "uncovered": uncovered,
+        }
+
+    def summary(self, changed_lines: Optional[Dict[str, Iterable[int]]] = None) -> Dict:
+        files = self.file_coverage()
+        covered = sum(f["covered"] for f in files.values())
+        total = sum(f["statements"] for f in files.values())
+        result = {
+            "percent": round(100.0 * covered / total, 1) if total else 100.0,
+            "covered": covered,
+            "lines": total,
+            "files": {
+                path: round(100.0 * f["covered"] / f["statements"], 1) if f["statements"] else 100.0
+                for path, f in sorted(files.items())
+            },
+        }
+        if changed_lines:
+            result["diff"] = self.diff_coverage(changed_lines)
+        return result
+
+
+def parse_unified_diff(diff_text: str) -> Dict[str, List[int]]:
+    """
+    Added/modified line numbers (new side) per file from a unified diff.
+    """
+    changed: Dict[str, List[int]] = {}
+    current, line = None, 0
+    for text in diff_text.splitlines():
+        if text.startswith("+++ "):
+            path = text[4:].split("\t")[0]
+            current = None if path == "/dev/null" else re.sub(r"^b/", "", path)
+        elif text.startswith("@@"):
+            match = re.match(r"@@ -\d+(?:,\d+)? \+(\d+)", text)
+            line = int(match.group(1)) if match else 0
+        elif current is not None and line:
+            if text.startswith("+"):
+                changed.setdefault(current, []).append(line)
+                line += 1
+            elif not text.startswith("-"):
+                line += 1
+    return changed
+
+
+def changed_lines(old: Optional[str], new: str) -> List[int]:
+    """
+    Line numbers in new that were added or modified relative to old.
+    """
+    if old is None:
+        return list(range(1, new.count("\n") + 2))
+    matcher = difflib.SequenceMatcher(None, old.splitlines(), new.splitlines(), autojunk=False)
+    lines = []
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            lines.extend(range(j1 + 1, j2 + 1))
+    return lines
+
+
+def format_coverage_summary(summary: Dict, max_files: int = 5) -> str:
+    """
+    A few lines for agent prompts: totals, diff coverage and the worst files.
+    """
+    text = f"coverage {summary['percent']}% ({summary['covered']}/{summary['lines']} lines)"
+    diff = summary.get("diff")
+    if diff and diff["lines"]:
+        text += f", diff coverage {diff['percent']}% ({diff['covered']}/{diff['lines']} changed lines)"
+    worst = sorted((pct, path) for path, pct in summary["files"].items() if pct < 100.0)[:max_files]
+    if worst:
+        text += "; lowest: " + ", ".join(f"{path} {pct}%" for pct, path in worst)
+    if diff and diff.get("uncovered"):
+        shown = list(diff["uncovered"].items())[:max_files]
+        text += "; uncovered changes: " + ", ".join(
+            f"{path}:{','.join(map(str, lines[:10]))}" for path, lines in shown
+        )
+    return text
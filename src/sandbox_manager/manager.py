@@ -1,6 +1,44 @@
-import docker
+from typing import Callable, List, Optional
+from src.agent_factory.static_validator import validate_directory, format_report
+from src.sandbox_manager.test_runner import run_tests, format_test_summary
 
-def run_validation_in_docker(code_snippet):
-    # Build an image or volume with the code
-    # Run a container that tries to compile or lint the code
-    return success_or_fail
+# Changes to these files can affect any module or test, so they force a full run
+GLOBAL_FILES = {"requirements.txt", "setup.py", "setup.cfg", "pyproject.toml", "tox.ini", "pytest.ini", "conftest.py"}
+
+def needs_full_run(changed_files: Optional[List[str]]) -> bool:
+    if changed_files is None:
+        return True
+    return any(f.rsplit("/", 1)[-1] in GLOBAL_FILES or f.rsplit("/", 1)[-1].startswith("requirements") for f in changed_files)
+
+def run_sandbox_validation(
+    path: str,
+    run_test_suite: bool = True,
+    cancelled: Optional[Callable[[], bool]] = None,
+    changed_files: Optional[List[str]] = None,
+) -> dict:
+    """
+    Static validation followed by the project's tests for a checked-out code tree.
+    cancelled is polled between stages; when it returns True the remaining stages are skipped.
+
+    The tree's .coppercore manifest (imports, hashes, cached results) is reused when present.
+    With changed_files only those paths are re-read; only they and their importers are
+    re-validated, and only tests whose import closure they touch are re-run. Without them,
+    or when a global file such as requirements.txt changed, every file is re-hashed and
+    results are still reused wherever content is unchanged.
+    """
+    scoped = None if needs_full_run(changed_files) else changed_files
+    validation = validate_directory(path, incremental=True, changed_paths=scoped)
+    result = {
+        "validation_passed": validation["ok"],
+        "validation_report": format_report(validation["results"]),
+        "files_checked": validation["files_checked"],
+        "scope": "changed" if scoped is not None else "full",
+    }
+    if cancelled and cancelled():
+        result["cancelled"] = True
+        return result
+    if run_test_suite:
+        tests = run_tests(path, changed_paths=scoped)
+        result["tests_status"] = tests["status"]
+        result["tests_report"] = format_test_summary(tests)
+    return result
@@ -0,0 +1,296 @@
+# src/sandbox_manager/test_runner.py
+import os
+import sys
+import time
+import heapq
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import importlib.util
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+from src.utils.workspace_manifest import WorkspaceManifest
+from src.utils import metrics
+from src.sandbox_manager.coverage_report import SHARD_RCFILE, CoverageAggregator, format_coverage_summary
+
+# Interpreter the generated tests run under: the project's venv, or a wrapper script that
+# starts them in a container. Required: shards are plain child processes of the worker,
+# isolated only by the environment allowlist below, so there is no implicit default
+TEST_RUNNER_PYTHON = os.getenv("TEST_RUNNER_PYTHON", "")
+TEST_WORKERS = int(os.getenv("TEST_RUNNER_WORKERS", "0")) or (os.cpu_count() or 2)
+# Seconds the shards of one run may take together (they run in parallel); stragglers are killed
+SHARD_TIMEOUT = int(os.getenv("TEST_RUNNER_SHARD_TIMEOUT", "600"))
+DEFAULT_TEST_DURATION = 1.0
+# Characters of a crashed shard's output quoted in its error
+SHARD_OUTPUT_TAIL = 500
+
+# The only variables generated code under test sees: the worker's environment holds
+# database URLs, Redis URLs and API keys/tokens that must not leak into it
+TEST_ENV_ALLOWLIST = tuple(
+    name.strip() for name in os.getenv(
+        "TEST_RUNNER_ENV_ALLOWLIST",
+        "PATH,HOME,LANG,LANGUAGE,LC_ALL,LC_CTYPE,TZ,TMPDIR,TEMP,TMP,PYTHONPATH,PYTHONIOENCODING,VIRTUAL_ENV,SYSTEMROOT,COMSPEC,PATHEXT",
+    ).split(",") if name.strip()
+)
+
+
+def is_test_file(rel: str) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+
+def _code_key(manifest: WorkspaceManifest, test_file: str) -> str:
+    """
+    Cache key for one test file: its own hash plus the hashes of every project
+    file it transitively imports, and of all conftest.py files.
+    """
+    deps = manifest.graph.dependencies([test_file])
+    deps |= {rel for rel in manifest.files if rel.rsplit("/", 1)[-1] == "conftest.py"}
+    h = hashlib.sha256()
+    for rel in sorted(deps):
+        h.update(f"{rel}:{manifest.files[rel]['hash']}\n".encode())
+    return h.hexdigest()
+
+
+def plan_shards(durations: Dict[str, float], workers: int) -> List[List[str]]:
+    """
+    Longest-processing-time-first assignment: each test file goes to the currently
+    least loaded shard, largest files first.
+    """
+    workers = max(1, min(workers, len(durations)))
+    heap = [(0.0, i) for i in range(workers)]
+    shards: List[List[str]] = [[] for _ in range(workers)]
+    for test_file, duration in sorted(durations.items(), key=lambda kv: (-kv[1], kv[0])):
+        load, i = heapq.heappop(heap)
+        shards[i].append(test_file)
+        heapq.heappush(heap, (load + duration, i))
+    return [s for s in shards if s]
+
+
+def _coverage_available() -> bool:
+    if TEST_RUNNER_PYTHON != sys.executable:
+        return subprocess.run([TEST_RUNNER_PYTHON, "-c", "import coverage"], capture_output=True).returncode == 0
+    return importlib.util.find_spec("coverage") is not None
+
+
+def _test_env(root: str) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if k in TEST_ENV_ALLOWLIST}
+    env["PYTHONPATH"] = root + os.pathsep + env["PYTHONPATH"] if env.get("PYTHONPATH") else root
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _start_shard(root: str, files: List[str], out_dir: str, index: int, with_coverage: bool) -> subprocess.Popen:
+    junit = os.path.join(out_dir, f"shard-{index}.xml")
+    pytest_args = ["-q", "-p", "no:cacheprovider", "-o", "junit_family=xunit1", f"--junitxml={junit}"] + files
+    if with_coverage:
+        data_file = os.path.join(out_dir, f".coverage.{index}")
+        rcfile = os.path.join(out_dir, "coveragerc")
+        cmd = [TEST_RUNNER_PYTHON, "-m", "coverage", "run", f"--rcfile={rcfile}", f"--data-file={data_file}",
+               f"--source={root}", "-m", "pytest"] + pytest_args
+    else:
+        cmd = [TEST_RUNNER_PYTHON, "-m", "pytest"] + pytest_args
+    # Output goes to a file, not a pipe: nothing has to drain it while the shards run
+    with open(os.path.join(out_dir, f"shard-{index}.log"), "wb") as log:
+        return subprocess.Popen(cmd, cwd=root, env=_test_env(root), stdout=log, stderr=subprocess.STDOUT)
+
+
+def _wait_all(procs: List[subprocess.Popen], timeout: float) -> List[bool]:
+    """
+    Waits for every shard against one deadline shared by all of them and kills the
+    ones still running when it passes. Returns which shards timed out.
+    """
+    deadline = time.monotonic() + timeout
+    timed_out = []
+    for proc in procs:
+        try:
+            proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            timed_out.append(False)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            timed_out.append(True)
+    return timed_out
+
+
+def _output_tail(path: str, limit: int = SHARD_OUTPUT_TAIL) -> str:
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - limit))
+            return " ".join(f.read().decode("utf-8", "replace").split())
+    except OSError:
+        return ""
+
+
+def _parse_junit(path: str, root: str) -> List[Dict]:
+    """
+    Per-test results from a pytest junit report (xunit1 adds the file attribute).
+    """
+    if not os.path.exists(path):
+        return []
+    tests = []
+    for case in ET.parse(path).getroot().iter("testcase"):
+        rel = (case.get("file") or "").replace("\\", "/")
+        if os.path.isabs(rel):
+            rel = os.path.relpath(rel, root).replace(os.sep, "/")
+        outcome, message = "passed", ""
+        for tag in ("failure", "error", "skipped"):
+            node = case.find(tag)
+            if node is not None:
+                outcome = {"failure": "failed", "error": "error", "skipped": "skipped"}[tag]
+                message = " ".join((node.get("message") or "").split())[:300]
+                break
+        tests.append({
+            "id": f"{rel}::{case.get('name')}",
+            "file": rel,
+            "outcome": outcome,
+            "duration": round(float(case.get("time") or 0.0), 4),
+            "message": message,
+        })
+    return tests
+
+
+def run_tests(
+    root: str,
+    workers: Optional[int] = None,
+    with_coverage: bool = True,
+    use_cache: bool = True,
+    changed_lines: Optional[Dict[str, List[int]]] = None,
+    changed_paths: Optional[List[str]] = None,
+) -> Dict:
+    """
+    Runs a project's tests in sharded pytest subprocesses under TEST_RUNNER_PYTHON.
+
+    Test files whose (own hash, code hash) key is unchanged since their last run are
+    not executed again; their cached per-test results are returned instead.
+    Coverage from the shards is merged into the project's persistent coverage state;
+    changed_lines ({path: [line, ...]}) adds diff coverage to the summary.
+    changed_paths limits the manifest refresh to those files instead of walking the tree.
+    """
+    started = time.time()
+    if not os.path.isdir(root):
+        return {"status": "error", "error": f"Directory not found: {root}"}
+    if not TEST_RUNNER_PYTHON:
+        return {"status": "error", "error": "TEST_RUNNER_PYTHON is not set: no interpreter to run the generated tests with"}
+    # The shards run with root as their working directory, so a relative root would
+    # point coverage's --source somewhere else
+    root = os.path.abspath(root)
+
+    manifest = WorkspaceManifest.load(root)
+    manifest.refresh(changed_paths)
+    test_files = sorted(rel for rel in manifest.files if is_test_file(rel))
+    if not test_files:
+        return {"status": "no_tests", "summary": {"total": 0}, "tests": [], "duration": 0.0}
+
+    keys = {rel: _code_key(manifest, rel) for rel in test_files}
+    with_coverage = with_coverage and _coverage_available()
+    aggregator = None
+    covered = {}
+    if with_coverage:
+        source_hashes = {rel: e["hash"] for rel, e in manifest.files.items() if rel.endswith(".py")}
+        aggregator = CoverageAggregator(root)
+        aggregator.reset_changed(source_hashes, keys)
+        covered = aggregator.test_keys()
+
+    cached, to_run = {}, {}
+    for rel in test_files:
+        previous = manifest.get_result(rel, "test") or {}
+        # A cached result is only enough when the coverage state holds the lines of that same run
+        if use_cache and previous.get("key") == keys[rel] and (aggregator is None or covered.get(rel) == keys[rel]):
+            cached[rel] = previous
+        else:
+            to_run[rel] = previous.get("duration", DEFAULT_TEST_DURATION)
+
+    fresh: Dict[str, List[Dict]] = {}
+    unreported = set()
+    if to_run:
+        out_dir = tempfile.mkdtemp(prefix="coppercore-tests-")
+        try:
+            if with_coverage:
+                with open(os.path.join(out_dir, "coveragerc"), "w", encoding="utf-8") as f:
+                    f.write(SHARD_RCFILE)
+            shards = plan_shards(to_run, workers or TEST_WORKERS)
+            procs = [_start_shard(root, files, out_dir, i, with_coverage) for i, files in enumerate(shards)]
+            timed_out = _wait_all(procs, SHARD_TIMEOUT)
+            for i, proc in enumerate(procs):
+                for test in _parse_junit(os.path.join(out_dir, f"shard-{i}.xml"), root):
+                    fresh.setdefault(test["file"], []).append(test)
+                # A shard that crashed or timed out reports nothing for its files
+                if timed_out[i]:
+                    reason = f"shard timed out after {SHARD_TIMEOUT}s"
+                else:
+                    reason = f"pytest exited with code {proc.returncode} before reporting"
+                tail = _output_tail(os.path.join(out_dir, f"shard-{i}.log"))
+                for rel in shards[i]:
+                    if rel not in fresh:
+                        unreported.add(rel)
+                        fresh[rel] = [{
+                            "id": rel, "file": rel, "outcome": "error", "duration": 0.0,
+                            "message": f"{reason}: {tail}" if tail else reason,
+                        }]
+                if aggregator:
+                    aggregator.merge_data_file(
+                        os.path.join(out_dir, f".coverage.{i}"), source_hashes,
+                        tests={rel: keys[rel] for rel in shards[i]},
+                        imports={rel: manifest.graph.dependencies([rel]) for rel in shards[i]},
+                    )
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+        # Crashes and timeouts may be transient, so only real reports are cached
+        for rel in set(to_run) - unreported:
+            tests = fresh.get(rel, [])
+            manifest.set_result(rel, "test", {
+                "key": keys[rel],
+                "duration": round(sum(t["duration"] for t in tests), 4) or DEFAULT_TEST_DURATION,
+                "tests": tests,
+            })
+        manifest.save()
+
+    tests = []
+    for rel in test_files:
+        tests.extend(cached[rel]["tests"] if rel in cached else fresh.get(rel, []))
+
+    summary = {"total": len(tests)}
+    for outcome in ("passed", "failed", "error", "skipped"):
+        summary[outcome] = sum(1 for t in tests if t["outcome"] == outcome)
+    result = {
+        "status": "passed" if summary["failed"] == 0 and summary["error"] == 0 else "failed",
+        "summary": summary,
+        "files_run": len(to_run),
+        "files_cached": len(cached),
+        "tests": tests,
+        "duration": round(time.time() - started, 3),
+    }
+    metrics.record_cache("test", len(cached), len(to_run))
+    if aggregator:
+        aggregator.add_unexecuted(source_hashes)
+        result["coverage"] = aggregator.summary(changed_lines)
+        aggregator.close()
+    return result
+
+
+def format_test_summary(result: Dict, max_failures: int = 10) -> str:
+    """
+    Compact text for the CoreAgent: one status line plus the failing tests.
+    """
+    if result["status"] == "error":
+        return f"Tests failed: {result['error']}"
+    if result["status"] == "no_tests":
+        return "Tests failed: no test files (test_*.py / *_test.py) found in project"
+
+    s = result["summary"]
+    header = "Tests passed" if result["status"] == "passed" else "Tests failed"
+    line = (
+        f"{header}: {s['passed']}/{s['total']} passed, {s['failed']} failed, {s['error']} errors, "
+        f"{s['skipped']} skipped ({result['files_run']} files run, {result['files_cached']} cached, {result['duration']}s)"
+    )
+    if "coverage" in result:
+        line += ", " + format_coverage_summary(result["coverage"])
+    failures = [t for t in result["tests"] if t["outcome"] in ("failed", "error")]
+    lines = [line] + [f"- {t['id']}: {t['message']}" for t in failures[:max_failures]]
+    if len(failures) > max_failures:
+        lines.append(f"- ... {len(failures) - max_failures} more")
+    return "\n".join(lines)
@@ -1,15 +1,199 @@
+import time
+import logging
+import threading
+import contextvars
 from langchain.callbacks.base import BaseCallbackHandler
+from src.utils import metrics, tracing
+
+# The tracker of the agent whose tool is running in this thread/context, so LLM calls
+# made inside tools (see LLMCallbackForwarder) are attributed to its task and stage
+_active_tracker = contextvars.ContextVar("active_tracker", default=None)
+
+logger = logging.getLogger(__name__)
 
 class ToolExecutionTracker(BaseCallbackHandler):
-    def __init__(self):
+    # Lets on_llm_start stop a call with BudgetExceeded (LangChain only logs handler errors otherwise)
+    raise_error = True
+
+    def __init__(self, short_term_memory=None, task_id=None, ledger=None):
         self.last_tool_name = None
+        self.task_id = task_id
+        # Optional src.memory.short_term_memory.ShortTermMemory receiving every tool's input/output
+        self.short_term_memory = short_term_memory
+        # Optional src.utils.usage_ledger.UsageLedger recording every LLM call and enforcing budgets
+        self.ledger = ledger
+        self._runs = {}  # run_id -> (stage, started, model, span, context token)
+        self._tracker_tokens = {}  # run_id -> _active_tracker token of a running tool
+        self._lock = threading.Lock()
+        # Per-task totals, see summary()
+        self.stages = {}
+        # Tools in call order and the model each stage's LLM calls used (for the scheduler's episodes)
+        self.sequence = []
+        self.models = {}
+        self.llm = {"calls": 0, "errors": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+    def _remember(self, kind: str, content, **fields):
+        if self.short_term_memory is None:
+            return
+        try:
+            self.short_term_memory.append(kind, str(content), **fields)
+        except Exception as e:
+            logger.warning("Could not record %s in short-term memory: %s", kind, e, extra={"task_id": self.task_id})
+
+    def _start(self, run_id, stage: str, model: str = None, span_name: str = None, **attributes) -> bool:
+        with self._lock:
+            if run_id in self._runs:
+                return False  # already seen through another callback path
+            span = tracing.begin_span(span_name or stage, kind=tracing.KIND_CLIENT if model else tracing.KIND_INTERNAL,
+                                      **{"task.id": self.task_id, "agent.stage": stage, **attributes})
+            # Tool spans become current, so the tool's LLM calls and DB flushes nest under them
+            token = tracing.activate(span) if model is None else None
+            self._runs[run_id] = (stage, time.perf_counter(), model, span, token)
+            return True
+
+    def _finish(self, run_id, error=None, **attributes):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        stage, started, model, span, token = run
+        if token is not None:
+            tracing.deactivate(token)
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        span.end(error=error)
+        return stage, time.perf_counter() - started, model
+
+    # Tools
 
-    def on_tool_start(self, serialized, input_str, **kwargs):
-        """Triggered when a tool starts execution."""        
-        print(f"ToolExecutionTracker > on_tool_start() serialized value is {serialized} ")
+    def on_tool_start(self, serialized, input_str, run_id=None, **kwargs):
+        """Triggered when a tool starts execution."""
         if "name" in serialized:
             self.last_tool_name = serialized["name"]
-            print(f"ToolExecutionTracker > on_tool_start() last_tool_name value is {self.last_tool_name} ")
+        logger.debug("Tool %s started", self.last_tool_name, extra={"task_id": self.task_id, "tool_input": input_str})
+        self._start(run_id, self.last_tool_name or "unknown", span_name=f"tool {self.last_tool_name or 'unknown'}")
+        self.sequence.append(self.last_tool_name or "unknown")
+        with self._lock:
+            self._tracker_tokens[run_id] = _active_tracker.set(self)
+        self._remember("tool_input", input_str, tool=self.last_tool_name)
+
+    def _end_tool(self, run_id, status: str, error=None):
+        with self._lock:
+            token = self._tracker_tokens.pop(run_id, None)
+        if token is not None:
+            try:
+                _active_tracker.reset(token)
+            except ValueError:
+                # Token from another context (callbacks ending on a different thread)
+                _active_tracker.set(None)
+        finished = self._finish(run_id, error=error)
+        if finished is None:
+            return
+        stage, seconds, _ = finished
+        metrics.observe_stage(stage, seconds, status)
+        totals = self.stages.setdefault(stage, {"calls": 0, "errors": 0, "seconds": 0.0})
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        if status != "ok":
+            totals["errors"] += 1
+
+    def on_tool_end(self, output, run_id=None, **kwargs):
+        """Triggered when a tool returns."""
+        self._end_tool(run_id, "ok")
+        self._remember("tool_output", output, tool=self.last_tool_name)
+
+    def on_tool_error(self, error, run_id=None, **kwargs):
+        self._end_tool(run_id, "error", error=error)
+        self._remember("tool_error", error, tool=self.last_tool_name)
+
+    # LLM calls
+
+    def _llm_stage(self) -> str:
+        # LLM calls while no tool is running are the agent's own reasoning steps
+        return self.last_tool_name if self._tool_running() else "core_agent"
+
+    def _tool_running(self) -> bool:
+        with self._lock:
+            return any(run[2] is None for run in self._runs.values())
+
+    def on_llm_start(self, serialized, prompts, run_id=None, invocation_params=None, **kwargs):
+        params = invocation_params or {}
+        model = params.get("model_name") or params.get("model") or "unknown"
+        if self.ledger is not None:
+            self.ledger.enforce()
+        self._start(run_id, self._llm_stage(), model, span_name=f"llm {model}", **{"llm.model": model})
+
+    def on_chat_model_start(self, serialized, messages, run_id=None, invocation_params=None, **kwargs):
+        self.on_llm_start(serialized, [], run_id=run_id, invocation_params=invocation_params, **kwargs)
+
+    def on_llm_end(self, response, run_id=None, **kwargs):
+        output = getattr(response, "llm_output", None) or {}
+        usage = output.get("token_usage") or {}
+        prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        finished = self._finish(run_id, **{"llm.prompt_tokens": prompt_tokens, "llm.completion_tokens": completion_tokens})
+        if finished is None:
+            return
+        stage, seconds, model = finished
+        model = output.get("model_name") or model
+        self.models.setdefault(stage, model)
+        metrics.observe_llm_call(model, stage, seconds, prompt_tokens, completion_tokens)
+        self.llm["calls"] += 1
+        self.llm["seconds"] += seconds
+        self.llm["prompt_tokens"] += prompt_tokens
+        self.llm["completion_tokens"] += completion_tokens
+        cost = metrics.llm_cost(model, prompt_tokens, completion_tokens)
+        self.llm["cost_usd"] += cost
+        if self.ledger is not None:
+            self.ledger.record(model, stage, prompt_tokens, completion_tokens, cost)
+
+    def on_llm_error(self, error, run_id=None, **kwargs):
+        finished = self._finish(run_id, error=error)
+        if finished is None:
+            return
+        stage, seconds, model = finished
+        metrics.observe_llm_call(model, stage, seconds, status="error")
+        self.llm["errors"] += 1
+
+    def summary(self) -> dict:
+        """
+        Totals for this task: per-stage calls/errors/seconds and LLM calls, tokens, cost.
+        """
+        return {"task_id": self.task_id, "stages": self.stages, "llm": self.llm}
 
     def get_last_tool_name(self):
         return self.last_tool_name or "CoreAgent"
+
+    def current_stage(self):
+        """The stage whose LLM calls are being made now: the running tool, else "core_agent"."""
+        return self._llm_stage()
+
+class LLMCallbackForwarder(BaseCallbackHandler):
+    """
+    Attached to LLMs created inside tools: forwards their LLM events to the tracker of
+    the agent currently running the tool, or records them unattributed.
+    """
+    raise_error = True
+
+    def _target(self):
+        return _active_tracker.get() or _unattributed
+
+    def on_llm_start(self, *args, **kwargs):
+        self._target().on_llm_start(*args, **kwargs)
+
+    def on_chat_model_start(self, *args, **kwargs):
+        self._target().on_chat_model_start(*args, **kwargs)
+
+    def on_llm_end(self, *args, **kwargs):
+        self._target().on_llm_end(*args, **kwargs)
+
+    def on_llm_error(self, *args, **kwargs):
+        self._target().on_llm_error(*args, **kwargs)
+
+_unattributed = ToolExecutionTracker()
+
+def current_stage():
+    """
+    Stage of the tool running in this context (see LLMCallbackForwarder), None outside tools.
+    """
+    tracker = _active_tracker.get()
+    return tracker.current_stage() if tracker is not None else None
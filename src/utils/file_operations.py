@@ -1,39 +1,200 @@
 import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Union
+from pydantic import BaseModel
 
 PROJECTS_ROOT = "./../projects"
 
+# Set WORKSPACE_FSYNC=false on dev machines to skip the durability barrier
+WORKSPACE_FSYNC = os.getenv("WORKSPACE_FSYNC", "true").lower() == "true"
+
+# Mode of new files: mkstemp creates its temp files 0600, so they are given this mode
+# explicitly (the process umask, which can't be read without changing it, does not apply)
+NEW_FILE_MODE = 0o644
+_project_locks = defaultdict(threading.Lock)
+_change_listeners: List[Callable[["ChangeSet"], None]] = []
+
+logger = logging.getLogger(__name__)
+
+class ChangeSet(BaseModel):
+    """
+    What a batch write actually changed. Paths are relative to the project directory.
+    """
+    project_name: str
+    added: List[str] = []
+    modified: List[str] = []
+    deleted: List[str] = []
+    unchanged: List[str] = []
+    hashes: Dict[str, str] = {}  # new content hash of every added/modified/unchanged path
+
+    @property
+    def changed(self) -> List[str]:
+        return self.added + self.modified + self.deleted
+
+    def is_empty(self) -> bool:
+        return not self.changed
+
+def register_change_listener(listener: Callable[[ChangeSet], None]):
+    """
+    Registers a callback that receives every non-empty ChangeSet after it is written.
+    """
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+def project_lock(project_name: str) -> threading.Lock:
+    """
+    The lock write_files holds while it changes a project directory.
+    """
+    return _project_locks[project_name]
+
 def ensure_project_directory(project_name: str):
     """
     Ensures the project directory exists. Creates it if necessary.
+    Checked on every call: rollback or cleanup may have removed it since.
     """
     project_path = os.path.join(PROJECTS_ROOT, project_name)
-    if not os.path.exists(project_path):
-        os.makedirs(project_path)
-        print(f"Created project directory: {project_path}")
+    if not os.path.isdir(project_path):
+        os.makedirs(project_path, exist_ok=True)
+        logger.info("Created project directory: %s", project_path)
     return project_path
 
+def _create_temp(directory: str, mode: int):
+    """
+    A temp file next to its target, with the mode the target will have.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        os.chmod(tmp_path, mode)
+    except OSError:
+        os.close(fd)
+        os.remove(tmp_path)
+        raise
+    return fd, tmp_path
+
+def _resolve(project_path: str, filename: str) -> str:
+    """
+    Joins filename onto the project path, refusing paths that escape the project.
+    """
+    file_path = os.path.normpath(os.path.join(project_path, filename))
+    root = os.path.normpath(project_path)
+    if os.path.commonpath([root, file_path]) != root or file_path == root:
+        raise ValueError(f"Path {filename!r} is outside project directory")
+    return file_path
+
+def _same_content(file_path: str, data: bytes, digest: str) -> bool:
+    try:
+        if os.path.getsize(file_path) != len(data):
+            return False
+        with open(file_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest() == digest
+    except OSError:
+        return False
+
+def _fsync_dir(path: str):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_files(project_name: str, files: Dict[str, Optional[Union[str, bytes]]]) -> ChangeSet:
+    """
+    Applies a batch of file changes to a project directory.
+    files maps relative paths to new content (text is UTF-8 encoded, bytes are written
+    as is), or to None to delete the file.
+
+    - Files whose content hash is unchanged are not rewritten.
+    - New content goes to a temp file next to the target and is moved in with an
+      atomic rename, so readers never see a torn file.
+    - With WORKSPACE_FSYNC, each temp file is fsynced before any rename, and each
+      directory the batch renamed into is fsynced once after all of them.
+    - Deletions run only after every rename succeeded, so a failed batch deletes nothing.
+    """
+    project_path = ensure_project_directory(project_name)
+    change_set = ChangeSet(project_name=project_name)
+    pending = []  # (tmp_path, file_path, rel, existed)
+    deletions = []  # (file_path, rel)
+
+    with _project_locks[project_name]:
+        try:
+            for filename, content in files.items():
+                file_path = _resolve(project_path, filename)
+                rel = os.path.relpath(file_path, project_path).replace(os.sep, "/")
+
+                if content is None:
+                    if os.path.exists(file_path):
+                        deletions.append((file_path, rel))
+                    continue
+
+                data = content if isinstance(content, bytes) else content.encode("utf-8")
+                digest = hashlib.sha256(data).hexdigest()
+                change_set.hashes[rel] = digest
+                existed = os.path.exists(file_path)
+                if existed and _same_content(file_path, data, digest):
+                    change_set.unchanged.append(rel)
+                    continue
+
+                directory = os.path.dirname(file_path)
+                os.makedirs(directory, exist_ok=True)
+                mode = os.stat(file_path).st_mode & 0o7777 if existed else NEW_FILE_MODE
+                fd, tmp_path = _create_temp(directory, mode)
+                pending.append((tmp_path, file_path, rel, existed))
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    if WORKSPACE_FSYNC:
+                        os.fsync(f.fileno())
+
+            directories = set()
+            for tmp_path, file_path, rel, existed in pending:
+                os.replace(tmp_path, file_path)
+                directories.add(os.path.dirname(file_path))
+                (change_set.modified if existed else change_set.added).append(rel)
+            for file_path, rel in deletions:
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    continue
+                directories.add(os.path.dirname(file_path))
+                change_set.deleted.append(rel)
+            if WORKSPACE_FSYNC:
+                for directory in directories:
+                    _fsync_dir(directory)
+        finally:
+            for tmp_path, _, _, _ in pending:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    if not change_set.is_empty():
+        logger.info(
+            "Project %s: %d added, %d modified, %d deleted, %d unchanged", project_name,
+            len(change_set.added), len(change_set.modified), len(change_set.deleted), len(change_set.unchanged),
+        )
+        for listener in _change_listeners:
+            try:
+                listener(change_set)
+            except Exception:
+                logger.exception("Change listener %s failed", listener)
+    return change_set
+
 def create_or_update_file(project_name: str, filename: str, content: str):
     """
     Creates or updates a file in the project directory.
+    The write is skipped when the content is unchanged.
     """
-    project_path = ensure_project_directory(project_name)
-    file_path = os.path.join(project_path, filename)
-    
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(content)
-    
-    print(f"File {filename} updated in project {project_name}.")
-    return file_path
+    write_files(project_name, {filename: content})
+    return _resolve(os.path.join(PROJECTS_ROOT, project_name), filename)
 
 def delete_file(project_name: str, filename: str):
     """
     Deletes a file in the project directory if it exists.
     """
-    project_path = ensure_project_directory(project_name)
-    file_path = os.path.join(project_path, filename)
-    
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        print(f"File {filename} deleted in project {project_name}.")
-        return True
-    return False
+    change_set = write_files(project_name, {filename: None})
+    return bool(change_set.deleted)
@@ -0,0 +1,176 @@
+# src/utils/import_graph.py
+import ast
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def parse_imports(tree: ast.AST) -> List[list]:
+    """
+    Returns [module, [names], level, lineno] for every import statement.
+    'import a.b' is recorded as ["a.b", [], 0, line].
+    """
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append([alias.name, [], 0, node.lineno])
+        elif isinstance(node, ast.ImportFrom):
+            imports.append([node.module or "", [a.name for a in node.names], node.level, node.lineno])
+    return imports
+
+
+def module_exports(tree: ast.Module) -> Optional[List[str]]:
+    """
+    Top-level names a module defines. None when they can't be known statically
+    (star imports or a module-level __getattr__).
+    """
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if node.name == "__getattr__":
+                return None
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == "*":
+                    return None
+                names.add((alias.asname or alias.name).split(".")[0])
+        else:
+            # Assignments, loops, with/try/if blocks at module level
+            for sub in ast.walk(node):
+                if isinstance(sub, ast.Name) and isinstance(sub.ctx, ast.Store):
+                    names.add(sub.id)
+                elif isinstance(sub, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    names.add(sub.name)
+                elif isinstance(sub, (ast.Import, ast.ImportFrom)):
+                    for alias in sub.names:
+                        if alias.name == "*":
+                            return None
+                        names.add((alias.asname or alias.name).split(".")[0])
+    return sorted(names)
+
+
+def module_name_for(relpath: str) -> str:
+    """
+    'pkg/sub/mod.py' -> 'pkg.sub.mod', 'pkg/__init__.py' -> 'pkg'.
+    """
+    parts = relpath.replace("\\", "/")[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return ".".join(parts)
+
+
+class ImportGraph:
+    """
+    File-level import graph of a project, built from per-file import lists
+    (as stored in the workspace manifest) without re-parsing anything.
+    """
+
+    def __init__(self, entries: Dict[str, dict]):
+        # entries: relpath -> {"imports": [...], "exports": [...] | None}
+        self.entries = entries
+        self.modules: Dict[str, str] = {}
+        for rel in entries:
+            name = module_name_for(rel)
+            self.modules[name] = rel
+            # src-layout projects import their packages without the 'src.' prefix
+            if name.startswith("src."):
+                self.modules.setdefault(name[4:], rel)
+
+        self.deps: Dict[str, Set[str]] = {rel: set() for rel in entries}
+        self.rdeps: Dict[str, Set[str]] = {rel: set() for rel in entries}
+        for rel, entry in entries.items():
+            for module, names, level, _ in entry.get("imports", []):
+                for target in self._resolve(rel, module, names, level):
+                    if target != rel:
+                        self.deps[rel].add(target)
+                        self.rdeps[target].add(rel)
+
+    def _absolute(self, importer: str, module: str, level: int) -> str:
+        if not level:
+            return module
+        package = module_name_for(importer).split(".")
+        if not importer.endswith("__init__.py"):
+            package = package[:-1]
+        if level > 1:
+            package = package[:len(package) - (level - 1)]
+        return ".".join([p for p in package + [module] if p])
+
+    def _resolve(self, importer: str, module: str, names: List[str], level: int) -> Set[str]:
+        base = self._absolute(importer, module, level)
+        targets = set()
+        # 'import a.b.c' also executes a and a.b
+        parts = base.split(".") if base else []
+        for i in range(1, len(parts) + 1):
+            rel = self.modules.get(".".join(parts[:i]))
+            if rel:
+                targets.add(rel)
+        # 'from pkg import mod' may name a submodule
+        for name in names:
+            rel = self.modules.get(f"{base}.{name}" if base else name)
+            if rel:
+                targets.add(rel)
+        return targets
+
+    def dependents(self, paths: Iterable[str]) -> Set[str]:
+        """
+        Every file that transitively imports one of paths (paths themselves excluded
+        unless they import each other).
+        """
+        seen: Set[str] = set()
+        stack = [p for p in paths]
+        while stack:
+            rel = stack.pop()
+            for parent in self.rdeps.get(rel, ()):
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+        return seen
+
+    def dependencies(self, paths: Iterable[str]) -> Set[str]:
+        """
+        Every project file transitively imported by paths, paths included.
+        """
+        seen: Set[str] = set(paths)
+        stack = list(seen)
+        while stack:
+            rel = stack.pop()
+            for child in self.deps.get(rel, ()):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return seen
+
+    def imported_modules(self, rel: str) -> List[list]:
+        """
+        [absolute module name, lineno] for every module rel imports, including the
+        submodules named by 'from pkg import mod'.
+        """
+        modules = []
+        for module, names, level, lineno in self.entries.get(rel, {}).get("imports", []):
+            base = self._absolute(rel, module, level)
+            if base:
+                modules.append([base, lineno])
+            modules.extend([f"{base}.{name}" if base else name, lineno] for name in names if name != "*")
+        return modules
+
+    def missing_names(self, rel: str) -> List[list]:
+        """
+        'from local_module import name' where local_module is a project file that
+        does not define name. Returns [module, name, lineno] triples.
+        """
+        missing = []
+        for module, names, level, lineno in self.entries.get(rel, {}).get("imports", []):
+            if not names or names == ["*"]:
+                continue
+            base = self._absolute(rel, module, level)
+            target = self.modules.get(base)
+            if not target:
+                continue
+            exports = self.entries[target].get("exports")
+            if exports is None:
+                continue
+            exported = set(exports)
+            for name in names:
+                if name not in exported and f"{base}.{name}" not in self.modules:
+                    missing.append([base, name, lineno])
+        return missing
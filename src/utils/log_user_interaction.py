@@ -1,13 +1,16 @@
 import json
+import logging
 from sqlalchemy.orm import Session
 from src.db.models import TaskQuestionsAnswers, UserConfirmation
 
+logger = logging.getLogger(__name__)
+
 def store_ai_questions(db: Session, task_id: int, user_id: int, project_id: int, agent_name: str, questions: list):
     """
     Store AI-generated batch of questions in the database before waiting for user input.
     """
     if not questions:
-        print(f" No questions to store for task {task_id}")
+        logger.info("No questions to store for task %s", task_id)
         return None
     formatted_questions = json.dumps(questions)
     question_entry = TaskQuestionsAnswers(
@@ -15,9 +18,9 @@ def store_ai_questions(db: Session, task_id: int, user_id: int, project_id: int,
         user_id=user_id,
         project_id=project_id,
         agent_name=agent_name,
-        questions=formatted_questions,
+        question=formatted_questions,
         status="pending",
-        answers=None
+        answer=None
     )
     db.add(question_entry)
     db.commit()
@@ -39,13 +42,27 @@ def store_user_answers(db: Session, question_id: int, answers: list, answer_by:
     """
     question_entry = db.query(TaskQuestionsAnswers).filter(TaskQuestionsAnswers.id == question_id).first()
     if question_entry:
-        question_entry.answers = answers
+        question_entry.answer = answers
         question_entry.answer_by = answer_by
         question_entry.status = "answered"
         db.commit()
         return question_entry
     return None
 
+def get_latest_answers(db: Session, task_id: int):
+    """
+    The user's answers to the task's most recent questions, None while those are unanswered.
+    """
+    question_entry = (
+        db.query(TaskQuestionsAnswers)
+        .filter(TaskQuestionsAnswers.task_id == task_id)
+        .order_by(TaskQuestionsAnswers.id.desc())
+        .first()
+    )
+    if question_entry is None or question_entry.status != "answered":
+        return None
+    return question_entry.answer
+
 # Approve or Reject AI Step Execution
 def update_user_confirmation_status(db: Session, confirmation_id: int, user_id: int, project_id: int, agent_name: str, status: str):
     """
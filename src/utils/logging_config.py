@@ -0,0 +1,232 @@
+# src/utils/logging_config.py
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-logger overrides, e.g. "src.agent_factory=DEBUG,langchain=WARNING,httpx=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,openai=WARNING,urllib3=WARNING")
+# "json" (one object per line, for journald/docker collectors) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Fraction of DEBUG records kept, per call site (1 keeps all)
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+# Messages and string fields longer than this are cut (prompts, agent outputs, tool payloads)
+LOG_MAX_FIELD_CHARS = int(os.getenv("LOG_MAX_FIELD_CHARS", "2000"))
+# Records waiting for the writer thread; when full, new records are dropped rather than blocking
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord has; anything else came in through extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+def truncate(value: str, limit: Optional[int] = None) -> str:
+    limit = LOG_MAX_FIELD_CHARS if limit is None else limit
+    if limit <= 0 or len(value) <= limit:
+        return value
+    return f"{value[:limit]}... [{len(value) - limit} more chars]"
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps LOG_DEBUG_SAMPLE_RATE of the DEBUG records of each call site (logger and
+    message template), evenly spaced rather than random, so a rare debug event still
+    shows up once a call site has been hit 1/rate times.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._seen: Dict[tuple, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else type(record.msg).__name__)
+        count = self._seen.get(key, 0) + 1
+        self._seen[key] = count
+        return int(count * self.rate) > int((count - 1) * self.rate)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread. The calling thread only renders the message,
+    truncates it and captures the trace context; serialization and I/O happen in the
+    QueueListener. A full queue drops the record instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self._stats_lock = threading.Lock()
+        self.stats = {"queued": 0, "dropped": 0, "sampled_out": 0, "truncated": 0, "caller_seconds": 0.0}
+
+    def _count(self, key: str, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def handle(self, record: logging.LogRecord):
+        started = time.perf_counter()
+        if not self.filter(record):
+            self._count("sampled_out")
+            return False
+        try:
+            self.enqueue(self.prepare(record))
+            self._count("queued")
+        except queue.Full:
+            self._count("dropped")
+        except Exception:
+            self.handleError(record)
+        self._count("caller_seconds", time.perf_counter() - started)
+        return True
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        cut = truncate(message)
+        truncated = cut is not message
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and isinstance(value, str) and len(value) > LOG_MAX_FIELD_CHARS > 0:
+                setattr(record, key, truncate(value))
+                truncated = True
+        if truncated:
+            self._count("truncated")
+        # The record crosses threads: freeze the message and the traceback (kept whole)
+        record.message = record.msg = cut
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, "trace_id"):
+            from src.utils import tracing
+            span = tracing.current_span()
+            if span is not None:
+                record.trace_id = span.trace_id
+                record.span_id = span.span_id
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        self.queue.put_nowait(record)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES}
+        return f"{line} {json.dumps(fields, ensure_ascii=False, default=str)}" if fields else line
+
+
+_handler: Optional[BoundedQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(stream=None, force: bool = False):
+    """
+    Routes the root logger through a bounded queue to a writer thread that prints
+    JSON (or text) lines to stdout. Call once at process start (API, Celery worker);
+    later calls are no-ops unless force is set.
+    """
+    global _handler, _listener
+    with _configure_lock:
+        if _handler is not None and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        handler = BoundedQueueHandler(log_queue)
+        handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+        listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+        listener.start()
+        _handler, _listener = handler, listener
+
+
+def stop_logging():
+    """
+    Writes out the queued records and stops the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def logging_stats() -> dict:
+    """
+    Counters of the logging pipeline: records queued, dropped (queue full), sampled out,
+    truncated, time spent in calling threads, and the current queue depth.
+    """
+    if _handler is None:
+        return {}
+    with _handler._stats_lock:
+        stats = dict(_handler.stats)
+    stats["queue_depth"] = _handler.queue.qsize()
+    stats["caller_us_per_record"] = round(1e6 * stats["caller_seconds"] / stats["queued"], 2) if stats["queued"] else 0.0
+    return stats
+
+
+def record_logging_metrics():
+    """
+    Copies the counters into the metrics registry (as totals since process start),
+    so /metrics shows the logging overhead of the API and of every worker.
+    """
+    from src.utils import metrics
+
+    stats = logging_stats()
+    if not stats:
+        return
+    for key in ("queued", "dropped", "sampled_out", "truncated"):
+        metrics.registry.set_total("log_records_total", stats[key], "Log records by outcome", outcome=key)
+    metrics.registry.set_total("log_caller_seconds_total", stats["caller_seconds"], "Time calling threads spent handing records to the log queue")
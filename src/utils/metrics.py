@@ -0,0 +1,319 @@
+# src/utils/metrics.py
+import os
+import json
+import time
+import logging
+import socket
+import bisect
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from src.utils.logging_config import record_logging_metrics
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Celery workers push their metrics to Redis this often, busy or idle ...
+METRICS_PUSH_INTERVAL = float(os.getenv("METRICS_PUSH_INTERVAL", "15"))
+# ... and a worker that stops pushing disappears from /metrics after this long
+METRICS_WORKER_TTL = int(os.getenv("METRICS_WORKER_TTL", "600"))
+METRICS_KEY_PREFIX = "metrics:worker:"
+
+# Seconds; covers a cached lookup up to a long test run or model call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+# USD per 1M (prompt, completion) tokens; override with LLM_PRICES_JSON='{"model": [in, out]}'
+LLM_PRICES = {
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4": (30.0, 60.0),
+    "o1-preview": (15.0, 60.0),
+    "o1-mini": (3.0, 12.0),
+}
+LLM_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES_JSON", "{}")).items()})
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def llm_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prices = LLM_PRICES.get(model)
+    if prices is None:
+        # Dated snapshots ("gpt-4o-2024-08-06") are priced like their base model
+        prices = next((p for name, p in sorted(LLM_PRICES.items(), key=lambda i: -len(i[0])) if model.startswith(name)), (0.0, 0.0))
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and histograms in the Prometheus data model.
+    Snapshots of several processes (API, Celery workers) can be merged and
+    rendered in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, dict] = {}
+        self._series: Dict[str, Dict[LabelKey, dict]] = {}
+
+    def _declare(self, name: str, kind: str, help_text: str, buckets=None):
+        if name not in self._meta:
+            self._meta[name] = {"type": kind, "help": help_text, "buckets": list(buckets) if buckets else None}
+            self._series[name] = {}
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            series = self._series[name].setdefault(key, {"value": 0.0})
+            series["value"] += value
+
+    def set_total(self, name: str, value: float, help_text: str = "", **labels):
+        """
+        Sets a counter to a running total kept elsewhere (e.g. by the logging pipeline).
+        """
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            self._series[name][key] = {"value": float(value)}
+
+    def observe(self, name: str, value: float, help_text: str = "", buckets=LATENCY_BUCKETS, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            self._declare(name, "histogram", help_text, buckets)
+            bounds = self._meta[name]["buckets"]
+            series = self._series[name].setdefault(key, {"count": 0, "sum": 0.0, "buckets": [0] * len(bounds)})
+            series["count"] += 1
+            series["sum"] += value
+            index = bisect.bisect_left(bounds, value)
+            if index < len(bounds):
+                series["buckets"][index] += 1
+
+    def snapshot(self) -> dict:
+        """
+        JSON-serializable copy: {name: {type, help, buckets, series: [[labels, values]]}}.
+        """
+        with self._lock:
+            return {
+                name: {**meta, "series": [[[list(pair) for pair in key], json.loads(json.dumps(values))]
+                                          for key, values in self._series[name].items()]}
+                for name, meta in self._meta.items()
+            }
+
+
+def merge_snapshots(snapshots: List[dict]) -> dict:
+    merged: Dict[str, dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {"type": metric["type"], "help": metric["help"], "buckets": metric["buckets"], "series": {}})
+            if target["buckets"] != metric["buckets"]:
+                continue
+            for labels, values in metric["series"]:
+                key = tuple(tuple(pair) for pair in labels)
+                current = target["series"].get(key)
+                if current is None:
+                    target["series"][key] = json.loads(json.dumps(values))
+                elif metric["type"] == "counter":
+                    current["value"] += values["value"]
+                else:
+                    current["count"] += values["count"]
+                    current["sum"] += values["sum"]
+                    current["buckets"] = [a + b for a, b in zip(current["buckets"], values["buckets"])]
+    return merged
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(merged: dict) -> str:
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key, values in sorted(metric["series"].items()):
+            if metric["type"] == "counter":
+                lines.append(f"{name}{_format_labels(key)} {values['value']}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric["buckets"], values["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {values['count']}")
+            lines.append(f"{name}_sum{_format_labels(key)} {values['sum']}")
+            lines.append(f"{name}_count{_format_labels(key)} {values['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def histogram_quantile(q: float, bounds: List[float], counts: List[int], total: int) -> Optional[float]:
+    """
+    Quantile estimate from bucket counts, interpolating linearly inside the bucket
+    (what Prometheus' histogram_quantile does). Values above the last bound report it.
+    """
+    if not total:
+        return None
+    rank, cumulative, lower = q * total, 0, 0.0
+    for bound, count in zip(bounds, counts):
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    return bounds[-1]
+
+
+def summarize(merged: dict) -> dict:
+    """
+    {histogram: [{labels, count, mean, p50, p99}]} and {counter: [{labels, value}]}.
+    """
+    summary = {}
+    for name, metric in merged.items():
+        rows = []
+        for key, values in metric["series"].items():
+            labels = dict(key)
+            if metric["type"] == "counter":
+                rows.append({"labels": labels, "value": values["value"]})
+            else:
+                rows.append({
+                    "labels": labels,
+                    "count": values["count"],
+                    "mean": values["sum"] / values["count"] if values["count"] else None,
+                    "p50": histogram_quantile(0.5, metric["buckets"], values["buckets"], values["count"]),
+                    "p99": histogram_quantile(0.99, metric["buckets"], values["buckets"], values["count"]),
+                })
+        summary[name] = rows
+    return summary
+
+
+registry = MetricsRegistry()
+
+_redis = None
+_last_push = 0.0
+_pusher: Optional[threading.Thread] = None
+_pusher_pid: Optional[int] = None
+_pusher_stop = threading.Event()
+_pusher_lock = threading.Lock()
+
+
+def _worker_key() -> str:
+    # Read per call: prefork pool processes are forked after this module was imported
+    return f"{METRICS_KEY_PREFIX}{socket.gethostname()}:{os.getpid()}"
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(REDIS_URL)
+    return _redis
+
+
+def push_worker_metrics(force: bool = False):
+    """
+    Publishes this process' metrics to Redis (throttled to METRICS_PUSH_INTERVAL),
+    where the API's /metrics picks them up. Called by Celery workers after each task
+    and by the pusher thread.
+    """
+    global _last_push
+    now = time.time()
+    if not force and now - _last_push < METRICS_PUSH_INTERVAL:
+        return
+    _last_push = now
+    record_logging_metrics()
+    try:
+        _get_redis().set(_worker_key(), json.dumps(registry.snapshot()), ex=METRICS_WORKER_TTL)
+    except Exception as e:
+        logger.warning("Could not push worker metrics: %s", e)
+
+
+def _push_periodically(interval: float):
+    while not _pusher_stop.wait(interval):
+        push_worker_metrics(force=True)
+
+
+def start_metrics_pusher(interval: float = METRICS_PUSH_INTERVAL):
+    """
+    Pushes this process' metrics every interval seconds from a daemon thread, so the
+    series of an idle worker don't expire after METRICS_WORKER_TTL. Idempotent; a
+    forked process (whose parent's thread did not survive the fork) starts its own.
+    """
+    global _pusher, _pusher_pid
+    with _pusher_lock:
+        if _pusher is not None and _pusher.is_alive() and _pusher_pid == os.getpid():
+            return
+        _pusher_stop.clear()
+        _pusher = threading.Thread(target=_push_periodically, args=(interval,), name="metrics-pusher", daemon=True)
+        _pusher_pid = os.getpid()
+        _pusher.start()
+
+
+def stop_metrics_pusher(final_push: bool = True):
+    """
+    Stops the pusher thread; with final_push the latest metrics are published once
+    more, so the last tasks of a stopping worker are not lost.
+    """
+    global _pusher
+    with _pusher_lock:
+        pusher, _pusher = _pusher, None
+        _pusher_stop.set()
+    if pusher is not None and pusher is not threading.current_thread():
+        pusher.join(timeout=5)
+    if final_push:
+        push_worker_metrics(force=True)
+
+
+def collect_all() -> dict:
+    """
+    This process' metrics merged with the latest snapshot of every live worker.
+    """
+    record_logging_metrics()
+    snapshots = [registry.snapshot()]
+    try:
+        client = _get_redis()
+        own = _worker_key().encode()
+        keys = [k for k in client.scan_iter(match=METRICS_KEY_PREFIX + "*", count=100) if k != own]
+        if keys:
+            snapshots.extend(json.loads(raw) for raw in client.mget(keys) if raw)
+    except Exception as e:
+        logger.warning("Could not read worker metrics: %s", e)
+    return merge_snapshots(snapshots)
+
+
+def render_metrics() -> str:
+    return render_prometheus(collect_all())
+
+
+# Helpers for the metrics recorded across the code base
+
+def observe_stage(stage: str, seconds: float, status: str = "ok"):
+    registry.observe("agent_stage_duration_seconds", seconds, "Duration of agent stages (tool invocations)", stage=stage, status=status)
+    if status != "ok":
+        registry.inc("agent_stage_errors_total", 1, "Failed agent stages", stage=stage)
+
+
+def observe_llm_call(model: str, stage: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0, status: str = "ok"):
+    registry.observe("llm_call_duration_seconds", seconds, "Duration of LLM calls", model=model, stage=stage, status=status)
+    if prompt_tokens:
+        registry.inc("llm_tokens_total", prompt_tokens, "LLM tokens used", model=model, stage=stage, kind="prompt")
+    if completion_tokens:
+        registry.inc("llm_tokens_total", completion_tokens, "LLM tokens used", model=model, stage=stage, kind="completion")
+    cost = llm_cost(model, prompt_tokens, completion_tokens)
+    if cost:
+        registry.inc("llm_cost_usd_total", cost, "Estimated LLM cost in USD", model=model, stage=stage)
+
+
+def record_cache(cache: str, hits: int, misses: int):
+    if hits:
+        registry.inc("cache_hits_total", hits, "Cache hits by cache", cache=cache)
+    if misses:
+        registry.inc("cache_misses_total", misses, "Cache misses by cache", cache=cache)
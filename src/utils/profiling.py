@@ -0,0 +1,267 @@
+# src/utils/profiling.py
+import os
+import io
+import sys
+import json
+import time
+import random
+import logging
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Shared by workers and the API, which serves the artifacts
+PROFILE_ROOT = os.getenv("PROFILE_ROOT", "./../profiles")
+# Fraction of tasks profiled without being asked to (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Profiler used for sampled tasks: "cprofile" (deterministic) or "sample" (statistical)
+PROFILE_DEFAULT_MODE = os.getenv("PROFILE_DEFAULT_MODE", "sample")
+# Seconds between stack samples in "sample" mode
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Functions listed in an artifact's summary
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "30"))
+
+# Celery message header requesting a profile: "cprofile", "sample" (or "1" for the default)
+PROFILE_HEADER = "profile"
+MODES = ("cprofile", "sample")
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread records the target thread's stack every
+    interval seconds. Cost is paid by the sampling thread, not the profiled code, so it
+    suits LLM- and I/O-bound tasks; output is collapsed stacks (flamegraph.pl / speedscope).
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"stack-sampler-{thread_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int) -> List[dict]:
+        """
+        Functions by share of samples they were on the stack (inclusive) and on top of it (self).
+        """
+        inclusive, own = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            for name in set(frames):
+                inclusive[name] += count
+            own[frames[-1]] += count
+        total = self.samples or 1
+        return [
+            {"function": name, "inclusive_pct": round(100 * n / total, 1), "self_pct": round(100 * own[name] / total, 1)}
+            for name, n in inclusive.most_common(limit)
+        ]
+
+
+class TaskProfile:
+    """
+    One profiled task run: start(), stop(), then save() writes the artifact.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode if mode in MODES else PROFILE_DEFAULT_MODE
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self.started = 0.0
+        self.seconds = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+                return
+            except ValueError:
+                # Only one deterministic profiler can be active at a time (Python 3.12+),
+                # so a concurrent profiled task falls back to sampling
+                self._profiler = None
+                self.mode = "sample"
+        self._sampler = StackSampler(threading.get_ident())
+        self._sampler.start()
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.seconds = time.perf_counter() - self.started
+
+    def _top_cprofile(self, limit: int) -> List[dict]:
+        stats = pstats.Stats(self._profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({
+                "function": f"{name} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "self_s": round(own, 6),
+                "cumulative_s": round(cumulative, 6),
+            })
+        return sorted(rows, key=lambda r: -r["cumulative_s"])[:limit]
+
+    def save(self, profile_id: str, attributes: Optional[dict] = None) -> dict:
+        """
+        Writes <profile_id>.prof (pstats, for snakeviz/pstats) or <profile_id>.collapsed
+        (collapsed stacks) and <profile_id>.json (metadata and top functions) under PROFILE_ROOT.
+        """
+        os.makedirs(PROFILE_ROOT, exist_ok=True)
+        if self._profiler is not None:
+            filename = f"{profile_id}.prof"
+            self._profiler.dump_stats(os.path.join(PROFILE_ROOT, filename))
+            top = self._top_cprofile(PROFILE_TOP_FUNCTIONS)
+        else:
+            filename = f"{profile_id}.collapsed"
+            with open(os.path.join(PROFILE_ROOT, filename), "w", encoding="utf-8") as f:
+                f.write(self._sampler.collapsed())
+            top = self._sampler.top(PROFILE_TOP_FUNCTIONS)
+        summary = {
+            "profile_id": profile_id,
+            "mode": self.mode,
+            "artifact": filename,
+            "seconds": round(self.seconds, 3),
+            "samples": self._sampler.samples if self._sampler else None,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            **(attributes or {}),
+            "top": top,
+        }
+        with open(os.path.join(PROFILE_ROOT, f"{profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def requested_mode(value) -> Optional[str]:
+    """
+    Profiler mode asked for by a header/query value, None when profiling is not requested.
+    """
+    if value is None or value is False:
+        return None
+    value = str(value).strip().lower()
+    if value in MODES:
+        return value
+    if value in ("1", "true", "yes", "on"):
+        return PROFILE_DEFAULT_MODE
+    return None
+
+
+def artifact_path(profile_id: str, filename: str) -> Optional[str]:
+    """
+    Path of one of a profile's files, None for names outside PROFILE_ROOT or missing files.
+    """
+    if os.path.basename(filename) != filename or not filename.startswith(profile_id + "."):
+        return None
+    path = os.path.join(PROFILE_ROOT, filename)
+    return path if os.path.isfile(path) else None
+
+
+def load_summary(profile_id: str) -> Optional[dict]:
+    path = artifact_path(profile_id, f"{profile_id}.json")
+    if path is None:
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Celery: a task is profiled when its message carries the profile header, or when it is
+# sampled (PROFILE_SAMPLE_RATE). Unprofiled tasks cost one header lookup.
+
+_active: Dict[str, TaskProfile] = {}
+
+
+def _record_in_task_log(summary: dict, kwargs: dict):
+    """
+    Links the artifact to the task: a "Profiler" entry in its task logs.
+    """
+    if not all(kwargs.get(k) is not None for k in ("user_id", "project_id", "task_id")):
+        return
+    from src.db.models import SessionLocal
+    from src.utils.log_agent_execution import log_agent_execution
+
+    db = SessionLocal()
+    try:
+        log_agent_execution(
+            db=db,
+            user_id=kwargs["user_id"],
+            project_id=kwargs["project_id"],
+            project_name=kwargs.get("project_name") or "",
+            task_id=kwargs["task_id"],
+            agent_name="Profiler",
+            status="profiled",
+            output=json.dumps({k: v for k, v in summary.items() if k != "top"}),
+        )
+    except Exception as e:
+        logger.warning("Could not link profile %s to task logs: %s", summary["profile_id"], e)
+    finally:
+        db.close()
+
+
+def instrument_celery():
+    from celery.signals import task_prerun, task_postrun
+
+    @task_prerun.connect(weak=False)
+    def _start_profile(task_id=None, task=None, **kwargs):
+        request = getattr(task, "request", None)
+        mode = requested_mode(getattr(request, PROFILE_HEADER, None))
+        if mode is None and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            mode = PROFILE_DEFAULT_MODE
+        if mode is None:
+            return
+        profile = TaskProfile(mode)
+        _active[task_id] = profile
+        profile.start()
+
+    @task_postrun.connect(weak=False)
+    def _save_profile(task_id=None, task=None, kwargs=None, state=None, **extra):
+        profile = _active.pop(task_id, None)
+        if profile is None:
+            return
+        profile.stop()
+        kwargs = kwargs or {}
+        try:
+            summary = profile.save(task_id, {
+                "celery_task": task.name,
+                "state": state,
+                "task_id": kwargs.get("task_id"),
+                "project_name": kwargs.get("project_name"),
+            })
+        except OSError as e:
+            logger.warning("Could not write profile for %s [%s]: %s", task.name, task_id, e)
+            return
+        logger.info("%s [%s] profiled (%s, %ss): %s", task.name, task_id, summary["mode"], summary["seconds"], summary["artifact"])
+        _record_in_task_log(summary, kwargs)
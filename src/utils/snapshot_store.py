@@ -0,0 +1,252 @@
+# src/utils/snapshot_store.py
+import os
+import json
+import zlib
+import time
+import hashlib
+import logging
+import tempfile
+from typing import Dict, List, Optional
+
+from src.utils import file_operations
+from src.utils.file_operations import ChangeSet, ensure_project_directory, project_lock, write_files
+from src.utils.workspace_manifest import SKIP_DIRS
+
+# Where snapshots are kept; defaults to a "<projects root>.snapshots" directory next to
+# the projects root, so no project name can collide with the store
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_ROOT", "")
+# Every Nth snapshot stores its full tree, the others only their delta to the parent
+CHECKPOINT_INTERVAL = int(os.getenv("SNAPSHOT_CHECKPOINT_INTERVAL", "20"))
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """
+    In-process, git-like version store for generated workspaces.
+
+    - Blobs are zlib-compressed file contents addressed by their sha256 (the same hash
+      the workspace writer reports), shared by every iteration of every project.
+    - A snapshot records only the paths that changed since its parent; every
+      CHECKPOINT_INTERVAL-th snapshot records the full tree so lookups stay short.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or SNAPSHOT_ROOT or os.path.normpath(file_operations.PROJECTS_ROOT) + ".snapshots"
+        self.objects_dir = os.path.join(self.root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._trees: Dict[tuple, Dict[str, str]] = {}
+
+    # Blobs
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            _atomic_write(path, zlib.compress(data))
+        return digest
+
+    def get_blob(self, digest: str) -> bytes:
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    # Snapshot records
+
+    def _project_dir(self, project_name: str) -> str:
+        return os.path.join(self.root, "snapshots", project_name)
+
+    def _record_path(self, project_name: str, snapshot_id: int) -> str:
+        return os.path.join(self._project_dir(project_name), f"{snapshot_id:08d}.json")
+
+    def _load_record(self, project_name: str, snapshot_id: int) -> dict:
+        with open(self._record_path(project_name, snapshot_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _ids(self, project_name: str) -> List[int]:
+        directory = self._project_dir(project_name)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(n[:-5]) for n in os.listdir(directory) if n.endswith(".json"))
+
+    def list_snapshots(self, project_name: str) -> List[dict]:
+        snapshots = []
+        for snapshot_id in self._ids(project_name):
+            record = self._load_record(project_name, snapshot_id)
+            snapshots.append({k: record[k] for k in ("id", "parent", "label", "tags", "created_at")})
+        return snapshots
+
+    def latest(self, project_name: str) -> Optional[int]:
+        ids = self._ids(project_name)
+        return ids[-1] if ids else None
+
+    def tree(self, project_name: str, snapshot_id: int) -> Dict[str, str]:
+        """
+        {path: blob hash} of a snapshot, rebuilt from the nearest checkpoint.
+        """
+        key = (project_name, snapshot_id)
+        if key in self._trees:
+            return self._trees[key]
+        chain, current = [], snapshot_id
+        while True:
+            record = self._load_record(project_name, current)
+            chain.append(record)
+            if record.get("full") or record["parent"] is None:
+                break
+            current = record["parent"]
+        tree: Dict[str, str] = {}
+        for record in reversed(chain):
+            if record.get("full"):
+                tree = dict(record["set"])
+            else:
+                tree.update(record["set"])
+                for path in record["deleted"]:
+                    tree.pop(path, None)
+        self._trees[key] = tree
+        return tree
+
+    def _write_record(self, project_name: str, record: dict) -> int:
+        """
+        Allocates the next snapshot id with O_EXCL, so concurrent writers never share one.
+        """
+        directory = self._project_dir(project_name)
+        os.makedirs(directory, exist_ok=True)
+        snapshot_id = (self.latest(project_name) or 0) + 1
+        while True:
+            record["id"] = snapshot_id
+            try:
+                fd = os.open(self._record_path(project_name, snapshot_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
+                snapshot_id += 1
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(record, f, separators=(",", ":"))
+            return snapshot_id
+
+    def snapshot(self, project_name: str, change_set: Optional[ChangeSet] = None, label: str = "") -> int:
+        """
+        Records the current state of a project directory.
+
+        With a change set (from write_files) only the changed files are read and
+        stored; without one, or for the first snapshot, the whole directory is scanned.
+        Runs under the project's write lock, so the parent read here is still the
+        latest snapshot when the new id is allocated, and no write lands mid-scan.
+        """
+        with project_lock(project_name):
+            return self._snapshot(project_name, change_set, label)
+
+    def _snapshot(self, project_name: str, change_set: Optional[ChangeSet], label: str) -> int:
+        project_path = ensure_project_directory(project_name)
+        parent = self.latest(project_name)
+
+        if change_set is None or parent is None:
+            changes = {}
+            for dirpath, dirnames, filenames in os.walk(project_path):
+                dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+                for name in filenames:
+                    full = os.path.join(dirpath, name)
+                    rel = os.path.relpath(full, project_path).replace(os.sep, "/")
+                    with open(full, "rb") as f:
+                        changes[rel] = self.put_blob(f.read())
+            deleted = [p for p in self.tree(project_name, parent)] if parent else []
+            deleted = [p for p in deleted if p not in changes]
+        else:
+            changes = {}
+            for rel in change_set.added + change_set.modified:
+                with open(os.path.join(project_path, rel), "rb") as f:
+                    changes[rel] = self.put_blob(f.read())
+            deleted = list(change_set.deleted)
+
+        full = parent is None or change_set is None or (parent + 1) % CHECKPOINT_INTERVAL == 0
+        record = {
+            "parent": parent,
+            "label": label,
+            "tags": [],
+            "created_at": time.time(),
+            "full": full,
+            "set": changes,
+            "deleted": deleted,
+        }
+        if full and parent is not None and change_set is not None:
+            tree = dict(self.tree(project_name, parent))
+            tree.update(changes)
+            for path in deleted:
+                tree.pop(path, None)
+            record["set"], record["deleted"] = tree, []
+        return self._write_record(project_name, record)
+
+    def tag(self, project_name: str, snapshot_id: int, tag: str):
+        path = self._record_path(project_name, snapshot_id)
+        record = self._load_record(project_name, snapshot_id)
+        if tag not in record["tags"]:
+            record["tags"].append(tag)
+            _atomic_write(path, json.dumps(record, separators=(",", ":")).encode("utf-8"))
+
+    def latest_tagged(self, project_name: str, tag: str) -> Optional[int]:
+        """
+        Newest snapshot carrying tag; records are read newest first, up to the first match.
+        """
+        for snapshot_id in reversed(self._ids(project_name)):
+            if tag in self._load_record(project_name, snapshot_id)["tags"]:
+                return snapshot_id
+        return None
+
+    # Comparing and restoring
+
+    def diff(self, project_name: str, from_id: int, to_id: int) -> Dict[str, List[str]]:
+        """
+        Paths added, modified and deleted going from one snapshot to another.
+        Adjacent snapshots are answered from the stored delta alone.
+        """
+        if from_id is not None and to_id is not None and from_id != to_id:
+            record = self._load_record(project_name, to_id)
+            if record["parent"] == from_id and not record.get("full"):
+                old = self.tree(project_name, from_id)
+                return {
+                    "added": sorted(p for p in record["set"] if p not in old),
+                    "modified": sorted(p for p in record["set"] if p in old and old[p] != record["set"][p]),
+                    "deleted": sorted(p for p in record["deleted"] if p in old),
+                }
+        old = self.tree(project_name, from_id) if from_id is not None else {}
+        new = self.tree(project_name, to_id)
+        return {
+            "added": sorted(p for p in new if p not in old),
+            "modified": sorted(p for p in new if p in old and old[p] != new[p]),
+            "deleted": sorted(p for p in old if p not in new),
+        }
+
+    def read_file(self, project_name: str, snapshot_id: int, path: str) -> Optional[str]:
+        digest = self.tree(project_name, snapshot_id).get(path)
+        return self.get_blob(digest).decode("utf-8") if digest else None
+
+    def rollback(self, project_name: str, snapshot_id: int) -> ChangeSet:
+        """
+        Restores a project directory to a snapshot by rewriting only the files that
+        differ from the latest snapshot, then records the result as a new snapshot.
+        Blobs are written back as stored bytes, so binary files survive the round trip.
+        """
+        latest = self.latest(project_name)
+        changes = self.diff(project_name, latest, snapshot_id) if latest is not None else {"added": [], "modified": [], "deleted": []}
+        target = self.tree(project_name, snapshot_id)
+        files = {p: self.get_blob(target[p]) for p in changes["added"] + changes["modified"]}
+        files.update({p: None for p in changes["deleted"]})
+        change_set = write_files(project_name, files)
+        self.snapshot(project_name, change_set, label=f"rollback to {snapshot_id}")
+        logger.info("Project %s rolled back to snapshot %s (%d files)", project_name, snapshot_id, len(files))
+        return change_set
+
+
+def _atomic_write(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,263 @@
+# src/utils/symbol_index.py
+import os
+import ast
+import json
+import re
+import tempfile
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from src.utils import file_operations
+from src.utils.file_operations import ChangeSet, register_change_listener
+from src.utils.import_graph import ImportGraph, parse_imports
+from src.utils.workspace_manifest import MANIFEST_DIR, SKIP_DIRS, content_hash
+
+SYMBOLS_FILE = "symbols.json"
+SYMBOLS_VERSION = 1
+# Upper bound for the context block added to a prompt
+SYMBOL_CONTEXT_MAX_CHARS = int(os.getenv("SYMBOL_CONTEXT_MAX_CHARS", "6000"))
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_DOTTED = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\.[A-Za-z_][A-Za-z0-9_]*")
+
+
+def _signature(node) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(b) for b in node.bases] + [ast.unparse(k) for k in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+def extract_symbols(source: str) -> Optional[dict]:
+    """
+    {"definitions": [...], "imports": [...], "calls": [...]} for a Python source, or None
+    when it doesn't parse. Definitions are top-level functions and classes plus methods,
+    each with its signature, first docstring line and line range.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+    definitions = []
+
+    def visit(body, owner: Optional[str]):
+        for node in body:
+            if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                continue
+            doc = ast.get_docstring(node) or ""
+            definitions.append({
+                "name": node.name,
+                "qualname": f"{owner}.{node.name}" if owner else node.name,
+                "kind": "class" if isinstance(node, ast.ClassDef) else ("method" if owner else "function"),
+                "signature": _signature(node),
+                "doc": doc.strip().splitlines()[0] if doc.strip() else "",
+                "lineno": node.lineno,
+                "end_lineno": node.end_lineno,
+            })
+            if isinstance(node, ast.ClassDef) and owner is None:
+                visit(node.body, node.name)
+
+    visit(tree.body, None)
+    calls = sorted({name for node in ast.walk(tree) if isinstance(node, ast.Call) for name in [_call_name(node)] if name})
+    return {"definitions": definitions, "imports": parse_imports(tree), "calls": calls}
+
+
+class SymbolIndex:
+    """
+    Per-project index of definitions, signatures, imports and call references,
+    kept in the project's .coppercore directory and updated file by file as the
+    workspace writer reports changes.
+    """
+
+    def __init__(self, project_path: str):
+        self.project_path = project_path
+        self.path = os.path.join(project_path, MANIFEST_DIR, SYMBOLS_FILE)
+        self.files: Dict[str, dict] = {}
+        self._graph: Optional[ImportGraph] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == SYMBOLS_VERSION:
+                self.files = data.get("files", {})
+        except (OSError, ValueError):
+            self.refresh()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".symbols-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": SYMBOLS_VERSION, "files": self.files}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def update(self, paths: Iterable[str]) -> int:
+        """
+        Re-indexes the given project-relative paths; deleted paths are dropped.
+        Returns how many files were (re)parsed.
+        """
+        parsed = 0
+        with self._lock:
+            for rel in paths:
+                if not rel.endswith(".py"):
+                    continue
+                full = os.path.join(self.project_path, rel)
+                try:
+                    with open(full, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    self.files.pop(rel, None)
+                    continue
+                digest = content_hash(data)
+                if self.files.get(rel, {}).get("hash") == digest:
+                    continue
+                symbols = extract_symbols(data.decode("utf-8", errors="replace"))
+                self.files[rel] = {"hash": digest, **(symbols or {"definitions": [], "imports": [], "calls": []})}
+                parsed += 1
+            self._graph = None
+            self.save()
+        return parsed
+
+    def refresh(self) -> int:
+        """
+        Brings the whole index in line with the files on disk.
+        """
+        found = set()
+        for dirpath, dirnames, filenames in os.walk(self.project_path):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                if name.endswith(".py"):
+                    found.add(os.path.relpath(os.path.join(dirpath, name), self.project_path).replace(os.sep, "/"))
+        for rel in set(self.files) - found:
+            self.files.pop(rel, None)
+            self._graph = None
+        return self.update(sorted(found))
+
+    def apply(self, change_set: ChangeSet):
+        self.update(change_set.changed)
+
+    # Queries
+
+    def definitions(self, names: Set[str]) -> List[tuple]:
+        """
+        (relpath, definition) for every definition whose name is in names.
+        """
+        return [
+            (rel, d)
+            for rel, entry in sorted(self.files.items())
+            for d in entry["definitions"]
+            if d["name"] in names
+        ]
+
+    def references(self, name: str) -> List[str]:
+        """
+        Files calling or importing name.
+        """
+        return sorted(
+            rel for rel, entry in self.files.items()
+            if name in entry["calls"] or any(name in imp[1] for imp in entry["imports"])
+        )
+
+    def outline(self, rel: str) -> str:
+        entry = self.files.get(rel)
+        if not entry:
+            return ""
+        lines = [f"# {rel}"]
+        for d in entry["definitions"]:
+            indent = "    " if d["kind"] == "method" else ""
+            doc = f"  # {d['doc']}" if d["doc"] else ""
+            lines.append(f"{indent}{d['signature']}{doc}")
+        return "\n".join(lines)
+
+    def snippet(self, rel: str, definition: dict) -> str:
+        try:
+            with open(os.path.join(self.project_path, rel), "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return ""
+        return "\n".join(lines[definition["lineno"] - 1:definition["end_lineno"]])
+
+    @property
+    def graph(self) -> ImportGraph:
+        if self._graph is None:
+            self._graph = ImportGraph({rel: {"imports": e["imports"]} for rel, e in self.files.items()})
+        return self._graph
+
+    def context_for(self, text: str, filename: Optional[str] = None, max_chars: int = SYMBOL_CONTEXT_MAX_CHARS) -> str:
+        """
+        Prompt context for a task description (and optionally the file being edited):
+        the outline of that file, then the definitions the text or that file refer to.
+        Definitions named in the text come as full snippets, the others as signatures;
+        those in the file, its imports and its importers come first. Methods are only
+        matched through their class (Class.method) outside those files. Bounded by max_chars.
+        """
+        mentioned = set(_IDENTIFIER.findall(text))
+        dotted = set(_DOTTED.findall(text))
+        blocks: List[tuple] = []
+        related: Set[str] = set()
+        wanted = set(mentioned)
+
+        if filename and filename in self.files:
+            related = {filename} | self.graph.deps.get(filename, set()) | self.graph.rdeps.get(filename, set())
+            entry = self.files[filename]
+            wanted |= set(entry["calls"]) | {n for imp in entry["imports"] for n in imp[1]}
+            blocks.append(((0, 0, 0), self.outline(filename)))
+
+        for rel, d in self.definitions(wanted):
+            named = d["name"] in mentioned or d["qualname"] in dotted
+            if d["kind"] == "method" and rel not in related and d["qualname"] not in dotted:
+                continue
+            if rel == filename and (not named or d["kind"] == "class"):
+                continue  # already in the outline
+            if named and d["kind"] != "class":
+                block = f"# {rel}:{d['lineno']}\n{self.snippet(rel, d)}"
+            else:
+                block = f"# {rel}:{d['lineno']}\n{d['signature']}"
+            blocks.append(((1, 0 if rel in related else 1, 0 if named else 1), block))
+
+        context, size = [], 0
+        for _, block in sorted(blocks, key=lambda b: b[0]):
+            if size + len(block) > max_chars:
+                continue
+            context.append(block)
+            size += len(block) + 2
+        return "\n\n".join(context)
+
+
+_indexes: Dict[str, SymbolIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_symbol_index(project_name: str) -> SymbolIndex:
+    project_path = os.path.join(file_operations.PROJECTS_ROOT, project_name)
+    with _indexes_lock:
+        if project_path not in _indexes:
+            _indexes[project_path] = SymbolIndex(project_path)
+        return _indexes[project_path]
+
+
+def _on_workspace_change(change_set: ChangeSet):
+    get_symbol_index(change_set.project_name).apply(change_set)
+
+
+register_change_listener(_on_workspace_change)
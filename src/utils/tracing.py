@@ -0,0 +1,379 @@
+# src/utils/tracing.py
+import os
+import json
+import time
+import queue
+import logging
+import atexit
+import secrets
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Finished spans are appended here, one OTLP/JSON export request per line (the
+# format of the OpenTelemetry collector's file exporter); empty disables the file
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "./../traces/spans.jsonl")
+# Optional OTLP/HTTP collector, e.g. http://localhost:4318/v1/traces
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "coppercoreagent")
+# Buffered spans are exported once this many are waiting (and whenever a trace's root ends)
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+# Batches waiting for the export thread; when full, new batches are dropped rather than blocking
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "64"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+TRACEPARENT_HEADER = "traceparent"
+
+# Span kinds and status codes as numbered by OTLP
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT, KIND_PRODUCER, KIND_CONSUMER = 1, 2, 3, 4, 5
+STATUS_OK, STATUS_ERROR = 1, 2
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed operation of a trace. Spans are started with start_span() (as a
+    context manager) or begin_span() (ended explicitly, for callback-style code).
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, kind: int = KIND_INTERNAL, attributes: Optional[dict] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = 0
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.status = STATUS_ERROR
+        self.status_message = str(error)[:500]
+
+    def end(self, error=None):
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.set_error(error)
+        elif self.status == 0:
+            self.status = STATUS_OK
+        self.end_ns = time.time_ns()
+        _exporter.add(self)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": self.status, "message": self.status_message} if self.status_message else {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class _Exporter:
+    """
+    Buffers finished spans and hands them in batches to a background thread that
+    writes them to the export file and, if configured, an OTLP/HTTP collector. A full
+    queue drops the batch instead of blocking the thread that ended the span.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: List[Span] = []
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self.stats = {"exported": 0, "dropped": 0}
+
+    def add(self, span: Span):
+        if not TRACING_ENABLED:
+            return
+        with self._lock:
+            self._spans.append(span)
+            full = len(self._spans) >= TRACE_BATCH_SIZE
+        if full or span.parent_id is None:
+            self.submit()
+
+    def _start(self) -> queue.Queue:
+        # Called with self._lock held; a forked child (Celery prefork) starts its own thread
+        if self._pid != os.getpid():
+            self._queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name="trace-exporter", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+        return self._queue
+
+    def submit(self):
+        """
+        Queues the buffered spans for export without waiting for them to be written.
+        """
+        with self._lock:
+            spans, self._spans = self._spans, []
+            if not spans:
+                return
+            export_queue = self._start()
+            try:
+                export_queue.put_nowait(spans)
+            except queue.Full:
+                self.stats["dropped"] += len(spans)
+                dropped = self.stats["dropped"]
+            else:
+                return
+        logger.warning("Trace export queue full, dropped %d spans (%d in total)", len(spans), dropped)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Queues the buffered spans and waits up to timeout seconds until everything
+        queued so far is written; False if the export thread did not get there in time.
+        """
+        self.submit()
+        with self._lock:
+            if self._pid != os.getpid():
+                return True
+            export_queue = self._queue
+        done = threading.Event()
+        try:
+            export_queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _run(self, export_queue: queue.Queue):
+        while True:
+            item = export_queue.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self._export(item)
+            except Exception as e:
+                logger.warning("Could not export spans: %s", e)
+
+    def _export(self, spans: List[Span]):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    _otlp_attribute("service.name", TRACE_SERVICE_NAME),
+                    _otlp_attribute("process.pid", os.getpid()),
+                ]},
+                "scopeSpans": [{"scope": {"name": "src.utils.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+            }]
+        }
+        line = json.dumps(request, separators=(",", ":")) + "\n"
+        if TRACE_EXPORT_PATH:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(TRACE_EXPORT_PATH)), exist_ok=True)
+                # One write on an O_APPEND descriptor keeps lines of concurrent processes whole
+                fd = os.open(TRACE_EXPORT_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line.encode("utf-8"))
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.warning("Could not write spans: %s", e)
+        if TRACE_OTLP_ENDPOINT:
+            try:
+                import requests
+                requests.post(TRACE_OTLP_ENDPOINT, data=line, headers={"Content-Type": "application/json"}, timeout=5)
+            except Exception as e:
+                logger.warning("Could not export spans to %s: %s", TRACE_OTLP_ENDPOINT, e)
+        self.stats["exported"] += len(spans)
+
+
+_exporter = _Exporter()
+atexit.register(_exporter.flush)
+
+
+def flush(wait: bool = True):
+    """
+    Exports the buffered spans; with wait, returns once they are written (benchmarks
+    reading the export file, process exit).
+    """
+    if wait:
+        _exporter.flush()
+    else:
+        _exporter.submit()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[tuple]:
+    """
+    (trace_id, parent_span_id) from a W3C traceparent header, or None if malformed.
+    """
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2]
+
+
+def begin_span(name: str, kind: int = KIND_INTERNAL, parent: Optional[Span] = None, traceparent: Optional[str] = None, **attributes) -> Span:
+    """
+    Starts a span under parent, the remote parent named by traceparent, or the current
+    span; without any of them a new trace begins. The span is not made current.
+    """
+    parent = parent or (None if traceparent else _current_span.get())
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    remote = parse_traceparent(traceparent)
+    if remote:
+        return Span(name, remote[0], remote[1], kind, attributes)
+    return Span(name, secrets.token_hex(16), None, kind, attributes)
+
+
+def activate(span: Optional[Span]):
+    """
+    Makes span the current one; returns the token for deactivate().
+    """
+    return _current_span.set(span)
+
+
+def deactivate(token):
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Token from another context (callbacks ending on a different thread)
+        _current_span.set(None)
+
+
+@contextmanager
+def start_span(name: str, kind: int = KIND_INTERNAL, traceparent: Optional[str] = None, **attributes):
+    """
+    with start_span("name", key=value) as span: ... -- current for the block, ended
+    with an error status if the block raises.
+    """
+    span = begin_span(name, kind=kind, traceparent=traceparent, **attributes)
+    token = activate(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.end(error=e)
+        raise
+    finally:
+        deactivate(token)
+        span.end()
+
+
+def inject(headers: Optional[Dict] = None) -> Dict:
+    """
+    Adds the current span's traceparent to headers (for Celery messages, HTTP calls).
+    """
+    headers = headers if headers is not None else {}
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+# Celery: the publishing side adds the traceparent to the message headers, the worker
+# runs every task inside a consumer span continuing that trace.
+
+_task_spans: Dict[str, tuple] = {}
+
+
+def instrument_celery():
+    from celery.signals import before_task_publish, task_prerun, task_postrun, task_failure
+
+    @before_task_publish.connect(weak=False)
+    def _inject_trace(headers=None, **kwargs):
+        if headers is not None:
+            inject(headers)
+
+    @task_prerun.connect(weak=False)
+    def _start_task_span(task_id=None, task=None, **kwargs):
+        request = getattr(task, "request", None)
+        traceparent = getattr(request, TRACEPARENT_HEADER, None) or (request.get(TRACEPARENT_HEADER) if hasattr(request, "get") else None)
+        span = begin_span(f"celery {task.name}", kind=KIND_CONSUMER, traceparent=traceparent,
+                          **{"celery.task_id": task_id, "celery.retries": getattr(request, "retries", 0)})
+        _task_spans[task_id] = (span, activate(span))
+
+    @task_failure.connect(weak=False)
+    def _fail_task_span(task_id=None, exception=None, **kwargs):
+        entry = _task_spans.get(task_id)
+        if entry:
+            entry[0].set_error(exception)
+
+    @task_postrun.connect(weak=False)
+    def _end_task_span(task_id=None, state=None, **kwargs):
+        entry = _task_spans.pop(task_id, None)
+        if entry is None:
+            return
+        span, token = entry
+        span.set_attribute("celery.state", state)
+        deactivate(token)
+        span.end()
+        flush(wait=False)
+
+
+# SQLAlchemy: one span per session flush, under whatever span is current.
+
+def instrument_sqlalchemy(session_class):
+    from sqlalchemy import event
+
+    @event.listens_for(session_class, "before_flush")
+    def _start_flush_span(session, flush_context, instances):
+        if _current_span.get() is None:
+            return  # not part of a traced request or task
+        session.info["trace_flush_span"] = begin_span(
+            "db.flush", kind=KIND_CLIENT,
+            **{"db.new": len(session.new), "db.dirty": len(session.dirty), "db.deleted": len(session.deleted)},
+        )
+
+    @event.listens_for(session_class, "after_flush_postexec")
+    def _end_flush_span(session, flush_context):
+        span = session.info.pop("trace_flush_span", None)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(session_class, "after_rollback")
+    def _abort_flush_span(session):
+        span = session.info.pop("trace_flush_span", None)
+        if span is not None:
+            span.end(error="rolled back")
@@ -0,0 +1,327 @@
+# src/utils/usage_ledger.py
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from sqlalchemy import func
+
+env_path = Path(__file__).parent.parent / ".env"
+load_dotenv(dotenv_path=env_path)
+
+# Buffered ledger rows are written in one batch once this many are waiting ...
+USAGE_FLUSH_SIZE = int(os.getenv("USAGE_FLUSH_SIZE", "20"))
+# ... or the oldest has waited this long (and always when the task ends)
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))
+# Other tasks' spend against the same budgets is re-read at most this often
+USAGE_REFRESH_SECONDS = float(os.getenv("USAGE_REFRESH_SECONDS", "30"))
+# Default limits (0 = unlimited); rows in usage_budgets override them per user/project
+USAGE_TASK_MAX_TOKENS = int(os.getenv("USAGE_TASK_MAX_TOKENS", "2000000"))
+USAGE_PROJECT_DAILY_MAX_TOKENS = int(os.getenv("USAGE_PROJECT_DAILY_MAX_TOKENS", "0"))
+USAGE_USER_DAILY_MAX_TOKENS = int(os.getenv("USAGE_USER_DAILY_MAX_TOKENS", "0"))
+USAGE_USER_DAILY_MAX_USD = float(os.getenv("USAGE_USER_DAILY_MAX_USD", "0"))
+# Past this fraction of any budget, models are swapped for their cheaper counterpart
+USAGE_DOWNGRADE_AT = float(os.getenv("USAGE_DOWNGRADE_AT", "0.8"))
+USAGE_DOWNGRADE_MODELS = {
+    "gpt-4o": "gpt-4o-mini",
+    "gpt-4": "gpt-4o-mini",
+    "o1-preview": "o1-mini",
+}
+USAGE_DOWNGRADE_MODELS.update(json.loads(os.getenv("USAGE_DOWNGRADE_MODELS_JSON", "{}")))
+
+PERIODS = ("task", "day", "month")
+STATUS_OK, STATUS_DOWNGRADE, STATUS_STOP = "ok", "downgrade", "stop"
+
+logger = logging.getLogger(__name__)
+
+# The ledger of the task running in this thread/context, see effective_model()
+_active_ledger = contextvars.ContextVar("active_ledger", default=None)
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised before an LLM call when the task, its project or its user is out of budget.
+    """
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def period_start(period: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    now = now or _utcnow()
+    if period == "day":
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return None
+
+
+def spend(db, user_id: int = None, project_id: int = None, task_id: int = None, since: datetime = None) -> Tuple[int, float]:
+    """
+    Tokens and cost in the ledger for the given filters, in one aggregate query.
+    """
+    from src.db.models import UsageRecord
+
+    query = db.query(
+        func.coalesce(func.sum(UsageRecord.prompt_tokens + UsageRecord.completion_tokens), 0),
+        func.coalesce(func.sum(UsageRecord.cost_usd), 0.0),
+    )
+    if user_id is not None:
+        query = query.filter(UsageRecord.user_id == user_id)
+    if project_id is not None:
+        query = query.filter(UsageRecord.project_id == project_id)
+    if task_id is not None:
+        query = query.filter(UsageRecord.task_id == task_id)
+    if since is not None:
+        query = query.filter(UsageRecord.created_at >= since)
+    tokens, cost = query.one()
+    return int(tokens), float(cost)
+
+
+def load_budgets(db, user_id: int, project_id: int) -> List[dict]:
+    """
+    The limits that apply to a task of this user and project: usage_budgets rows,
+    and the USAGE_* defaults for the scopes without a row.
+    """
+    from src.db.models import UsageBudget
+
+    rows = (
+        db.query(UsageBudget)
+        .filter(UsageBudget.user_id == user_id)
+        .filter((UsageBudget.project_id == project_id) | (UsageBudget.project_id.is_(None)))
+        .all()
+    )
+    budgets = [
+        {
+            "scope": "project" if row.project_id is not None else "user",
+            "period": row.period,
+            "max_tokens": row.max_tokens or 0,
+            "max_cost_usd": row.max_cost_usd or 0.0,
+        }
+        for row in rows
+        if row.period in PERIODS
+    ]
+    # A per-task row of the user or the project replaces the default task budget
+    configured = {("task", "task") if b["period"] == "task" else (b["scope"], b["period"]) for b in budgets}
+    defaults = [
+        {"scope": "task", "period": "task", "max_tokens": USAGE_TASK_MAX_TOKENS, "max_cost_usd": 0.0},
+        {"scope": "project", "period": "day", "max_tokens": USAGE_PROJECT_DAILY_MAX_TOKENS, "max_cost_usd": 0.0},
+        {"scope": "user", "period": "day", "max_tokens": USAGE_USER_DAILY_MAX_TOKENS, "max_cost_usd": USAGE_USER_DAILY_MAX_USD},
+    ]
+    budgets.extend(b for b in defaults if (b["scope"], b["period"]) not in configured)
+    return [b for b in budgets if b["max_tokens"] or b["max_cost_usd"]]
+
+
+def budget_status(used_tokens: int, used_cost: float, budget: dict) -> Tuple[str, float]:
+    fraction = max(
+        used_tokens / budget["max_tokens"] if budget["max_tokens"] else 0.0,
+        used_cost / budget["max_cost_usd"] if budget["max_cost_usd"] else 0.0,
+    )
+    if fraction >= 1:
+        return STATUS_STOP, fraction
+    if fraction >= USAGE_DOWNGRADE_AT:
+        return STATUS_DOWNGRADE, fraction
+    return STATUS_OK, fraction
+
+
+class UsageLedger:
+    """
+    Records the token usage and cost of one task's LLM calls and enforces the task's
+    budgets. Calls are buffered and written in batches; budget checks use the spend
+    read at start (and every USAGE_REFRESH_SECONDS) plus this task's own calls, so
+    enforcing costs no query per call.
+    """
+
+    def __init__(self, user_id: int, project_id: int, task_id: int, session_factory=None):
+        self.user_id = user_id
+        self.project_id = project_id
+        self.task_id = task_id
+        if session_factory is None:
+            from src.db.models import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._pending: List[dict] = []
+        self._oldest_pending = 0.0
+        self.budgets: List[dict] = []
+        self._others: Dict[int, Tuple[int, float]] = {}  # budget index -> spend of other tasks
+        self._refreshed = 0.0
+        self.tokens = 0  # this ledger's calls, flushed or not
+        self.cost_usd = 0.0
+        self._flushed_tokens = 0
+        self._flushed_cost = 0.0
+
+    def _scope_filters(self, budget: dict) -> dict:
+        if budget["period"] == "task" or budget["scope"] == "task":
+            filters = {"task_id": self.task_id}
+        elif budget["scope"] == "project":
+            filters = {"project_id": self.project_id}
+        else:
+            filters = {"user_id": self.user_id}
+        return {**filters, "since": period_start(budget["period"])}
+
+    def start(self):
+        """
+        Loads the budgets and the spend already counted against them.
+        """
+        db = self._session_factory()
+        try:
+            self.budgets = load_budgets(db, self.user_id, self.project_id)
+            self._refresh(db)
+        except Exception as e:
+            logger.warning("Could not load usage budgets: %s", e, extra={"task_id": self.task_id})
+        finally:
+            db.close()
+        return self
+
+    def _refresh(self, db):
+        # The ledger already holds this ledger's flushed calls; they are counted through self.tokens
+        for index, budget in enumerate(self.budgets):
+            tokens, cost = spend(db, **self._scope_filters(budget))
+            self._others[index] = (tokens - self._flushed_tokens, cost - self._flushed_cost)
+        self._refreshed = time.monotonic()
+
+    def record(self, model: str, stage: str, prompt_tokens: int, completion_tokens: int, cost_usd: float):
+        with self._lock:
+            if not self._pending:
+                self._oldest_pending = time.monotonic()
+            self._pending.append({
+                "user_id": self.user_id,
+                "project_id": self.project_id,
+                "task_id": self.task_id,
+                "model": model,
+                "stage": stage,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost_usd": cost_usd,
+                "created_at": _utcnow(),
+            })
+            self.tokens += prompt_tokens + completion_tokens
+            self.cost_usd += cost_usd
+            due = len(self._pending) >= USAGE_FLUSH_SIZE or time.monotonic() - self._oldest_pending >= USAGE_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered calls in one batch; refreshes other tasks' spend when it is stale.
+        A failed write keeps the rows for the next flush.
+        """
+        from src.db.models import UsageRecord
+
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows and time.monotonic() - self._refreshed < USAGE_REFRESH_SECONDS:
+            return
+        db = self._session_factory()
+        try:
+            if rows:
+                db.execute(UsageRecord.__table__.insert(), rows)
+                db.commit()
+                with self._lock:
+                    self._flushed_tokens += sum(r["prompt_tokens"] + r["completion_tokens"] for r in rows)
+                    self._flushed_cost += sum(r["cost_usd"] for r in rows)
+            if self.budgets and time.monotonic() - self._refreshed >= USAGE_REFRESH_SECONDS:
+                self._refresh(db)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Could not write %d usage records: %s", len(rows), e, extra={"task_id": self.task_id})
+            with self._lock:
+                self._pending = rows + self._pending
+        finally:
+            db.close()
+
+    def status(self) -> Tuple[str, Optional[str]]:
+        """
+        (STATUS_OK | STATUS_DOWNGRADE | STATUS_STOP, reason) for the most exhausted budget.
+        """
+        worst, reason, worst_fraction = STATUS_OK, None, 0.0
+        for index, budget in enumerate(self.budgets):
+            other_tokens, other_cost = self._others.get(index, (0, 0.0))
+            state, fraction = budget_status(other_tokens + self.tokens, other_cost + self.cost_usd, budget)
+            if fraction > worst_fraction:
+                worst_fraction = fraction
+                if state != STATUS_OK:
+                    worst = state
+                    reason = f"{budget['scope']} budget ({budget['period']}) at {fraction:.0%}"
+        return worst, reason
+
+    def enforce(self):
+        state, reason = self.status()
+        if state == STATUS_STOP:
+            raise BudgetExceeded(f"Usage budget exhausted for task {self.task_id}: {reason}")
+
+    def summary(self) -> dict:
+        state, reason = self.status()
+        return {"tokens": self.tokens, "cost_usd": round(self.cost_usd, 6), "status": state, "reason": reason}
+
+
+def activate(ledger: Optional[UsageLedger]):
+    return _active_ledger.set(ledger)
+
+
+def deactivate(token):
+    _active_ledger.reset(token)
+
+
+def active_ledger() -> Optional[UsageLedger]:
+    return _active_ledger.get()
+
+
+def effective_model(model_name: str) -> str:
+    """
+    The model to use for a call of the running task: its cheaper counterpart once
+    a budget of the task is nearly exhausted.
+    """
+    ledger = _active_ledger.get()
+    if ledger is None or ledger.status()[0] == STATUS_OK:
+        return model_name
+    return USAGE_DOWNGRADE_MODELS.get(model_name, model_name)
+
+
+def usage_report(db, user_id: int = None, project_id: int = None, task_id: int = None, since: datetime = None) -> dict:
+    """
+    Spend for the given filters, in total and by model and stage.
+    """
+    from src.db.models import UsageRecord
+
+    tokens = func.sum(UsageRecord.prompt_tokens + UsageRecord.completion_tokens)
+    filters = []
+    if user_id is not None:
+        filters.append(UsageRecord.user_id == user_id)
+    if project_id is not None:
+        filters.append(UsageRecord.project_id == project_id)
+    if task_id is not None:
+        filters.append(UsageRecord.task_id == task_id)
+    if since is not None:
+        filters.append(UsageRecord.created_at >= since)
+
+    def grouped(column):
+        rows = (
+            db.query(column, func.count(UsageRecord.id), func.sum(UsageRecord.prompt_tokens),
+                     func.sum(UsageRecord.completion_tokens), func.sum(UsageRecord.cost_usd))
+            .filter(*filters)
+            .group_by(column)
+            .order_by(tokens.desc())
+            .all()
+        )
+        return [
+            {"name": name, "calls": calls, "prompt_tokens": int(p or 0), "completion_tokens": int(c or 0), "cost_usd": round(float(cost or 0), 6)}
+            for name, calls, p, c, cost in rows
+        ]
+
+    by_model = grouped(UsageRecord.model)
+    return {
+        "calls": sum(r["calls"] for r in by_model),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in by_model),
+        "completion_tokens": sum(r["completion_tokens"] for r in by_model),
+        "cost_usd": round(sum(r["cost_usd"] for r in by_model), 6),
+        "by_model": by_model,
+        "by_stage": grouped(UsageRecord.stage),
+    }
@@ -0,0 +1,169 @@
+# src/utils/workspace_manifest.py
+import os
+import ast
+import json
+import hashlib
+import tempfile
+from typing import Dict, Iterable, Optional, Set
+
+from src.utils.import_graph import ImportGraph, parse_imports, module_exports, module_name_for
+
+MANIFEST_DIR = ".coppercore"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Directories that never contain generated project code
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "node_modules", ".mypy_cache", ".pytest_cache", MANIFEST_DIR}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class WorkspaceManifest:
+    """
+    Per-project record of file content hashes, their imports/exports and the last
+    result of each pipeline stage ("validate", "test", ...) for that content.
+
+    Files whose size and mtime are unchanged are not re-read; files whose content
+    hash is unchanged keep their cached results.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_DIR, MANIFEST_FILE)
+        self.files: Dict[str, dict] = {}
+        self._graph: Optional[ImportGraph] = None
+        # Module names of the Python files the last refresh() found deleted
+        self.removed_modules: Set[str] = set()
+
+    @classmethod
+    def load(cls, root: str) -> "WorkspaceManifest":
+        manifest = cls(root)
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                manifest.files = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+        return manifest
+
+    def save(self):
+        """
+        Writes the manifest through a temp file and an atomic rename, so concurrent
+        readers never see a torn file.
+        """
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _walk(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            for name in filenames:
+                full = os.path.join(dirpath, name)
+                yield os.path.relpath(full, self.root).replace(os.sep, "/"), full
+
+    def _index(self, rel: str, data: bytes, entry: dict):
+        entry["hash"] = content_hash(data)
+        entry["results"] = {}
+        if rel.endswith(".py"):
+            try:
+                tree = ast.parse(data)
+                entry["imports"] = parse_imports(tree)
+                entry["exports"] = module_exports(tree)
+            except (SyntaxError, ValueError):
+                entry["imports"], entry["exports"] = [], None
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> Dict[str, Set[str]]:
+        """
+        Brings the manifest up to date with the files on disk and returns
+        {"changed": {...}, "removed": {...}, "importers": {...}} as project-relative
+        paths, importers being the files that imported a removed one.
+
+        When paths is given (e.g. a change set from the workspace writer) only those
+        files are looked at and the directory walk is skipped.
+        """
+        changed, removed = set(), set()
+        if paths is not None and not self.files:
+            paths = None  # nothing indexed yet, the scoped refresh would miss everything else
+        if paths is None:
+            candidates = dict(self._walk())
+            removed = set(self.files) - set(candidates)
+        else:
+            candidates = {}
+            for rel in paths:
+                full = os.path.join(self.root, rel)
+                if os.path.isfile(full):
+                    candidates[rel] = full
+                elif rel in self.files:
+                    removed.add(rel)
+
+        for rel, full in candidates.items():
+            try:
+                st = os.stat(full)
+            except OSError:
+                if rel in self.files:
+                    removed.add(rel)
+                continue
+            entry = self.files.get(rel)
+            if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+                continue
+            with open(full, "rb") as f:
+                data = f.read()
+            if entry and entry.get("hash") == content_hash(data):
+                entry["size"], entry["mtime_ns"] = st.st_size, st.st_mtime_ns
+                continue
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            self._index(rel, data, entry)
+            self.files[rel] = entry
+            changed.add(rel)
+
+        # Importers of deleted files are only known from the graph as it was before
+        importers = self.graph.dependents(removed) - removed if removed else set()
+        self.removed_modules = {module_name_for(rel) for rel in removed if rel.endswith(".py")}
+        # src-layout projects import their packages without the 'src.' prefix
+        self.removed_modules |= {name[4:] for name in self.removed_modules if name.startswith("src.")}
+        for rel in removed:
+            self.files.pop(rel, None)
+        if changed or removed:
+            self._graph = None
+        return {"changed": changed, "removed": removed, "importers": importers}
+
+    @property
+    def graph(self) -> ImportGraph:
+        if self._graph is None:
+            self._graph = ImportGraph({rel: e for rel, e in self.files.items() if rel.endswith(".py")})
+        return self._graph
+
+    def python_files(self) -> Set[str]:
+        return {rel for rel in self.files if rel.endswith(".py")}
+
+    def affected(self, changes: Dict[str, Set[str]]) -> Set[str]:
+        """
+        Changed files plus every file that (transitively) imports a changed or removed one.
+        """
+        touched = changes["changed"] | changes.get("importers", set())
+        return (touched | self.graph.dependents(touched)) & set(self.files)
+
+    def get_result(self, rel: str, stage: str):
+        entry = self.files.get(rel)
+        return entry["results"].get(stage) if entry else None
+
+    def set_result(self, rel: str, stage: str, result):
+        if rel in self.files:
+            self.files[rel]["results"][stage] = result
+
+    def invalidate(self, paths: Iterable[str], stage: str):
+        for rel in paths:
+            if rel in self.files:
+                self.files[rel]["results"].pop(stage, None)
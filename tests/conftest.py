@@ -0,0 +1,39 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+# Settings read at import time: keep the suite off MySQL, Redis, OTLP and real workspaces
+_scratch = tempfile.mkdtemp(prefix="coppercore-tests-")
+for key, value in {
+    "DATABASE_URL": f"sqlite:///{os.path.join(_scratch, 'tests.sqlite')}",
+    "SQL_ECHO": "false",
+    "CELERY_BROKER_URL": "memory://",
+    "CELERY_RESULT_BACKEND": "cache+memory://",
+    "TRACE_EXPORT_PATH": os.path.join(_scratch, "spans.jsonl"),
+    "TRACE_OTLP_ENDPOINT": "",
+    "PROFILE_ROOT": os.path.join(_scratch, "profiles"),
+    "VECTOR_DB_ROOT": os.path.join(_scratch, "vector_db"),
+    "REPO_MIRRORS_ROOT": os.path.join(_scratch, "mirrors"),
+    "METRICS_PUSH_INTERVAL": "3600",
+    "RL_SCHEDULER": "off",
+    "TEST_RUNNER_PYTHON": sys.executable,
+}.items():
+    os.environ.setdefault(key, value)
+
+
+@pytest.fixture(autouse=True)
+def projects_root(tmp_path, monkeypatch):
+    """
+    Workspaces of every test go to its tmp_path; PROJECTS_ROOT itself is not configurable.
+    """
+    from src.utils import file_operations
+
+    monkeypatch.setattr(file_operations, "PROJECTS_ROOT", str(tmp_path))
+    monkeypatch.setattr(file_operations, "WORKSPACE_FSYNC", False)
+    return tmp_path
@@ -0,0 +1,73 @@
+# tests/test_agent_tools.py
+import uuid
+from types import SimpleNamespace
+
+import fakeredis
+
+from src.memory.short_term_memory import ShortTermMemory
+from src.utils.agent_tools import LLMCallbackForwarder, ToolExecutionTracker, _active_tracker, current_stage
+
+
+def llm_result(prompt_tokens, completion_tokens, model="gpt-4o"):
+    return SimpleNamespace(llm_output={"model_name": model, "token_usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}})
+
+
+def run_tool(tracker, name, inner=None, error=None):
+    run_id = uuid.uuid4()
+    tracker.on_tool_start({"name": name}, f"input for {name}", run_id=run_id)
+    if inner:
+        inner()
+    if error:
+        tracker.on_tool_error(error, run_id=run_id)
+    else:
+        tracker.on_tool_end(f"output of {name}", run_id=run_id)
+
+
+def test_llm_calls_inside_tools_are_attributed_to_the_tool():
+    tracker, forwarder = ToolExecutionTracker(task_id=1), LLMCallbackForwarder()
+
+    def tool_llm_call():
+        assert current_stage() == "codegen"
+        run_id = uuid.uuid4()
+        forwarder.on_llm_start({}, ["prompt"], run_id=run_id, invocation_params={"model_name": "gpt-4o"})
+        forwarder.on_llm_end(llm_result(100, 20), run_id=run_id)
+
+    run_tool(tracker, "codegen", inner=tool_llm_call)
+    run_id = uuid.uuid4()
+    tracker.on_llm_start({}, ["prompt"], run_id=run_id, invocation_params={"model_name": "gpt-4o-mini"})
+    tracker.on_llm_end(llm_result(10, 5, model="gpt-4o-mini"), run_id=run_id)
+
+    assert tracker.models == {"codegen": "gpt-4o", "core_agent": "gpt-4o-mini"}
+    assert tracker.llm["calls"] == 2 and tracker.llm["prompt_tokens"] == 110
+    assert tracker.summary()["stages"]["codegen"]["calls"] == 1
+
+
+def test_the_active_tracker_is_reset_when_the_tool_ends():
+    tracker = ToolExecutionTracker(task_id=2)
+    run_tool(tracker, "validate")
+    assert _active_tracker.get() is None and current_stage() is None
+    run_tool(tracker, "deploy", error=RuntimeError("boom"))
+    assert _active_tracker.get() is None
+    assert tracker.stages["deploy"]["errors"] == 1 and tracker.sequence == ["validate", "deploy"]
+
+    # Nested tools restore the outer tool's tracker
+    outer = ToolExecutionTracker(task_id=3)
+    run_tool(outer, "plan", inner=lambda: (run_tool(tracker, "codegen"), _check(outer)))
+    assert _active_tracker.get() is None
+
+
+def _check(expected):
+    assert _active_tracker.get() is expected
+
+
+def test_tool_io_is_recorded_in_short_term_memory():
+    memory = ShortTermMemory(4, client=fakeredis.FakeRedis())
+    tracker = ToolExecutionTracker(short_term_memory=memory, task_id=4)
+    run_tool(tracker, "codegen")
+    run_tool(tracker, "validate", error=ValueError("bad syntax"))
+    assert [(e["kind"], e["tool"], e["content"]) for e in memory.load()["entries"]] == [
+        ("tool_input", "codegen", "input for codegen"),
+        ("tool_output", "codegen", "output of codegen"),
+        ("tool_input", "validate", "input for validate"),
+        ("tool_error", "validate", "bad syntax"),
+    ]
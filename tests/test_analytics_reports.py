@@ -0,0 +1,93 @@
+# tests/test_analytics_reports.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.analytics.columnar import Dictionary
+from src.analytics.reports import build_report, dense_pairs, group_quantiles
+from src.db.models import Base, TaskLog, TaskModel, UsageRecord
+
+DAY_1, DAY_2 = datetime(2026, 1, 1), datetime(2026, 1, 2)
+
+
+def test_group_quantiles_match_numpy_per_group():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 4, 500)
+    values = rng.standard_normal(500)
+    values[::50] = np.nan
+    result = group_quantiles(groups, values, 5, quantiles=(0.5, 0.9))
+    for g in range(4):
+        selected = values[(groups == g) & ~np.isnan(values)]
+        assert result[g] == pytest.approx(np.percentile(selected, [50, 90]))
+    assert np.isnan(result[4]).all()
+
+
+def test_dictionary_codes_are_stable_across_chunks():
+    dictionary = Dictionary()
+    assert dictionary.encode(["plan", "codegen", "plan"]).tolist() == [1, 0, 1]
+    assert dictionary.encode(["test", "codegen"]).tolist() == [2, 0]
+    assert dictionary.values == ["codegen", "plan", "test"]
+    assert dictionary.codes(["plan", "missing"]).tolist() == [1, -1]
+    first, second, pair = dense_pairs(np.array([3, 1, 3]), np.array([0, 2, 0]))
+    assert (first.tolist(), second.tolist(), pair.tolist()) == ([1, 3], [2, 0], [1, 0, 1])
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[TaskModel.__table__, TaskLog.__table__, UsageRecord.__table__])
+    db = sessionmaker(bind=engine)()
+    for task_id, created, entries in (
+        (1, DAY_1, [("Analyze", "completed", 10), ("Codegen", "failed", 40), ("Codegen", "completed", 100), ("CoreAgent", "completed", 120)]),
+        (2, DAY_2, [("Analyze", "completed", 20), ("Codegen", "failed", 50), ("CoreAgent", "failed", 60)]),
+    ):
+        db.add(TaskModel(id=task_id, user_id=1, project_id=1, description="d", created_at=created))
+        for agent_name, status, seconds in entries:
+            db.add(TaskLog(user_id=1, project_id=1, task_id=task_id, project_name="p", agent_name=agent_name,
+                           status=status, output="x" * seconds, created_at=created + timedelta(seconds=seconds)))
+    for task_id, created, stage, model, prompt, completion, cost in (
+        (1, DAY_1, "codegen", "gpt-4o", 100, 50, 0.01),
+        (1, DAY_1, "codegen", "gpt-4o", 200, 100, 0.02),
+        (2, DAY_2, "analyze", "gpt-4o-mini", 10, 5, 0.001),
+    ):
+        db.add(UsageRecord(user_id=1, project_id=1, task_id=task_id, stage=stage, model=model, prompt_tokens=prompt,
+                           completion_tokens=completion, cost_usd=cost, created_at=created + timedelta(seconds=30)))
+    db.commit()
+    db.close()
+    return engine
+
+
+def test_the_report_aggregates_stages_tasks_tokens_and_days(engine):
+    report = build_report(engine, chunk_rows=2)
+    assert report["rows"] == {"task_logs": 7, "usage_records": 3, "tasks": 2, "chunks": 6}
+
+    stages = {row["stage"]: row for row in report["stages"]}
+    assert set(stages) == {"Analyze", "Codegen"}
+    codegen = stages["Codegen"]
+    assert (codegen["runs"], codegen["successes"], codegen["failures"], codegen["success_rate"]) == (3, 1, 2, 0.3333)
+    assert (codegen["tasks"], codegen["retries_per_task"], codegen["max_retries"], codegen["task_success_rate"]) == (2, 0.5, 1, 0.5)
+    assert codegen["seconds_p50"] == 30.0 and stages["Analyze"]["seconds_p50"] is None
+
+    tasks = report["tasks"]
+    assert (tasks["tasks"], tasks["completion_rate"], tasks["outcomes"]) == (2, 0.5, {"completed": 1, "failed": 1})
+    assert tasks["seconds_p50"] == 90.0 and tasks["completed_seconds_p50"] == 120.0
+
+    tokens = report["tokens"]
+    assert (tokens["calls"], tokens["tasks"], tokens["prompt_tokens"], tokens["completion_tokens"]) == (3, 2, 310, 155)
+    assert [(r["stage"], r["calls"], r["cost_usd"]) for r in tokens["by_stage"]] == [("codegen", 2, 0.03), ("analyze", 1, 0.001)]
+    assert report["daily"] == [
+        {"day": "2026-01-01", "tasks": 1, "failures": 1, "tokens": 450, "cost_usd": 0.03},
+        {"day": "2026-01-02", "tasks": 1, "failures": 2, "tokens": 15, "cost_usd": 0.001},
+    ]
+
+
+def test_reports_are_limited_to_the_time_range(engine):
+    report = build_report(engine, since="2026-01-02")
+    assert report["rows"]["task_logs"] == 3 and report["tasks"]["outcomes"] == {"failed": 1}
+    assert [r["day"] for r in report["daily"]] == ["2026-01-02"]
+    empty = build_report(engine, since="2027-01-01")
+    assert empty["stages"] == [] and empty["daily"] == [] and empty["tokens"]["calls"] == 0
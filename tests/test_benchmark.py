@@ -0,0 +1,90 @@
+# tests/test_benchmark.py
+import copy
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.benchmark.fake_llm import Cassette, FakeChatModel, LatencyModel, prompt_key
+from src.benchmark.harness import compare, scripted_response, summarize_spans
+
+
+def test_latency_samples_depend_on_seed_role_and_prompt_only():
+    model = LatencyModel({"default": "uniform:1,2", "deploy": "fixed:0.5"}, scale=0.1, seed=7)
+    assert model.sample("deploy", "a") == pytest.approx(0.05)
+    first = model.sample("codegen", "prompt-1")
+    assert 0.1 <= first <= 0.2
+    assert LatencyModel({"default": "uniform:1,2"}, scale=0.1, seed=7).sample("codegen", "prompt-1") == first
+    assert LatencyModel({"default": "uniform:1,2"}, scale=0.1, seed=8).sample("codegen", "prompt-1") != first
+    assert LatencyModel().sample("codegen") == 0.0
+    with pytest.raises(ValueError):
+        LatencyModel({"default": "lognormal:0.8"})
+
+
+def test_scripted_calls_report_token_usage_and_honour_stop_words():
+    model = FakeChatModel(responder=lambda messages: ("core_agent", "Action: plan\nObservation: made up"))
+    result = model._generate([HumanMessage(content="hello there")], stop=["\nObservation:"])
+    assert result.generations[0].message.content == "Action: plan"
+    usage = result.llm_output["token_usage"]
+    assert usage["prompt_tokens"] > 0 and usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+    assert result.llm_output["model_name"] == "fake"
+
+
+def test_recorded_answers_are_replayed_from_the_cassette(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    messages = [SystemMessage(content="You are the Plan Agent"), HumanMessage(content="plan it")]
+    real = FakeChatModel(responder=lambda messages: ("default", "recorded plan"))
+    recorder = FakeChatModel(mode="record", record_model=real, cassette=Cassette(path), responder=lambda m: ("plan", "unused"))
+    assert recorder.invoke(messages).content == "recorded plan"
+    recorder.cassette.save()
+
+    cassette = Cassette(path)
+    assert cassette.entries == {prompt_key(messages): {"role": "plan", "text": "recorded plan"}}
+    replay = FakeChatModel(mode="replay", cassette=cassette)
+    assert replay.invoke(messages).content == "recorded plan"
+    with pytest.raises(KeyError):
+        replay.invoke([HumanMessage(content="never recorded")])
+    assert (cassette.hits, cassette.misses) == (1, 1)
+
+
+def react_prompt(observations, tools="analyze, plan, codegen, validate, test, deploy"):
+    scratchpad = "".join(f"\nObservation: done {i}\nThought:" for i in range(observations))
+    return [HumanMessage(content=f"Action: the action to take, should be one of [{tools}]\nBegin!\n[project: bench-3]{scratchpad}")]
+
+
+def test_the_scripted_agent_walks_the_pipeline_with_the_offered_tools():
+    assert "Action: analyze" in scripted_response(react_prompt(0))[1]
+    assert "Action: codegen" in scripted_response(react_prompt(2))[1]
+    assert scripted_response(react_prompt(7))[1].endswith("Final Answer: Task 3: calculator.py and its tests were generated, validated, tested and deployed.")
+    # Without plan and validate on offer, the third turn is the second codegen step
+    role, text = scripted_response(react_prompt(2, tools="analyze, codegen, test, deploy"))
+    assert role == "core_agent" and '"filename": "test_calculator.py"' in text
+    assert scripted_response([HumanMessage(content="You are the Code Generation Agent. Target file: pkg/test_x.py")])[1].startswith("import pytest")
+
+
+def span(name, seconds, status=1, **attributes):
+    return {
+        "name": name, "startTimeUnixNano": "0", "endTimeUnixNano": str(int(seconds * 1e9)), "status": {"code": status},
+        "attributes": [{"key": k, "value": {"stringValue" if isinstance(v, str) else "intValue": str(v)}} for k, v in attributes.items()],
+    }
+
+
+def test_spans_summarize_into_stages_and_regressions_are_flagged():
+    stages, tokens = summarize_spans([
+        span("tool codegen", 0.2), span("tool codegen", 0.4, status=2), span("db.flush", 0.001), span("http GET", 1),
+        span("llm ChatOpenAI", 0.5, **{"agent.stage": "codegen", "llm.prompt_tokens": 100, "llm.completion_tokens": 20}),
+    ])
+    assert set(stages) == {"codegen", "db.flush", "llm:codegen"}
+    assert stages["codegen"]["count"] == 2 and stages["codegen"]["errors"] == 1
+    assert stages["codegen"]["total_s"] == pytest.approx(0.6)
+    assert tokens == {"prompt": 100, "completion": 20, "llm_calls": 1}
+
+    baseline = {
+        "tasks_per_sec": 1.0, "tasks": {"failed": 0}, "db": {"round_trips_per_task": 50}, "llm": {"tokens_per_task": 1000},
+        "stages": {"codegen": {"p50_s": 0.1, "p99_s": 0.2}, "db.flush": {"p50_s": 0.001, "p99_s": 0.001}},
+    }
+    current = copy.deepcopy(baseline)
+    current["db"]["round_trips_per_task"] = 80
+    current["stages"]["codegen"]["p99_s"] = 0.5
+    current["stages"]["db.flush"]["p50_s"] = 0.002  # doubled, but below MIN_STAGE_DELTA_S
+    assert compare(baseline, baseline) == []
+    assert [r.split(":")[0] for r in compare(baseline, current)] == ["db.round_trips_per_task", "codegen p99"]
@@ -0,0 +1,115 @@
+# tests/test_core_agent.py
+import fakeredis
+import pytest
+from langchain.agents import Tool
+from langchain_core.agents import AgentFinish
+
+from src.agent_factory import core_agent, langchain_integration
+from src.agent_factory import agent_continuation
+from src.agent_factory.agent_continuation import ASK_USER_TOOL, STATUS_FINISHED, STATUS_PAUSED, ExecutorCheckpoint
+from src.agent_factory.core_agent import CoreAgent
+from src.benchmark.fake_llm import FakeChatModel
+from src.db.models import AgentCheckpoint, Base, SessionLocal, TaskQuestionsAnswers, engine
+from src.memory import short_term_memory
+from src.utils.log_user_interaction import store_user_answers
+
+TASK_ID = 9001
+
+
+def respond(messages):
+    """
+    Asks for the language first, then builds with the answer it got.
+    """
+    scratchpad = "\n".join(str(m.content) for m in messages).rsplit("Begin!", 1)[1]
+    if "Observation:" not in scratchpad:
+        return "core_agent", "Thought: The language is missing.\nFinal Answer: Ask the user: Which language?"
+    if "Observation: built" not in scratchpad:
+        language = "Go" if "Go" in scratchpad.rsplit("Observation:", 1)[1] else "Python"
+        return "core_agent", f"Thought: The user answered.\nAction: build\nAction Input: {language}"
+    return "core_agent", "Thought: I now know the final answer\nFinal Answer: built the app"
+
+
+@pytest.fixture
+def agent_factory(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(short_term_memory, "_client", fakeredis.FakeRedis())
+    monkeypatch.setattr(core_agent, "get_pending_user_confirmation", lambda *args: [])
+    calls, built = [], []
+
+    def responder(messages):
+        calls.append(messages)
+        return respond(messages)
+
+    langchain_integration.set_llm_factory(lambda **kwargs: FakeChatModel(responder=responder))
+    db = SessionLocal()
+    for model in (AgentCheckpoint, TaskQuestionsAnswers):
+        db.query(model).filter(model.task_id == TASK_ID).delete()
+    db.commit()
+
+    def make():
+        agent = CoreAgent(db=db, user_id=1, task_id=TASK_ID, project_id=1, project_name="app", requirement="Build an app")
+        agent.tools = [Tool(name="build", func=lambda language: built.append(language) or f"built in {language}", description="Builds the app.")]
+        agent.agent_chain = agent._build_agent_chain()
+        return agent
+
+    yield make, calls, built, db
+    langchain_integration.set_llm_factory(None)
+    db.close()
+
+
+def test_a_paused_task_continues_with_the_stored_answers(agent_factory):
+    make, calls, built, db = agent_factory
+    assert make().run("Build an app") == "Awaiting user answers to clarifying questions."
+    checkpoint = ExecutorCheckpoint(db, TASK_ID, 1, 1).load()
+    assert checkpoint.status == STATUS_PAUSED and checkpoint.awaiting_answers
+    assert checkpoint.steps[-1][0].tool == ASK_USER_TOOL and "Which language?" in checkpoint.steps[-1][0].tool_input
+    assert checkpoint.steps[-1][0].log == "Thought: The language is missing.\nAction: user_interaction\nAction Input: Ask the user: Which language?"
+
+    # Run again before the user answered: no LLM call, still waiting
+    assert make().run("Build an app") == "Awaiting user answers to clarifying questions."
+    assert len(calls) == 1
+
+    question = db.query(TaskQuestionsAnswers).filter(TaskQuestionsAnswers.task_id == TASK_ID).one()
+    store_user_answers(db, question.id, ["Go"], answer_by=1)
+    assert make().run("Build an app") == "Final Answer: built the app"
+    assert built == ["Go"] and len(calls) == 3
+    assert "Observation: [\"Go\"]" in "\n".join(str(m.content) for m in calls[1])
+
+    checkpoint = ExecutorCheckpoint(db, TASK_ID, 1, 1).load()
+    row = db.query(AgentCheckpoint).filter(AgentCheckpoint.task_id == TASK_ID).one()
+    assert row.status == STATUS_FINISHED and [s["tool"] for s in row.steps] == [ASK_USER_TOOL, "build"]
+
+
+def test_answers_can_come_with_the_requirement_the_task_is_run_again_with(agent_factory):
+    make, calls, built, db = agent_factory
+    make().run("Build an app")
+    assert make().run("Build an app\n\nAnswers: use Python") == "Final Answer: built the app"
+    assert built == ["Python"]
+    assert "Observation: Build an app\n\nAnswers: use Python" in "\n".join(str(m.content) for m in calls[1])
+
+
+def test_a_run_stopped_without_a_final_answer_is_not_completed(agent_factory, monkeypatch):
+    make, calls, built, db = agent_factory
+    monkeypatch.setattr(agent_continuation, "CORE_AGENT_MAX_STEPS", 1)
+    make().run("Build an app")
+    store_user_answers(db, db.query(TaskQuestionsAnswers).filter(TaskQuestionsAnswers.task_id == TASK_ID).one().id, ["Go"], answer_by=1)
+    result = make().run("Build an app")
+    assert "Execution stopped due to error" in result and "Final Answer:" not in result
+    assert built == []
+
+
+def test_a_finish_without_the_final_answer_marker_is_not_completed(agent_factory, monkeypatch):
+    make, calls, built, db = agent_factory
+    refusal = AgentFinish({"output": "I cannot build that."}, "I cannot build that.")
+    monkeypatch.setattr(core_agent, "take_step", lambda *args, **kwargs: ([], refusal))
+    result = make().run("Build an app")
+    assert "Execution stopped due to error" in result and "Final Answer:" not in result
+
+
+def test_an_unsupported_langchain_fails_before_the_step(agent_factory, monkeypatch):
+    make, calls, built, db = agent_factory
+    monkeypatch.setattr(agent_continuation.langchain, "__version__", "0.4.0")
+    monkeypatch.setattr(core_agent.time, "sleep", lambda seconds: None)
+    result = make().run("Build an app")
+    assert result.startswith(core_agent.ERROR_STOPPED) and "supports langchain 0.3" in result
+    assert calls == []
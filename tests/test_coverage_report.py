@@ -0,0 +1,130 @@
+# tests/test_coverage_report.py
+import os
+
+import pytest
+
+from src.sandbox_manager.coverage_report import (
+    CoverageAggregator, bitmap_to_lines, changed_lines, format_coverage_summary, lines_to_bitmap,
+    parse_unified_diff, statement_lines,
+)
+from src.sandbox_manager.test_runner import run_tests
+
+SOURCE = "def f(x):\n    if x:\n        return 1\n    return 2\n"
+
+
+def shard_data(path, executed):
+    """
+    A shard's .coverage file as coverage.py writes it.
+    """
+    coverage = pytest.importorskip("coverage")
+    data = coverage.CoverageData(basename=path)
+    data.add_lines(executed)
+    data.write()
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / "mod.py").write_text(SOURCE)
+    return tmp_path
+
+
+def test_bitmap_round_trip():
+    lines = [1, 2, 7, 64, 65, 300]
+    assert bitmap_to_lines(lines_to_bitmap(lines)) == lines
+    assert bitmap_to_lines(0) == []
+
+
+def test_statement_lines():
+    assert bitmap_to_lines(statement_lines(SOURCE)) == [1, 2, 3, 4]
+    assert statement_lines("def broken(:\n") == 0
+
+
+def test_parse_unified_diff():
+    diff = (
+        "--- a/mod.py\n+++ b/mod.py\n@@ -1,3 +1,4 @@\n def f(x):\n-    pass\n+    if x:\n+        return 1\n     return 2\n"
+        "--- a/gone.py\n+++ /dev/null\n@@ -1 +0,0 @@\n-x = 1\n"
+    )
+    assert parse_unified_diff(diff) == {"mod.py": [2, 3]}
+
+
+def test_changed_lines():
+    assert changed_lines(None, "a\nb") == [1, 2]
+    assert changed_lines("a\nb\nc\n", "a\nB\nc\nd\n") == [2, 4]
+
+
+def test_shards_are_or_ed_together(project):
+    root = str(project)
+    hashes = {"mod.py": "h1"}
+    shard_data(str(project / ".coverage.0"), {os.path.join(root, "mod.py"): [1, 2, 3]})
+    shard_data(str(project / ".coverage.1"), {os.path.join(root, "mod.py"): [1, 2, 4], "/elsewhere/x.py": [1]})
+    aggregator = CoverageAggregator(root)
+    aggregator.reset_changed(hashes)
+    aggregator.merge_data_file(str(project / ".coverage.0"), hashes)
+    aggregator.merge_data_file(str(project / ".coverage.1"), hashes)
+    assert aggregator.file_coverage() == {"mod.py": {"covered": 4, "statements": 4}}
+    aggregator.close()
+
+
+def test_changed_file_drops_old_lines_and_counts_unexecuted(project):
+    root = str(project)
+    shard_data(str(project / ".coverage.0"), {os.path.join(root, "mod.py"): [1, 2, 3]})
+    aggregator = CoverageAggregator(root)
+    aggregator.merge_data_file(str(project / ".coverage.0"), {"mod.py": "h1"})
+    aggregator.close()
+
+    aggregator = CoverageAggregator(root)
+    aggregator.reset_changed({"mod.py": "h2"})
+    aggregator.add_unexecuted({"mod.py": "h2"})
+    summary = aggregator.summary({"mod.py": [3, 4]})
+    assert summary["covered"] == 0 and summary["lines"] == 4
+    assert summary["diff"]["uncovered"] == {"mod.py": [3, 4]}
+    assert "diff coverage 0.0%" in format_coverage_summary(summary)
+    aggregator.close()
+
+
+def test_lines_of_changed_or_removed_test_files_are_dropped(project):
+    root = str(project)
+    hashes = {"mod.py": "h1"}
+    shard_data(str(project / ".coverage.0"), {os.path.join(root, "mod.py"): [1, 2, 3, 4]})
+    aggregator = CoverageAggregator(root)
+    # Outside a test context, lines belong to the shard's tests that import the file
+    aggregator.merge_data_file(
+        str(project / ".coverage.0"), hashes, tests={"test_a.py": "k1", "test_b.py": "k1"},
+        imports={"test_a.py": {"test_a.py", "mod.py"}, "test_b.py": {"test_b.py"}},
+    )
+    assert aggregator.test_keys() == {"test_a.py": "k1", "test_b.py": "k1"}
+    aggregator.reset_changed(hashes, {"test_a.py": "k1", "test_b.py": "k1", "test_c.py": "k1"})
+    assert aggregator.file_coverage()["mod.py"]["covered"] == 4
+
+    aggregator.reset_changed(hashes, {"test_a.py": "k2", "test_b.py": "k1"})
+    assert aggregator.file_coverage()["mod.py"]["covered"] == 0
+    assert aggregator.test_keys() == {"test_b.py": "k1"}
+    aggregator.close()
+
+
+def test_unreadable_shard_is_skipped(project):
+    (project / ".coverage.0").write_bytes(b"not sqlite")
+    aggregator = CoverageAggregator(str(project))
+    aggregator.merge_data_file(str(project / ".coverage.0"), {"mod.py": "h1"})
+    assert aggregator.file_coverage() == {}
+    aggregator.close()
+
+
+def test_run_tests_reports_coverage(project):
+    pytest.importorskip("coverage")
+    (project / "test_mod.py").write_text("from mod import f\n\ndef test_f():\n    assert f(1) == 1\n")
+    result = run_tests(str(project), workers=1, changed_lines={"mod.py": [4]})
+    assert result["status"] == "passed"
+    assert result["coverage"]["files"]["mod.py"] == 75.0
+    assert result["coverage"]["diff"]["uncovered"] == {"mod.py": [4]}
+
+
+def test_removing_a_test_drops_the_lines_only_it_covered(project):
+    pytest.importorskip("coverage")
+    (project / "test_one.py").write_text("from mod import f\n\ndef test_one():\n    assert f(1) == 1\n")
+    (project / "test_zero.py").write_text("from mod import f\n\ndef test_zero():\n    assert f(0) == 2\n")
+    assert run_tests(str(project), workers=1)["coverage"]["files"]["mod.py"] == 100.0
+
+    (project / "test_zero.py").unlink()
+    result = run_tests(str(project), workers=1)
+    assert result["files_cached"] == 1 and result["coverage"]["files"]["mod.py"] == 75.0
@@ -0,0 +1,82 @@
+# tests/test_embedding_pipeline.py
+import hashlib
+import os
+
+import numpy as np
+import pytest
+
+from src.memory import embedding_pipeline
+from src.memory.embedding_pipeline import EmbeddingCache, EmbeddingPipeline, make_batches, text_hash
+
+
+class FakeEmbeddings:
+    """
+    Deterministic 8-dimensional embeddings that count provider calls.
+    """
+
+    model = "fake-embeddings"
+
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    @staticmethod
+    def vector(text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(8).tolist()
+
+    def embed_documents(self, texts):
+        self.documents.append(list(texts))
+        return [self.vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self.vector(text)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache("fake-embeddings", root=str(tmp_path))
+
+
+def test_batches_are_bounded_by_count_and_length():
+    assert make_batches(["a", "b", "c"], batch_size=2) == [["a", "b"], ["c"]]
+    assert make_batches(["aaaa", "bb", "cc"], batch_size=10, max_chars=5) == [["aaaa"], ["bb", "cc"]]
+
+
+def test_duplicates_and_cached_texts_are_embedded_once(cache):
+    fake = FakeEmbeddings()
+    pipeline = EmbeddingPipeline(fake, cache=cache, batch_size=2)
+    first = pipeline.embed(["a", "b", "a", "c"])
+    assert fake.documents == [["a", "b"], ["c"]]
+    np.testing.assert_allclose(first[0], first[2])
+
+    again = EmbeddingPipeline(FakeEmbeddings(), cache=EmbeddingCache("fake-embeddings", root=os.path.dirname(cache.path)))
+    np.testing.assert_allclose(again.embed(["c", "b"]), first[[3, 1]], atol=1e-2)
+    assert again.stats == {"texts": 2, "cached": 2, "embedded": 0, "calls": 0}
+
+
+def test_a_write_torn_between_vectors_and_hashes_is_cut_off(cache):
+    cache.put_many({text_hash("a"): np.ones(8)})
+    # A writer died after appending its vectors but before their digests
+    with open(cache._vectors_path, "ab") as f:
+        f.write(np.full((2, 8), 7, dtype=np.float16).tobytes())
+    cache.put_many({text_hash("b"): np.full(8, 2.0)})
+
+    fresh = EmbeddingCache("fake-embeddings", root=os.path.dirname(cache.path))
+    found = fresh.get_many([text_hash("a"), text_hash("b")])
+    np.testing.assert_allclose(found[text_hash("a")], np.ones(8))
+    np.testing.assert_allclose(found[text_hash("b")], np.full(8, 2.0))
+    assert os.path.getsize(cache._vectors_path) == 2 * 8 * 2
+
+
+def test_queries_use_a_bounded_in_memory_cache(cache, monkeypatch):
+    monkeypatch.setattr(embedding_pipeline, "QUERY_CACHE_SIZE", 2)
+    fake = FakeEmbeddings()
+    pipeline = EmbeddingPipeline(fake, cache=cache)
+    pipeline.embed(["indexed text"])
+    for query in ["q1", "q2", "q1", "q3", "q2", "indexed text"]:
+        pipeline.embed_query(query)
+    assert fake.queries == ["q1", "q2", "q3", "q2"]
+    assert list(pipeline._queries) == [text_hash("q2"), text_hash("indexed text")]
+    assert not os.path.exists(cache._hashes_path) or os.path.getsize(cache._hashes_path) == 32
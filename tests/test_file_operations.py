@@ -0,0 +1,51 @@
+# tests/test_file_operations.py
+import os
+import shutil
+import stat
+
+import pytest
+
+from src.utils.file_operations import create_or_update_file, delete_file, write_files
+
+
+def test_change_set_reports_added_modified_unchanged_and_deleted(projects_root):
+    first = write_files("p", {"a.py": "x = 1\n", "pkg/b.py": "y = 2\n"})
+    assert sorted(first.added) == ["a.py", "pkg/b.py"] and not first.modified
+
+    second = write_files("p", {"a.py": "x = 1\n", "pkg/b.py": "y = 3\n", "gone.py": None})
+    assert second.unchanged == ["a.py"] and second.modified == ["pkg/b.py"] and not second.deleted
+    assert (projects_root / "p" / "pkg" / "b.py").read_text() == "y = 3\n"
+
+    assert delete_file("p", "a.py") and not delete_file("p", "a.py")
+    assert not [name for name in os.listdir(projects_root / "p") if name.startswith(".tmp-")]
+
+
+def test_paths_outside_the_project_are_refused():
+    with pytest.raises(ValueError):
+        write_files("p", {"../escape.py": "x = 1\n"})
+
+
+def test_writes_recreate_a_deleted_project_directory(projects_root):
+    create_or_update_file("p", "pkg/a.py", "x = 1\n")
+    shutil.rmtree(projects_root / "p")
+    path = create_or_update_file("p", "pkg/a.py", "x = 1\n")
+    with open(path) as f:
+        assert f.read() == "x = 1\n"
+
+
+def test_new_files_get_the_default_mode_and_existing_files_keep_theirs(projects_root):
+    path = create_or_update_file("p", "new.py", "x = 1\n")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+    os.chmod(path, 0o755)
+    create_or_update_file("p", "new.py", "x = 2\n")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o755
+
+
+def test_a_failed_batch_deletes_nothing(projects_root):
+    write_files("p", {"a.py": "x = 1\n", "b.py": "y = 2\n"})
+    # a.py is a file, so nothing can be written below it
+    with pytest.raises(OSError):
+        write_files("p", {"b.py": None, "a.py/c.py": "z = 3\n"})
+    assert (projects_root / "p" / "b.py").read_text() == "y = 2\n"
+    assert not [name for name in os.listdir(projects_root / "p") if name.startswith(".tmp-")]
@@ -0,0 +1,104 @@
+# tests/test_github_service.py
+import os
+from types import SimpleNamespace
+
+import pytest
+from github import GithubException
+
+from src.github_integration import github_service
+from src.github_integration.github_service import git_blob_sha, push_change_set, push_files
+from src.utils.file_operations import write_files
+
+
+class FakeRepo:
+    """
+    The Git Data API calls push_files makes, recorded against an in-memory branch.
+    """
+
+    full_name = "acme/app"
+
+    def __init__(self, tree=None):
+        self.calls = []
+        self.pushed = []  # tree elements of every create_git_tree call
+        self.head = None
+        if tree is not None:
+            self.head = SimpleNamespace(sha="c0", tree=SimpleNamespace(sha="t0"))
+            self.tree = [SimpleNamespace(path=p, sha=git_blob_sha(c.encode()), mode=m, type="blob") for p, (c, m) in tree.items()]
+
+    def get_git_ref(self, name):
+        self.calls.append("get_git_ref")
+        if self.head is None:
+            raise GithubException(404, {"message": "Not Found"}, None)
+        return SimpleNamespace(object=SimpleNamespace(sha=self.head.sha), edit=lambda sha: self.calls.append(("edit", sha)))
+
+    def get_git_commit(self, sha):
+        self.calls.append("get_git_commit")
+        return self.head
+
+    def get_git_tree(self, sha, recursive=False):
+        self.calls.append("get_git_tree")
+        return SimpleNamespace(tree=self.tree)
+
+    def create_git_tree(self, elements, base_tree=None):
+        self.calls.append("create_git_tree")
+        self.pushed.append([e._identity for e in elements])
+        return SimpleNamespace(sha="t1")
+
+    def create_git_commit(self, message, tree, parents):
+        self.calls.append("create_git_commit")
+        return SimpleNamespace(sha="c1")
+
+    def create_git_ref(self, ref, sha):
+        self.calls.append(("create_git_ref", ref, sha))
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    holder = {}
+    monkeypatch.setattr(github_service, "get_repo", lambda name: holder["repo"])
+    return holder
+
+
+def test_unchanged_files_are_skipped_without_a_commit(repo):
+    repo["repo"] = fake = FakeRepo({"a.py": ("a = 1\n", "100644")})
+    result = push_files("app", {"a.py": "a = 1\n"})
+    assert result == {"commit": "c0", "changed": [], "skipped": 1}
+    assert "create_git_commit" not in fake.calls
+
+
+def test_a_change_set_is_one_commit_with_deletions(repo):
+    repo["repo"] = fake = FakeRepo({"a.py": ("a = 1\n", "100644"), "run.sh": ("echo\n", "100755"), "old.py": ("x\n", "100644")})
+    result = push_files("app", {"a.py": "a = 1\n", "b.py": "b = 1\n", "run.sh": None, "old.py": None, "never.py": None})
+    assert result == {"commit": "c1", "changed": ["b.py", "run.sh", "old.py"], "skipped": 2}
+    assert fake.pushed == [[
+        {"path": "b.py", "mode": "100644", "type": "blob", "content": "b = 1\n"},
+        {"path": "run.sh", "mode": "100755", "type": "blob", "sha": None},
+        {"path": "old.py", "mode": "100644", "type": "blob", "sha": None},
+    ]]
+    assert fake.calls.count("create_git_commit") == 1 and ("edit", "c1") in fake.calls
+
+
+def test_first_push_creates_the_branch(repo):
+    repo["repo"] = fake = FakeRepo()
+    assert push_files("app", {"a.py": "a = 1\n"}, branch="dev")["changed"] == ["a.py"]
+    assert ("create_git_ref", "refs/heads/dev", "c1") in fake.calls
+
+
+def test_paths_without_a_mode_keep_the_one_on_the_branch(repo):
+    repo["repo"] = fake = FakeRepo({"run.sh": ("echo\n", "100755"), "alias.py": ("lib.py", "120000")})
+    result = push_files("app", {"run.sh": "echo hi\n", "alias.py": "lib.py", "new.py": "x = 1\n"})
+    assert result["changed"] == ["run.sh", "new.py"]
+    assert [(e["path"], e["mode"]) for e in fake.pushed[0]] == [("run.sh", "100755"), ("new.py", "100644")]
+
+
+def test_change_sets_push_working_tree_modes(repo, tmp_path):
+    repo["repo"] = fake = FakeRepo({"run.sh": ("echo\n", "100644")})
+    change_set = write_files("app", {"run.sh": "echo\n", "lib.py": "x = 1\n"})
+    os.chmod(tmp_path / "app" / "run.sh", 0o755)
+    os.symlink("lib.py", tmp_path / "app" / "alias.py")
+    change_set.added.append("alias.py")
+
+    result = push_change_set("app", change_set)
+    assert sorted(result["changed"]) == ["alias.py", "lib.py", "run.sh"]
+    pushed = {e["path"]: (e["mode"], e["content"]) for e in fake.pushed[0]}
+    assert pushed == {"run.sh": ("100755", "echo\n"), "lib.py": ("100644", "x = 1\n"), "alias.py": ("120000", "lib.py")}
@@ -0,0 +1,52 @@
+# tests/test_lexical_index.py
+import pytest
+
+from src.memory.lexical_index import LexicalIndex, is_lexical_query, reciprocal_rank_fusion, tokenize
+
+
+def test_identifiers_are_split_into_their_parts():
+    assert tokenize("parseJsonResponse(load_user_config)") == [
+        "parsejsonresponse", "parse", "json", "response", "load_user_config", "load", "user", "config",
+    ]
+    assert tokenize("return the HTTPServer") == ["httpserver", "http", "server"]
+
+
+def test_lexical_queries_name_code():
+    assert is_lexical_query("load_user_config")
+    assert is_lexical_query("utils/config.py parseJson")
+    assert is_lexical_query("retry")
+    assert not is_lexical_query("how do we retry requests")
+    assert not is_lexical_query("")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=60)
+    assert [doc_id for doc_id, _ in fused] == [1, 3, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    index.add([0, 1, 2], [
+        "def load_user_config(path): ...",
+        "def save_user(user): ...",
+        "class ConfigLoader: ...",
+    ], ["a", "a", "b"])
+    return index
+
+
+def test_bm25_ranks_documents_matching_more_terms_first(index):
+    assert [hit["id"] for hit in index.search("load_user_config")][0] == 0
+    assert {hit["id"] for hit in index.search("config")} == {0, 2}
+    assert [hit["id"] for hit in index.search("config", project="b")] == [2]
+    assert index.search("the of") == []
+
+
+def test_new_versions_of_a_path_retire_the_old_document(index):
+    index.add([3], ["def load_settings(): ..."], ["a"], [("cfg.py", "h1")])
+    assert index.find([("cfg.py", "h1"), ("cfg.py", "h2")]) == {("cfg.py", "h1"): 3}
+    index.add([4], ["def read_settings(): ..."], ["a"], [("cfg.py", "h2")])
+    assert index.find([("cfg.py", "h1"), ("cfg.py", "h2")]) == {("cfg.py", "h2"): 4}
+    assert index.retired([3, 4]) == {3}
+    assert [hit["id"] for hit in index.search("settings")] == [4]
@@ -0,0 +1,96 @@
+# tests/test_logging_config.py
+import io
+import json
+import logging
+import queue
+from concurrent.futures import Future
+
+import pytest
+
+from src.memory import vector_db_client
+from src.utils import file_operations, logging_config
+from src.utils.logging_config import BoundedQueueHandler, DebugSampler, configure_logging, stop_logging
+from src.utils.tracing import start_span
+
+
+def record(msg, level=logging.INFO, name="src.test", args=(), **extra):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    rec.__dict__.update(extra)
+    return rec
+
+
+def test_a_full_queue_drops_records_instead_of_blocking():
+    handler = BoundedQueueHandler(queue.Queue(maxsize=2))
+    for i in range(5):
+        handler.handle(record("step %d", args=(i,)))
+    assert handler.stats["queued"] == 2 and handler.stats["dropped"] == 3
+    first = handler.queue.get_nowait()
+    assert first.msg == "step 0" and first.args is None
+
+
+def test_messages_and_fields_are_truncated_and_carry_the_trace(monkeypatch):
+    monkeypatch.setattr(logging_config, "LOG_MAX_FIELD_CHARS", 10)
+    handler = BoundedQueueHandler(queue.Queue())
+    with start_span("request") as span:
+        handler.handle(record("x" * 25, prompt="p" * 30, stage="codegen"))
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "xxxxxxxxxx... [15 more chars]" and queued.prompt.startswith("pppppppppp... [20")
+    assert queued.stage == "codegen" and queued.trace_id == span.trace_id
+    assert handler.stats["truncated"] == 1
+
+
+def test_debug_records_are_sampled_evenly_per_call_site():
+    sampler = DebugSampler(0.25)
+    kept = [sampler.filter(record("polling", level=logging.DEBUG)) for _ in range(8)]
+    assert kept.count(True) == 2
+    assert [sampler.filter(record("other site", level=logging.DEBUG)) for _ in range(4)] == [False, False, False, True]
+    assert all(sampler.filter(record("polling", level=logging.INFO)) for _ in range(3))
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    stop_logging()
+    logging_config._handler = None
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_records_reach_the_stream_as_json_lines(root_logger):
+    stream = io.StringIO()
+    configure_logging(stream=stream, force=True)
+    logging.getLogger("src.test").info("Task %s done", 7, extra={"task_id": 7})
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        logging.getLogger("src.test").exception("Failed")
+    stop_logging()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(l["level"], l["logger"], l["msg"]) for l in lines] == [("INFO", "src.test", "Task 7 done"), ("ERROR", "src.test", "Failed")]
+    assert lines[0]["task_id"] == 7 and "ValueError: bad" in lines[1]["exc"]
+    assert logging_config.logging_stats()["queued"] == 2
+
+
+def test_background_failures_and_listener_errors_are_logged(caplog):
+    future = Future()
+    future.set_exception(RuntimeError("disk full"))
+    vector_db_client._report_compaction_failure(future)
+    failed = [r for r in caplog.records if r.name == "src.memory.vector_db_client"]
+    assert failed[0].levelno == logging.ERROR and failed[0].exc_info[1].args == ("disk full",)
+
+    def broken_listener(change_set):
+        raise KeyError("boom")
+
+    file_operations.register_change_listener(broken_listener)
+    try:
+        file_operations.write_files("p", {"a.py": "x = 1\n"})
+    finally:
+        file_operations._change_listeners.remove(broken_listener)
+    messages = [r.getMessage() for r in caplog.records if r.name == "src.utils.file_operations"]
+    assert any(m.startswith("Change listener") and "broken_listener" in m for m in messages)
@@ -0,0 +1,89 @@
+# tests/test_memory_service.py
+import os
+
+import pytest
+
+from src.memory.embedding_pipeline import EmbeddingCache, EmbeddingPipeline
+from src.memory.memory_service import MemoryService
+from src.memory.vector_db_client import ShardedVectorDB
+from tests.test_embedding_pipeline import FakeEmbeddings
+
+
+@pytest.fixture
+def service(tmp_path):
+    fake = FakeEmbeddings()
+    service = MemoryService(api_key=None, embeddings=fake)
+    service.pipeline = EmbeddingPipeline(fake, cache=EmbeddingCache(fake.model, root=str(tmp_path / "cache")))
+    service.store = ShardedVectorDB("snippets", root=str(tmp_path / "vectors"))
+    return service
+
+
+def write(root, rel, source):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+def test_reindexing_a_project_adds_only_changed_files(service, tmp_path):
+    root = str(tmp_path / "shop")
+    write(root, "cart.py", "def add_to_cart(item):\n    pass\n")
+    write(root, "pay.py", "def charge_card(amount):\n    pass\n")
+    write(root, "notes.bin", "skipped")
+    first = service.index_project(root, background=False)
+    assert service.index_project(root, background=False) == first
+    assert service.store.shard("shop").count() == 2
+
+    write(root, "pay.py", "def refund_payment(amount):\n    pass\n")
+    service.index_project(root, background=False)
+    assert service.store.shard("shop").count() == 3
+    assert service.search("charge_card", k=2, project="shop", mode="lexical") == []
+    paths = [hit["metadata"]["path"] for hit in service.search("refund payment amount", k=5, project="shop", mode="vector")]
+    assert sorted(paths) == ["cart.py", "pay.py"]
+
+
+def test_repeated_snippets_share_one_id(service):
+    ids = service.add_snippets(["x = 1", "y = 2", "x = 1"], [{"project": "p"}, {"project": "p"}, {"project": "p"}])
+    assert ids[0] == ids[2] != ids[1]
+    assert service.add_snippet("x = 1", {"project": "p"}) == ids[0]
+    # The same text in another project is a separate document
+    assert service.add_snippet("x = 1", {"project": "q"})[0] == "q"
+    assert service.pipeline.stats["embedded"] == 2
+
+
+@pytest.fixture
+def snippets(service):
+    texts = [
+        "def load_user_config(path):\n    return yaml.safe_load(open(path))\n",
+        "def save_user(user):\n    db.add(user)\n",
+        "class ConfigLoader:\n    pass\n",
+        "Checkout flow: validate the basket, charge the card, send the receipt.",
+    ]
+    service.add_snippets(texts, [{"project": "p", "path": f"f{i}.py"} for i in range(len(texts))])
+    return texts
+
+
+def test_identifier_queries_are_answered_lexically(service, snippets):
+    hits = service.search("load_user_config", k=1, project="p")
+    assert [hit["text"] for hit in hits] == [snippets[0]]
+    assert hits[0]["shard"] == "p"
+    assert service.embeddings.queries == []
+
+
+def test_hybrid_search_fuses_both_rankings(service, snippets):
+    hits = service.search(snippets[3], k=2, project="p", mode="hybrid")
+    assert hits[0]["text"] == snippets[3]
+    assert hits[0]["score"] == pytest.approx(2 / 61)
+    assert service.search(snippets[3], k=1, mode="vector")[0]["text"] == snippets[3]
+    assert service.search("checkout basket receipt", k=1, mode="lexical")[0]["text"] == snippets[3]
+
+
+def test_lexical_hits_of_different_shards_are_merged_by_rank(service):
+    # In a shard where every document mentions it, "widget" scores far lower than in one
+    # where it is rare; raw BM25 would return only the rare shard's hits
+    rare = [f"widget part {i}" if i < 2 else f"unrelated text {i}" for i in range(10)]
+    common = [f"widget number {i}" for i in range(3)]
+    service.add_snippets(rare + common, [{"project": "rare"}] * 10 + [{"project": "common"}] * 3)
+    hits = service.search("widget", k=2, mode="lexical")
+    assert sorted(hit["shard"] for hit in hits) == ["common", "rare"]
+    assert [hit["shard"] for hit in service.search("widget", k=2, project="rare", mode="lexical")] == ["rare", "rare"]
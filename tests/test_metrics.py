@@ -0,0 +1,74 @@
+# tests/test_metrics.py
+import json
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from src.utils import metrics
+from src.utils.metrics import MetricsRegistry, histogram_quantile, llm_cost, merge_snapshots, render_prometheus
+
+
+def test_snapshots_of_several_processes_merge_and_render():
+    api, worker = MetricsRegistry(), MetricsRegistry()
+    api.inc("tasks_total", 2, "Tasks", status="ok")
+    worker.inc("tasks_total", 3, "Tasks", status="ok")
+    worker.observe("stage_seconds", 0.3, "Stage duration", buckets=(0.1, 1), stage="codegen")
+    worker.observe("stage_seconds", 5, "Stage duration", buckets=(0.1, 1), stage="codegen")
+
+    merged = merge_snapshots([api.snapshot(), json.loads(json.dumps(worker.snapshot()))])
+    assert merged["tasks_total"]["series"][(("status", "ok"),)] == {"value": 5.0}
+    text = render_prometheus(merged)
+    assert 'tasks_total{status="ok"} 5.0' in text
+    assert 'stage_seconds_bucket{stage="codegen",le="1.0"} 1' in text
+    assert 'stage_seconds_bucket{stage="codegen",le="+Inf"} 2' in text
+    assert 'stage_seconds_sum{stage="codegen"} 5.3' in text
+
+
+def test_quantiles_interpolate_within_buckets_and_prices_match_snapshots():
+    assert histogram_quantile(0.5, [1, 2, 4], [0, 4, 0], 4) == pytest.approx(1.5)
+    assert histogram_quantile(0.99, [1, 2], [1, 0], 2) == 2
+    assert histogram_quantile(0.5, [1], [0], 0) is None
+    assert llm_cost("gpt-4o-2024-08-06", 1_000_000, 0) == pytest.approx(2.5)
+    assert llm_cost("unknown-model", 1000, 1000) == 0.0
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(metrics, "_redis", client)
+    monkeypatch.setattr(metrics, "_last_push", 0.0)
+    yield client
+    metrics.stop_metrics_pusher(final_push=False)
+
+
+def test_pushes_are_throttled_and_read_back_by_the_api(redis_client, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_PUSH_INTERVAL", 3600)
+    metrics.registry.inc("test_pushes_total", 1, "Pushes")
+    metrics.push_worker_metrics()
+    metrics.registry.inc("test_pushes_total", 1, "Pushes")
+    metrics.push_worker_metrics()
+    key = metrics._worker_key()
+    assert json.loads(redis_client.get(key))["test_pushes_total"]["series"][0][1] == {"value": 1.0}
+    assert 0 < redis_client.ttl(key) <= metrics.METRICS_WORKER_TTL
+
+    redis_client.set(metrics.METRICS_KEY_PREFIX + "other:1", json.dumps({
+        "test_pushes_total": {"type": "counter", "help": "Pushes", "buckets": None, "series": [[[], {"value": 10.0}]]},
+    }))
+    assert metrics.collect_all()["test_pushes_total"]["series"][()]["value"] == 12.0
+
+
+def test_idle_workers_keep_pushing_and_push_once_more_on_shutdown(redis_client):
+    metrics.start_metrics_pusher(interval=0.05)
+    metrics.start_metrics_pusher(interval=0.05)
+    deadline = time.time() + 5
+    while redis_client.get(metrics._worker_key()) is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert redis_client.get(metrics._worker_key()) is not None
+    assert len([t for t in threading.enumerate() if t.name == "metrics-pusher"]) == 1
+
+    redis_client.delete(metrics._worker_key())
+    metrics.stop_metrics_pusher()
+    assert redis_client.get(metrics._worker_key()) is not None
+    assert metrics._pusher is None
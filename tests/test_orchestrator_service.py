@@ -0,0 +1,40 @@
+# tests/test_orchestrator_service.py
+import pytest
+
+from src.agent_factory import core_agent
+from src.db.models import Base, SessionLocal, TaskLog, TaskModel, engine
+from src.orchestrator import orchestrator_service
+
+
+@pytest.fixture
+def run_with(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+
+    def run(result):
+        class StubAgent:
+            def __init__(self, **kwargs):
+                pass
+
+            def run(self, requirement):
+                return result
+
+        monkeypatch.setattr(orchestrator_service, "CoreAgent", StubAgent)
+        db = SessionLocal()
+        try:
+            db.query(TaskModel).filter(TaskModel.project_id == 77).delete()
+            db.commit()
+            orchestrator_service.run_core_agent_task.run(1, 0, 77, "app", "Build an app")
+            row = db.query(TaskLog).filter(TaskLog.project_id == 77).order_by(TaskLog.id.desc()).first()
+            return row.status
+        finally:
+            db.close()
+
+    return run
+
+
+def test_pauses_and_budget_stops_are_not_logged_as_failures(run_with):
+    assert run_with("Final Answer: built the app") == "completed"
+    assert run_with(core_agent.AWAITING_ANSWERS) == "waiting_user_input"
+    assert run_with(f"{core_agent.BUDGET_STOPPED} Usage budget exhausted for task 1: tokens") == "budget_exceeded"
+    assert run_with(f"{core_agent.ERROR_STOPPED} boom") == "failed"
+    assert core_agent.result_status(f"{core_agent.ERROR_STOPPED} parser saw Final Answer:") == "failed"
@@ -0,0 +1,62 @@
+# tests/test_profiling.py
+import os
+import time
+
+import pytest
+
+from src.utils import profiling
+from src.utils.profiling import TaskProfile, artifact_path, load_summary, requested_mode
+
+
+@pytest.fixture(autouse=True)
+def profile_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def busy_work(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+def test_requested_modes():
+    assert requested_mode("cProfile") == "cprofile"
+    assert requested_mode("1") == profiling.PROFILE_DEFAULT_MODE
+    assert requested_mode(None) is None and requested_mode("0") is None and requested_mode("flame") is None
+
+
+def test_cprofile_runs_save_pstats_and_a_summary(profile_root):
+    profile = TaskProfile("cprofile")
+    profile.start()
+    busy_work(0.05)
+    profile.stop()
+    if profile.mode != "cprofile":
+        pytest.skip("another deterministic profiler is active")
+    summary = profile.save("t1", {"celery_task": "run_core_agent_task"})
+    assert summary["artifact"] == "t1.prof" and (profile_root / "t1.prof").stat().st_size > 0
+    assert any(row["function"].startswith("busy_work (test_profiling.py:") for row in summary["top"])
+    assert load_summary("t1")["celery_task"] == "run_core_agent_task"
+
+
+def test_sampled_runs_save_collapsed_stacks(profile_root):
+    profile = TaskProfile("sample")
+    profile.start()
+    busy_work(0.2)
+    profile.stop()
+    summary = profile.save("t2")
+    assert summary["mode"] == "sample" and summary["samples"] > 0
+    stacks = (profile_root / "t2.collapsed").read_text().splitlines()
+    assert any("busy_work (test_profiling.py:" in line for line in stacks)
+    busy = next(row for row in summary["top"] if row["function"].startswith("busy_work"))
+    assert busy["inclusive_pct"] > 50
+
+
+def test_artifacts_are_served_only_from_the_profile_root(profile_root):
+    (profile_root / "t3.json").write_text("{}")
+    assert artifact_path("t3", "t3.json") == os.path.join(str(profile_root), "t3.json")
+    assert artifact_path("t3", "../t3.json") is None
+    assert artifact_path("t3", "t4.json") is None
+    assert artifact_path("t3", "t3.prof") is None and load_summary("missing") is None
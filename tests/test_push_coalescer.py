@@ -0,0 +1,73 @@
+# tests/test_push_coalescer.py
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from src.github_integration import push_coalescer
+from src.github_integration.push_coalescer import clear_pending, is_current, pending_changes, record_push, set_task
+from src.github_integration.webhook_handler import changed_paths_from_payload, enqueue_push_validation
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    monkeypatch.setattr(push_coalescer, "_client", fakeredis.FakeRedis())
+
+
+def test_pushes_collect_paths_from_the_first_base():
+    assert record_push("acme/app", "main", "c1", ["a.py"], base_commit="c0") == (1, None)
+    set_task("acme/app", "main", 1, "task-1")
+    assert record_push("acme/app", "main", "c2", ["b.py", "a.py"], base_commit="c1") == (2, "task-1")
+    assert pending_changes("acme/app", "main") == ("c0", ["a.py", "b.py"])
+    assert not is_current("acme/app", "main", 1) and is_current("acme/app", "main", 2)
+    assert is_current("acme/app", "main", None)
+    # Other branches are tracked separately
+    assert pending_changes("acme/app", "dev") == (None, None)
+
+
+def test_an_unscoped_push_forces_a_full_run():
+    record_push("acme/app", "main", "c1", ["a.py"], base_commit="c0")
+    record_push("acme/app", "main", "c2", None, base_commit="c1")
+    assert pending_changes("acme/app", "main") == ("c0", None)
+
+
+def test_stale_generations_neither_clear_changes_nor_register_tasks():
+    record_push("acme/app", "main", "c1", ["a.py"], base_commit="c0")
+    record_push("acme/app", "main", "c2", ["b.py"], base_commit="c1")
+    set_task("acme/app", "main", 1, "stale")
+    clear_pending("acme/app", "main", 1)
+    assert pending_changes("acme/app", "main") == ("c0", ["a.py", "b.py"])
+    assert record_push("acme/app", "main", "c3", ["c.py"], base_commit="c2")[1] is None
+
+    clear_pending("acme/app", "main", 3)
+    assert pending_changes("acme/app", "main") == (None, None)
+    record_push("acme/app", "main", "c4", ["d.py"], base_commit="c3")
+    assert pending_changes("acme/app", "main") == ("c3", ["d.py"])
+
+
+def test_payload_paths_are_scoped_only_when_complete():
+    commit = {"added": ["n.py"], "modified": ["m.py"], "removed": ["r.py"]}
+    assert changed_paths_from_payload({"commits": [commit, {"modified": ["m.py"]}]}) == ["m.py", "n.py", "r.py"]
+    assert changed_paths_from_payload({"commits": [commit], "forced": True}) is None
+    assert changed_paths_from_payload({"commits": [commit], "created": True}) is None
+    assert changed_paths_from_payload({"commits": [commit] * 20}) is None
+
+
+def test_a_burst_of_pushes_revokes_all_but_the_last_validation(monkeypatch):
+    from src.orchestrator import orchestrator_service
+
+    revoked, scheduled = [], []
+
+    def apply_async(kwargs, countdown):
+        scheduled.append((kwargs, countdown))
+        return SimpleNamespace(id=f"task-{len(scheduled)}")
+
+    monkeypatch.setattr(orchestrator_service.celery_app.control, "revoke", revoked.append)
+    monkeypatch.setattr(orchestrator_service.sync_code_and_validate, "apply_async", apply_async)
+    for i in range(1, 4):
+        enqueue_push_validation("acme/app", "main", f"c{i}", [f"f{i}.py"], base_commit=f"c{i - 1}")
+
+    assert revoked == ["task-1", "task-2"]
+    assert [kwargs["generation"] for kwargs, _ in scheduled] == [1, 2, 3]
+    assert all(countdown == push_coalescer.PUSH_DEBOUNCE_SECONDS for _, countdown in scheduled)
+    assert pending_changes("acme/app", "main") == ("c0", ["f1.py", "f2.py", "f3.py"])
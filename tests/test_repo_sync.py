@@ -0,0 +1,99 @@
+# tests/test_repo_sync.py
+import os
+import subprocess
+
+import pytest
+from filelock import FileLock
+
+from src.github_integration.repo_sync import RepoMirrorManager, RepoSyncError
+
+
+def git(*args, cwd=None):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", "-c", "init.defaultBranch=main", *args],
+        cwd=cwd, check=True, capture_output=True, text=True,
+    ).stdout.strip()
+
+
+def commit(work, name, content):
+    with open(os.path.join(work, name), "w") as f:
+        f.write(content)
+    git("add", name, cwd=work)
+    git("commit", "-q", "-m", f"add {name}", cwd=work)
+    git("push", "-q", "origin", "HEAD:main", cwd=work)
+    return git("rev-parse", "HEAD", cwd=work)
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """
+    Bare upstream repositories under tmp_path/upstream/<owner>/<name>.git, with a
+    working clone per repository to push commits from.
+    """
+    def make(repo):
+        bare = tmp_path / "upstream" / f"{repo}.git"
+        work = tmp_path / "work" / repo
+        bare.parent.mkdir(parents=True, exist_ok=True)
+        git("init", "-q", "--bare", str(bare))
+        git("clone", "-q", str(bare), str(work))
+        return str(work)
+    return make
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return RepoMirrorManager(root=str(tmp_path / "mirrors"), url_template=f"file://{tmp_path}/upstream/{{repo}}.git")
+
+
+def test_sync_clones_then_fetches_only_missing_commits(origin, manager):
+    work = origin("acme/app")
+    first = commit(work, "a.py", "a = 1\n")
+    mirror = manager.sync("acme/app", first)
+    assert os.path.isdir(mirror) and manager._recorded_size("acme/app") > 0
+
+    second = commit(work, "b.py", "b = 1\n" * 1000)
+    manager.sync("acme/app", second)
+    with manager.checkout("acme/app", second) as path:
+        assert sorted(n for n in os.listdir(path) if n.endswith(".py")) == ["a.py", "b.py"]
+    assert not os.listdir(os.path.join(manager.worktrees_dir))
+
+    with pytest.raises(RepoSyncError):
+        manager.sync("acme/app", "0" * 40)
+
+
+def test_evict_uses_recorded_sizes_and_drops_least_recently_used(origin, manager, monkeypatch):
+    for repo in ("acme/old", "acme/mid", "acme/new"):
+        manager.sync(repo, commit(origin(repo), "a.py", repo * 2000))
+    os.utime(manager.mirror_path("acme/old") + ".used", (1, 1))
+    os.utime(manager.mirror_path("acme/mid") + ".used", (2, 2))
+
+    monkeypatch.setattr(manager, "_disk_usage", lambda path: pytest.fail("evict walked a mirror"))
+    sizes = {repo: manager._recorded_size(repo) for repo in ("acme/old", "acme/mid", "acme/new")}
+    manager.disk_budget = sizes["acme/mid"] + sizes["acme/new"]
+    manager.evict(keep="acme/new")
+    assert not os.path.exists(manager.mirror_path("acme/old"))
+    assert not os.path.exists(manager.mirror_path("acme/old") + ".size")
+    assert os.path.isdir(manager.mirror_path("acme/mid"))
+
+
+def test_evict_skips_locked_mirrors(origin, manager):
+    for repo in ("acme/busy", "acme/idle"):
+        manager.sync(repo, commit(origin(repo), "a.py", repo))
+    os.utime(manager.mirror_path("acme/busy") + ".used", (1, 1))
+    os.utime(manager.mirror_path("acme/idle") + ".used", (2, 2))
+    manager.disk_budget = 0
+    with FileLock(manager.mirror_path("acme/busy") + ".lock"):
+        manager.evict()
+    assert os.path.isdir(manager.mirror_path("acme/busy"))
+    assert not os.path.exists(manager.mirror_path("acme/idle"))
+
+
+def test_mirrors_without_a_recorded_size_are_measured_once_unlocked(origin, manager):
+    manager.sync("acme/app", commit(origin("acme/app"), "a.py", "a = 1\n"))
+    size_path = manager.mirror_path("acme/app") + ".size"
+    os.remove(size_path)
+    with FileLock(manager.mirror_path("acme/app") + ".lock"):
+        manager.evict()
+    assert not os.path.exists(size_path)
+    manager.evict()
+    assert manager._recorded_size("acme/app") > 0
@@ -0,0 +1,119 @@
+# tests/test_rl_strategies.py
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.models import Base, TaskLog, UsageRecord
+from src.orchestrator.rl_engine import rl_strategies
+from src.orchestrator.rl_engine.rl_strategies import (
+    Schedule, SchedulerPolicy, decision_points, episode_decisions, evaluate, load_episodes, model_override, reward,
+)
+
+FULL = ["analyze", "plan", "codegen", "validate", "test", "deploy"]
+LEAN = ["codegen", "validate", "test", "deploy"]
+
+
+def episode(sequence, completed=True, tokens=10_000, seconds=60, models=None):
+    return {
+        "outcome": "completed" if completed else "failed", "sequence": sequence, "models": models or {},
+        "tokens": tokens, "seconds": seconds, "reward": reward(completed, tokens, seconds),
+    }
+
+
+def history(n=12):
+    # Lean runs complete as often as full ones with a third of the tokens
+    return [episode(FULL, tokens=30_000) for _ in range(n)] + [episode(LEAN, tokens=10_000) for _ in range(n)]
+
+
+def test_reward_trades_completion_against_tokens_and_time():
+    assert reward(False, 0, 0) == 0.0
+    assert reward(True, 0, 0) == 1.0
+    assert reward(True, 25_000, 300) == pytest.approx(1 - 0.25 - 0.125)
+    assert reward(True, 10**9, 10**9) == pytest.approx(0.25)
+
+
+def test_decisions_are_inferred_from_what_ran():
+    decisions = episode_decisions(episode(["plan", "codegen", "test"], models={"plan": "gpt-4o-mini", "codegen": "gpt-4o-2024"}))
+    assert decisions["skip:analyze"] == "skip" and decisions["skip:plan"] == "run"
+    assert decisions["model:plan"] == "small" and decisions["model:codegen"] == "default"
+    assert "model:analyze" not in decisions
+    assert "skip:validate" not in decisions and "skip:validate" not in decision_points()
+    scheduled = {"mode": "on", "arms": {"skip:plan": "skip"}, "sequence": ["plan"]}
+    assert episode_decisions(scheduled) == {"skip:plan": "skip"}
+
+
+def test_defaults_hold_until_arms_are_observed_often_enough():
+    policy = SchedulerPolicy.fit(history(n=3))
+    schedule = policy.decide(rng=random.Random(0), exploration=0.0, mode="on")
+    assert schedule.skip == [] and schedule.order == FULL
+    assert set(schedule.propensities.values()) == {1.0}
+
+
+def test_the_fitted_policy_skips_unrewarding_stages_and_follows_good_transitions():
+    policy = SchedulerPolicy.fit(history())
+    assert policy.greedy("skip:analyze", ["run", "skip"]) == "skip"
+    schedule = policy.decide(rng=random.Random(0), exploration=0.0, mode="on")
+    assert schedule.skip == ["analyze", "plan"]
+    assert schedule.order == LEAN
+    assert "Skip these stages" in schedule.hint() and "codegen -> validate -> test -> deploy" in schedule.hint()
+
+    explored = policy.decide(rng=random.Random(1), exploration=1.0, mode="on")
+    assert explored.propensities["skip:plan"] == pytest.approx(0.5)
+    assert explored.propensities["model:codegen"] == pytest.approx(1 / len(decision_points()["model:codegen"]))
+
+
+def test_shadow_schedules_change_nothing():
+    arms = {"skip:plan": "skip", "model:codegen": "small"}
+    shadow, applied = Schedule(arms, {}, LEAN, mode="shadow"), Schedule(arms, {}, LEAN, mode="on")
+    assert shadow.skip == [] and shadow.hint() == "" and shadow.model_for("codegen", "gpt-4o") == "gpt-4o"
+    assert applied.skip == ["plan"] and applied.model_for("codegen", "gpt-4o") == "gpt-4o-mini"
+
+    token = rl_strategies.activate(applied)
+    try:
+        assert model_override("codegen", "gpt-4o") == "gpt-4o-mini"
+        assert model_override(None, "gpt-4o") == model_override("deploy", "gpt-4o") == "gpt-4o"
+    finally:
+        rl_strategies.deactivate(token)
+    assert model_override("codegen", "gpt-4o") == "gpt-4o"
+
+
+def test_episodes_come_from_scheduler_logs_and_older_task_logs():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[TaskLog.__table__, UsageRecord.__table__])
+    db = sessionmaker(bind=engine)()
+    started = datetime(2026, 1, 1, 12, 0, 0)
+
+    def log(task_id, agent_name, status, output="", at=started):
+        db.add(TaskLog(user_id=1, project_id=1, task_id=task_id, project_name="p", agent_name=agent_name, status=status, output=output, created_at=at))
+
+    scheduled = Schedule({"skip:plan": "skip"}, {"skip:plan": 0.95}, LEAN, mode="on").to_dict()
+    log(1, "Scheduler", "completed", json.dumps({**scheduled, "outcome": "completed", "sequence": LEAN, "tokens": 5000, "seconds": 30}), at=started + timedelta(minutes=5))
+    log(1, "CoreAgent", "completed", at=started + timedelta(minutes=5))
+    # A task from before the scheduler: rebuilt from its usage records
+    log(2, "CoreAgent", "failed", at=started + timedelta(seconds=90))
+    for stage, model in (("plan", "gpt-4o"), ("codegen", "gpt-4o-mini"), ("plan", "gpt-4o")):
+        db.add(UsageRecord(user_id=1, project_id=1, task_id=2, model=model, stage=stage, prompt_tokens=100, completion_tokens=50, cost_usd=0.0, created_at=started))
+    db.commit()
+
+    first, second = load_episodes(db)
+    assert first["task_id"] == 2 and first["sequence"] == ["plan", "codegen"] and first["models"] == {"plan": "gpt-4o", "codegen": "gpt-4o-mini"}
+    assert (first["tokens"], first["seconds"], first["reward"]) == (450, 90.0, 0.0)
+    assert second["task_id"] == 1 and second["propensities"] == {"skip:plan": 0.95}
+    assert second["reward"] == reward(True, 5000, 30)
+    db.close()
+
+
+def test_offline_evaluation_prefers_the_policy_on_held_out_episodes():
+    full, lean = history(n=20)[:20], history(n=20)[20:]
+    episodes = [e for pair in zip(full, lean) for e in pair]
+    report = evaluate(episodes, train_fraction=0.7)
+    assert (report["train_episodes"], report["test_episodes"]) == (28, 12)
+    assert report["policy"]["arms"]["skip:plan"] == "skip"
+    point = report["decision_points"]["skip:plan"]
+    assert point["estimator"] == "replay" and point["policy_value"] > point["logged_value"]
+    assert report["policy_consistent"]["tokens_per_completed"] == 10_000
@@ -0,0 +1,67 @@
+# tests/test_scoped_validation.py
+import os
+
+import pytest
+
+from src.agent_factory.static_validator import validate_directory
+from src.github_integration.repo_sync import RepoMirrorManager
+from src.sandbox_manager.manager import needs_full_run, run_sandbox_validation
+from src.utils.workspace_manifest import MANIFEST_DIR, WorkspaceManifest
+
+
+def write(root, rel, source):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = str(tmp_path / "app")
+    write(root, "a.py", "def helper():\n    return 1\n")
+    write(root, "b.py", "from a import helper\n\ndef run():\n    return helper()\n")
+    write(root, "c.py", "import b\n")
+    write(root, "d.py", "x = 1\n")
+    write(root, "test_b.py", "from b import run\n\ndef test_run():\n    assert run() == 1\n")
+    write(root, "test_d.py", "from d import x\n\ndef test_x():\n    assert x == 1\n")
+    return root
+
+
+def test_global_files_force_a_full_run():
+    assert needs_full_run(None)
+    assert needs_full_run(["pkg/conftest.py"]) and needs_full_run(["requirements-dev.txt"])
+    assert not needs_full_run(["a.py", "docs/setup.md"])
+
+
+def test_changed_paths_revalidate_importers_without_walking(project, monkeypatch):
+    assert validate_directory(project)["ok"]
+    write(project, "a.py", "def helper():\n    return 2\n")
+    monkeypatch.setattr(WorkspaceManifest, "_walk", lambda self: pytest.fail("scoped refresh walked the tree"))
+    result = validate_directory(project, changed_paths=["a.py"])
+    assert result["ok"] and result["files_checked"] == 4  # a, b, c and test_b
+
+
+def test_sandbox_validation_scopes_to_changed_files(project):
+    full = run_sandbox_validation(project)
+    assert full["scope"] == "full" and full["validation_passed"] and full["tests_status"] == "passed"
+
+    write(project, "d.py", "x = 2\n")
+    scoped = run_sandbox_validation(project, changed_files=["d.py"])
+    assert scoped["scope"] == "changed" and scoped["files_checked"] == 2
+    assert scoped["tests_status"] == "failed"
+    assert "1 files run, 1 cached" in scoped["tests_report"]
+
+    assert run_sandbox_validation(project, run_test_suite=False, changed_files=["d.py", "requirements.txt"])["scope"] == "full"
+
+
+def test_branch_state_round_trips_through_the_mirror_root(project, tmp_path):
+    mirrors = RepoMirrorManager(root=str(tmp_path / "mirrors"))
+    worktree = str(tmp_path / "worktree")
+    assert mirrors.restore_state("acme/app", "main", worktree) is None
+
+    validate_directory(project)
+    mirrors.save_state("acme/app", "main", project, "c1")
+    assert mirrors.restore_state("acme/app", "main", worktree) == "c1"
+    assert sorted(os.listdir(os.path.join(worktree, MANIFEST_DIR))) == sorted(os.listdir(os.path.join(project, MANIFEST_DIR)))
+    assert mirrors.restore_state("acme/app", "dev", worktree) is None
@@ -0,0 +1,58 @@
+# tests/test_short_term_memory.py
+import fakeredis
+import pytest
+
+from src.memory import short_term_memory
+from src.memory.short_term_memory import ShortTermMemory, _pack, _unpack, count_tokens
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def test_values_round_trip_and_large_ones_are_compressed():
+    small, large = {"a": 1}, {"text": "x" * 5000}
+    assert _pack(small)[:1] == b"j" and _unpack(_pack(small)) == small
+    assert _pack(large)[:1] == b"z" and len(_pack(large)) < 1000 and _unpack(_pack(large)) == large
+
+
+def test_the_buffer_evicts_oldest_entries_by_count(client):
+    memory = ShortTermMemory(1, client=client, max_entries=3, max_tokens=10**6)
+    for i in range(5):
+        result = memory.append("tool_output", f"step {i}", tool="codegen")
+    assert result["evicted"] == 1
+    entries = memory.load()["entries"]
+    assert [e["content"] for e in entries] == ["step 2", "step 3", "step 4"]
+    assert entries[0]["tool"] == "codegen"
+
+
+def test_the_buffer_stays_within_the_token_budget(client):
+    memory = ShortTermMemory(2, client=client, max_entries=100, max_tokens=3 * count_tokens("word " * 50))
+    for i in range(6):
+        memory.append("note", f"{i} " + "word " * 50)
+    context = memory.load()
+    assert context["tokens"] <= memory.max_tokens
+    assert context["tokens"] == sum(e["tokens"] for e in context["entries"])
+    assert context["entries"][-1]["content"].startswith("5 ")
+    # An entry over the whole budget is still kept, alone
+    memory.append("note", "word " * 1000)
+    assert len(memory.load()["entries"]) == 1
+
+
+def test_context_is_shared_between_workers_and_expires_after_completion(client, monkeypatch):
+    monkeypatch.setattr(short_term_memory, "SHORT_TERM_ACTIVE_TTL", 1000)
+    first = ShortTermMemory(3, client=client)
+    first.append("tool_input", "build the cart", tool="plan")
+    first.set_artifact("plan", {"files": ["cart.py"]})
+
+    second = ShortTermMemory(3, client=client)
+    assert second.load()["artifacts"] == {"plan": {"files": ["cart.py"]}}
+    assert second.format_context() == "- tool_input (plan): build the cart"
+    assert second.format_context(max_chars=5) == " cart"
+    assert 0 < client.ttl(second.entries_key) <= 1000
+
+    second.complete(ttl=60)
+    assert all(0 < client.ttl(key) <= 60 for key in (second.entries_key, second.meta_key, second.artifacts_key))
+    second.clear()
+    assert second.load() == {"entries": [], "artifacts": {}, "tokens": 0}
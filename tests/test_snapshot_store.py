@@ -0,0 +1,112 @@
+# tests/test_snapshot_store.py
+import os
+import threading
+
+import pytest
+
+from src.utils import snapshot_store
+from src.utils.file_operations import write_files
+from src.utils.snapshot_store import SnapshotStore
+
+
+@pytest.fixture
+def store():
+    return SnapshotStore()
+
+
+def test_snapshots_store_deltas_and_rebuild_trees(store):
+    write_files("p", {"a.py": "a = 1\n", "b.py": "b = 1\n"})
+    first = store.snapshot("p", label="initial")
+    change_set = write_files("p", {"a.py": "a = 2\n", "b.py": None, "c.py": "c = 1\n"})
+    second = store.snapshot("p", change_set)
+
+    record = store._load_record("p", second)
+    assert record["parent"] == first and not record["full"]
+    assert set(record["set"]) == {"a.py", "c.py"} and record["deleted"] == ["b.py"]
+    assert set(store.tree("p", second)) == {"a.py", "c.py"}
+    assert store.read_file("p", first, "a.py") == "a = 1\n"
+    assert store.diff("p", first, second) == {"added": ["c.py"], "modified": ["a.py"], "deleted": ["b.py"]}
+
+
+def test_checkpoints_store_the_full_tree(store, monkeypatch):
+    monkeypatch.setattr(snapshot_store, "CHECKPOINT_INTERVAL", 3)
+    write_files("p", {"a.py": "a = 0\n"})
+    store.snapshot("p")
+    for i in range(1, 5):
+        store.snapshot("p", write_files("p", {f"f{i}.py": f"x = {i}\n"}))
+    checkpoint = store._load_record("p", 3)
+    assert checkpoint["full"] and set(checkpoint["set"]) == {"a.py", "f1.py", "f2.py"}
+    # A fresh store (no cached trees) rebuilds from the checkpoint
+    assert set(SnapshotStore().tree("p", 5)) == {"a.py", "f1.py", "f2.py", "f3.py", "f4.py"}
+
+
+def test_rollback_restores_only_differing_files(store, tmp_path):
+    write_files("p", {"a.py": "a = 1\n", "b.py": "b = 1\n"})
+    good = store.snapshot("p")
+    store.tag("p", good, "validated")
+    store.snapshot("p", write_files("p", {"a.py": "broken(\n", "new.py": "n = 1\n"}))
+
+    change_set = store.rollback("p", store.latest_tagged("p", "validated"))
+    assert change_set.modified == ["a.py"] and change_set.deleted == ["new.py"] and not change_set.added
+    assert (tmp_path / "p" / "a.py").read_text() == "a = 1\n" and not (tmp_path / "p" / "new.py").exists()
+    latest = store.latest("p")
+    assert store.tree("p", latest) == store.tree("p", good)
+    assert store.list_snapshots("p")[-1]["label"] == f"rollback to {good}"
+
+
+def test_latest_tagged_reads_newest_first_and_stops_at_the_match(store, monkeypatch):
+    write_files("p", {"a.py": "a = 0\n"})
+    for i in range(5):
+        snapshot_id = store.snapshot("p", write_files("p", {"a.py": f"a = {i + 1}\n"}))
+        if i in (1, 3):
+            store.tag("p", snapshot_id, "validated")
+    loaded = []
+    load = store._load_record
+    monkeypatch.setattr(store, "_load_record", lambda project, sid: loaded.append(sid) or load(project, sid))
+    assert store.latest_tagged("p", "validated") == 4
+    assert loaded == [5, 4]
+    assert store.latest_tagged("p", "missing") is None
+
+
+def test_concurrent_snapshots_form_a_chain(store):
+    write_files("p", {"a.py": "a = 0\n"})
+    store.snapshot("p")
+    barrier = threading.Barrier(8)
+
+    def worker(i):
+        change_set = write_files("p", {f"w{i}.py": f"w = {i}\n"})
+        barrier.wait()
+        store.snapshot("p", change_set)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    parents = [record["parent"] for record in store.list_snapshots("p")]
+    assert parents == [None] + list(range(1, 9))
+    assert len(store.tree("p", store.latest("p"))) == 9
+
+
+def test_rollback_writes_binary_files_back_unchanged(store, tmp_path):
+    blob = bytes(range(256))
+    write_files("p", {"logo.png": blob})
+    good = store.snapshot("p")
+    store.snapshot("p", write_files("p", {"logo.png": b"\x89PNG broken"}))
+
+    store.rollback("p", good)
+    assert (tmp_path / "p" / "logo.png").read_bytes() == blob
+
+
+def test_store_lives_outside_the_projects_root(tmp_path, monkeypatch):
+    from src.utils import file_operations
+
+    other = tmp_path / "other"
+    monkeypatch.setattr(file_operations, "PROJECTS_ROOT", str(other))
+    store = SnapshotStore()
+    assert store.root == str(other) + ".snapshots"
+
+    write_files(".store", {"a.py": "a = 1\n"})
+    first = store.snapshot(".store")
+    assert set(store.tree(".store", first)) == {"a.py"}
+    assert sorted(os.listdir(other)) == [".store"]
@@ -0,0 +1,89 @@
+# tests/test_static_validator.py
+import os
+
+from src.agent_factory import static_validator
+from src.agent_factory.static_validator import check_source, format_report, validate_directory
+
+
+def rules(result):
+    return [issue["rule"] for issue in result["issues"]]
+
+
+def write(root, rel, source):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+def test_clean_source_passes():
+    result = check_source("import os\n\ndef f(x):\n    return os.path.join(x, 'a')\n")
+    assert result["ok"] and result["issues"] == []
+
+
+def test_syntax_error_is_reported_with_its_line():
+    result = check_source("def f(:\n    pass\n")
+    assert not result["ok"]
+    assert rules(result) == ["syntax-error"] and result["issues"][0]["line"] == 1
+
+
+def test_undefined_name_once_per_name():
+    result = check_source("def f():\n    return missing + missing\n")
+    assert rules(result) == ["undefined-name"] and not result["ok"]
+
+
+def test_star_import_disables_undefined_names():
+    assert check_source("from os.path import *\nprint(join('a', 'b'))\n")["ok"]
+
+
+def test_dangerous_and_weak_calls():
+    result = check_source("import os, hashlib\nos.system('ls')\neval('1')\nhashlib.md5(b'')\n")
+    assert rules(result) == ["dangerous-call", "dangerous-call", "weak-call"]
+    assert not result["ok"]
+
+
+def test_warnings_alone_do_not_fail():
+    result = check_source("import hashlib\nhashlib.sha1(b'')\n")
+    assert result["ok"] and rules(result) == ["weak-call"]
+
+
+def test_security_patterns():
+    source = (
+        "import subprocess, requests, yaml\n"
+        "subprocess.run('ls', shell=True)\n"
+        "requests.get('https://x', verify=False)\n"
+        "yaml.load('a: 1')\n"
+        "def q(cursor, name):\n"
+        "    cursor.execute(f\"select * from t where name = '{name}'\")\n"
+        "api_key = 'sk-123'\n"
+    )
+    assert set(rules(check_source(source))) == {
+        "shell-injection", "tls-verify-disabled", "unsafe-yaml", "sql-injection", "hardcoded-secret",
+    }
+
+
+def test_parameterized_query_passes():
+    assert check_source("def q(cursor, name):\n    cursor.execute('select 1 where a = %s', (name,))\n")["ok"]
+
+
+def test_format_report():
+    assert format_report([check_source("x = 1\n")]) == "Validation passed"
+    report = format_report([check_source("eval('1')\n", "a.py")])
+    assert report.startswith("Validation failed:\na.py:1 [error] dangerous-call")
+
+
+def test_validate_directory_full_and_missing(tmp_path):
+    write(tmp_path, "ok.py", "x = 1\n")
+    write(tmp_path, "bad.py", "eval('1')\n")
+    result = validate_directory(str(tmp_path), incremental=False)
+    assert result["files_checked"] == 2 and not result["ok"]
+    assert validate_directory(str(tmp_path / "nope"))["error"].startswith("Directory not found")
+
+
+def test_process_pool_gives_the_same_results(tmp_path, monkeypatch):
+    for i in range(6):
+        write(tmp_path, f"m{i}.py", "eval('1')\n" if i == 3 else f"x{i} = {i}\n")
+    serial = validate_directory(str(tmp_path), incremental=False)
+    monkeypatch.setattr(static_validator, "PARALLEL_THRESHOLD", 2)
+    parallel = validate_directory(str(tmp_path), incremental=False)
+    assert serial == parallel
@@ -0,0 +1,85 @@
+# tests/test_symbol_index.py
+import os
+
+from src.utils.file_operations import write_files
+from src.utils.symbol_index import SymbolIndex, extract_symbols, get_symbol_index
+
+CART = '''
+from pricing import total_price
+
+
+class Cart:
+    """Items a customer is about to buy."""
+
+    def add(self, item):
+        self.items.append(item)
+
+    def checkout(self) -> float:
+        return total_price(self.items)
+'''
+
+PRICING = '''
+def total_price(items, discount: float = 0.0) -> float:
+    """Sum of item prices after the discount."""
+    return sum(i.price for i in items) * (1 - discount)
+
+
+async def fetch_rates():
+    pass
+'''
+
+
+def test_definitions_carry_signatures_docs_and_line_ranges():
+    symbols = extract_symbols(CART)
+    cart, add, checkout = symbols["definitions"]
+    assert (cart["kind"], cart["signature"], cart["doc"]) == ("class", "class Cart", "Items a customer is about to buy.")
+    assert (add["qualname"], add["kind"], add["signature"]) == ("Cart.add", "method", "def add(self, item)")
+    assert checkout["signature"] == "def checkout(self) -> float" and checkout["end_lineno"] == 12
+    assert symbols["calls"] == ["append", "total_price"]
+    assert extract_symbols(PRICING)["definitions"][1]["signature"] == "async def fetch_rates()"
+    assert extract_symbols("def broken(:\n") is None
+
+
+def project(tmp_path):
+    write_files("shop", {"cart.py": CART, "pricing.py": PRICING, "notes.txt": "total_price"})
+    return SymbolIndex(str(tmp_path / "shop"))
+
+
+def test_queries_find_definitions_and_references(tmp_path):
+    index = project(tmp_path)
+    assert [(rel, d["qualname"]) for rel, d in index.definitions({"total_price", "add"})] == [
+        ("cart.py", "Cart.add"), ("pricing.py", "total_price"),
+    ]
+    assert index.references("total_price") == ["cart.py"]
+    assert index.outline("cart.py").splitlines() == [
+        "# cart.py", "class Cart  # Items a customer is about to buy.", "    def add(self, item)", "    def checkout(self) -> float",
+    ]
+
+
+def test_context_puts_the_edited_file_and_named_code_first(tmp_path):
+    index = project(tmp_path)
+    context = index.context_for("make checkout apply a discount via total_price", filename="cart.py")
+    blocks = context.split("\n\n")
+    assert blocks[0].startswith("# cart.py\nclass Cart")
+    # Named definitions come as full snippets, those of the edited file first
+    assert blocks[1] == "# cart.py:11\n    def checkout(self) -> float:\n        return total_price(self.items)"
+    assert blocks[2].startswith("# pricing.py:2\ndef total_price(items, discount: float = 0.0) -> float:")
+    assert "return sum(" in blocks[2]
+    assert "fetch_rates" not in context
+    assert len(index.context_for("total_price", max_chars=20)) <= 20
+
+
+def test_the_index_follows_workspace_writes(tmp_path):
+    index = get_symbol_index("shop")
+    write_files("shop", {"pricing.py": PRICING})
+    assert [d["name"] for _, d in index.definitions({"total_price"})] == ["total_price"]
+
+    write_files("shop", {"pricing.py": "def price_of(item):\n    return item.price\n"})
+    assert index.definitions({"total_price"}) == [] and index.definitions({"price_of"})
+    write_files("shop", {"pricing.py": None})
+    assert index.files == {}
+
+    # The saved index is reloaded without parsing again
+    write_files("shop", {"cart.py": CART})
+    reloaded = SymbolIndex(str(tmp_path / "shop"))
+    assert os.path.exists(reloaded.path) and reloaded.update(["cart.py"]) == 0
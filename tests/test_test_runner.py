@@ -0,0 +1,92 @@
+# tests/test_test_runner.py
+import os
+
+from src.sandbox_manager import test_runner
+from src.sandbox_manager.test_runner import format_test_summary, is_test_file, plan_shards, run_tests
+
+
+def write(root, rel, source):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+def test_is_test_file():
+    assert is_test_file("tests/test_a.py") and is_test_file("a_test.py")
+    assert not is_test_file("testing.py") and not is_test_file("test_a.txt")
+
+
+def test_plan_shards_balances_longest_first():
+    shards = plan_shards({"a": 5.0, "b": 4.0, "c": 3.0, "d": 2.0, "e": 1.0}, 2)
+    loads = sorted(sum({"a": 5, "b": 4, "c": 3, "d": 2, "e": 1}[f] for f in shard) for shard in shards)
+    assert loads == [7, 8]
+    assert plan_shards({"a": 1.0}, 8) == [["a"]]
+
+
+def test_test_env_is_an_allowlist(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "mysql://root:secret@db/x")
+    monkeypatch.setenv("REDIS_URL", "redis://cache:6379/0")
+    monkeypatch.setenv("SOME_SERVICE_TOKEN", "t")
+    monkeypatch.setenv("STRIPE_KEY", "k")
+    monkeypatch.setenv("PATH", "/usr/bin")
+    monkeypatch.delenv("PYTHONPATH", raising=False)
+    env = test_runner._test_env("/project")
+    assert env["PATH"] == "/usr/bin" and env["PYTHONPATH"] == "/project"
+    assert not {"DATABASE_URL", "REDIS_URL", "SOME_SERVICE_TOKEN", "STRIPE_KEY"} & set(env)
+
+
+def test_generated_tests_do_not_see_secrets(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    write(tmp_path, "test_env.py", "import os\n\ndef test_env():\n    assert 'OPENAI_API_KEY' not in os.environ\n")
+    assert run_tests(str(tmp_path), workers=1, with_coverage=False)["status"] == "passed"
+
+
+def test_run_and_cache(tmp_path):
+    write(tmp_path, "calc.py", "def add(a, b):\n    return a + b\n")
+    write(tmp_path, "test_calc.py", "from calc import add\n\ndef test_add():\n    assert add(1, 2) == 3\n")
+    write(tmp_path, "test_other.py", "def test_fails():\n    assert 1 == 2\n")
+    first = run_tests(str(tmp_path), workers=2, with_coverage=False)
+    assert first["summary"]["passed"] == 1 and first["summary"]["failed"] == 1
+    assert first["files_run"] == 2 and first["status"] == "failed"
+    assert "test_other.py::test_fails" in format_test_summary(first)
+
+    second = run_tests(str(tmp_path), workers=2, with_coverage=False)
+    assert second["files_run"] == 0 and second["files_cached"] == 2
+    assert second["summary"] == first["summary"]
+
+    # Changing imported code reruns only the test file depending on it
+    write(tmp_path, "calc.py", "def add(a, b):\n    return a - b\n")
+    third = run_tests(str(tmp_path), workers=2, with_coverage=False)
+    assert third["files_run"] == 1 and third["summary"]["failed"] == 2
+
+
+def test_chatty_shards_do_not_block(tmp_path):
+    # Far more output than a pipe buffer holds, from several shards at once
+    for i in range(3):
+        write(tmp_path, f"test_loud{i}.py", "def test_loud():\n    print('x' * 1_000_000)\n    assert False\n")
+    result = run_tests(str(tmp_path), workers=3, with_coverage=False)
+    assert result["summary"]["failed"] == 3
+
+
+def test_timeout_is_shared_by_all_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr(test_runner, "SHARD_TIMEOUT", 2)
+    for i in range(3):
+        write(tmp_path, f"test_slow{i}.py", "import time\n\ndef test_slow():\n    time.sleep(30)\n")
+    result = run_tests(str(tmp_path), workers=3, with_coverage=False)
+    assert result["duration"] < 10
+    assert result["summary"]["error"] == 3
+    assert all("timed out" in t["message"] for t in result["tests"])
+    # Timeouts may be transient: nothing is cached
+    assert run_tests(str(tmp_path), workers=3, with_coverage=False)["files_run"] == 3
+
+
+def test_missing_directory():
+    assert run_tests("/nonexistent/project")["status"] == "error"
+
+
+def test_an_interpreter_must_be_configured(tmp_path, monkeypatch):
+    monkeypatch.setattr(test_runner, "TEST_RUNNER_PYTHON", "")
+    write(tmp_path, "test_a.py", "def test_a():\n    pass\n")
+    result = run_tests(str(tmp_path), workers=1, with_coverage=False)
+    assert result["status"] == "error" and "TEST_RUNNER_PYTHON" in format_test_summary(result)
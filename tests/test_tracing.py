@@ -0,0 +1,78 @@
+# tests/test_tracing.py
+import json
+import threading
+import time
+
+import pytest
+
+from src.utils import tracing
+from src.utils.tracing import Span, begin_span, inject, parse_traceparent, start_span
+
+
+@pytest.fixture
+def export_path(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "TRACE_EXPORT_PATH", str(path))
+    return path
+
+
+def exported_spans(path):
+    with open(path) as f:
+        return [s for line in f for s in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+
+
+def test_a_trace_is_written_when_its_root_ends(export_path):
+    with start_span("request", route="/tasks") as root:
+        with start_span("db.flush"):
+            pass
+        with pytest.raises(RuntimeError):
+            with start_span("agent"):
+                raise RuntimeError("boom")
+    assert tracing.current_span() is None
+    tracing.flush()
+
+    spans = {s["name"]: s for s in exported_spans(export_path)}
+    assert set(spans) == {"request", "db.flush", "agent"}
+    assert spans["agent"]["parentSpanId"] == root.span_id and "parentSpanId" not in spans["request"]
+    assert spans["agent"]["status"] == {"code": tracing.STATUS_ERROR, "message": "boom"}
+    assert {"key": "route", "value": {"stringValue": "/tasks"}} in spans["request"]["attributes"]
+
+
+def test_traceparent_headers_continue_the_trace():
+    with start_span("publish") as span:
+        headers = inject({})
+    assert parse_traceparent(headers["traceparent"]) == (span.trace_id, span.span_id)
+    child = begin_span("consume", traceparent=headers["traceparent"])
+    assert (child.trace_id, child.parent_id) == (span.trace_id, span.span_id)
+    assert parse_traceparent("00-" + "0" * 32 + "-" + "1" * 16 + "-01") is None
+    assert parse_traceparent("garbage") is None
+
+
+def test_a_slow_collector_does_not_block_the_caller_and_a_full_queue_drops(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_QUEUE_SIZE", 2)
+    exporter, busy, release, exported = tracing._Exporter(), threading.Event(), threading.Event(), []
+
+    def slow_export(spans):
+        busy.set()
+        release.wait(10)
+        exported.extend(spans)
+
+    def end_root(i):
+        span = Span(f"root {i}", trace_id=f"{i:032x}")
+        span.end_ns = span.start_ns
+        exporter.add(span)
+
+    monkeypatch.setattr(exporter, "_export", slow_export)
+    started = time.perf_counter()
+    end_root(0)
+    assert busy.wait(5)
+    for i in range(1, 5):
+        end_root(i)
+    assert time.perf_counter() - started < 1
+    # One batch is being exported, two wait in the queue, the rest were dropped
+    assert exporter.stats["dropped"] == 2
+    assert not exporter.flush(timeout=0.1)
+
+    release.set()
+    assert exporter.flush(timeout=5)
+    assert [s.name for s in exported] == ["root 0", "root 1", "root 2"]
@@ -0,0 +1,85 @@
+# tests/test_usage_ledger.py
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.db.models import Base, UsageBudget, UsageRecord
+from src.utils import usage_ledger
+from src.utils.usage_ledger import BudgetExceeded, UsageLedger, effective_model, load_budgets, spend
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[UsageRecord.__table__, UsageBudget.__table__])
+    monkeypatch.setattr(usage_ledger, "USAGE_TASK_MAX_TOKENS", 1000)
+    monkeypatch.setattr(usage_ledger, "USAGE_USER_DAILY_MAX_TOKENS", 5000)
+    monkeypatch.setattr(usage_ledger, "USAGE_PROJECT_DAILY_MAX_TOKENS", 0)
+    monkeypatch.setattr(usage_ledger, "USAGE_USER_DAILY_MAX_USD", 0.0)
+    return sessionmaker(bind=engine)
+
+
+def add_budget(factory, **columns):
+    db = factory()
+    db.add(UsageBudget(user_id=1, **columns))
+    db.commit()
+    db.close()
+
+
+def budgets(factory, project_id=10):
+    db = factory()
+    try:
+        return sorted((b["scope"], b["period"], b["max_tokens"]) for b in load_budgets(db, 1, project_id))
+    finally:
+        db.close()
+
+
+def test_defaults_apply_to_scopes_without_a_row(session_factory):
+    assert budgets(session_factory) == [("task", "task", 1000), ("user", "day", 5000)]
+    add_budget(session_factory, project_id=None, period="day", max_tokens=200)
+    assert budgets(session_factory) == [("task", "task", 1000), ("user", "day", 200)]
+
+
+@pytest.mark.parametrize("project_id,scope", [(None, "user"), (10, "project")])
+def test_a_per_task_row_replaces_the_default_task_budget(session_factory, project_id, scope):
+    add_budget(session_factory, project_id=project_id, period="task", max_tokens=50_000)
+    assert budgets(session_factory) == sorted([(scope, "task", 50_000), ("user", "day", 5000)])
+    # A row of another project does not apply
+    other = ("user", "task", 50_000) if scope == "user" else ("task", "task", 1000)
+    assert budgets(session_factory, project_id=11) == sorted([other, ("user", "day", 5000)])
+
+def test_calls_downgrade_then_stop_the_task(session_factory, monkeypatch):
+    monkeypatch.setattr(usage_ledger, "USAGE_FLUSH_SIZE", 2)
+    ledger = UsageLedger(1, 10, 100, session_factory=session_factory).start()
+    token = usage_ledger.activate(ledger)
+    try:
+        ledger.record("gpt-4o", "codegen", 300, 100, 0.01)
+        assert effective_model("gpt-4o") == "gpt-4o"
+        ledger.record("gpt-4o", "codegen", 300, 100, 0.01)
+        assert ledger.status() == ("downgrade", "task budget (task) at 80%")
+        assert effective_model("gpt-4o") == "gpt-4o-mini"
+        ledger.enforce()
+        ledger.record("gpt-4o-mini", "test", 150, 50, 0.001)
+        with pytest.raises(BudgetExceeded):
+            ledger.enforce()
+    finally:
+        usage_ledger.deactivate(token)
+    ledger.flush()
+    db = session_factory()
+    assert spend(db, task_id=100) == (1000, pytest.approx(0.021))
+    db.close()
+
+
+def test_other_tasks_spend_counts_against_shared_budgets(session_factory):
+    add_budget(session_factory, project_id=None, period="task", max_tokens=10**6)
+    first = UsageLedger(1, 10, 100, session_factory=session_factory).start()
+    first.record("gpt-4o", "plan", 3000, 1000, 0.05)
+    first.flush()
+
+    second = UsageLedger(1, 11, 101, session_factory=session_factory).start()
+    assert second.status() == ("downgrade", "user budget (day) at 80%")
+    second.record("gpt-4o", "plan", 800, 200, 0.01)
+    with pytest.raises(BudgetExceeded, match="user budget"):
+        second.enforce()
+    assert second.summary()["tokens"] == 1000
@@ -0,0 +1,119 @@
+# tests/test_vector_db_client.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from src.memory import vector_db_client
+from src.memory.vector_db_client import INDEX_FILE, ShardedVectorDB, VectorDBClient
+
+
+def vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def add(client, data, start=0):
+    return client.add(data, [f"doc {start + i}" for i in range(len(data))], [{"row": start + i} for i in range(len(data))])
+
+
+def mapped_files():
+    with open("/proc/self/maps", "r") as f:
+        return {line.split(None, 5)[5].strip() for line in f if len(line.split(None, 5)) == 6}
+
+
+def test_appends_are_searchable_before_and_after_compaction(tmp_path):
+    client = VectorDBClient("docs", root=str(tmp_path), compact_rows=10**6)
+    data = vectors(50)
+    assert add(client, data) == list(range(50))
+    hit = client.search(data[7], k=1)[0]
+    assert hit["id"] == 7 and hit["text"] == "doc 7" and hit["metadata"] == {"row": 7}
+
+    assert client.compact() == "gen-00000001"
+    assert add(client, vectors(5, seed=1), start=50) == list(range(50, 55))
+    assert client.count() == 55
+    assert client.search(data[7], k=1)[0]["id"] == 7
+    assert [d["text"] for d in client.get([0, 52, 99])] == ["doc 0", "doc 52"]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    client = VectorDBClient("docs", root=str(tmp_path))
+    add(client, vectors(3))
+    with pytest.raises(ValueError):
+        client.search(np.ones(8), k=1)
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc/self/maps")
+@pytest.mark.parametrize("ann_min_rows,index_type", [(10**6, "flat"), (1000, "ivf")])
+def test_compacted_indexes_are_file_backed_mappings(tmp_path, monkeypatch, ann_min_rows, index_type):
+    monkeypatch.setattr(vector_db_client, "ANN_MIN_ROWS", ann_min_rows)
+    client = VectorDBClient("docs", root=str(tmp_path), compact_rows=10**6)
+    data = vectors(2000)
+    add(client, data)
+    generation = client.compact()
+    assert client.search(data[3], k=1)[0]["id"] == 3
+
+    index_path = os.path.join(client.path, generation, INDEX_FILE)
+    assert client._generation.index_meta["type"] == index_type
+    assert index_path in mapped_files()
+    client.close()
+
+
+def test_sharded_searches_stay_in_the_project_shard(tmp_path):
+    db = ShardedVectorDB("memory", root=str(tmp_path))
+    a, b = vectors(4, seed=1), vectors(4, seed=2)
+    db.shard("proj-a").add(a, ["a0", "a1", "a2", "a3"])
+    db.shard("proj/b").add(b, ["b0", "b1", "b2", "b3"])
+    assert db.shard_names() == ["proj%2Fb", "proj-a"]
+    assert {hit["text"][0] for hit in db.search(b[1], k=4, project="proj-a")} == {"a"}
+    best = db.search(b[1], k=1)[0]
+    assert best["text"] == "b1" and best["shard"] == "proj%2Fb"
+
+
+def test_shard_names_neither_collide_nor_leave_the_collection():
+    names = [ShardedVectorDB.shard_name(p) for p in ("my app", "my_app", "my%20app", "_shared", None, "../x")]
+    assert names == ["my%20app", "my_app", "my%2520app", "%5Fshared", ShardedVectorDB.DEFAULT_SHARD, "..%2Fx"]
+    for project in (".", ".."):
+        with pytest.raises(ValueError):
+            ShardedVectorDB.shard_name(project)
+
+
+def test_ivf_list_count_grows_with_the_square_root():
+    assert vector_db_client.ivf_list_count(100) == 16
+    assert vector_db_client.ivf_list_count(1000) == 25  # enough points per list to train
+    assert vector_db_client.ivf_list_count(1_000_000) == 4000
+    assert vector_db_client.ivf_list_count(10**12) == 65536
+
+
+def test_large_shards_switch_to_ivf_and_retrain_after_growing(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_db_client, "ANN_MIN_ROWS", 1000)
+    monkeypatch.setattr(vector_db_client, "RETRAIN_GROWTH", 1.5)
+    client = VectorDBClient("docs", root=str(tmp_path), compact_rows=10**6)
+    data = vectors(3000)
+
+    add(client, data[:800])
+    client.compact()
+    assert client._open().index_meta["type"] == "flat"
+    add(client, data[800:1200], start=800)
+    client.compact()
+    assert client._open().index_meta == {"type": "ivf", "nlist": 30, "trained_rows": 1200, "rows": 1200}
+
+    # Within RETRAIN_GROWTH the trained index is extended, beyond it re-trained
+    add(client, data[1200:1700], start=1200)
+    client.compact()
+    assert client._open().index_meta["trained_rows"] == 1200
+    add(client, data[1700:], start=1700)
+    client.compact()
+    assert client._open().index_meta["trained_rows"] == 3000
+    assert client._open().index.nprobe == vector_db_client.NPROBE
+    assert client.search(data[2500], k=1)[0]["id"] == 2500
+
+
+def test_appends_past_compact_rows_compact_in_the_background(tmp_path):
+    client = VectorDBClient("docs", root=str(tmp_path), compact_rows=20)
+    add(client, vectors(10))
+    assert client._current_name() == "gen-00000000"
+    add(client, vectors(15, seed=1), start=10)
+    vector_db_client._compaction_executor.submit(lambda: None).result(timeout=30)
+    assert client._current_name() == "gen-00000001"
+    assert client.count() == 25 and client._open().delta_count == 0
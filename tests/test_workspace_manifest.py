@@ -0,0 +1,105 @@
+# tests/test_workspace_manifest.py
+import os
+
+from src.agent_factory.static_validator import validate_directory
+from src.utils.import_graph import ImportGraph, parse_imports
+from src.utils.workspace_manifest import WorkspaceManifest
+
+
+def write(root, rel, source):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(source)
+
+
+def project(tmp_path):
+    write(tmp_path, "a.py", "def helper():\n    return 1\n")
+    write(tmp_path, "b.py", "from a import helper\n\ndef run():\n    return helper()\n")
+    write(tmp_path, "c.py", "import b\n")
+    write(tmp_path, "d.py", "x = 1\n")
+    return str(tmp_path)
+
+
+def test_refresh_reports_changes_only_once(tmp_path):
+    root = project(tmp_path)
+    manifest = WorkspaceManifest.load(root)
+    assert manifest.refresh()["changed"] == {"a.py", "b.py", "c.py", "d.py"}
+    manifest.save()
+    manifest = WorkspaceManifest.load(root)
+    assert manifest.refresh() == {"changed": set(), "removed": set(), "importers": set()}
+
+
+def test_affected_includes_transitive_importers(tmp_path):
+    root = project(tmp_path)
+    manifest = WorkspaceManifest.load(root)
+    manifest.refresh()
+    write(tmp_path, "a.py", "def helper():\n    return 2\n")
+    assert manifest.affected(manifest.refresh()) == {"a.py", "b.py", "c.py"}
+
+
+def test_affected_includes_importers_of_deleted_files(tmp_path):
+    root = project(tmp_path)
+    manifest = WorkspaceManifest.load(root)
+    manifest.refresh()
+    os.remove(os.path.join(root, "a.py"))
+    changes = manifest.refresh()
+    assert changes["removed"] == {"a.py"}
+    assert manifest.affected(changes) == {"b.py", "c.py"}
+
+
+def test_scoped_refresh_reports_deleted_paths(tmp_path):
+    root = project(tmp_path)
+    manifest = WorkspaceManifest.load(root)
+    manifest.refresh()
+    os.remove(os.path.join(root, "a.py"))
+    changes = manifest.refresh(["a.py"])
+    assert changes["removed"] == {"a.py"} and changes["importers"] == {"b.py", "c.py"}
+
+
+def test_incremental_validation_reuses_cached_results(tmp_path):
+    root = project(tmp_path)
+    first = validate_directory(root)
+    assert first["ok"] and first["files_checked"] == 4
+    write(tmp_path, "d.py", "y = 2\n")
+    second = validate_directory(root)
+    assert second["files_checked"] == 1 and second["files_cached"] == 3
+
+
+def test_changed_export_fails_its_importer(tmp_path):
+    root = project(tmp_path)
+    validate_directory(root)
+    write(tmp_path, "a.py", "def renamed():\n    return 1\n")
+    result = validate_directory(root)
+    assert not result["ok"]
+    b = next(r for r in result["results"] if r["filename"] == "b.py")
+    assert [i["rule"] for i in b["issues"]] == ["import-error"]
+
+
+def test_deleting_an_imported_module_fails_its_importer(tmp_path):
+    root = project(tmp_path)
+    assert validate_directory(root)["ok"]
+    os.remove(os.path.join(root, "a.py"))
+    result = validate_directory(root)
+    assert not result["ok"] and result["files_checked"] == 2
+    b = next(r for r in result["results"] if r["filename"] == "b.py")
+    assert "module 'a' was deleted" in b["issues"][0]["message"]
+    # Restoring the module clears the error again
+    write(tmp_path, "a.py", "def helper():\n    return 1\n")
+    assert validate_directory(root)["ok"]
+
+
+def test_import_graph_resolves_relative_and_src_layout_imports():
+    import ast
+
+    def entry(source):
+        return {"imports": parse_imports(ast.parse(source)), "exports": None}
+
+    graph = ImportGraph({
+        "src/pkg/__init__.py": entry(""),
+        "src/pkg/core.py": entry("from .util import f\n"),
+        "src/pkg/util.py": entry("def f():\n    pass\n"),
+        "app.py": entry("from pkg import core\n"),
+    })
+    assert graph.dependencies(["app.py"]) == {"app.py", "src/pkg/__init__.py", "src/pkg/core.py", "src/pkg/util.py"}
+    assert graph.dependents(["src/pkg/util.py"]) == {"src/pkg/core.py", "app.py"}